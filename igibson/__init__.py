@@ -53,6 +53,12 @@ else:
     cubicasa_dataset_path = global_config["cubicasa_dataset_path"]
 cubicasa_dataset_path = os.path.expanduser(cubicasa_dataset_path)
 
+if "IGIBSON_CACHE_PATH" in os.environ:
+    cache_path = os.environ["IGIBSON_CACHE_PATH"]
+else:
+    cache_path = global_config.get("cache_path", "data/cache")
+cache_path = os.path.expanduser(cache_path)
+
 if "KEY_PATH" in os.environ:
     key_path = os.environ["KEY_PATH"]
 else:
@@ -71,6 +77,8 @@ if not os.path.isabs(threedfront_dataset_path):
     threedfront_dataset_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), threedfront_dataset_path)
 if not os.path.isabs(cubicasa_dataset_path):
     cubicasa_dataset_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), cubicasa_dataset_path)
+if not os.path.isabs(cache_path):
+    cache_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), cache_path)
 if not os.path.isabs(key_path):
     key_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), key_path)
 
@@ -84,6 +92,7 @@ log.debug("iG Dataset path: {}".format(ig_dataset_path))
 log.debug("3D-FRONT Dataset path: {}".format(threedfront_dataset_path))
 log.debug("CubiCasa5K Dataset path: {}".format(cubicasa_dataset_path))
 log.debug("iGibson Key path: {}".format(key_path))
+log.debug("iGibson cache path: {}".format(cache_path))
 
 
 def get_version(dataset_path):
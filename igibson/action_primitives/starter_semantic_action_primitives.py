@@ -8,6 +8,7 @@ runnable examples.
 import inspect
 import logging
 import random
+import time
 from enum import IntEnum
 from math import ceil
 
@@ -31,6 +32,7 @@ from igibson.utils.behavior_robot_motion_planning_utils import (
     plan_base_motion_br,
     plan_hand_motion_br,
 )
+from igibson.utils.collision_utils import detect_collisions
 from igibson.utils.grasp_planning_utils import get_grasp_poses_for_object, get_grasp_position_for_open
 from igibson.utils.utils import restoreState
 
@@ -44,6 +46,12 @@ MAX_ATTEMPTS_FOR_SAMPLING_POSE_WITH_OBJECT_AND_PREDICATE = 20
 MAX_ATTEMPTS_FOR_SAMPLING_POSE_NEAR_OBJECT = 60
 MAX_ATTEMPTS_FOR_SAMPLING_POSE_IN_ROOM = 60
 
+# Stages of the candidate poses sampled near an object, from the cheapest to the most expensive one
+POSE_SAMPLING_STAGES = ("room", "traversability", "shoulder_distance", "collision")
+# Whether to reject the candidate poses near an object that are not traversable. The traversability map is eroded by
+# the robot footprint, so this also rejects some collision-free poses next to objects.
+FILTER_POSES_NEAR_OBJECT_BY_TRAVERSABILITY = False
+
 BIRRT_SAMPLING_CIRCLE_PROBABILITY = 0.5
 HAND_SAMPLING_DOMAIN_PADDING = 1  # Allow 1m of freedom around the sampling range.
 PREDICATE_SAMPLING_Z_OFFSET = 0.1
@@ -61,6 +69,8 @@ DEFAULT_ANGLE_THRESHOLD = 0.05
 LOW_PRECISION_DIST_THRESHOLD = 0.1
 LOW_PRECISION_ANGLE_THRESHOLD = 0.2
 
+COLLISION_DISTANCE = 0.01
+
 logger = logging.getLogger(__name__)
 
 
@@ -199,6 +209,35 @@ class StarterSemanticActionPrimitives(BaseActionPrimitiveSet):
             StarterSemanticActionPrimitive.NAVIGATE_TO: self._navigate_to_obj,
         }
         self.arm = "right_hand"
+        self.reset_pose_sampling_stats()
+
+    def reset_pose_sampling_stats(self):
+        """
+        Reset the counters of the sampling of poses near objects
+        """
+        self.pose_sampling_stats = {
+            "calls": 0,
+            "successes": 0,
+            "time": 0.0,
+            "stages": {stage: {"attempts": 0, "accepted": 0} for stage in POSE_SAMPLING_STAGES},
+        }
+
+    def get_pose_sampling_stats(self):
+        """
+        Get the counters of the sampling of poses near objects: number of calls, successes and total wall time, and
+        the number of candidates tested and accepted by each stage, with the acceptance rates and mean time per call
+
+        :return: dict of counters
+        """
+        stats = {key: value for key, value in self.pose_sampling_stats.items() if key != "stages"}
+        stats["mean_time"] = stats["time"] / stats["calls"] if stats["calls"] > 0 else 0.0
+        stats["stages"] = {}
+        for stage, counters in self.pose_sampling_stats["stages"].items():
+            stats["stages"][stage] = dict(counters)
+            stats["stages"][stage]["acceptance_rate"] = (
+                counters["accepted"] / counters["attempts"] if counters["attempts"] > 0 else 0.0
+            )
+        return stats
 
     def get_action_space(self):
         if ACTIVITY_RELEVANT_OBJECTS_ONLY:
@@ -659,32 +698,90 @@ class StarterSemanticActionPrimitives(BaseActionPrimitiveSet):
         )
 
     def _sample_pose_near_object(self, obj, pos_on_obj=None, **kwargs):
+        """
+        Sample a robot pose near an object. A batch of candidates is sampled, the candidates in other rooms, too far
+        from the object for the hand, or on non traversable cells if FILTER_POSES_NEAR_OBJECT_BY_TRAVERSABILITY is set,
+        are rejected at once, and the remaining candidates are tested in the physics simulation, best first, until one
+        is collision-free.
+        The counters of each stage are kept in pose_sampling_stats.
+
+        :param obj: object to sample a pose near
+        :param pos_on_obj: position on the object that the hand should reach, sampled on the object AABB by default
+        :return: 2D pose (x, y, yaw)
+        """
+        start_time = time.time()
+        self.pose_sampling_stats["calls"] += 1
+        try:
+            pose_2d = self._sample_pose_near_object_in_stages(obj, pos_on_obj=pos_on_obj, **kwargs)
+        finally:
+            self.pose_sampling_stats["time"] += time.time() - start_time
+        self.pose_sampling_stats["successes"] += 1
+        return pose_2d
+
+    def _sample_pose_near_object_in_stages(self, obj, pos_on_obj=None, **kwargs):
         if pos_on_obj is None:
             pos_on_obj = self._sample_position_on_aabb_face(obj)
 
         pos_on_obj = np.array(pos_on_obj)
         obj_rooms = obj.in_rooms if obj.in_rooms else [self.scene.get_room_instance_by_point(pos_on_obj[:2])]
-        for _ in range(MAX_ATTEMPTS_FOR_SAMPLING_POSE_NEAR_OBJECT):
-            distance = np.random.uniform(0.2, 1.0)
-            yaw = np.random.uniform(-np.pi, np.pi)
-            pose_2d = np.array(
-                [pos_on_obj[0] + distance * np.cos(yaw), pos_on_obj[1] + distance * np.sin(yaw), yaw + np.pi]
-            )
+        obj_room_ids = [self.scene.room_ins_name_to_ins_id[room] if room is not None else 0 for room in obj_rooms]
 
-            # Check room
-            if self.scene.get_room_instance_by_point(pose_2d[:2]) not in obj_rooms:
-                indented_print("Candidate position is in the wrong room.")
-                continue
+        num_candidates = MAX_ATTEMPTS_FOR_SAMPLING_POSE_NEAR_OBJECT
+        distance = np.random.uniform(0.2, 1.0, num_candidates)
+        yaw = np.random.uniform(-np.pi, np.pi, num_candidates)
+        poses_2d = np.stack(
+            [pos_on_obj[0] + distance * np.cos(yaw), pos_on_obj[1] + distance * np.sin(yaw), yaw + np.pi], axis=1
+        )
+
+        # Check room
+        in_room = np.isin(self.scene.get_room_instance_ids_by_points(poses_2d[:, :2]), obj_room_ids)
+        poses_2d = self._filter_candidate_poses("room", poses_2d, in_room)
+
+        # Check traversability
+        if FILTER_POSES_NEAR_OBJECT_BY_TRAVERSABILITY:
+            floor = max(np.searchsorted(self.scene.floor_heights, pos_on_obj[2], side="right") - 1, 0)
+            traversable = self.scene.get_traversability_by_points(floor, poses_2d[:, :2])
+            poses_2d = self._filter_candidate_poses("traversability", poses_2d, traversable)
+
+        # Check shoulder distance
+        hand_distances = self._get_dist_from_point_to_shoulder_for_poses(pos_on_obj, poses_2d)
+        in_reach = hand_distances <= HAND_DISTANCE_THRESHOLD
+        poses_2d = self._filter_candidate_poses("shoulder_distance", poses_2d, in_reach)
+        indented_print(
+            "%d of %d candidate positions passed the filtering stages.",
+            len(poses_2d),
+            num_candidates,
+        )
 
+        # The candidates in the middle of the reach of the hand are tested first: far enough from the object to be
+        # less likely to collide with it, and not at the limit of the reach
+        poses_2d = poses_2d[np.argsort(np.abs(hand_distances[in_reach] - HAND_DISTANCE_THRESHOLD / 2), kind="stable")]
+        collision_stats = self.pose_sampling_stats["stages"]["collision"]
+        for pose_2d in poses_2d:
+            collision_stats["attempts"] += 1
             if not self._test_pose(pose_2d, pos_on_obj=pos_on_obj, **kwargs):
                 continue
 
+            collision_stats["accepted"] += 1
             return pose_2d
 
         raise ActionPrimitiveError(
             ActionPrimitiveError.Reason.SAMPLING_ERROR, "Could not find valid position near object."
         )
 
+    def _filter_candidate_poses(self, stage, poses_2d, keep):
+        """
+        Keep the candidate poses that passed a sampling stage, counting them in pose_sampling_stats
+
+        :param stage: stage name, in POSE_SAMPLING_STAGES
+        :param poses_2d: (N, 3) array of candidate 2D poses
+        :param keep: (N,) boolean array of the candidates that passed the stage
+        :return: (M, 3) array of the candidates that passed the stage
+        """
+        self.pose_sampling_stats["stages"][stage]["attempts"] += len(poses_2d)
+        self.pose_sampling_stats["stages"][stage]["accepted"] += int(np.count_nonzero(keep))
+        return poses_2d[keep]
+
     @staticmethod
     def _sample_position_on_aabb_face(target_obj):
         aabb_center, aabb_extent = get_center_extent(target_obj.states)
@@ -737,19 +834,23 @@ class StarterSemanticActionPrimitives(BaseActionPrimitiveSet):
             return pos, orn
 
     @staticmethod
-    def _detect_collision(body, obj_in_hand=None):
-        collision = []
-        obj_in_hand_id = None
+    def _detect_collision(body, obj_in_hand=None, find_all=False):
+        """
+        Detect the bodies in collision with a body, only running the narrow phase for the bodies close enough
+
+        :param body: pybullet body id
+        :param obj_in_hand: object held by the body, ignored
+        :param find_all: whether to find all the colliding bodies, otherwise stop at the first one
+        :return: list of the ids of the colliding bodies
+        """
+        exclude_body_ids = []
         if obj_in_hand is not None:
             [obj_in_hand_id] = obj_in_hand.get_body_ids()
-        for body_id in range(p.getNumBodies()):
-            if body_id == body or body_id == obj_in_hand_id:
-                continue
-            closest_points = p.getClosestPoints(body, body_id, distance=0.01)
-            if len(closest_points) > 0:
-                collision.append(body_id)
-                break
-        return collision
+            exclude_body_ids.append(obj_in_hand_id)
+        collisions = detect_collisions(
+            body, distance=COLLISION_DISTANCE, exclude_body_ids=exclude_body_ids, find_all=find_all
+        )
+        return [body_id for _, body_id in collisions]
 
     def _detect_robot_collision(self):
         # TODO(MP): Generalize.
@@ -831,6 +932,33 @@ class StarterSemanticActionPrimitives(BaseActionPrimitiveSet):
         shoulder_to_hand = point_in_base_frame - shoulder_pos_in_base_frame
         return np.linalg.norm(shoulder_to_hand)
 
+    def _get_dist_from_point_to_shoulder_for_poses(self, pos, poses_2d):
+        """
+        Get the distance from a point to the shoulder for a batch of robot 2D poses, as _get_dist_from_point_to_shoulder
+        would once the robot is at each pose
+
+        :param pos: 3D point
+        :param poses_2d: (N, 3) array of 2D poses (x, y, yaw)
+        :return: (N,) array of distances
+        """
+        shoulder_pos_in_base_frame = np.array(
+            self.robot.links["%s_shoulder" % self.arm].get_local_position_orientation()[0]
+        )
+        # The robot is at DEFAULT_BODY_OFFSET_FROM_FLOOR, rotated by the yaw only
+        offset = np.array(pos)[None, :] - np.stack(
+            [poses_2d[:, 0], poses_2d[:, 1], np.full(len(poses_2d), DEFAULT_BODY_OFFSET_FROM_FLOOR)], axis=1
+        )
+        cos_yaw, sin_yaw = np.cos(poses_2d[:, 2]), np.sin(poses_2d[:, 2])
+        point_in_base_frame = np.stack(
+            [
+                cos_yaw * offset[:, 0] + sin_yaw * offset[:, 1],
+                -sin_yaw * offset[:, 0] + cos_yaw * offset[:, 1],
+                offset[:, 2],
+            ],
+            axis=1,
+        )
+        return np.linalg.norm(point_in_base_frame - shoulder_pos_in_base_frame, axis=1)
+
     def _get_hand_pose_for_object_pose(self, desired_pose):
         obj_in_hand = self._get_obj_in_hand()
 
@@ -94,6 +94,10 @@ class BaseEnv(gym.Env):
                 use_pb_gui=use_pb_gui,
             )
         else:
+            # The raycast vision backend does not render, so in headless mode no renderer (and no GPU) is needed
+            use_renderer = self.config.get(
+                "use_renderer", mode != "headless" or self.config.get("vision_backend", "renderer") != "raycast"
+            )
             self.simulator = Simulator(
                 mode=mode,
                 physics_timestep=physics_timestep,
@@ -104,6 +108,7 @@ class BaseEnv(gym.Env):
                 device_idx=device_idx,
                 rendering_settings=self.rendering_settings,
                 use_pb_gui=use_pb_gui,
+                use_renderer=use_renderer,
             )
         self.load()
 
@@ -187,6 +192,7 @@ class BaseEnv(gym.Env):
                 merge_fixed_links=self.config.get("merge_fixed_links", True)
                 and not self.config.get("online_sampling", False),
                 include_robots=include_robots,
+                use_reset_snapshot=self.config.get("use_reset_snapshot", True),
             )
             # TODO: Unify the function import_scene and take out of the if-else clauses.
             first_n = self.config.get("_set_first_n_objects", -1)
@@ -11,8 +11,10 @@ from transforms3d.euler import euler2quat
 
 from igibson import object_states
 from igibson.envs.env_base import BaseEnv
+from igibson.render.profiler import step_profiler
 from igibson.robots.robot_base import BaseRobot
 from igibson.sensors.bump_sensor import BumpSensor
+from igibson.sensors.raycast_vision_sensor import RaycastVisionSensor
 from igibson.sensors.scan_sensor import ScanSensor
 from igibson.sensors.vision_sensor import VisionSensor
 from igibson.tasks.behavior_task import BehaviorTask
@@ -24,7 +26,13 @@ from igibson.tasks.point_nav_random_task import PointNavRandomTask
 from igibson.tasks.reaching_random_task import ReachingRandomTask
 from igibson.tasks.room_rearrangement_task import RoomRearrangementTask
 from igibson.utils.constants import MAX_CLASS_COUNT, MAX_INSTANCE_COUNT
-from igibson.utils.utils import quatToXYZW
+from igibson.utils.placement_utils import (
+    check_bodies_collision,
+    check_self_collision,
+    get_min_distance,
+    get_resting_height_offset,
+)
+from igibson.utils.utils import quatToXYZW, restoreState
 
 log = logging.getLogger(__name__)
 
@@ -80,6 +88,8 @@ class iGibsonEnv(BaseEnv):
         # s = 0.5 * G * (t ** 2)
         drop_distance = 0.5 * 9.8 * (self.action_timestep**2)
         assert drop_distance < self.initial_pos_z_offset, "initial_pos_z_offset is too small for collision checking"
+        # validate and land poses with collision queries and ray casts instead of stepping the simulator
+        self.physics_free_placement = self.config.get("physics_free_placement", True)
 
         # ignore the agent's collision with these body ids
         self.collision_ignore_body_b_ids = set(self.config.get("collision_ignore_body_b_ids", []))
@@ -201,7 +211,6 @@ class iGibsonEnv(BaseEnv):
         if "scan" in self.output:
             self.n_horizontal_rays = self.config.get("n_horizontal_rays", 128)
             self.n_vertical_beams = self.config.get("n_vertical_beams", 1)
-            assert self.n_vertical_beams == 1, "scan can only handle one vertical beam for now"
             observation_space["scan"] = self.build_obs_space(
                 shape=(self.n_horizontal_rays * self.n_vertical_beams, 1), low=0.0, high=1.0
             )
@@ -209,11 +218,38 @@ class iGibsonEnv(BaseEnv):
         if "scan_rear" in self.output:
             self.n_horizontal_rays = self.config.get("n_horizontal_rays", 128)
             self.n_vertical_beams = self.config.get("n_vertical_beams", 1)
-            assert self.n_vertical_beams == 1, "scan can only handle one vertical beam for now"
             observation_space["scan_rear"] = self.build_obs_space(
                 shape=(self.n_horizontal_rays * self.n_vertical_beams, 1), low=0.0, high=1.0
             )
             scan_modalities.append("scan_rear")
+        if "scan_pc" in self.output:
+            self.n_horizontal_rays = self.config.get("n_horizontal_rays", 128)
+            self.n_vertical_beams = self.config.get("n_vertical_beams", 1)
+            observation_space["scan_pc"] = self.build_obs_space(
+                shape=(self.n_horizontal_rays * self.n_vertical_beams, 3), low=-np.inf, high=np.inf
+            )
+            scan_modalities.append("scan_pc")
+        if "scan_pc_voxel" in self.output:
+            self.n_horizontal_rays = self.config.get("n_horizontal_rays", 128)
+            self.n_vertical_beams = self.config.get("n_vertical_beams", 1)
+            observation_space["scan_pc_voxel"] = self.build_obs_space(
+                shape=(self.n_horizontal_rays * self.n_vertical_beams, 3), low=-np.inf, high=np.inf
+            )
+            scan_modalities.append("scan_pc_voxel")
+        if "scan_intensity" in self.output:
+            self.n_horizontal_rays = self.config.get("n_horizontal_rays", 128)
+            self.n_vertical_beams = self.config.get("n_vertical_beams", 1)
+            observation_space["scan_intensity"] = self.build_obs_space(
+                shape=(self.n_horizontal_rays * self.n_vertical_beams, 1), low=0.0, high=1.0
+            )
+            scan_modalities.append("scan_intensity")
+        if "scan_ins_seg" in self.output:
+            self.n_horizontal_rays = self.config.get("n_horizontal_rays", 128)
+            self.n_vertical_beams = self.config.get("n_vertical_beams", 1)
+            observation_space["scan_ins_seg"] = self.build_obs_space(
+                shape=(self.n_horizontal_rays * self.n_vertical_beams, 1), low=0.0, high=MAX_INSTANCE_COUNT
+            )
+            scan_modalities.append("scan_ins_seg")
         if "occupancy_grid" in self.output:
             self.grid_resolution = self.config.get("grid_resolution", 128)
             self.occupancy_grid_space = gym.spaces.Box(
@@ -230,7 +266,13 @@ class iGibsonEnv(BaseEnv):
             )
 
         if len(vision_modalities) > 0:
-            sensors["vision"] = VisionSensor(self, vision_modalities)
+            vision_backend = self.config.get("vision_backend", "renderer")
+            if vision_backend == "renderer":
+                sensors["vision"] = VisionSensor(self, vision_modalities)
+            elif vision_backend == "raycast":
+                sensors["vision"] = RaycastVisionSensor(self, vision_modalities)
+            else:
+                raise ValueError("Invalid vision backend: {}".format(vision_backend))
 
         if len(scan_modalities) > 0:
             sensors["scan_occ"] = ScanSensor(self, scan_modalities)
@@ -274,23 +316,29 @@ class iGibsonEnv(BaseEnv):
         """
         state = OrderedDict()
         if "task_obs" in self.output:
-            state["task_obs"] = self.task.get_task_obs(self)
+            with step_profiler.scope("task_obs"):
+                state["task_obs"] = self.task.get_task_obs(self)
         if "vision" in self.sensors:
-            vision_obs = self.sensors["vision"].get_obs(self)
+            with step_profiler.scope("vision"):
+                vision_obs = self.sensors["vision"].get_obs(self)
             for modality in vision_obs:
                 state[modality] = vision_obs[modality]
         if "scan_occ" in self.sensors:
-            scan_obs = self.sensors["scan_occ"].get_obs(self)
+            with step_profiler.scope("scan_occ"):
+                scan_obs = self.sensors["scan_occ"].get_obs(self)
             for modality in scan_obs:
                 state[modality] = scan_obs[modality]
         if "scan_occ_rear" in self.sensors:
-            scan_obs = self.sensors["scan_occ_rear"].get_obs(self)
+            with step_profiler.scope("scan_occ_rear"):
+                scan_obs = self.sensors["scan_occ_rear"].get_obs(self)
             for modality in scan_obs:
                 state[modality] = scan_obs[modality]
         if "bump" in self.sensors:
-            state["bump"] = self.sensors["bump"].get_obs(self)
+            with step_profiler.scope("bump"):
+                state["bump"] = self.sensors["bump"].get_obs(self)
         if "proprioception" in self.output:
-            state["proprioception"] = np.array(self.robots[0].get_proprioception())
+            with step_profiler.scope("proprioception"):
+                state["proprioception"] = np.array(self.robots[0].get_proprioception())
 
         return state
 
@@ -350,23 +398,31 @@ class iGibsonEnv(BaseEnv):
         :return: done: whether the episode is terminated
         :return: info: info dictionary with any useful information
         """
-        self.current_step += 1
-        if action is not None:
-            self.robots[0].apply_action(action)
-        collision_links = self.run_simulation()
-        self.collision_links = collision_links
-        self.collision_step += int(len(collision_links) > 0)
-
-        state = self.get_state()
-        info = {}
-        reward, info = self.task.get_reward(self, collision_links, action, info)
-        done, info = self.task.get_termination(self, collision_links, action, info)
-        self.task.step(self)
-        self.populate_info(info)
-
-        if done and self.automatic_reset:
-            info["last_observation"] = state
-            state = self.reset()
+        with step_profiler.scope("env_step"):
+            self.current_step += 1
+            if action is not None:
+                with step_profiler.scope("apply_action"):
+                    self.robots[0].apply_action(action)
+            with step_profiler.scope("run_simulation"):
+                collision_links = self.run_simulation()
+            self.collision_links = collision_links
+            self.collision_step += int(len(collision_links) > 0)
+
+            with step_profiler.scope("get_state"):
+                state = self.get_state()
+            info = {}
+            with step_profiler.scope("task_reward"):
+                reward, info = self.task.get_reward(self, collision_links, action, info)
+            with step_profiler.scope("task_termination"):
+                done, info = self.task.get_termination(self, collision_links, action, info)
+            with step_profiler.scope("task_step"):
+                self.task.step(self)
+            self.populate_info(info)
+
+            if done and self.automatic_reset:
+                info["last_observation"] = state
+                with step_profiler.scope("reset"):
+                    state = self.reset()
 
         return state, reward, done, info
 
@@ -431,9 +487,58 @@ class iGibsonEnv(BaseEnv):
             obj.keep_still()
 
         ignore_ids = obj.get_body_ids() if ignore_self_collision else []
+        if self.physics_free_placement:
+            return not check_bodies_collision(obj.get_body_ids(), ignore_ids)
+
         has_collision = any(self.check_collision(body_id, ignore_ids) for body_id in obj.get_body_ids())
         return not has_collision
 
+    def test_valid_positions(self, obj, positions, orns=None, ignore_self_collision=False, stop_at_first_valid=False):
+        """
+        Test a batch of candidate poses for the robot or the object. Apart from the pose of the tested object, the
+        simulator state is left unchanged.
+
+        :param obj: an instance of robot or object
+        :param positions: list of positions
+        :param orns: list of orientations (random yaw if None)
+        :param ignore_self_collision: whether the object's self-collisions should be ignored.
+        :param stop_at_first_valid: whether to stop testing after the first valid pose, the remaining poses are
+            reported as invalid
+        :return: boolean array, whether each position is valid
+        """
+        if orns is None:
+            orns = [None] * len(positions)
+        valid = np.zeros(len(positions), dtype=bool)
+
+        if not self.physics_free_placement:
+            # The placement tests step the simulator, so its state is restored after each of them
+            # TODO: p.saveState takes a few seconds, need to speed up
+            state_id = p.saveState()
+            for i, (pos, orn) in enumerate(zip(positions, orns)):
+                valid[i] = self.test_valid_position(obj, pos, orn, ignore_self_collision=ignore_self_collision)
+                restoreState(state_id)
+                if valid[i] and stop_at_first_valid:
+                    break
+            p.removeState(state_id)
+            return valid
+
+        # The joint configuration is the same for all the candidate poses, so the robot is reset and its
+        # self-collisions are checked once for the whole batch
+        if isinstance(obj, BaseRobot):
+            obj.reset()
+            obj.keep_still()
+        body_ids = obj.get_body_ids()
+        ignore_ids = body_ids if ignore_self_collision else []
+        if not ignore_self_collision and check_self_collision(body_ids):
+            return valid
+
+        for i, (pos, orn) in enumerate(zip(positions, orns)):
+            self.set_pos_orn_with_z_offset(obj, pos, orn)
+            valid[i] = not check_bodies_collision(body_ids, ignore_ids, check_self_collisions=False)
+            if valid[i] and stop_at_first_valid:
+                break
+        return valid
+
     def land(self, obj, pos, orn):
         """
         Land the robot or the object onto the floor, given a valid position and orientation.
@@ -451,13 +556,17 @@ class iGibsonEnv(BaseEnv):
             obj.keep_still()
 
         land_success = False
-        # land for maximum 1 second, should fall down ~5 meters
-        max_simulator_step = int(1.0 / self.action_timestep)
-        for _ in range(max_simulator_step):
-            self.simulator_step()
-            if any(len(p.getContactPoints(bodyA=body_id)) > 0 for body_id in obj.get_body_ids()):
-                land_success = True
-                break
+        if self.physics_free_placement:
+            land_success = self.land_without_physics(obj)
+
+        if not land_success:
+            # land for maximum 1 second, should fall down ~5 meters
+            max_simulator_step = int(1.0 / self.action_timestep)
+            for _ in range(max_simulator_step):
+                self.simulator_step()
+                if any(len(p.getContactPoints(bodyA=body_id)) > 0 for body_id in obj.get_body_ids()):
+                    land_success = True
+                    break
 
         if not land_success:
             log.warning("Object failed to land.")
@@ -466,6 +575,27 @@ class iGibsonEnv(BaseEnv):
             obj.reset()
             obj.keep_still()
 
+    def land_without_physics(self, obj, penetration_tolerance=0.01):
+        """
+        Move the robot or the object straight down onto the highest surface below it, found by ray casting.
+
+        :param obj: an instance of robot or object
+        :param penetration_tolerance: maximum penetration with the scene after landing
+        :return: whether the object landed, otherwise it is left at its original pose
+        """
+        body_ids = obj.get_body_ids()
+        z_offset = get_resting_height_offset(body_ids)
+        if z_offset is None:
+            return False
+
+        pos = np.array(obj.get_position())
+        obj.set_position(pos + np.array([0.0, 0.0, z_offset]))
+        # The rays may miss a surface that sticks out between them, in which case the object would penetrate it
+        if get_min_distance(body_ids) < -penetration_tolerance:
+            obj.set_position(pos)
+            return False
+        return True
+
     def reset_variables(self):
         """
         Reset bookkeeping variables for the next new episode.
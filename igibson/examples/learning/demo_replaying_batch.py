@@ -5,12 +5,11 @@ import argparse
 import json
 import logging
 import os
-from pathlib import Path
 
 import pandas as pd
 
 import igibson
-from igibson.examples.learning.demo_replaying_example import replay_demo
+from igibson.utils.demo_replay_farm import DemoReplayFarm, get_replay_jobs, print_report
 
 
 def replay_demo_batch(
@@ -24,10 +23,22 @@ def replay_demo_batch(
     debug_display=False,
     image_size=(1280, 720),
     deactivate_logger=True,
+    num_workers=1,
+    timeout=7200.0,
+    max_trials=2,
+    num_shards=1,
+    shard_id=0,
+    replay_manifest=None,
+    reuse_env=True,
+    use_processes=None,
 ):
     """
     Execute replay analysis functions (provided through callbacks) on a batch of BEHAVIOR demos.
 
+    The demos are replayed by a DemoReplayFarm: a pool of worker processes that reuse their environment between demos
+    of the same scene and activity instance, with a timeout and retries per demo, and a replay manifest recording the
+    demos that are done so that an interrupted batch can be resumed.
+
     @param demo_dir: Directory containing the demo files listed in the manifests.
     @param demo_manifest: The manifest file containing list of BEHAVIOR demos to batch over.
     @param out_dir: Directory to store results in.
@@ -36,14 +47,26 @@ def replay_demo_batch(
         the first three callback function sets need to be compatible with the behavior_demo_replay
         API and will be used for this purpose for that particular demo. The data callbacks should
         take no arguments and return a dictionary to be included in the demo's replay data that will
-        be saved in the end.
-    @param ignore_errors: If an Error is raised, the batch will continue if this is True (with the error saved to the
-        log file). If False, the error will be propagated.
-    @param skip_existing: Whether demos with existing output logs should be skipped.
+        be saved in the end. With a single worker, it is called in this process as before, so closures and lambdas
+        work. With several workers, it is called in the worker processes, so it must be defined at module level.
+    @param ignore_errors: If a demo fails, the batch will continue if this is True (with the error saved to the
+        log file). If False, an error listing the failed demos is raised at the end of the batch.
+    @param skip_existing: Whether demos with existing outputs should be skipped.
     @param save_frames: Whether the demo's frames should be saved alongside statistics.
     @param debug_display: Whether a debug display (the pybullet GUI) should be enabled.
     @param image_size: The image size that should be used by the renderer.
     @param deactivate_logger: If we deactivate the logger
+    @param num_workers: Number of worker processes replaying demos in parallel.
+    @param timeout: Maximum time in seconds of the replay of a demo, only enforced with worker processes.
+    @param max_trials: Maximum number of attempts to replay a demo.
+    @param num_shards: Number of shards the demos of the manifest are split into.
+    @param shard_id: Shard of the demos to replay.
+    @param replay_manifest: JSON file recording the status and outputs of every replayed demo, used to resume the
+        batch. Defaults to replay_manifest.json (or replay_manifest_<shard_id>.json with shards) in out_dir.
+    @param reuse_env: Whether the environment is reset and reused between demos of the same scene and activity instance.
+    @param use_processes: Whether to replay the demos in worker processes, with a timeout and isolation of every replay.
+        Defaults to worker processes only when num_workers is more than 1.
+    @return: The replay report, with the status, attempts and replay time of every demo and a summary.
     """
 
     if deactivate_logger:
@@ -54,57 +77,36 @@ def replay_demo_batch(
 
     logging.info("Demos in manifest: {}".format(demo_list["demos"]))
 
-    for idx, demo in enumerate(demo_list["demos"]):
-        if "replay" in demo:
-            continue
-
-        demo_name = os.path.splitext(demo)[0]
-        demo_file = os.path.join(demo_dir, demo)
-        replaying_log_file = os.path.join(out_dir, demo_name + "_replay_log.json")
-
-        if skip_existing and os.path.exists(replaying_log_file):
-            logging.info("Skipping existing demo: {}, {} out of {}".format(demo, idx, len(demo_list["demos"])))
-            continue
-
-        logging.info("Replaying demo: {}, {} out of {}".format(demo, idx, len(demo_list["demos"])))
-
-        curr_frame_save_path = None
-        if save_frames:
-            curr_frame_save_path = os.path.join(out_dir, demo_name + ".mp4")
-
-        try:
-            if get_callbacks_callback is not None:
-                start_callbacks, step_callbacks, end_callbacks, data_callbacks = get_callbacks_callback(
-                    demo_name=demo_name, out_dir=out_dir
-                )
-            else:
-                start_callbacks, step_callbacks, end_callbacks, data_callbacks = [], [], [], []
-            demo_information = replay_demo(
-                in_demo_file=demo_file,
-                frame_save_dir=curr_frame_save_path,
-                start_callbacks=start_callbacks,
-                step_callbacks=step_callbacks,
-                end_callbacks=end_callbacks,
-                mode="headless",
-                use_pb_gui=debug_display,
-                verbose=False,
-                image_size=image_size,
-            )
-            demo_information["failed"] = False
-            demo_information["filename"] = Path(demo).name
-
-            for callback in data_callbacks:
-                demo_information.update(callback())
-
-        except Exception as e:
-            if ignore_errors:
-                logging.info("Demo failed with the error: {}".format(str(e)))
-                demo_information = {"demo_id": Path(demo).name, "failed": True, "failure_reason": str(e)}
-            else:
-                raise
+    if replay_manifest is None:
+        manifest_name = "replay_manifest.json" if num_shards == 1 else "replay_manifest_{}.json".format(shard_id)
+        replay_manifest = os.path.join(out_dir, manifest_name)
+
+    jobs = get_replay_jobs(demo_dir, list(demo_list["demos"]), num_shards=num_shards, shard_id=shard_id)
+    farm = DemoReplayFarm(
+        out_dir,
+        manifest_file=replay_manifest,
+        get_callbacks_callback=get_callbacks_callback,
+        num_workers=num_workers,
+        timeout=timeout,
+        max_trials=max_trials,
+        skip_existing=skip_existing,
+        reuse_env=reuse_env,
+        save_frames=save_frames,
+        debug_display=debug_display,
+        image_size=image_size,
+        deactivate_logger=deactivate_logger,
+        use_processes=use_processes,
+    )
+    report = farm.run(jobs)
 
-        with open(replaying_log_file, "w") as file:
-            json.dump(demo_information, file)
+    if not ignore_errors and len(report["summary"]["failed"]) > 0:
+        failed = report["summary"]["failed"]
+        raise RuntimeError(
+            "{} demos failed: {}. First error:\n{}".format(
+                len(failed), ", ".join(failed), report["demos"][failed[0]]["error"]
+            )
+        )
+    return report
 
 
 def parse_args(defaults=False):
@@ -113,6 +115,14 @@ def parse_args(defaults=False):
     args_dict["demo_manifest"] = os.path.join(igibson.ig_dataset_path, "tests", "test_manifest.txt")
     args_dict["out_dir"] = os.path.join(igibson.ig_dataset_path, "tests")
     args_dict["split"] = 0
+    args_dict["num_workers"] = 1
+    args_dict["timeout"] = 7200.0
+    args_dict["max_trials"] = 2
+    args_dict["num_shards"] = 1
+    args_dict["shard_id"] = 0
+    args_dict["replay_manifest"] = None
+    args_dict["report"] = None
+    args_dict["reuse_env"] = True
     if not defaults:
         parser = argparse.ArgumentParser(description="Replays a batch demos specified in a manifest file")
         parser.add_argument(
@@ -124,11 +134,31 @@ def parse_args(defaults=False):
             required=True,
             help="The manifest file containing list of BEHAVIOR demos to batch over.",
         )
-        parser.add_argument("--demo_dir", type=str, required=True, help="Directory to store results in.")
+        parser.add_argument("--out_dir", type=str, required=True, help="Directory to store results in.")
+        parser.add_argument("--num_workers", type=int, default=1, help="Number of worker processes.")
+        parser.add_argument("--timeout", type=float, default=7200.0, help="Timeout of the replay of a demo in seconds.")
+        parser.add_argument("--max_trials", type=int, default=2, help="Maximum number of attempts per demo.")
+        parser.add_argument("--num_shards", type=int, default=1, help="Number of shards the demos are split into.")
+        parser.add_argument("--shard_id", type=int, default=0, help="Shard of the demos to replay.")
+        parser.add_argument(
+            "--replay_manifest", type=str, default=None, help="Manifest of the replayed demos, used to resume."
+        )
+        parser.add_argument("--report", type=str, default=None, help="Optional JSON file to write the replay report.")
+        parser.add_argument(
+            "--no_env_reuse", action="store_true", help="Create a new environment for every demo instead of resetting."
+        )
         args = parser.parse_args()
-        args_dict["demo_dir"] = args.demo_root
-        args_dict["demo_manifest"] = args.log_manifest
+        args_dict["demo_dir"] = args.demo_dir
+        args_dict["demo_manifest"] = args.demo_manifest
         args_dict["out_dir"] = args.out_dir
+        args_dict["num_workers"] = args.num_workers
+        args_dict["timeout"] = args.timeout
+        args_dict["max_trials"] = args.max_trials
+        args_dict["num_shards"] = args.num_shards
+        args_dict["shard_id"] = args.shard_id
+        args_dict["replay_manifest"] = args.replay_manifest
+        args_dict["report"] = args.report
+        args_dict["reuse_env"] = not args.no_env_reuse
     return args_dict
 
 
@@ -142,7 +172,7 @@ def main(selection="user", headless=False, short_exec=False):
     args_dict = parse_args(defaults=testing)
 
     get_callbacks_callback = None  # Add a function that generates callbacks here to call during the batch processing
-    replay_demo_batch(
+    report = replay_demo_batch(
         args_dict["demo_dir"],
         args_dict["demo_manifest"],
         args_dict["out_dir"],
@@ -150,7 +180,18 @@ def main(selection="user", headless=False, short_exec=False):
         deactivate_logger=False,
         skip_existing=not testing,  # Do not skip when testing
         ignore_errors=not testing,  # Do not ignore when testing
+        num_workers=args_dict["num_workers"],
+        timeout=args_dict["timeout"],
+        max_trials=args_dict["max_trials"],
+        num_shards=args_dict["num_shards"],
+        shard_id=args_dict["shard_id"],
+        replay_manifest=args_dict["replay_manifest"],
+        reuse_env=args_dict["reuse_env"],
     )
+    print_report(report)
+    if args_dict["report"] is not None:
+        with open(args_dict["report"], "w") as f:
+            json.dump(report, f, indent=2)
 
 
 RUN_AS_TEST = False  # Change to True to run this example in test mode
@@ -44,7 +44,6 @@ def verify_determinism(in_log_path, out_log_path):
 
 
 def parse_args(defaults=False):
-
     args_dict = dict()
     args_dict["in_demo_file"] = os.path.join(
         igibson.ig_dataset_path,
@@ -97,47 +96,25 @@ def parse_args(defaults=False):
     return args_dict
 
 
-def replay_demo(
+def create_replay_env(
     in_demo_file,
-    replay_demo_file=None,
-    disable_save=False,
     frame_save_dir=None,
-    verbose=True,
     mode="headless",
     config_file=os.path.join(igibson.configs_path, "behavior_robot_vr_behavior_task.yaml"),
-    start_callbacks=[],
-    step_callbacks=[],
-    end_callbacks=[],
-    profile=False,
     image_size=(1280, 720),
     use_pb_gui=False,
 ):
     """
-    Replay a demo of a task.
-
-    Note that this returns, but does not check for determinism. Use safe_replay_demo to assert for determinism
-    when using in scenarios where determinism is important.
+    Create the environment to replay a demo in, with the scene, activity instance, timesteps and VR settings of the
+    demo. It can be reused to replay the other demos of the same scene and activity instance.
 
     @param in_demo_file: the path and filename of the BEHAVIOR demo to replay.
-    @param replay_demo_file: the path and filename of the new BEHAVIOR demo to save from the replay.
-    @param disable_save: Whether saving the replay as a BEHAVIOR demo log should be disabled.
     @param frame_save_dir: the path to save frame images to. None to disable frame image saving.
-    @param verbose: Whether to print out git diff in detail
-    @param mode: which rendering mode ("headless", "headless_tensor", "gui_non_interactive", "vr"). In gui_non_interactive
-        mode, the demo will be replayed with simple robot view.
+    @param mode: which rendering mode ("headless", "headless_tensor", "gui_non_interactive", "vr").
     @param config_file: environment config file
-    @param disable_save: Whether saving the replay as a BEHAVIOR demo log should be disabled.
-    @param profile: Whether the replay should be profiled, with profiler output to stdout.
-    @param start_callback: A callback function that will be called immediately before starting to replay steps. Should
-        take two arguments: iGibsonEnv and IGLogReader
-    @param step_callback: A callback function that will be called immediately following each replayed step. Should
-        take two arguments: iGibsonEnv and IGLogReader
-    @param end_callback: A callback function that will be called when replay has finished. Should
-        take two arguments: iGibsonEnv and IGLogReader
-    @param profile: Whether the replay should be profiled, with profiler output to stdout.
     @param image_size: The image size that should be used by the renderer.
     @param use_pb_gui: display the interactive pybullet gui (for debugging)
-    @return if disable_save is True, returns None. Otherwise, returns a boolean indicating if replay was deterministic.
+    @return the environment, not reset yet
     """
     # HDR files for PBR rendering
     hdr_texture = os.path.join(igibson.ig_dataset_path, "scenes", "background", "probe_02.hdr")
@@ -161,9 +138,6 @@ def replay_demo(
         light_dimming_factor=1.0,
     )
 
-    # Check mode
-    assert mode in ["headless", "headless_tensor", "vr", "gui_non_interactive"]
-
     # Initialize settings to save action replay frames
     vr_settings = VrSettings(config_str=IGLogReader.read_metadata_attr(in_demo_file, "/metadata/vr_settings"))
     vr_settings.set_frame_save_path(frame_save_dir)
@@ -174,13 +148,95 @@ def replay_demo(
     scene = IGLogReader.read_metadata_attr(in_demo_file, "/metadata/scene_id")
     physics_timestep = IGLogReader.read_metadata_attr(in_demo_file, "/metadata/physics_timestep")
     render_timestep = IGLogReader.read_metadata_attr(in_demo_file, "/metadata/render_timestep")
-    filter_objects = IGLogReader.read_metadata_attr(in_demo_file, "/metadata/filter_objects")
     instance_id = IGLogReader.read_metadata_attr(in_demo_file, "/metadata/instance_id")
     urdf_file = IGLogReader.read_metadata_attr(in_demo_file, "/metadata/urdf_file")
 
     if urdf_file is None:
         urdf_file = "{}_task_{}_{}_0_fixed_furniture".format(scene, task, task_id)
 
+    if instance_id is None:
+        instance_id = 0
+
+    # Get some information from the config and some other copy it from the input log
+    config = parse_config(config_file)
+    config["task"] = task
+    config["task_id"] = task_id
+    config["scene_id"] = scene
+    config["instance_id"] = instance_id
+    config["urdf_file"] = urdf_file
+    config["image_width"] = image_size[0]
+    config["image_height"] = image_size[1]
+    config["online_sampling"] = False
+
+    return iGibsonEnv(
+        config_file=config,
+        mode=mode,
+        action_timestep=render_timestep,
+        physics_timestep=physics_timestep,
+        rendering_settings=rendering_setting,
+        vr_settings=vr_settings,
+        use_pb_gui=use_pb_gui,
+    )
+
+
+def replay_demo(
+    in_demo_file,
+    replay_demo_file=None,
+    disable_save=False,
+    frame_save_dir=None,
+    verbose=True,
+    mode="headless",
+    config_file=os.path.join(igibson.configs_path, "behavior_robot_vr_behavior_task.yaml"),
+    start_callbacks=[],
+    step_callbacks=[],
+    end_callbacks=[],
+    profile=False,
+    image_size=(1280, 720),
+    use_pb_gui=False,
+    env=None,
+):
+    """
+    Replay a demo of a task.
+
+    Note that this returns, but does not check for determinism. Use safe_replay_demo to assert for determinism
+    when using in scenarios where determinism is important.
+
+    @param in_demo_file: the path and filename of the BEHAVIOR demo to replay.
+    @param replay_demo_file: the path and filename of the new BEHAVIOR demo to save from the replay.
+    @param disable_save: Whether saving the replay as a BEHAVIOR demo log should be disabled.
+    @param frame_save_dir: the path to save frame images to. None to disable frame image saving.
+    @param verbose: Whether to print out git diff in detail
+    @param mode: which rendering mode ("headless", "headless_tensor", "gui_non_interactive", "vr"). In gui_non_interactive
+        mode, the demo will be replayed with simple robot view.
+    @param config_file: environment config file
+    @param disable_save: Whether saving the replay as a BEHAVIOR demo log should be disabled.
+    @param profile: Whether the replay should be profiled, with profiler output to stdout.
+    @param start_callback: A callback function that will be called immediately before starting to replay steps. Should
+        take two arguments: iGibsonEnv and IGLogReader
+    @param step_callback: A callback function that will be called immediately following each replayed step. Should
+        take two arguments: iGibsonEnv and IGLogReader
+    @param end_callback: A callback function that will be called when replay has finished. Should
+        take two arguments: iGibsonEnv and IGLogReader
+    @param profile: Whether the replay should be profiled, with profiler output to stdout.
+    @param image_size: The image size that should be used by the renderer.
+    @param use_pb_gui: display the interactive pybullet gui (for debugging)
+    @param env: environment created with create_replay_env for a demo of the same scene and activity instance, which
+        is reset and reused instead of creating a new one. It is not closed at the end of the replay.
+    @return if disable_save is True, returns None. Otherwise, returns a boolean indicating if replay was deterministic.
+    """
+    # Check mode
+    assert mode in ["headless", "headless_tensor", "vr", "gui_non_interactive"]
+
+    if not in_demo_file:
+        raise RuntimeError("Must provide a log path to run action replay!")
+
+    # Get the information from the input log file
+    task = IGLogReader.read_metadata_attr(in_demo_file, "/metadata/atus_activity")
+    task_id = IGLogReader.read_metadata_attr(in_demo_file, "/metadata/activity_definition")
+    scene = IGLogReader.read_metadata_attr(in_demo_file, "/metadata/scene_id")
+    filter_objects = IGLogReader.read_metadata_attr(in_demo_file, "/metadata/filter_objects")
+    instance_id = IGLogReader.read_metadata_attr(in_demo_file, "/metadata/instance_id")
+
     if instance_id is None:
         instance_id = 0
 
@@ -209,32 +265,23 @@ def replay_demo(
             print("Current git info:\n")
             pp.pprint(git_info[key])
 
-    # Get some information from the config and some other copy it from the input log
-    config = parse_config(config_file)
-    config["task"] = task
-    config["task_id"] = task_id
-    config["scene_id"] = scene
-    config["instance_id"] = instance_id
-    config["urdf_file"] = urdf_file
-    config["image_width"] = image_size[0]
-    config["image_height"] = image_size[1]
-    config["online_sampling"] = False
-
-    print("Creating environment and resetting it")
-    env = iGibsonEnv(
-        config_file=config,
-        mode=mode,
-        action_timestep=render_timestep,
-        physics_timestep=physics_timestep,
-        rendering_settings=rendering_setting,
-        vr_settings=vr_settings,
-        use_pb_gui=use_pb_gui,
-    )
+    if env is None:
+        print("Creating environment and resetting it")
+        env = create_replay_env(
+            in_demo_file,
+            frame_save_dir=frame_save_dir,
+            mode=mode,
+            config_file=config_file,
+            image_size=image_size,
+            use_pb_gui=use_pb_gui,
+        )
+        close_env = True
+    else:
+        print("Resetting environment")
+        close_env = False
     env.reset()
     robot = env.robots[0]
 
-    if not in_demo_file:
-        raise RuntimeError("Must provide a log path to run action replay!")
     log_reader = IGLogReader(in_demo_file, log_status=False)
 
     log_writer = None
@@ -299,7 +346,8 @@ def replay_demo(
         print("End of the replay.")
         if not disable_save:
             log_writer.end_log_session()
-        env.close()
+        if close_env:
+            env.close()
 
     is_deterministic = None
     if not disable_save:
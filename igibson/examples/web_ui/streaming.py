@@ -0,0 +1,342 @@
+"""
+Streaming of the frames of the web UI environments to their clients, as MJPEG.
+
+Every session steps its environment worker in a thread and encodes the frames straight from their uint8 buffer into a
+bounded queue, from which the HTTP response of the client reads. When a client reads slower than its environment
+renders, the oldest frames of its queue are dropped, so that it always gets the most recent frames. Environment workers
+are kept in a pool and reused by the next sessions once their session is over.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+log = logging.getLogger(__name__)
+
+CONTENT_TYPES = {"jpeg": "image/jpeg", "png": "image/png"}
+
+
+def frame_to_uint8(frame):
+    """
+    Convert a frame of the renderer to a uint8 RGB image
+
+    :param frame: (H, W, 3 or 4) float frame in [0, 1], or uint8 frame
+    :return: (H, W, 3) uint8 frame
+    """
+    frame = np.asarray(frame)[:, :, :3]
+    if frame.dtype != np.uint8:
+        frame = (np.clip(frame, 0.0, 1.0) * 255).astype(np.uint8)
+    return frame
+
+
+def mjpeg_chunk(data, content_type="image/jpeg"):
+    """
+    Wrap an encoded image into a part of a multipart/x-mixed-replace response
+
+    :param data: encoded image
+    :param content_type: content type of the image
+    :return: part of the response
+    """
+    return b"--frame\r\nContent-Type: " + content_type.encode() + b"\r\n\r\n" + data + b"\r\n\r\n"
+
+
+class ImageEncoder(object):
+    """
+    Encode frames as JPEG or PNG images, with PIL or OpenCV
+    """
+
+    def __init__(self, backend="pil", image_format="jpeg", quality=80, size=None):
+        """
+        :param backend: pil or opencv
+        :param image_format: jpeg or png
+        :param quality: JPEG quality, in [1, 100]
+        :param size: (width, height) the frames are resized to, or None to keep their size
+        """
+        if backend not in ["pil", "opencv"]:
+            raise ValueError("Unknown image encoder backend: {}".format(backend))
+        if backend == "opencv" and cv2 is None:
+            raise ImportError("The opencv image encoder backend requires opencv-python")
+        if image_format not in CONTENT_TYPES:
+            raise ValueError("Unknown image format: {}".format(image_format))
+        self.backend = backend
+        self.image_format = image_format
+        self.quality = quality
+        self.size = tuple(size) if size is not None else None
+        self.content_type = CONTENT_TYPES[image_format]
+
+    def encode(self, frame):
+        """
+        Encode a frame
+
+        :param frame: frame of the renderer, see frame_to_uint8
+        :return: encoded image
+        """
+        frame = frame_to_uint8(frame)
+        if self.backend == "opencv":
+            if self.size is not None and (frame.shape[1], frame.shape[0]) != self.size:
+                frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+            if self.image_format == "jpeg":
+                params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+            else:
+                params = []
+            success, data = cv2.imencode("." + self.image_format, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR), params)
+            if not success:
+                raise RuntimeError("Could not encode frame")
+            return data.tobytes()
+
+        image = Image.fromarray(frame)
+        if self.size is not None and image.size != self.size:
+            image = image.resize(self.size, Image.BILINEAR)
+        buf = BytesIO()
+        if self.image_format == "jpeg":
+            image.save(buf, format="JPEG", quality=self.quality)
+        else:
+            image.save(buf, format="PNG")
+        return buf.getvalue()
+
+
+class FrameQueue(object):
+    """
+    Bounded queue of frames that drops its oldest frames when full
+    """
+
+    def __init__(self, maxsize=2):
+        """
+        :param maxsize: maximum number of frames in the queue
+        """
+        self.frames = deque(maxlen=maxsize)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.num_put = 0
+        self.num_dropped = 0
+
+    def put(self, frame):
+        """
+        Add a frame, dropping the oldest one if the queue is full
+
+        :param frame: frame
+        """
+        with self.condition:
+            if len(self.frames) == self.frames.maxlen:
+                self.num_dropped += 1
+            self.frames.append(frame)
+            self.num_put += 1
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """
+        Get the oldest frame, waiting for one if the queue is empty
+
+        :param timeout: maximum time to wait in seconds, or None to wait until a frame is added or the queue is closed
+        :return: frame, or None if the queue is closed and empty or if the timeout expired
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.frames or self.closed, timeout=timeout)
+            if self.frames:
+                return self.frames.popleft()
+            return None
+
+    def close(self):
+        """
+        Close the queue: the frames left can still be read, and get stops waiting once they are read
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class StreamingSession(object):
+    """
+    Step an environment worker in a thread and encode its frames into a FrameQueue
+    """
+
+    def __init__(self, worker, encoder, get_action, queue_size=2, timeout=200, max_fps=30.0):
+        """
+        :param worker: environment worker, whose step function takes an action and returns a frame
+        :param encoder: ImageEncoder
+        :param get_action: function returning the current action of the client
+        :param queue_size: maximum number of encoded frames waiting for the client
+        :param timeout: duration of the session in seconds
+        :param max_fps: maximum number of frames per second rendered, or None for no limit
+        """
+        self.worker = worker
+        self.encoder = encoder
+        self.get_action = get_action
+        self.queue = FrameQueue(queue_size)
+        self.timeout = timeout
+        self.max_fps = max_fps
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.failed = False
+        self.encode_times = []
+
+    def start(self):
+        """
+        Start stepping the environment
+        """
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop stepping the environment and wait for the thread to finish
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def frames(self):
+        """
+        Generate the encoded frames until the session is over
+
+        :return: generator of encoded frames
+        """
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                return
+            yield frame
+
+    def stats(self):
+        """
+        :return: dict with the number of frames encoded and dropped, and the mean encode time in seconds
+        """
+        return {
+            "frames": self.queue.num_put,
+            "dropped": self.queue.num_dropped,
+            "mean_encode_time": float(np.mean(self.encode_times)) if self.encode_times else 0.0,
+        }
+
+    def _run(self):
+        start_time = time.time()
+        min_frame_time = 1.0 / self.max_fps if self.max_fps else 0.0
+        try:
+            while not self.stop_event.is_set() and time.time() - start_time < self.timeout:
+                frame_start = time.time()
+                frame = self.worker.step(self.get_action())
+                encode_start = time.time()
+                data = self.encoder.encode(frame)
+                self.encode_times.append(time.time() - encode_start)
+                self.queue.put(data)
+                time_until_min_frame_time = min_frame_time - (time.time() - frame_start)
+                if time_until_min_frame_time > 0:
+                    self.stop_event.wait(time_until_min_frame_time)
+        except Exception:
+            log.exception("Error while streaming an environment")
+            self.failed = True
+        finally:
+            self.queue.close()
+
+
+class EnvPool(object):
+    """
+    Pool of environment workers, reused across sessions
+    """
+
+    def __init__(self, worker_factory, max_workers=3, idle_timeout=200):
+        """
+        :param worker_factory: function creating a started worker from a key, such as (robot, scene)
+        :param max_workers: maximum number of workers, busy or idle
+        :param idle_timeout: time in seconds after which idle workers are closed
+        """
+        self.worker_factory = worker_factory
+        self.max_workers = max_workers
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.num_workers = 0
+        # List of (key, worker, release time)
+        self.idle_workers = []
+
+    def acquire(self, key):
+        """
+        Get a worker for a key: an idle worker of the same key, reset, or a new worker if the pool is not full, in
+        which case the least recently used idle worker of another key may be closed to make room
+
+        :param key: key of the worker
+        :return: worker, or None if all the workers are busy
+        """
+        self.cleanup()
+        evicted = None
+        with self.lock:
+            for i, (idle_key, worker, _) in enumerate(self.idle_workers):
+                if idle_key == key:
+                    del self.idle_workers[i]
+                    break
+            else:
+                worker = None
+                if self.num_workers >= self.max_workers:
+                    if not self.idle_workers:
+                        return None
+                    _, evicted, _ = self.idle_workers.pop(0)
+                else:
+                    self.num_workers += 1
+        if evicted is not None:
+            evicted.close()
+        if worker is not None:
+            try:
+                worker.reset()
+            except Exception:
+                self.discard(worker)
+                raise
+            return worker
+        try:
+            return self.worker_factory(key)
+        except Exception:
+            with self.lock:
+                self.num_workers -= 1
+            raise
+
+    def release(self, key, worker):
+        """
+        Return a worker to the pool once its session is over
+
+        :param key: key of the worker
+        :param worker: worker
+        """
+        with self.lock:
+            self.idle_workers.append((key, worker, time.time()))
+
+    def discard(self, worker):
+        """
+        Close a worker that can't be reused, for instance after an error
+
+        :param worker: worker
+        """
+        with self.lock:
+            self.num_workers -= 1
+        worker.close()
+
+    def cleanup(self):
+        """
+        Close the workers idle for more than idle_timeout
+        """
+        now = time.time()
+        with self.lock:
+            expired = [
+                worker for _, worker, release_time in self.idle_workers if now - release_time > self.idle_timeout
+            ]
+            self.idle_workers = [item for item in self.idle_workers if now - item[2] <= self.idle_timeout]
+            self.num_workers -= len(expired)
+        for worker in expired:
+            worker.close()
+
+    def close(self):
+        """
+        Close the idle workers
+        """
+        with self.lock:
+            workers = [worker for _, worker, _ in self.idle_workers]
+            self.idle_workers = []
+            self.num_workers -= len(workers)
+        for worker in workers:
+            worker.close()
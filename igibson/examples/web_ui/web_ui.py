@@ -1,20 +1,18 @@
+import argparse
 import atexit
-import base64
-import binascii
 import logging
 import multiprocessing
 import os
 import sys
-import time
 import traceback
 import uuid
-from io import BytesIO
 
 import numpy as np
 from flask import Flask, Response, render_template, request
 from PIL import Image
 
 import igibson
+from igibson.examples.web_ui.streaming import EnvPool, ImageEncoder, StreamingSession, frame_to_uint8, mjpeg_chunk
 from igibson.objects.ycb_object import YCBObject
 from igibson.render.mesh_renderer.mesh_renderer_settings import MeshRendererSettings
 from igibson.robots.fetch import Fetch
@@ -27,12 +25,6 @@ from igibson.utils.utils import parse_config
 interactive = True
 
 
-def pil_image_to_base64(pil_image):
-    buf = BytesIO()
-    pil_image.save(buf, format="JPEG")
-    return base64.b64encode(buf.getvalue())
-
-
 class ProcessPyEnvironment(object):
     """Step a single env in a separate process for lock free paralellism."""
 
@@ -212,13 +204,20 @@ class ToyEnv(object):
             self.s.import_object(obj)
             obj.set_position_orientation(np.random.uniform(low=0, high=2, size=3), [0, 0, 0, 1])
         print(self.s.renderer.instances)
+        self.initial_robot_pose = self.robot.get_position_orientation()
 
     def step(self, a):
         # run simulation for one step and get an rgb frame
         self.robot.apply_action(a)
         self.s.step()
         frame = self.s.renderer.render_robot_cameras(modes=("rgb"))[0]
-        return frame
+        # uint8 frames are 4 times smaller to send to the main process than float frames
+        return frame_to_uint8(frame)
+
+    def reset(self):
+        # move the robot back to its initial pose, when the environment is reused by a new session
+        self.robot.reset()
+        self.robot.set_position_orientation(*self.initial_robot_pose)
 
     def close(self):
         # tear down the simulation
@@ -269,6 +268,7 @@ class ToyEnvInt(object):
             self.s.import_object(obj)
             obj.set_position_orientation(np.random.uniform(low=0, high=2, size=3), [0, 0, 0, 1])
         print(self.s.renderer.instances)
+        self.initial_robot_pose = self.robot.get_position_orientation()
 
     def step(self, a):
         # run simulation for one step and get an rgb frame
@@ -284,7 +284,12 @@ class ToyEnvInt(object):
         self.robot.apply_action(action)
         self.s.step()
         frame = self.s.renderer.render_robot_cameras(modes=("rgb"))[0]
-        return frame
+        return frame_to_uint8(frame)
+
+    def reset(self):
+        # move the robot back to its initial pose, when the environment is reused by a new session
+        self.robot.reset()
+        self.robot.set_position_orientation(*self.initial_robot_pose)
 
     def close(self):
         # tear down the simulation
@@ -293,47 +298,77 @@ class ToyEnvInt(object):
 
 class iGFlask(Flask):
     """
-    iGFlask is a Flask app that handles environment creation and teardown.
+    iGFlask is a Flask app that handles the pool of environments and the streaming sessions.
     """
 
     def __init__(self, args, **kwargs):
         super(iGFlask, self).__init__(args, **kwargs)
         self.action = {}  # map uuid to input action
-        self.envs = {}  # map uuid to environment instance
-        self.envs_inception_time = {}  # map uuid to environment start time
+        self.sessions = {}  # map uuid to streaming session and key of its environment
+        self.configure()
 
-    def cleanup(self):
+    def configure(self, max_envs=3, encoder_backend="pil", image_format="jpeg", quality=80, size=None, queue_size=2):
         """
-        Routine clean up, this function tries to find any environment that idles for more
-        than 200s and stops it.
+        Configure the pool of environments and the encoding of the frames.
+
+        :param max_envs: maximum number of environments, busy or idle
+        :param encoder_backend: pil or opencv
+        :param image_format: jpeg or png
+        :param quality: JPEG quality
+        :param size: (width, height) the frames are resized to, or None to keep the rendered size
+        :param queue_size: maximum number of encoded frames waiting for a client
         """
-        print(self.envs)
-        for k, v in self.envs_inception_time.items():
-            if time.time() - v > 200:
-                # clean up an old environment
-                self.stop_env(k)
 
-    def prepare_env(self, uuid, robot, scene):
-        """
-        This function creates an Env (ToyEnv or ToyEnvInt) in a subprocess.
-        """
-        self.cleanup()
+        def env_constructor_factory(key):
+            robot, scene = key
+
+            def env_constructor():
+                if interactive:
+                    return ToyEnvInt(robot=robot, scene=scene)
+                else:
+                    return ToyEnv()
 
-        def env_constructor():
-            if interactive:
-                return ToyEnvInt(robot=robot, scene=scene)
-            else:
-                return ToyEnv()
+            return env_constructor
 
-        self.envs[uuid] = ProcessPyEnvironment(env_constructor)
-        self.envs[uuid].start()
-        self.envs_inception_time[uuid] = time.time()
+        def worker_factory(key):
+            # This function creates an Env (ToyEnv or ToyEnvInt) in a subprocess.
+            worker = ProcessPyEnvironment(env_constructor_factory(key))
+            worker.start()
+            return worker
 
-    def stop_env(self, uuid):
-        # stop an environment (ToyEnv or ToyEnvInt) that lives in a subprocess.
-        self.envs[uuid].close()
-        del self.envs[uuid]
-        del self.envs_inception_time[uuid]
+        # Idle environments are reused by the next sessions with the same robot and scene, and stopped after 200s
+        self.env_pool = EnvPool(worker_factory, max_workers=max_envs, idle_timeout=200)
+        self.encoder = ImageEncoder(backend=encoder_backend, image_format=image_format, quality=quality, size=size)
+        self.queue_size = queue_size
+
+    def start_session(self, uuid, robot, scene):
+        """
+        This function gets an environment from the pool and starts streaming its frames.
+
+        :return: streaming session, or None if all the environments are busy
+        """
+        worker = self.env_pool.acquire((robot, scene))
+        if worker is None:
+            return None
+        session = StreamingSession(
+            worker,
+            self.encoder,
+            lambda: self.action[uuid],
+            queue_size=self.queue_size,
+            timeout=200 if interactive else 30,
+        )
+        self.sessions[uuid] = (session, (robot, scene))
+        session.start()
+        return session
+
+    def stop_session(self, uuid):
+        # stop streaming and give the environment back to the pool.
+        session, key = self.sessions.pop(uuid)
+        session.stop()
+        if session.failed:
+            self.env_pool.discard(session.worker)
+        else:
+            self.env_pool.release(key, session.worker)
 
 
 app = iGFlask(__name__)
@@ -362,49 +397,29 @@ gen is a utility function that generate an image based on user id
 
 
 def gen(app, unique_id, robot, scene):
-    image = np.array(Image.open("templates/loading.jpg").resize((400, 400))).astype(np.uint8)
-    loading_frame = pil_image_to_base64(Image.fromarray(image))
-    loading_frame = binascii.a2b_base64(loading_frame)
-
-    image = np.array(Image.open("templates/waiting.jpg").resize((400, 400))).astype(np.uint8)
-    waiting_frame = pil_image_to_base64(Image.fromarray(image))
-    waiting_frame = binascii.a2b_base64(waiting_frame)
-
-    image = np.array(Image.open("templates/finished.jpg").resize((400, 400))).astype(np.uint8)
-    finished_frame = pil_image_to_base64(Image.fromarray(image))
-    finished_frame = binascii.a2b_base64(finished_frame)
+    content_type = app.encoder.content_type
+    loading_frame = app.encoder.encode(np.array(Image.open("templates/loading.jpg").resize((400, 400))))
+    waiting_frame = app.encoder.encode(np.array(Image.open("templates/waiting.jpg").resize((400, 400))))
+    finished_frame = app.encoder.encode(np.array(Image.open("templates/finished.jpg").resize((400, 400))))
     id = unique_id
-    if len(app.envs) < 3:
-        # if number of envs is smaller than 3, then create an environment and provide to the user
-        for i in range(5):
-            yield (b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + loading_frame + b"\r\n\r\n")
-        app.prepare_env(id, robot, scene)
+    for i in range(5):
+        yield mjpeg_chunk(loading_frame, content_type)
+    session = app.start_session(id, robot, scene)
+    if session is not None:
+        # if an environment is available, stream its frames to the user
         try:
-            start_time = time.time()
-            if interactive:
-                timeout = 200
-            else:
-                timeout = 30
-            while time.time() - start_time < timeout:
-                # If the environment is still valid (before it should be destroyed)
-                # generate a frame from the Env and supply to the user.
-                frame = app.envs[id].step(app.action[id])
-                frame = (frame[:, :, :3] * 255).astype(np.uint8)
-                frame = pil_image_to_base64(Image.fromarray(frame))
-                frame = binascii.a2b_base64(frame)
-                yield (b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n\r\n")
-        except:
-            pass
+            for frame in session.frames():
+                yield mjpeg_chunk(frame, content_type)
         finally:
-            # if timeouts, stop the environment, and show an text prompt image telling
+            # if timeouts or if the user left, stop streaming, and show an text prompt image telling
             # the user the simulation has finished
-            app.stop_env(id)
+            app.stop_session(id)
         for i in range(5):
-            yield (b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + finished_frame + b"\r\n\r\n")
+            yield mjpeg_chunk(finished_frame, content_type)
     else:
-        # If number of envs is >= 3, then let the user wait
+        # If all the environments are busy, then let the user wait
         for i in range(5):
-            yield (b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + waiting_frame + b"\r\n\r\n")
+            yield mjpeg_chunk(waiting_frame, content_type)
 
 
 @app.route("/video_feed", methods=["POST", "GET"])
@@ -435,5 +450,21 @@ def video_feed():
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
-    port = int(sys.argv[1])
-    app.run(host="0.0.0.0", port=port)
+    parser = argparse.ArgumentParser(description="Web server that hosts iGibson environments")
+    parser.add_argument("port", type=int, help="port of the server")
+    parser.add_argument("--max_envs", type=int, default=3, help="maximum number of environments")
+    parser.add_argument("--encoder", choices=["pil", "opencv"], default="pil", help="image encoder")
+    parser.add_argument("--format", choices=["jpeg", "png"], default="jpeg", help="image format of the frames")
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality of the frames")
+    parser.add_argument("--size", type=int, nargs=2, default=None, help="width and height of the frames")
+    parser.add_argument("--queue_size", type=int, default=2, help="maximum number of frames waiting for a client")
+    args = parser.parse_args()
+    app.configure(
+        max_envs=args.max_envs,
+        encoder_backend=args.encoder,
+        image_format=args.format,
+        quality=args.quality,
+        size=args.size,
+        queue_size=args.queue_size,
+    )
+    app.run(host="0.0.0.0", port=args.port, threaded=True)
@@ -1,16 +1,83 @@
-import copy
-
 import numpy as np
 
 from igibson.metrics.metric_base import MetricBase
-from igibson.object_states import Inside, NextTo, OnFloor, OnTop, Pose, Touching, Under
+from igibson.object_states import (
+    AABB,
+    ContactBodies,
+    Inside,
+    NextTo,
+    OnFloor,
+    OnTop,
+    Pose,
+    Touching,
+    Under,
+    VerticalAdjacency,
+)
 from igibson.object_states.object_state_base import AbsoluteObjectState, BooleanState
 from igibson.object_states.on_floor import RoomFloor
+from igibson.object_states.utils import get_center_extent
 from igibson.objects.multi_object_wrappers import ObjectMultiplexer
 from igibson.robots.robot_base import BaseRobot
 
 SIMULATOR_SETTLE_TIME = 150
 
+# States whose changes count as a single kinematic edit per object, and states whose changes are not counted
+KINEMATIC_STATES = [Inside, Under, OnTop, Touching, OnFloor]
+IGNORED_STATES = [NextTo]
+
+# Parts of an object whose logical states are cached: the object itself (or the base object of a multiplexer) and the
+# two parts of a multiplexer
+LOGICAL_STATE_SLOTS = ["base", "part_0", "part_1"]
+
+# Relative slack of the NextTo distance prefilter, so that rounding never rejects a pair that NextTo would accept
+NEXT_TO_PREFILTER_SLACK = 1e-6
+
+
+def get_pose_distances(poses_1, rows_1, poses_2, rows_2):
+    """
+    Get the distances between positions of two pose arrays
+
+    :param poses_1: [M, 7] array of positions and orientations (x, y, z, w)
+    :param rows_1: array of rows of poses_1
+    :param poses_2: [M, 7] array of positions and orientations (x, y, z, w)
+    :param rows_2: array of rows of poses_2, of the same shape as rows_1
+    :return: array of the distances, of the same shape as rows_1, equal to np.linalg.norm of every difference
+    """
+    diff = poses_2[rows_2, :3] - poses_1[rows_1, :3]
+    # A batched dot product rounds as np.linalg.norm does for a single vector, which np.sum and np.einsum do not
+    return np.sqrt(np.matmul(diff[..., None, :], diff[..., :, None])[..., 0, 0])
+
+
+def get_pose_rotations(poses_1, rows_1, poses_2, rows_2):
+    """
+    Get the rotation angles between orientations of two pose arrays
+
+    :param poses_1: [M, 7] array of positions and orientations (x, y, z, w)
+    :param rows_1: array of rows of poses_1
+    :param poses_2: [M, 7] array of positions and orientations (x, y, z, w)
+    :param rows_2: array of rows of poses_2, of the same shape as rows_1
+    :return: array of the rotation angles in radians, of the same shape as rows_1
+    """
+    dot = np.abs(np.sum(poses_1[rows_1, 3:] * poses_2[rows_2, 3:], axis=-1))
+    return 2 * np.arccos(np.clip(dot, 0.0, 1.0))
+
+
+def sequential_total(base, children):
+    """
+    Sum the displacements of all objects, adding the base displacement and then the sum of the two child displacements
+    of one object after the other, so that the total is rounded as when accumulating it object by object
+
+    :param base: [N] array of base displacements
+    :param children: [N, 2] array of child displacements
+    :return: total displacement
+    """
+    if len(base) == 0:
+        return 0
+    terms = np.empty(2 * len(base))
+    terms[0::2] = base
+    terms[1::2] = children[:, 0] + children[:, 1]
+    return np.cumsum(terms)[-1]
+
 
 class KinematicDisarrangement(MetricBase):
     def __init__(self):
@@ -18,114 +85,198 @@ class KinematicDisarrangement(MetricBase):
 
         self.integrated_disarrangement = 0
         self.delta_disarrangement = []
+        self.integrated_rotation = 0
+        self.delta_rotation = []
+
+        # Objects, fixed at the first step, and their rows in the pose arrays: the row of the base pose and the rows of
+        # the poses of the two parts of a multiplexer, which are the base row for other objects
+        self.object_ids = []
+        self.pose_rows = np.zeros((0, 3), dtype=int)
+        self.multiplexed = np.zeros(0, dtype=bool)
+        self.pose_states = []
+        self.multiplexers = []
+
+        # [M, 7] arrays of positions and orientations and [N] arrays of the active part of every object
+        self.initial_poses = None
+        self.prev_poses = None
+        self.cur_poses = None
+        self.initial_active = None
+        self.prev_active = None
+        self.cur_active = None
+
+        # Per step and integrated displacements and rotations of the base and of the two children of every object
+        self.delta_obj_disp = []
+        self.int_obj_disp = np.zeros((0, 3))
+        self.int_obj_rot = np.zeros((0, 3))
+
+    def initialize_layout(self, object_ids, multiplexed):
+        """
+        Allocate the pose arrays of a set of objects
 
-        self.delta_obj_disp_dict = {}
-        self.int_obj_disp_dict = {}
+        :param object_ids: ids of the objects
+        :param multiplexed: for every object, whether it is a multiplexer with two parts, which has three poses
+        """
+        self.object_ids = list(object_ids)
+        self.multiplexed = np.array(multiplexed, dtype=bool).reshape(len(self.object_ids))
+        num_poses = np.where(self.multiplexed, 3, 1)
+        first_rows = np.cumsum(num_poses) - num_poses
+        self.pose_rows = first_rows[:, None] + np.where(self.multiplexed[:, None], np.arange(3), 0)
+        total_poses = int(np.sum(num_poses))
+        self.initial_poses = np.zeros((total_poses, 7))
+        self.prev_poses = np.zeros((total_poses, 7))
+        self.cur_poses = np.zeros((total_poses, 7))
+        self.initial_active = np.zeros(len(self.object_ids), dtype=int)
+        self.prev_active = np.zeros(len(self.object_ids), dtype=int)
+        self.cur_active = np.zeros(len(self.object_ids), dtype=int)
+        self.int_obj_disp = np.zeros((len(self.object_ids), 3))
+        self.int_obj_rot = np.zeros((len(self.object_ids), 3))
+
+    def initialize_objects(self, env):
+        """
+        Collect the objects of the scene, other than robots, and the Pose states read every step
 
-    def update_state_cache(self, env):
-        state_cache = {}
+        :param env: environment
+        """
+        object_ids = []
+        multiplexed = []
+        self.pose_states = []
+        self.multiplexers = []
         for obj_id, obj in env.scene.objects_by_name.items():
             if isinstance(obj, BaseRobot):
                 continue
+            object_ids.append(obj_id)
             if type(obj) == ObjectMultiplexer:
                 assert (
                     len(obj._multiplexed_objects[1].objects) == 2
                 ), "Kinematic caching only supported for multiplexed objects of len 2"
-                part_pose = [
-                    obj._multiplexed_objects[1].objects[0].states[Pose].get_value(),
-                    obj._multiplexed_objects[1].objects[1].states[Pose].get_value(),
-                ]
-                state_cache[obj_id] = {
-                    "pose": {
-                        "base": obj._multiplexed_objects[0].states[Pose].get_value(),
-                        "children": part_pose,
-                    },
-                    "active": obj.current_index,
-                }
+                self.pose_states.extend(
+                    [
+                        obj._multiplexed_objects[0].states[Pose],
+                        obj._multiplexed_objects[1].objects[0].states[Pose],
+                        obj._multiplexed_objects[1].objects[1].states[Pose],
+                    ]
+                )
+                self.multiplexers.append((len(object_ids) - 1, obj))
+                multiplexed.append(True)
             else:
-                state_cache[obj_id] = {
-                    "pose": {
-                        "base": obj.states[Pose].get_value(),
-                    },
-                    "active": 0,
-                }
-        return state_cache
+                self.pose_states.append(obj.states[Pose])
+                multiplexed.append(False)
+        self.initialize_layout(object_ids, multiplexed)
 
-    @staticmethod
-    def calculate_object_disarrangement(obj, prev_state_cache, cur_state_cache):
-        """
-        This function implements logic to check the current index in order to aggregate kinematic state as
-        an object is split/joined. This logic should be shifted into the multiplexer class, as it requires
-        a significant amount of (error prone) handling.
+    def update_state_cache(self, env):
         """
-        obj_disarrangement = {"base": 0, "children": [0, 0]}
-        if prev_state_cache[obj]["active"] == 0 and cur_state_cache[obj]["active"] == 0:
-            obj_disarrangement["base"] = np.linalg.norm(
-                cur_state_cache[obj]["pose"]["base"][0] - prev_state_cache[obj]["pose"]["base"][0]
-            )
-        elif prev_state_cache[obj]["active"] == 0 and cur_state_cache[obj]["active"] == 1:
-            obj_disarrangement["children"][0] = np.linalg.norm(
-                cur_state_cache[obj]["pose"]["children"][0][0] - prev_state_cache[obj]["pose"]["base"][0]
-            )
-            obj_disarrangement["children"][1] = np.linalg.norm(
-                cur_state_cache[obj]["pose"]["children"][1][0] - prev_state_cache[obj]["pose"]["base"][0]
-            )
-        elif prev_state_cache[obj]["active"] == 1 and cur_state_cache[obj]["active"] == 0:
-            obj_disarrangement["children"][0] = np.linalg.norm(
-                cur_state_cache[obj]["pose"]["base"][0] - prev_state_cache[obj]["pose"]["children"][0][0]
-            )
-            obj_disarrangement["children"][1] = np.linalg.norm(
-                cur_state_cache[obj]["pose"]["base"][0] - prev_state_cache[obj]["pose"]["children"][1][0]
-            )
-        elif prev_state_cache[obj]["active"] == 1 and cur_state_cache[obj]["active"] == 1:
-            obj_disarrangement["children"][0] = np.linalg.norm(
-                cur_state_cache[obj]["pose"]["children"][0][0] - prev_state_cache[obj]["pose"]["children"][0][0]
-            )
-            obj_disarrangement["children"][1] = np.linalg.norm(
-                cur_state_cache[obj]["pose"]["children"][1][0] - prev_state_cache[obj]["pose"]["children"][1][0]
-            )
-        else:
-            raise Exception
-        return obj_disarrangement
+        Read the poses and the active parts of the objects into the current pose and active arrays
 
-    def step_callback(self, env, _):
-        total_disarrangement = 0
-        self.cur_state_cache = self.update_state_cache(env)
+        :param env: environment
+        """
+        for row, pose_state in enumerate(self.pose_states):
+            pos, orn = pose_state.get_value()
+            self.cur_poses[row, :3] = pos
+            self.cur_poses[row, 3:] = orn
+        for idx, obj in self.multiplexers:
+            self.cur_active[idx] = obj.current_index
+
+    def get_pose_rows(self, active):
+        """
+        Get the rows of the two poses compared for every object: the base pose twice when the base object is active,
+        or the poses of the two parts
 
-        if not self.initialized:
-            self.prev_state_cache = copy.deepcopy(self.cur_state_cache)
-            self.initial_state_cache = copy.deepcopy(self.cur_state_cache)
-            self.delta_obj_disp_dict = {obj: {"base": [], "children": []} for obj in self.cur_state_cache}
-            self.int_obj_disp_dict = {obj: {"base": 0, "children": [0, 0]} for obj in self.cur_state_cache}
-            self.initialized = True
+        :param active: [N] array of the active part of every object
+        :return: [N, 2] array of rows of the pose arrays
+        """
+        assert np.all((active == 0) | (active == 1)), "Kinematic caching only supported for multiplexers of len 2"
+        return np.where(active[:, None] == 0, self.pose_rows[:, :1], self.pose_rows[:, 1:])
 
-        for obj in self.prev_state_cache:
-            obj_disarrangement = self.calculate_object_disarrangement(obj, self.prev_state_cache, self.cur_state_cache)
-            total_disarrangement += obj_disarrangement["base"]
-            total_disarrangement += np.sum(obj_disarrangement["children"])
+    def calculate_disarrangement(self, prev_poses, prev_active, cur_poses, cur_active):
+        """
+        Compute the displacement and rotation of all objects between two sets of poses. The displacement of an object
+        whose base object is active in both is its base displacement. Otherwise the object was split or joined, or
+        its parts moved, and the displacements of the two children are those from (or to) the base object or between
+        the parts.
+
+        :param prev_poses: [M, 7] array of previous poses
+        :param prev_active: [N] array of the previous active parts
+        :param cur_poses: [M, 7] array of current poses
+        :param cur_active: [N] array of the current active parts
+        :return: [N, 3] arrays of displacements and of rotations of the base and of the two children
+        """
+        prev_rows = self.get_pose_rows(prev_active)
+        cur_rows = self.get_pose_rows(cur_active)
+        distances = get_pose_distances(prev_poses, prev_rows, cur_poses, cur_rows)
+        rotations = get_pose_rotations(prev_poses, prev_rows, cur_poses, cur_rows)
+        base_active = (prev_active == 0) & (cur_active == 0)
+
+        displacement = np.zeros((len(self.object_ids), 3))
+        displacement[:, 0] = np.where(base_active, distances[:, 0], 0.0)
+        displacement[:, 1:] = np.where(base_active[:, None], 0.0, distances)
+        rotation = np.zeros((len(self.object_ids), 3))
+        rotation[:, 0] = np.where(base_active, rotations[:, 0], 0.0)
+        rotation[:, 1:] = np.where(base_active[:, None], 0.0, rotations)
+        return displacement, rotation
+
+    def update_disarrangement(self):
+        """
+        Accumulate the disarrangement between the previous and the current poses, and make the current poses the
+        previous ones
 
-            self.delta_obj_disp_dict[obj]["base"].append(obj_disarrangement["base"])
-            self.delta_obj_disp_dict[obj]["children"].append(obj_disarrangement["children"])
+        :return: total displacement of the objects
+        """
+        displacement, rotation = self.calculate_disarrangement(
+            self.prev_poses, self.prev_active, self.cur_poses, self.cur_active
+        )
+        total_disarrangement = sequential_total(displacement[:, 0], displacement[:, 1:])
 
-            self.int_obj_disp_dict[obj]["base"] += obj_disarrangement["base"]
-            self.int_obj_disp_dict[obj]["children"] = np.array(self.int_obj_disp_dict[obj]["children"]) + np.array(
-                obj_disarrangement["children"]
-            )
+        self.delta_obj_disp.append(displacement)
+        self.int_obj_disp += displacement
+        self.int_obj_rot += rotation
 
-        self.prev_state_cache = copy.deepcopy(self.cur_state_cache)
+        self.prev_poses, self.cur_poses = self.cur_poses, self.prev_poses
+        self.prev_active, self.cur_active = self.cur_active, self.prev_active
         self.integrated_disarrangement += total_disarrangement
         self.delta_disarrangement.append(total_disarrangement)
+        self.integrated_rotation += np.sum(rotation)
+        self.delta_rotation.append(np.sum(rotation))
 
         return total_disarrangement
 
+    def step_callback(self, env, _):
+        if not self.initialized:
+            self.initialize_objects(env)
+            self.update_state_cache(env)
+            self.prev_poses[:] = self.cur_poses
+            self.initial_poses[:] = self.cur_poses
+            self.prev_active[:] = self.cur_active
+            self.initial_active[:] = self.cur_active
+            self.initialized = True
+        else:
+            self.update_state_cache(env)
+
+        return self.update_disarrangement()
+
+    @property
+    def delta_obj_disp_dict(self):
+        return {
+            obj: {
+                "base": [step_disp[idx, 0] for step_disp in self.delta_obj_disp],
+                "children": [list(step_disp[idx, 1:]) for step_disp in self.delta_obj_disp],
+            }
+            for idx, obj in enumerate(self.object_ids)
+        }
+
+    @property
+    def int_obj_disp_dict(self):
+        return {
+            obj: {"base": self.int_obj_disp[idx, 0], "children": self.int_obj_disp[idx, 1:].copy()}
+            for idx, obj in enumerate(self.object_ids)
+        }
+
     @property
     def relative_disarrangement(self):
-        relative_disarrangement = 0
-        for obj in self.initial_state_cache:
-            disarrangement = self.calculate_object_disarrangement(obj, self.initial_state_cache, self.cur_state_cache)
-            relative_disarrangement += disarrangement["base"]
-            relative_disarrangement += np.sum(disarrangement["children"])
-        return relative_disarrangement
+        # The poses of the last step were swapped into the previous poses
+        displacement, _ = self.calculate_disarrangement(
+            self.initial_poses, self.initial_active, self.prev_poses, self.prev_active
+        )
+        return sequential_total(displacement[:, 0], displacement[:, 1:])
 
     def gather_results(self):
         return {
@@ -137,6 +288,93 @@ class KinematicDisarrangement(MetricBase):
         }
 
 
+class LogicalStateTargets(object):
+    """
+    Target objects of the relative states of a logical state cache, with the data used to find the candidate targets
+    of an object before evaluating a relative state against them
+    """
+
+    def __init__(self, object_ids, objects):
+        """
+        :param object_ids: ids of the objects that are not robots
+        :param objects: the objects
+        """
+        self.object_ids = object_ids
+        self.objects = objects
+        # Relational states with multiplexed target objects currently unhandled
+        # For example, inside apple cabinet is supported, inside cabinet apple is not
+        self.evaluated = np.array([type(obj) != ObjectMultiplexer for obj in objects], dtype=bool)
+        self.body_to_target = {}
+        for idx, obj in enumerate(objects):
+            if self.evaluated[idx]:
+                for body_id in obj.get_body_ids():
+                    self.body_to_target.setdefault(body_id, []).append(idx)
+        self._aabbs = None
+        self._no_aabb = None
+
+    def get_aabbs(self):
+        """
+        :return: [T, 2, 3] array of the AABB states of the targets, NaN for the targets without one, and [T] mask of
+            the targets without one
+        """
+        if self._aabbs is None:
+            self._aabbs = np.full((len(self.objects), 2, 3), np.nan)
+            self._no_aabb = np.zeros(len(self.objects), dtype=bool)
+            for idx, obj in enumerate(self.objects):
+                if not self.evaluated[idx]:
+                    continue
+                if AABB in obj.states:
+                    self._aabbs[idx] = obj.states[AABB].get_value()
+                else:
+                    self._no_aabb[idx] = True
+        return self._aabbs, self._no_aabb
+
+    def get_targets_of_bodies(self, body_ids):
+        """
+        :param body_ids: pybullet body ids
+        :return: [T] mask of the targets with one of the bodies
+        """
+        mask = np.zeros(len(self.objects), dtype=bool)
+        for body_id in body_ids:
+            mask[self.body_to_target.get(body_id, [])] = True
+        return mask
+
+    def get_candidates(self, state_class, obj):
+        """
+        Get the targets against which a relative state of an object can be true. Each test is the first test of the
+        state itself, or a looser one, so the state is false against the other targets.
+
+        :param state_class: relative state
+        :param obj: object (or part of a multiplexer) with the state
+        :return: [T] mask of the candidate targets
+        """
+        if state_class in [Touching, OnTop] and ContactBodies in obj.states:
+            # OnTop requires Touching, which requires a contact with a body of the target
+            return self.get_targets_of_bodies(item.bodyUniqueIdB for item in obj.states[ContactBodies].get_value())
+        elif state_class == Under and VerticalAdjacency in obj.states:
+            # Under requires a body of the target above the object
+            return self.get_targets_of_bodies(obj.states[VerticalAdjacency].get_value().positive_neighbors)
+        elif state_class == Inside and Pose in obj.states:
+            # Inside requires the position of the object to be in the AABB of the target
+            aabbs, no_aabb = self.get_aabbs()
+            pos = np.asarray(obj.states[Pose].get_value()[0])
+            inside_aabb = np.all(np.less_equal(aabbs[:, 0], pos), axis=1) & np.all(
+                np.less_equal(pos, aabbs[:, 1]), axis=1
+            )
+            return inside_aabb | no_aabb
+        elif state_class == NextTo and AABB in obj.states:
+            # NextTo requires the distance between the AABBs to be at most a sixth of their mean size
+            aabbs, no_aabb = self.get_aabbs()
+            lower, upper = obj.states[AABB].get_value()
+            gaps = np.maximum(np.maximum(lower, aabbs[:, 0]) - np.minimum(upper, aabbs[:, 1]), 0.0)
+            distances = np.sqrt(np.sum(gaps * gaps, axis=1))
+            mean_lengths = np.mean((upper - lower) + (aabbs[:, 1] - aabbs[:, 0]), axis=1)
+            next_to = distances <= mean_lengths * (1.0 / 6.0) * (1.0 + NEXT_TO_PREFILTER_SLACK)
+            return next_to | no_aabb
+        else:
+            return np.ones(len(self.objects), dtype=bool)
+
+
 class LogicalDisarrangement(MetricBase):
     def __init__(self):
         self.initialized = False
@@ -145,37 +383,8 @@ class LogicalDisarrangement(MetricBase):
         self.next_state_cache = {}
 
     @staticmethod
-    def cache_single_object(obj_id, obj, room_floors, env):
-        obj_cache = {}
-        for state_class, state in obj.states.items():
-            if not isinstance(state, BooleanState):
-                continue
-            if isinstance(state, AbsoluteObjectState):
-                obj_cache[state_class] = state.get_value()
-            # TODO (mjlbach): room floors are not currently proper objects, this means special logic
-            # is needed to handle onFloor until this is fixed
-            elif isinstance(state, OnFloor):
-                relational_state_cache = {}
-                for floor_id, floor in room_floors.items():
-                    relational_state_cache[floor_id] = state.get_value(floor)
-                obj_cache[state_class] = relational_state_cache
-            else:
-                relational_state_cache = {}
-                for target_obj_id, target_obj in env.scene.objects_by_name.items():
-                    if obj_id == target_obj_id or isinstance(target_obj, BaseRobot):
-                        continue
-                    relational_state_cache[target_obj_id] = False
-                    # Relational states with multiplexed target objects currently unhandled
-                    # For example, inside apple cabinet is supported, inside cabinet apple is not
-                    if type(target_obj) == ObjectMultiplexer:
-                        pass
-                    else:
-                        relational_state_cache[target_obj_id] = state.get_value(target_obj)
-                obj_cache[state_class] = relational_state_cache
-        return obj_cache
-
-    def create_object_logical_state_cache(self, env):
-        room_floors = {
+    def get_room_floors(env):
+        return {
             "room_floor_"
             + room_inst: RoomFloor(
                 category="room_floor",
@@ -187,144 +396,166 @@ class LogicalDisarrangement(MetricBase):
             for room_inst in env.scene.room_ins_name_to_ins_id.keys()
         }
 
-        state_cache = {}
-        for obj_id, obj in env.scene.objects_by_name.items():
-            if isinstance(obj, BaseRobot):
+    @staticmethod
+    def cache_single_object(state_cache, slot, idx, obj, room_floors, targets):
+        """
+        Evaluate the boolean states of an object into a row of a logical state cache. Relative states are only
+        evaluated against their candidate targets and are false against the others.
+
+        :param state_cache: logical state cache
+        :param slot: part of the object, in LOGICAL_STATE_SLOTS
+        :param idx: row of the object
+        :param obj: object (or base object or part of a multiplexer)
+        :param room_floors: dict of RoomFloor by id
+        :param targets: LogicalStateTargets of the relative states
+        """
+        slot_states = state_cache["states"][slot]
+        num_objects = len(state_cache["object_ids"])
+        for state_class, state in obj.states.items():
+            if not isinstance(state, BooleanState):
                 continue
-            state_cache[obj_id] = {}
+            if isinstance(state, AbsoluteObjectState):
+                shape = (num_objects,)
+            elif isinstance(state, OnFloor):
+                shape = (num_objects, len(room_floors))
+            else:
+                shape = (num_objects, len(targets.objects))
+            if state_class not in slot_states:
+                slot_states[state_class] = {
+                    "mask": np.zeros(num_objects, dtype=bool),
+                    "values": np.zeros(shape, dtype=bool),
+                }
+            slot_states[state_class]["mask"][idx] = True
+            values = slot_states[state_class]["values"]
+
+            if isinstance(state, AbsoluteObjectState):
+                values[idx] = state.get_value()
+            # TODO (mjlbach): room floors are not currently proper objects, this means special logic
+            # is needed to handle onFloor until this is fixed
+            elif isinstance(state, OnFloor):
+                # OnFloor requires the center of the AABB of the object to be in the room of the floor
+                if not room_floors:
+                    continue
+                center, _ = get_center_extent(obj.states)
+                room_instance = next(iter(room_floors.values())).scene.get_room_instance_by_point(center[:2])
+                for floor_idx, floor in enumerate(room_floors.values()):
+                    if floor.room_instance == room_instance:
+                        values[idx, floor_idx] = state.get_value(floor)
+            else:
+                candidates = targets.get_candidates(state_class, obj) & targets.evaluated
+                candidates[idx] = False
+                for target_idx in np.flatnonzero(candidates):
+                    values[idx, target_idx] = state.get_value(targets.objects[target_idx])
+
+    def create_object_logical_state_cache(self, env):
+        """
+        Evaluate the boolean states of all objects, other than robots, into a logical state cache of boolean arrays:
+        for every part of the objects in LOGICAL_STATE_SLOTS and every state, the mask of the objects with the state
+        and the [N] values of an absolute state, [N, N] values of a relative state against every object, or [N, F]
+        values of OnFloor against every room floor
+
+        :param env: environment
+        :return: logical state cache
+        """
+        room_floors = self.get_room_floors(env)
+        object_ids = []
+        objects = []
+        for obj_id, obj in env.scene.objects_by_name.items():
+            if not isinstance(obj, BaseRobot):
+                object_ids.append(obj_id)
+                objects.append(obj)
+        targets = LogicalStateTargets(object_ids, objects)
+
+        state_cache = {
+            "object_ids": object_ids,
+            "floor_ids": list(room_floors),
+            "multiplexer": np.array([type(obj) == ObjectMultiplexer for obj in objects], dtype=bool),
+            "active": np.zeros(len(objects), dtype=int),
+            "states": {slot: {} for slot in LOGICAL_STATE_SLOTS},
+        }
+        for idx, obj in enumerate(objects):
             if type(obj) == ObjectMultiplexer:
+                state_cache["active"][idx] = obj.current_index
                 if obj.current_index == 0:
-                    cache_base = self.cache_single_object(obj_id, obj._multiplexed_objects[0], room_floors, env)
-                    cache_part_1 = None
-                    cache_part_2 = None
-                else:
-                    cache_base = None
-                    cache_part_1 = self.cache_single_object(
-                        obj_id, obj._multiplexed_objects[1].objects[0], room_floors, env.task
-                    )
-                    cache_part_2 = self.cache_single_object(
-                        obj_id, obj._multiplexed_objects[1].objects[1], room_floors, env.task
+                    self.cache_single_object(
+                        state_cache, "base", idx, obj._multiplexed_objects[0], room_floors, targets
                     )
-                state_cache[obj_id] = {
-                    "base_states": cache_base,
-                    "part_states": [cache_part_1, cache_part_2],
-                    "active": obj.current_index,
-                    "type": "multiplexer",
-                }
+                else:
+                    for slot, part in zip(LOGICAL_STATE_SLOTS[1:], obj._multiplexed_objects[1].objects):
+                        self.cache_single_object(state_cache, slot, idx, part, room_floors, targets)
             else:
-                cache_base = self.cache_single_object(obj_id, obj, room_floors, env.task)
-                state_cache[obj_id] = {
-                    "base_states": cache_base,
-                    "type": "standard",
-                }
+                self.cache_single_object(state_cache, "base", idx, obj, room_floors, targets)
         return state_cache
 
-    def diff_object_states(self, obj_1_states, obj_2_states):
-        total_states = 0
-        non_kinematic_edits = 0
-        kinematic_edits = 0
-        for state in obj_1_states:
-            total_states += 1
-            if obj_1_states[state] != obj_2_states[state]:
-                if state in [Inside, Under, OnTop, Touching, OnFloor]:
-                    kinematic_edits = 1
-                elif state in [NextTo]:
-                    pass
-                else:
-                    non_kinematic_edits += 1
-        return total_states, kinematic_edits, non_kinematic_edits
+    @staticmethod
+    def diff_object_states(state_cache_1, slot_1, state_cache_2, slot_2):
+        """
+        Diff the states of a part of all objects between two logical state caches
+
+        :param state_cache_1: logical state cache
+        :param slot_1: part of the objects in state_cache_1
+        :param state_cache_2: logical state cache
+        :param slot_2: part of the objects in state_cache_2
+        :return: [N] arrays of the number of states, of the kinematic edits (at most one per object) and of the other
+            edits of every object
+        """
+        num_objects = len(state_cache_1["object_ids"])
+        total_states = np.zeros(num_objects, dtype=int)
+        kinematic_edits = np.zeros(num_objects, dtype=bool)
+        non_kinematic_edits = np.zeros(num_objects, dtype=int)
+        slot_states_2 = state_cache_2["states"][slot_2]
+        for state_class, states_1 in state_cache_1["states"][slot_1].items():
+            total_states += states_1["mask"]
+            if state_class in IGNORED_STATES:
+                continue
+            values_2 = slot_states_2[state_class]["values"] if state_class in slot_states_2 else False
+            changed = states_1["values"] != values_2
+            if changed.ndim > 1:
+                changed = np.any(changed, axis=1)
+            changed &= states_1["mask"]
+            if state_class in KINEMATIC_STATES:
+                kinematic_edits |= changed
+            else:
+                non_kinematic_edits += changed
+        return total_states, kinematic_edits.astype(int), non_kinematic_edits
 
     def compute_logical_disarrangement(self, object_state_cache_1, object_state_cache_2):
+        """
+        Count the edits between two logical state caches. A standard object, or a multiplexer whose base object is
+        active in both caches, is diffed once. A split or joined multiplexer is diffed once per part against the base
+        object, and a multiplexer split in both caches once per part, against the same part of the first cache.
+
+        :param object_state_cache_1: logical state cache
+        :param object_state_cache_2: logical state cache of the same objects
+        :return: dict of the number of objects, edits and states
+        """
+        assert object_state_cache_1["object_ids"] == object_state_cache_2["object_ids"], "Caches of different objects"
+        assert object_state_cache_1["floor_ids"] == object_state_cache_2["floor_ids"], "Caches of different floors"
+        active_1 = np.where(object_state_cache_1["multiplexer"], object_state_cache_1["active"], 0)
+        active_2 = np.where(object_state_cache_1["multiplexer"], object_state_cache_2["active"], 0)
+        assert np.all(np.isin(active_1, [0, 1]) & np.isin(active_2, [0, 1])), "Multiplexers of len 2 only supported"
+
+        # Pairs of diffed parts and the objects diffed with them
+        diffs = [
+            ((object_state_cache_1, "base", object_state_cache_2, "base"), (active_1 == 0) & (active_2 == 0)),
+            ((object_state_cache_1, "base", object_state_cache_2, "part_0"), (active_1 == 0) & (active_2 == 1)),
+            ((object_state_cache_1, "base", object_state_cache_2, "part_1"), (active_1 == 0) & (active_2 == 1)),
+            ((object_state_cache_1, "part_0", object_state_cache_2, "base"), (active_1 == 1) & (active_2 == 0)),
+            ((object_state_cache_1, "part_1", object_state_cache_2, "base"), (active_1 == 1) & (active_2 == 0)),
+            ((object_state_cache_1, "part_0", object_state_cache_1, "part_0"), (active_1 == 1) & (active_2 == 1)),
+            ((object_state_cache_1, "part_1", object_state_cache_1, "part_1"), (active_1 == 1) & (active_2 == 1)),
+        ]
         total_edit_distance = 0
-        total_objects = 0
         total_states = 0
-        for obj_id in object_state_cache_1:
-            kinematic_edits = 0
-            non_kinematic_edits = 0
-            total_objects += 1
-            obj_total_states = 0
-            obj_kinematic_edits = 0
-            obj_non_kinematic_edits = 0
-            if object_state_cache_1[obj_id]["type"] == "multiplexer":
-                if object_state_cache_1[obj_id]["active"] == 0 and object_state_cache_2[obj_id]["active"] == 0:
-                    obj_1_states = object_state_cache_1[obj_id]["base_states"]
-                    obj_2_states = object_state_cache_2[obj_id]["base_states"]
-                    (
-                        obj_total_states,
-                        obj_kinematic_edits,
-                        obj_non_kinematic_edits,
-                    ) = self.diff_object_states(obj_1_states, obj_2_states)
-                elif object_state_cache_1[obj_id]["active"] == 0 and object_state_cache_2[obj_id]["active"] == 1:
-                    obj_1_states = object_state_cache_1[obj_id]["base_states"]
-                    obj_2_1_states = object_state_cache_2[obj_id]["part_states"][0]
-                    obj_2_2_states = object_state_cache_2[obj_id]["part_states"][1]
-                    (
-                        obj_total_states,
-                        obj_kinematic_edits,
-                        obj_non_kinematic_edits,
-                    ) = self.diff_object_states(obj_1_states, obj_2_1_states)
-                    total_states += obj_total_states
-                    kinematic_edits += obj_kinematic_edits
-                    kinematic_edits += obj_non_kinematic_edits
-                    (
-                        obj_total_states,
-                        obj_kinematic_edits,
-                        obj_non_kinematic_edits,
-                    ) = self.diff_object_states(obj_1_states, obj_2_2_states)
-                elif object_state_cache_1[obj_id]["active"] == 1 and object_state_cache_2[obj_id]["active"] == 0:
-                    obj_1_1_states = object_state_cache_1[obj_id]["part_states"][0]
-                    obj_1_2_states = object_state_cache_1[obj_id]["part_states"][1]
-                    obj_2_states = object_state_cache_2[obj_id]["base_states"]
-                    (
-                        obj_total_states,
-                        obj_kinematic_edits,
-                        obj_non_kinematic_edits,
-                    ) = self.diff_object_states(obj_1_1_states, obj_2_states)
-                    total_states += obj_total_states
-                    kinematic_edits += obj_kinematic_edits
-                    kinematic_edits += obj_non_kinematic_edits
-                    (
-                        obj_total_states,
-                        obj_kinematic_edits,
-                        obj_non_kinematic_edits,
-                    ) = self.diff_object_states(obj_1_2_states, obj_2_states)
-                elif object_state_cache_1[obj_id]["active"] == 1 and object_state_cache_2[obj_id]["active"] == 1:
-                    obj_1_1_states = object_state_cache_1[obj_id]["part_states"][0]
-                    obj_1_2_states = object_state_cache_1[obj_id]["part_states"][1]
-                    obj_2_1_states = object_state_cache_1[obj_id]["part_states"][0]
-                    obj_2_2_states = object_state_cache_1[obj_id]["part_states"][1]
-                    (
-                        obj_total_states,
-                        obj_kinematic_edits,
-                        obj_non_kinematic_edits,
-                    ) = self.diff_object_states(obj_1_1_states, obj_2_1_states)
-                    total_states += obj_total_states
-                    kinematic_edits += obj_kinematic_edits
-                    kinematic_edits += obj_non_kinematic_edits
-                    (
-                        obj_total_states,
-                        obj_kinematic_edits,
-                        obj_non_kinematic_edits,
-                    ) = self.diff_object_states(obj_1_2_states, obj_2_2_states)
-                else:
-                    raise Exception
-            else:
-                obj_1_states = object_state_cache_1[obj_id]["base_states"]
-                obj_2_states = object_state_cache_2[obj_id]["base_states"]
-                (
-                    obj_total_states,
-                    obj_kinematic_edits,
-                    obj_non_kinematic_edits,
-                ) = self.diff_object_states(obj_1_states, obj_2_states)
-            total_states += obj_total_states
-            kinematic_edits += obj_kinematic_edits
-            kinematic_edits += obj_non_kinematic_edits
-
-            total_edit_distance += non_kinematic_edits
-            total_edit_distance += kinematic_edits
+        for diff_args, diffed in diffs:
+            if not np.any(diffed):
+                continue
+            obj_total_states, obj_kinematic_edits, obj_non_kinematic_edits = self.diff_object_states(*diff_args)
+            total_states += int(np.sum(obj_total_states[diffed]))
+            total_edit_distance += int(np.sum(obj_kinematic_edits[diffed]) + np.sum(obj_non_kinematic_edits[diffed]))
 
         return {
-            "total_objects": total_objects,
+            "total_objects": len(object_state_cache_1["object_ids"]),
             "total_edit_distance": total_edit_distance,
             "total_states": total_states,
         }
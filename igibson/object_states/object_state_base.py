@@ -93,6 +93,18 @@ class AbsoluteObjectState(BaseObjectState):
     def load(self, data):
         raise NotImplementedError()
 
+    @classmethod
+    def load_batch(cls, instances, data):
+        """
+        Load the dumps of several instances of this state at once, e.g. when restoring a scene snapshot. States whose
+        load can be applied to many objects at once can override this.
+
+        :param instances: instances of this state
+        :param data: dumps of the instances, in the same order
+        """
+        for instance, instance_data in zip(instances, data):
+            instance.load(instance_data)
+
 
 class CachingEnabledObjectState(AbsoluteObjectState):
     """
@@ -445,6 +445,8 @@ class WaterStream(ParticleSystem):
         body_ids = super(WaterStream, self)._load_particle(particle)
 
         # Set renderer instance settings on the particles.
+        if self._simulator.renderer is None:
+            return body_ids
         instances = self._simulator.renderer.get_instances()
         for instance in instances:
             if instance.pybullet_uuid in body_ids:
@@ -279,8 +279,14 @@ PYBIND11_MODULE(EGLRendererContext, m) {
 	pymodule.def("updateHiddenData", &EGLRendererContext::updateHiddenData, "TBA");
 	pymodule.def("updateUVData", &EGLRendererContext::updateUVData, "TBA");
     pymodule.def("updateDynamicData", &EGLRendererContext::updateDynamicData, "TBA");
+    pymodule.def("updatePoseData", &EGLRendererContext::updatePoseData, "TBA");
+    pymodule.def("updateViewData", &EGLRendererContext::updateViewData, "TBA");
     pymodule.def("renderOptimized", &EGLRendererContext::renderOptimized, "TBA");
     pymodule.def("clean_meshrenderer_optimized", &EGLRendererContext::clean_meshrenderer_optimized, "TBA");
+    pymodule.def("updateOptimizedVertexData", &EGLRendererContext::updateOptimizedVertexData, "TBA");
+    pymodule.def("updateOptimizedIndexData", &EGLRendererContext::updateOptimizedIndexData, "TBA");
+    pymodule.def("updateMultiDrawData", &EGLRendererContext::updateMultiDrawData, "TBA");
+    pymodule.def("clean_optimized_buffers", &EGLRendererContext::clean_optimized_buffers, "TBA");
 
     //for skybox
     pymodule.def("loadSkyBox", &EGLRendererContext::loadSkyBox, "TBA");
@@ -185,8 +185,14 @@ PYBIND11_MODULE(GLFWRendererContext, m) {
 	pymodule.def("updateHiddenData", &GLFWRendererContext::updateHiddenData, "TBA");
 	pymodule.def("updateUVData", &GLFWRendererContext::updateUVData, "TBA");
     pymodule.def("updateDynamicData", &GLFWRendererContext::updateDynamicData, "TBA");
+    pymodule.def("updatePoseData", &GLFWRendererContext::updatePoseData, "TBA");
+    pymodule.def("updateViewData", &GLFWRendererContext::updateViewData, "TBA");
     pymodule.def("renderOptimized", &GLFWRendererContext::renderOptimized, "TBA");
     pymodule.def("clean_meshrenderer_optimized", &GLFWRendererContext::clean_meshrenderer_optimized, "TBA");
+    pymodule.def("updateOptimizedVertexData", &GLFWRendererContext::updateOptimizedVertexData, "TBA");
+    pymodule.def("updateOptimizedIndexData", &GLFWRendererContext::updateOptimizedIndexData, "TBA");
+    pymodule.def("updateMultiDrawData", &GLFWRendererContext::updateMultiDrawData, "TBA");
+    pymodule.def("clean_optimized_buffers", &GLFWRendererContext::clean_optimized_buffers, "TBA");
 
     //for skybox
     pymodule.def("loadSkyBox", &GLFWRendererContext::loadSkyBox, "TBA");
@@ -1390,6 +1390,9 @@ py::list MeshRendererContext::generateArrayTextures(std::vector<std::string> fil
 		float use_pbr,
 		float blend_highlight,
 		int depth_tex_id) {
+		// The uniform buffers of a previous setup are replaced
+		deleteOptimizedUniformBuffers();
+
 		// First set up VAO and corresponding attributes
 		GLuint VAO;
 		glGenVertexArrays(1, &VAO);
@@ -1434,6 +1437,8 @@ py::list MeshRendererContext::generateArrayTextures(std::vector<std::string> fil
 
 		multidrawCount = index_ptr_offsets.size();
 		int* indexOffsetPtr = (int*)index_ptr_offsets.request().ptr;
+		this->multidrawStartIndices.clear();
+		this->multidrawCounts.clear();
 
 		for (int i = 0; i < multidrawCount; i++) {
 			unsigned int offset = (unsigned int)indexOffsetPtr[i];
@@ -1641,6 +1646,12 @@ py::list MeshRendererContext::generateArrayTextures(std::vector<std::string> fil
 
 		glUseProgram(shaderProgram);
 
+		// Release the buffers of the previous update
+		glDeleteBuffers(1, &uboTexColorData);
+		glDeleteBuffers(1, &uboPbrData);
+		glDeleteBuffers(1, &uboHidden);
+		glDeleteBuffers(1, &uboUV);
+
 		glGenBuffers(1, &uboTexColorData);
 		glBindBuffer(GL_UNIFORM_BUFFER, uboTexColorData);
 		texColorDataSize = 4 * 16 * MAX_ARRAY_SIZE;
@@ -1706,6 +1717,70 @@ py::list MeshRendererContext::generateArrayTextures(std::vector<std::string> fil
 		glBindBuffer(GL_UNIFORM_BUFFER, 0);
 	}
 
+	// Writes vertex data in the merged vertex buffer, starting at the given float offset
+	void MeshRendererContext::updateOptimizedVertexData(GLuint VBO, int offset, py::array_t<float> vertex_data) {
+		float* vertexDataPtr = (float*)vertex_data.request().ptr;
+		glBindBuffer(GL_ARRAY_BUFFER, VBO);
+		glBufferSubData(GL_ARRAY_BUFFER, offset * sizeof(float), vertex_data.size() * sizeof(float), vertexDataPtr);
+		glBindBuffer(GL_ARRAY_BUFFER, 0);
+	}
+
+	// Writes indices in the merged index buffer, starting at the given index offset
+	void MeshRendererContext::updateOptimizedIndexData(GLuint VAO, GLuint EBO, int offset, py::array_t<int> indices) {
+		int* indicesPtr = (int*)indices.request().ptr;
+		std::vector<unsigned int> indexData;
+		for (int i = 0; i < indices.size(); i++) {
+			indexData.push_back((unsigned int)indicesPtr[i]);
+		}
+		if (indexData.size() == 0) {
+			return;
+		}
+		// The element array buffer binding is part of the VAO state
+		glBindVertexArray(VAO);
+		glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, EBO);
+		glBufferSubData(GL_ELEMENT_ARRAY_BUFFER, offset * sizeof(unsigned int), indexData.size() * sizeof(unsigned int), &indexData[0]);
+		glBindVertexArray(0);
+	}
+
+	// Replaces the draws of renderOptimized
+	void MeshRendererContext::updateMultiDrawData(py::array_t<int> index_ptr_offsets, py::array_t<int> index_counts) {
+		multidrawCount = index_ptr_offsets.size();
+		int* indexOffsetPtr = (int*)index_ptr_offsets.request().ptr;
+		int* indices_count_ptr = (int*)index_counts.request().ptr;
+		this->multidrawStartIndices.clear();
+		this->multidrawCounts.clear();
+		for (int i = 0; i < multidrawCount; i++) {
+			unsigned int offset = (unsigned int)indexOffsetPtr[i];
+			this->multidrawStartIndices.push_back(BUFFER_OFFSET((offset * sizeof(unsigned int))));
+			this->multidrawCounts.push_back(indices_count_ptr[i]);
+		}
+	}
+
+	// Deletes the array textures and merged buffers of the optimized renderer, and its uniform buffers with the VAO
+	void MeshRendererContext::clean_optimized_buffers(std::vector<GLuint> textures, std::vector<GLuint> vaos, std::vector<GLuint> buffers) {
+		glDeleteTextures(textures.size(), textures.data());
+		glDeleteVertexArrays(vaos.size(), vaos.data());
+		glDeleteBuffers(buffers.size(), buffers.data());
+		if (vaos.size() > 0) {
+			deleteOptimizedUniformBuffers();
+		}
+	}
+
+	void MeshRendererContext::deleteOptimizedUniformBuffers() {
+		// Deleting the buffer name 0 is silently ignored
+		GLuint ubos[8] = {uboTexColorData, uboPbrData, uboTransformDataRot, uboTransformDataTrans,
+			uboTransformDataLastRot, uboTransformDataLastTrans, uboHidden, uboUV};
+		glDeleteBuffers(8, ubos);
+		uboTexColorData = 0;
+		uboPbrData = 0;
+		uboTransformDataRot = 0;
+		uboTransformDataTrans = 0;
+		uboTransformDataLastRot = 0;
+		uboTransformDataLastTrans = 0;
+		uboHidden = 0;
+		uboUV = 0;
+	}
+
 	// Updates UV data in vertex shader
 	void MeshRendererContext::updateUVData(int shaderProgram, py::array_t<float> uv_data) {
 		glUseProgram(shaderProgram);
@@ -1775,6 +1850,48 @@ py::list MeshRendererContext::generateArrayTextures(std::vector<std::string> fil
         glUniform3f(glGetUniformLocation(shaderProgram, "eyePosition"), eye_pos_ptr[0], eye_pos_ptr[1], eye_pos_ptr[2]);
 	}
 
+	// Uploads a range of 4x4 matrices of a [N, 4, 4] array to a uniform buffer of MAX_ARRAY_SIZE matrices
+	static void uploadMatrixRange(GLuint ubo, py::array_t<float> matrices, int start, int end) {
+		if (end > MAX_ARRAY_SIZE) end = MAX_ARRAY_SIZE;
+		if (end > matrices.size() / 16) end = matrices.size() / 16;
+		if (start >= end) return;
+		float* matricesPtr = (float*)matrices.request().ptr;
+		glBindBuffer(GL_UNIFORM_BUFFER, ubo);
+		glBufferSubData(GL_UNIFORM_BUFFER, start * 16 * sizeof(float), (end - start) * 16 * sizeof(float), matricesPtr + start * 16);
+	}
+
+	void MeshRendererContext::updatePoseData(py::array_t<float> pose_trans_array, py::array_t<float> pose_rot_array,
+		py::array_t<float> last_trans_array, py::array_t<float> last_rot_array, int start, int end, int last_start,
+		int last_end) {
+		uploadMatrixRange(uboTransformDataTrans, pose_trans_array, start, end);
+		uploadMatrixRange(uboTransformDataRot, pose_rot_array, start, end);
+		uploadMatrixRange(uboTransformDataLastTrans, last_trans_array, last_start, last_end);
+		uploadMatrixRange(uboTransformDataLastRot, last_rot_array, last_start, last_end);
+		glBindBuffer(GL_UNIFORM_BUFFER, 0);
+	}
+
+	// Sets the camera and light uniforms of a pass of the optimized renderer, the poses are uploaded by updatePoseData
+	void MeshRendererContext::updateViewData(int shaderProgram, py::array_t<float> V, py::array_t<float> last_V,
+		py::array_t<float> P, py::array_t<float> lightV, py::array_t<float> lightP, int shadow_pass,
+		py::array_t<float> eye_pos) {
+		glUseProgram(shaderProgram);
+
+		float* Vptr = (float*)V.request().ptr;
+		float *last_Vptr = (float *) last_V.request().ptr;
+		float* Pptr = (float*)P.request().ptr;
+		float* lightVptr = (float*)lightV.request().ptr;
+		float* lightPptr = (float*)lightP.request().ptr;
+		float *eye_pos_ptr = (float *) eye_pos.request().ptr;
+
+		glUniformMatrix4fv(glGetUniformLocation(shaderProgram, "V"), 1, GL_TRUE, Vptr);
+		glUniformMatrix4fv(glGetUniformLocation(shaderProgram, "last_V"), 1, GL_TRUE, last_Vptr);
+		glUniformMatrix4fv(glGetUniformLocation(shaderProgram, "P"), 1, GL_FALSE, Pptr);
+		glUniformMatrix4fv(glGetUniformLocation(shaderProgram, "lightV"), 1, GL_TRUE, lightVptr);
+		glUniformMatrix4fv(glGetUniformLocation(shaderProgram, "lightP"), 1, GL_FALSE, lightPptr);
+		glUniform1i(glGetUniformLocation(shaderProgram, "shadow_pass"), shadow_pass);
+		glUniform3f(glGetUniformLocation(shaderProgram, "eyePosition"), eye_pos_ptr[0], eye_pos_ptr[1], eye_pos_ptr[2]);
+	}
+
 	// Optimized rendering function that is called once per frame for all merged data
 	void MeshRendererContext::renderOptimized(GLuint VAO) {
 		glBindVertexArray(VAO);
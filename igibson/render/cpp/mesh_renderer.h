@@ -65,14 +65,14 @@ public:
 	int multidrawCount;
 
 	// UBO data
-	GLuint uboTexColorData;
-	GLuint uboPbrData;
-	GLuint uboTransformDataRot;
-	GLuint uboTransformDataTrans;
-    GLuint uboTransformDataLastRot;
-	GLuint uboTransformDataLastTrans;
-	GLuint uboHidden;
-	GLuint uboUV;
+	GLuint uboTexColorData = 0;
+	GLuint uboPbrData = 0;
+	GLuint uboTransformDataRot = 0;
+	GLuint uboTransformDataTrans = 0;
+    GLuint uboTransformDataLastRot = 0;
+	GLuint uboTransformDataLastTrans = 0;
+	GLuint uboHidden = 0;
+	GLuint uboUV = 0;
 
 	int texColorDataSize;
 	int transformDataSize;
@@ -218,6 +218,17 @@ public:
 
 	void updateHiddenData(int shaderProgram, py::array_t<float> hidden_array);
 
+	// Incremental updates of the merged buffers set up by renderSetup, offsets are in number of elements
+	void updateOptimizedVertexData(GLuint VBO, int offset, py::array_t<float> vertex_data);
+
+	void updateOptimizedIndexData(GLuint VAO, GLuint EBO, int offset, py::array_t<int> indices);
+
+	void updateMultiDrawData(py::array_t<int> index_ptr_offsets, py::array_t<int> index_counts);
+
+	void clean_optimized_buffers(std::vector<GLuint> textures, std::vector<GLuint> vaos, std::vector<GLuint> buffers);
+
+	void deleteOptimizedUniformBuffers();
+
 	void updateUVData(int shaderProgram, py::array_t<float> uv_data);
 
     void updateDynamicData(int shaderProgram, py::array_t<float> pose_trans_array,
@@ -227,6 +238,14 @@ public:
         py::array_t<float> lightP, int shadow_pass,
 		py::array_t<float> eye_pos);
 
+	// Uploads the poses of the draws in [start, end) and the last poses of the draws in [last_start, last_end)
+	void updatePoseData(py::array_t<float> pose_trans_array, py::array_t<float> pose_rot_array,
+		py::array_t<float> last_trans_array, py::array_t<float> last_rot_array, int start, int end, int last_start,
+		int last_end);
+
+	void updateViewData(int shaderProgram, py::array_t<float> V, py::array_t<float> last_V, py::array_t<float> P,
+		py::array_t<float> lightV, py::array_t<float> lightP, int shadow_pass, py::array_t<float> eye_pos);
+
 	void renderOptimized(GLuint VAO);
 
 	void loadSkyBox(int shaderProgram, float skybox_size);
@@ -878,8 +878,14 @@ PYBIND11_MODULE(VRRendererContext, m) {
 	pymodule.def("updateHiddenData", &VRRendererContext::updateHiddenData, "TBA");
 	pymodule.def("updateUVData", &VRRendererContext::updateUVData, "TBA");
 	pymodule.def("updateDynamicData", &VRRendererContext::updateDynamicData, "TBA");
+	pymodule.def("updatePoseData", &VRRendererContext::updatePoseData, "TBA");
+	pymodule.def("updateViewData", &VRRendererContext::updateViewData, "TBA");
 	pymodule.def("renderOptimized", &VRRendererContext::renderOptimized, "TBA");
 	pymodule.def("clean_meshrenderer_optimized", &VRRendererContext::clean_meshrenderer_optimized, "TBA");
+	pymodule.def("updateOptimizedVertexData", &VRRendererContext::updateOptimizedVertexData, "TBA");
+	pymodule.def("updateOptimizedIndexData", &VRRendererContext::updateOptimizedIndexData, "TBA");
+	pymodule.def("updateMultiDrawData", &VRRendererContext::updateMultiDrawData, "TBA");
+	pymodule.def("clean_optimized_buffers", &VRRendererContext::clean_optimized_buffers, "TBA");
 
 	// for skybox
 	pymodule.def("loadSkyBox", &VRRendererContext::loadSkyBox, "TBA");
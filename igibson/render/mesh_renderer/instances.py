@@ -45,8 +45,10 @@ class InstanceGroup(object):
         :param parent_body_name: name of the parent body, if any, to be used by the Robosuite/Mujoco bridge
         """
         self.objects = objects
-        self.poses_trans = poses_trans
-        self.poses_rot = poses_rot
+        # (number of visual objects, 4, 4) float32 arrays, updated in place so they can be views into the pose arrays
+        # of the optimized renderer
+        self._poses_trans = np.array(poses_trans, dtype=np.float32).reshape(-1, 4, 4)
+        self._poses_rot = np.array(poses_rot, dtype=np.float32).reshape(-1, 4, 4)
         self.id = id
         self.link_ids = link_ids
         self.class_id = class_id
@@ -71,10 +73,40 @@ class InstanceGroup(object):
         # Indices into optimized buffers such as color information and transformation buffer
         # These values are used to set buffer information during simulation
         self.or_buffer_indices = None
+        # First row of the poses of this instance in the pose arrays of the optimized renderer
+        self.or_pose_offset = None
         self.last_trans = [np.copy(item) for item in poses_trans]
         self.last_rot = [np.copy(item) for item in poses_rot]
         self.parent_body_name = parent_body_name
 
+    @property
+    def poses_trans(self):
+        return self._poses_trans
+
+    @poses_trans.setter
+    def poses_trans(self, poses_trans):
+        self._poses_trans[:] = poses_trans
+
+    @property
+    def poses_rot(self):
+        return self._poses_rot
+
+    @poses_rot.setter
+    def poses_rot(self, poses_rot):
+        self._poses_rot[:] = poses_rot
+
+    def bind_pose_buffers(self, poses_trans, poses_rot):
+        """
+        Move the poses of this InstanceGroup to new arrays, usually views into the pose arrays of the optimized renderer
+
+        :param poses_trans: (number of visual objects, 4, 4) float32 array for the translations
+        :param poses_rot: (number of visual objects, 4, 4) float32 array for the rotation matrices
+        """
+        poses_trans[:] = self._poses_trans
+        poses_rot[:] = self._poses_rot
+        self._poses_trans = poses_trans
+        self._poses_rot = poses_rot
+
     def set_highlight(self, highlight):
         self.highlight = highlight
 
@@ -110,15 +142,12 @@ class InstanceGroup(object):
                     vertices_flattened = [item for sublist in vertices for item in sublist]
                     vertex_position = np.array(vertices_flattened).reshape((len(vertices_flattened) // 3, 3))
                     shape = self.renderer.shapes[object_idx]
-                    n_indices = len(shape.mesh.indices)
-                    np_indices = shape.mesh.numpy_indices().reshape((n_indices, 3))
-                    shape_vertex_index = np_indices[:, 0]
-                    shape_vertex = vertex_position[shape_vertex_index]
+                    shape_vertex = vertex_position[shape.indices[:, 0]]
 
-                    # update new vertex position in buffer data
-                    new_data = self.renderer.vertex_data[object_idx]
+                    # update new vertex position in buffer data, the vertex data may be shared with other objects
+                    new_data = self.renderer.vertex_data[object_idx].astype(np.float32)
                     new_data[:, 0 : shape_vertex.shape[1]] = shape_vertex
-                    new_data = new_data.astype(np.float32)
+                    self.renderer.vertex_data[object_idx] = new_data
 
                     # transform and rotation already included in mesh data
                     self.pose_trans = np.eye(4)
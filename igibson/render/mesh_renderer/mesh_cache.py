@@ -0,0 +1,536 @@
+"""
+Cache of the CPU-side work of MeshRenderer.load_object.
+
+Two levels are used:
+- in process, the vertex buffers built for an (obj file, scale, transform) are kept, so that every instance of the
+  same model shares them, and the parsed obj files are kept so that new transforms of a model do not parse it again.
+- on disk, the parsed obj files are stored as .npz files keyed by the content hash of the obj and mtl files, so that
+  later processes skip obj parsing. Data read from encrypted files is never written to disk, those files are only
+  cached in process.
+Optionally, the textures are also stored on disk downscaled by their texture scale, keyed by the path, modification
+time and texture scale of the texture file. They are downscaled with a port of the stb_image_resize filter that
+MeshRendererContext.loadTexture uses, so that the cached pixels are the ones loadTexture computes from the original
+file. loadTexture then loads them with a texture scale of 1, at which stb_image_resize still applies its filter once.
+"""
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+import igibson
+from igibson.render.mesh_renderer import tinyobjloader
+from igibson.utils.mesh_util import quat2rotmat, xyzw2wxyz
+
+log = logging.getLogger(__name__)
+
+# Increase when the format of the cached meshes or textures changes
+MESH_CACHE_VERSION = 1
+MATERIAL_FIELDS = ["name", "diffuse", "diffuse_texname", "metallic_texname", "roughness_texname", "bump_texname"]
+# Texture file formats that PIL decodes to the same 8 bits RGB pixels as stb_image, when their mode is RGB
+CACHEABLE_TEXTURE_FORMATS = ["PNG", "BMP"]
+
+
+class MeshShape(object):
+    """
+    Shape of a parsed obj file
+    """
+
+    def __init__(self, name, material_id, indices):
+        """
+        :param name: shape name
+        :param material_id: index of the material of the shape in the obj file, -1 if it has none
+        :param indices: (num triangles * 3, 3) vertex, normal and texcoord indices of the corners of the triangles
+        """
+        self.name = name
+        self.material_id = material_id
+        self.indices = indices
+
+
+class ParsedMesh(object):
+    """
+    Content of a parsed obj file and its materials
+    """
+
+    def __init__(self, vertex_position, vertex_normal, vertex_texcoord, materials, shapes):
+        """
+        :param vertex_position: (num vertices, 3) vertex positions
+        :param vertex_normal: (num normals, 3) vertex normals
+        :param vertex_texcoord: (num texcoords, 2) texture coordinates
+        :param materials: list of dicts with the MATERIAL_FIELDS of each material
+        :param shapes: list of MeshShape
+        """
+        self.vertex_position = vertex_position
+        self.vertex_normal = vertex_normal
+        self.vertex_texcoord = vertex_texcoord
+        self.materials = materials
+        self.shapes = shapes
+
+    def get_nbytes(self):
+        return (
+            self.vertex_position.nbytes
+            + self.vertex_normal.nbytes
+            + self.vertex_texcoord.nbytes
+            + sum(shape.indices.nbytes for shape in self.shapes)
+        )
+
+
+def parse_obj_file(obj_path):
+    """
+    Parse an obj file with tinyobjloader, decrypting it with the iGibson key if needed
+
+    :param obj_path: path of obj file
+    :return: ParsedMesh
+    """
+    reader = tinyobjloader.ObjReader()
+    log.debug("Loading {}".format(obj_path))
+    if obj_path.endswith("encrypted.obj"):
+        if not os.path.exists(igibson.key_path):
+            raise FileNotFoundError("iGibson key file is not found, request here https://forms.gle/oW4xB3tRXyCJa1Ap8")
+        ret = reader.ParseFromFileWithKey(obj_path, igibson.key_path)
+    else:
+        ret = reader.ParseFromFile(obj_path)
+    if not ret:
+        log.error("Warning: {}".format(reader.Warning()))
+        raise IOError("Failed to load {}: {}".format(obj_path, reader.Error()))
+
+    if reader.Warning():
+        log.warning("Warning: {}".format(reader.Warning()))
+
+    attrib = reader.GetAttrib()
+    materials = [{field: getattr(item, field) for field in MATERIAL_FIELDS} for item in reader.GetMaterials()]
+    for material in materials:
+        material["diffuse"] = list(material["diffuse"])
+    shapes = []
+    for shape in reader.GetShapes():
+        n_indices = len(shape.mesh.indices)
+        if len(shape.mesh.material_ids) == 0:
+            material_id = -1
+        else:
+            material_id = shape.mesh.material_ids[0]
+            # assumption: each shape only have one material
+        shapes.append(MeshShape(shape.name, material_id, shape.mesh.numpy_indices().reshape((n_indices, 3))))
+
+    return ParsedMesh(
+        np.array(attrib.vertices).reshape((len(attrib.vertices) // 3, 3)),
+        np.array(attrib.normals).reshape((len(attrib.normals) // 3, 3)),
+        np.array(attrib.texcoords).reshape((len(attrib.texcoords) // 2, 2)),
+        materials,
+        shapes,
+    )
+
+
+def get_shape_vertex_data(parsed_mesh, shape, scale=np.array([1, 1, 1]), transform_orn=None, transform_pos=None):
+    """
+    Build the vertex buffer of a shape: position, normal, texcoord, tangent and bitangent of every triangle corner
+
+    :param parsed_mesh: ParsedMesh the shape belongs to
+    :param shape: MeshShape
+    :param scale: scale, default 1
+    :param transform_orn: rotation quaternion, convention xyzw
+    :param transform_pos: translation for loading, it is a list of length 3
+    :return: (num corners, 14) float32 vertex data and (num triangles, 3) faces
+    """
+    shape_vertex = parsed_mesh.vertex_position[shape.indices[:, 0]]
+
+    if len(parsed_mesh.vertex_normal) == 0:
+        # dummy normal if normal is not available
+        shape_normal = np.zeros((shape_vertex.shape[0], 3))
+    else:
+        shape_normal = parsed_mesh.vertex_normal[shape.indices[:, 1]]
+
+    # Scale the shape before transforming
+    # Need to flip normals in axes where we have negative scaling
+    for i in range(3):
+        shape_vertex[:, i] *= scale[i]
+        if scale[i] < 0:
+            shape_normal[:, i] *= -1
+
+    if len(parsed_mesh.vertex_texcoord) == 0:
+        # dummy texcoord if texcoord is not available
+        shape_texcoord = np.zeros((shape_vertex.shape[0], 2))
+    else:
+        shape_texcoord = parsed_mesh.vertex_texcoord[shape.indices[:, 2]]
+
+    if transform_orn is not None:
+        # Rotate the shape after they are scaled
+        orn = quat2rotmat(xyzw2wxyz(transform_orn))
+        shape_vertex = shape_vertex.dot(orn[:3, :3].T)
+        # Also rotate the surface normal, note that tangent space does not need to be rotated since they
+        # are derived from shape_vertex
+        shape_normal = shape_normal.dot(orn[:3, :3].T)
+    if transform_pos is not None:
+        # Translate the shape after they are scaled
+        shape_vertex += np.array(transform_pos)
+
+    # Compute tangents and bitangents for tangent space normal mapping.
+    v0 = shape_vertex[0::3, :]
+    v1 = shape_vertex[1::3, :]
+    v2 = shape_vertex[2::3, :]
+    uv0 = shape_texcoord[0::3, :]
+    uv1 = shape_texcoord[1::3, :]
+    uv2 = shape_texcoord[2::3, :]
+    delta_pos1 = v1 - v0
+    delta_pos2 = v2 - v0
+    delta_uv1 = uv1 - uv0
+    delta_uv2 = uv2 - uv0
+    d = delta_uv1[:, 0] * delta_uv2[:, 1] - delta_uv1[:, 1] * delta_uv2[:, 0]
+    # filter zero values
+    d[np.abs(d) < 1e-10] = 1e-10
+    tangent = (delta_pos1 * delta_uv2[:, 1][:, None] - delta_pos2 * delta_uv1[:, 1][:, None]) * (1.0 / d)[:, None]
+    bitangent = (delta_pos2 * delta_uv1[:, 0][:, None] - delta_pos1 * delta_uv2[:, 0][:, None]) * (1.0 / d)[:, None]
+    # Set the same tangent and bitangent for all three vertices of the triangle.
+    tangent = tangent.repeat(3, axis=0)
+    bitangent = bitangent.repeat(3, axis=0)
+
+    vertices = np.concatenate([shape_vertex, shape_normal, shape_texcoord, tangent, bitangent], axis=-1)
+    faces = np.array(range(len(vertices))).reshape((len(vertices) // 3, 3))
+    return vertices.astype(np.float32), faces
+
+
+def _catmullrom_filter(x):
+    x = np.abs(x)
+    near = np.float32(1) - x * x * (np.float32(2.5) - np.float32(1.5) * x)
+    far = np.float32(2) - x * (np.float32(4) + x * (np.float32(0.5) * x - np.float32(2.5)))
+    return np.where(x < 1, near, np.where(x < 2, far, 0)).astype(np.float32)
+
+
+def _mitchell_filter(x):
+    x = np.abs(x)
+    near = (np.float32(16) + x * x * (np.float32(21) * x - np.float32(36))) / np.float32(18)
+    far = (np.float32(32) + x * (np.float32(-60) + x * (np.float32(36) - np.float32(7) * x))) / np.float32(18)
+    return np.where(x < 1, near, np.where(x < 2, far, 0)).astype(np.float32)
+
+
+def get_resize_weights(in_size, out_size):
+    """
+    Get the weights of the input pixels of every output pixel along one axis, as computed by stbir_resize_uint8 of
+    stb_image_resize 0.96: Catmull-Rom filter when upsampling, Mitchell filter when downsampling, in float32.
+
+    :param in_size: number of input pixels
+    :param out_size: number of output pixels
+    :return: (out_size,) index of the first input pixel of every output pixel, possibly out of the image, and
+        (out_size, num taps) weights of the consecutive input pixels from the first one
+    """
+    scale = np.float32(out_size) / np.float32(in_size)
+    # Output pixel -> [input pixel, weight] in increasing input pixel order
+    weights = {}
+    if scale > 1:
+        radius = np.float32(2) * scale
+        for n in range(out_size):
+            out_center = np.float32(n) + np.float32(0.5)
+            in_center = out_center / scale
+            first = int(np.floor(np.float64((out_center - radius) / scale) + 0.5))
+            last = int(np.floor(np.float64((out_center + radius) / scale) - 0.5))
+            coefficients = _catmullrom_filter(in_center - (np.arange(first, last + 1, dtype=np.float32) + 0.5))
+            total = np.float32(0)
+            for coefficient in coefficients:
+                total += coefficient
+            coefficients = coefficients * (np.float32(1) / total)
+            weights[n] = [[first + i, coefficient] for i, coefficient in enumerate(coefficients)]
+    else:
+        # Input pixels, including the ones of the clamped margin, are spread on the output pixels
+        radius = np.float32(2) / scale
+        margin = int(np.ceil(np.float32(4) / scale)) // 2
+        weights = {n: [] for n in range(out_size)}
+        for n in range(-margin, in_size + margin):
+            in_center = np.float32(n) + np.float32(0.5)
+            out_center = in_center * scale
+            first = int(np.floor(np.float64((in_center - radius) * scale) + 0.5))
+            last = int(np.floor(np.float64((in_center + radius) * scale) - 0.5))
+            out_centers = np.arange(first, last + 1, dtype=np.float32) + np.float32(0.5)
+            coefficients = _mitchell_filter(out_centers - out_center) * scale
+            for k, coefficient in zip(range(first, last + 1), coefficients):
+                if 0 <= k < out_size:
+                    weights[k].append([n, coefficient])
+        for n in range(out_size):
+            total = np.float32(0)
+            for _, coefficient in weights[n]:
+                total += coefficient
+            inv_total = np.float32(1) / total
+            for weight in weights[n]:
+                weight[1] *= inv_total
+
+    num_taps = max(len(weights[n]) for n in range(out_size))
+    first_pixels = np.array([weights[n][0][0] for n in range(out_size)])
+    taps = np.zeros((out_size, num_taps), dtype=np.float32)
+    for n in range(out_size):
+        taps[n, : len(weights[n])] = [coefficient for _, coefficient in weights[n]]
+    return first_pixels, taps
+
+
+def resize_texture(pixels, width, height):
+    """
+    Resize an 8 bits image with the same result as stbir_resize_uint8, which MeshRendererContext.loadTexture uses to
+    downscale textures. Pixels are clamped at the borders and the weighted sums are accumulated in float32 in the
+    same order as stb_image_resize.
+
+    :param pixels: (h, w, channels) uint8 image
+    :param width: output width
+    :param height: output height
+    :return: (height, width, channels) uint8 image
+    """
+    in_height, in_width = pixels.shape[:2]
+    values = pixels.astype(np.float32) / np.float32(255)
+    first_pixels, taps = get_resize_weights(in_width, width)
+    rows = np.zeros((in_height, width, pixels.shape[2]), dtype=np.float32)
+    for i in range(taps.shape[1]):
+        rows += values[:, np.clip(first_pixels + i, 0, in_width - 1)] * taps[None, :, i, None]
+    first_pixels, taps = get_resize_weights(in_height, height)
+    resized = np.zeros((height, width, pixels.shape[2]), dtype=np.float32)
+    for i in range(taps.shape[1]):
+        resized += rows[np.clip(first_pixels + i, 0, in_height - 1)] * taps[:, i, None, None]
+    resized = np.clip(resized, 0, 1) * np.float32(255)
+    return np.floor(resized.astype(np.float64) + 0.5).astype(np.uint8)
+
+
+class MeshCache(object):
+    """
+    In-process and on-disk cache of parsed obj files, shape vertex buffers and downscaled textures.
+    The in-process entries are evicted in least recently used order once they exceed max_memory bytes.
+    The content hash of an obj file is computed once per path, call clear after modifying a loaded obj file.
+    """
+
+    def __init__(self, cache_dir=None, max_memory=2 * 1024**3):
+        """
+        :param cache_dir: directory of the on-disk cache, default to <igibson.cache_path>/mesh_cache. If it is
+            False, nothing is read from or written to disk
+        :param max_memory: maximum size in bytes of the arrays kept in process
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(igibson.cache_path, "mesh_cache")
+        self.cache_dir = cache_dir
+        self.max_memory = max_memory
+        self.memory = 0
+        # Obj file path -> content hash of the obj file and its mtl files
+        self.obj_hashes = {}
+        # Key -> (value, size in bytes)
+        self.entries = OrderedDict()
+        # (texture file path, modification time, texture scale) -> file to load and texture scale to load it with
+        self.texture_files = {}
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "parsed": 0, "textures_cached": 0}
+
+    def get_obj_hash(self, obj_path):
+        """
+        Get the content hash of an obj file and of the mtl files next to it, from which its materials are read.
+        The hash is memoized per path, so that cache hits do not access the file system.
+
+        :param obj_path: path of obj file
+        :return: hex digest
+        """
+        obj_hash = self.obj_hashes.get(obj_path)
+        if obj_hash is None:
+            obj_dir = os.path.dirname(obj_path)
+            mtl_paths = [os.path.join(obj_dir, name) for name in os.listdir(obj_dir) if ".mtl" in name]
+            hasher = hashlib.sha1(str(MESH_CACHE_VERSION).encode())
+            for file_path in [obj_path] + sorted(mtl_paths):
+                file_hasher = hashlib.sha1()
+                with open(file_path, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        file_hasher.update(block)
+                hasher.update(file_hasher.hexdigest().encode())
+            obj_hash = hasher.hexdigest()
+            self.obj_hashes[obj_path] = obj_hash
+        return obj_hash
+
+    def get_entry(self, key):
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+
+    def set_entry(self, key, value, nbytes):
+        self.entries[key] = (value, nbytes)
+        self.memory += nbytes
+        while self.memory > self.max_memory and len(self.entries) > 1:
+            _, (_, evicted_nbytes) = self.entries.popitem(last=False)
+            self.memory -= evicted_nbytes
+
+    def clear(self):
+        """
+        Clear the in-process cache and the memoized content hashes
+        """
+        self.obj_hashes.clear()
+        self.entries.clear()
+        self.texture_files.clear()
+        self.memory = 0
+
+    def get_mesh_cache_file(self, obj_hash):
+        return os.path.join(self.cache_dir, "meshes", obj_hash + ".npz")
+
+    def save_parsed_mesh(self, parsed_mesh, cache_file):
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        meta = {
+            "version": MESH_CACHE_VERSION,
+            "materials": parsed_mesh.materials,
+            "shape_names": [shape.name for shape in parsed_mesh.shapes],
+        }
+        shape_lengths = [len(shape.indices) for shape in parsed_mesh.shapes]
+        tmp_cache_file = cache_file + ".tmp"
+        with open(tmp_cache_file, "wb") as f:
+            np.savez(
+                f,
+                meta=np.array(json.dumps(meta)),
+                vertex_position=parsed_mesh.vertex_position,
+                vertex_normal=parsed_mesh.vertex_normal,
+                vertex_texcoord=parsed_mesh.vertex_texcoord,
+                shape_indices=np.concatenate([shape.indices for shape in parsed_mesh.shapes] + [np.zeros((0, 3))])
+                .astype(np.int32)
+                .reshape(-1, 3),
+                shape_offsets=np.cumsum([0] + shape_lengths),
+                shape_material_ids=np.array([shape.material_id for shape in parsed_mesh.shapes], dtype=np.int64),
+            )
+        os.replace(tmp_cache_file, cache_file)
+
+    def load_parsed_mesh(self, cache_file):
+        with np.load(cache_file) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta["version"] != MESH_CACHE_VERSION:
+                return None
+            shape_indices = data["shape_indices"]
+            shape_offsets = data["shape_offsets"]
+            shapes = [
+                MeshShape(name, int(material_id), shape_indices[start:end])
+                for name, material_id, start, end in zip(
+                    meta["shape_names"], data["shape_material_ids"], shape_offsets[:-1], shape_offsets[1:]
+                )
+            ]
+            return ParsedMesh(
+                data["vertex_position"], data["vertex_normal"], data["vertex_texcoord"], meta["materials"], shapes
+            )
+
+    def get_parsed_mesh(self, obj_path):
+        """
+        Get the content of an obj file, from the in-process cache, the disk cache or by parsing it
+
+        :param obj_path: path of obj file
+        :return: ParsedMesh
+        """
+        obj_hash = self.get_obj_hash(obj_path)
+        key = ("parsed", obj_hash)
+        parsed_mesh = self.get_entry(key)
+        if parsed_mesh is not None:
+            return parsed_mesh
+
+        # Decrypted content is never written to disk
+        use_disk = self.cache_dir is not False and not obj_path.endswith("encrypted.obj")
+        cache_file = self.get_mesh_cache_file(obj_hash) if use_disk else None
+        if use_disk and os.path.isfile(cache_file):
+            try:
+                parsed_mesh = self.load_parsed_mesh(cache_file)
+            except (OSError, ValueError, KeyError):
+                log.warning("Corrupted mesh cache file {}, parsing {} again".format(cache_file, obj_path))
+            if parsed_mesh is not None:
+                self.stats["disk_hits"] += 1
+
+        if parsed_mesh is None:
+            parsed_mesh = parse_obj_file(obj_path)
+            self.stats["parsed"] += 1
+            if use_disk:
+                self.save_parsed_mesh(parsed_mesh, cache_file)
+
+        self.set_entry(key, parsed_mesh, parsed_mesh.get_nbytes())
+        return parsed_mesh
+
+    def get_mesh_data(self, obj_path, scale=np.array([1, 1, 1]), transform_orn=None, transform_pos=None):
+        """
+        Get the parsed obj file and the vertex buffers of its shapes for the given scale and transform.
+        The arrays are shared between all the callers with the same arguments and are read-only.
+
+        :param obj_path: path of obj file
+        :param scale: scale, default 1
+        :param transform_orn: rotation quaternion, convention xyzw
+        :param transform_pos: translation for loading, it is a list of length 3
+        :return: ParsedMesh, list of vertex data and list of faces of its shapes
+        """
+        key = (
+            "shapes",
+            self.get_obj_hash(obj_path),
+            tuple(np.asarray(scale, dtype=float).flatten()),
+            None if transform_orn is None else tuple(np.asarray(transform_orn, dtype=float).flatten()),
+            None if transform_pos is None else tuple(np.asarray(transform_pos, dtype=float).flatten()),
+        )
+        mesh_data = self.get_entry(key)
+        if mesh_data is not None:
+            self.stats["memory_hits"] += 1
+            return mesh_data
+
+        parsed_mesh = self.get_parsed_mesh(obj_path)
+        vertex_data = []
+        faces = []
+        for shape in parsed_mesh.shapes:
+            shape_vertex_data, shape_faces = get_shape_vertex_data(
+                parsed_mesh, shape, scale=scale, transform_orn=transform_orn, transform_pos=transform_pos
+            )
+            shape_vertex_data.setflags(write=False)
+            shape_faces.setflags(write=False)
+            vertex_data.append(shape_vertex_data)
+            faces.append(shape_faces)
+        mesh_data = (parsed_mesh, vertex_data, faces)
+        self.set_entry(key, mesh_data, sum(item.nbytes for item in vertex_data + faces))
+        return mesh_data
+
+    def get_texture_file(self, tex_filename, texture_scale):
+        """
+        Get a texture file downscaled by texture_scale, with the pixels that MeshRendererContext.loadTexture would
+        downscale it to. The downscaled texture is written to the disk cache the first time, keyed by the path,
+        modification time and texture scale of the texture file. Textures that stb_image and PIL may decode
+        differently, encrypted textures and textures that are not downscaled are loaded from their original file.
+
+        :param tex_filename: texture file filename
+        :param texture_scale: total texture scale
+        :return: file to load and texture scale to load it with
+        """
+        if self.cache_dir is False or texture_scale >= 1.0 or tex_filename.endswith("encrypted.png"):
+            return tex_filename, texture_scale
+
+        # loadTexture receives the texture scale as a float32
+        key = (os.path.abspath(tex_filename), os.stat(tex_filename).st_mtime_ns, float(np.float32(texture_scale)))
+        if key in self.texture_files:
+            return self.texture_files[key]
+
+        key_hash = hashlib.sha1(json.dumps([MESH_CACHE_VERSION] + list(key)).encode()).hexdigest()
+        cache_file = os.path.join(self.cache_dir, "textures", key_hash + ".bmp")
+        texture_file = (cache_file, 1.0)
+        if not os.path.isfile(cache_file):
+            with Image.open(tex_filename) as img:
+                width = int(np.float32(img.width) * np.float32(texture_scale))
+                height = int(np.float32(img.height) * np.float32(texture_scale))
+                cacheable = (
+                    img.format in CACHEABLE_TEXTURE_FORMATS
+                    and img.mode == "RGB"
+                    and "transparency" not in img.info
+                    and width >= 1
+                    and height >= 1
+                )
+                pixels = np.asarray(img) if cacheable else None
+            if pixels is None:
+                texture_file = (tex_filename, texture_scale)
+            else:
+                # stb_image flips the images vertically on load, before they are resized
+                pixels = resize_texture(pixels[::-1], width, height)[::-1]
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                tmp_cache_file = cache_file + ".tmp"
+                Image.fromarray(np.ascontiguousarray(pixels)).save(tmp_cache_file, format="BMP")
+                os.replace(tmp_cache_file, cache_file)
+                self.stats["textures_cached"] += 1
+        self.texture_files[key] = texture_file
+        return texture_file
+
+
+_mesh_cache = None
+
+
+def get_mesh_cache():
+    """
+    Get the mesh cache shared by the renderers of this process
+
+    :return: MeshCache
+    """
+    global _mesh_cache
+    if _mesh_cache is None:
+        _mesh_cache = MeshCache()
+    return _mesh_cache
@@ -2,7 +2,6 @@ import logging
 import os
 import platform
 import shutil
-import sys
 
 import numpy as np
 import py360convert
@@ -10,11 +9,12 @@ from PIL import Image
 
 import igibson
 import igibson.render.mesh_renderer as mesh_renderer
-from igibson.render.mesh_renderer import tinyobjloader
 from igibson.render.mesh_renderer.get_available_devices import get_available_devices
 from igibson.render.mesh_renderer.instances import InstanceGroup
 from igibson.render.mesh_renderer.materials import Material, ProceduralMaterial, RandomizedMaterial
+from igibson.render.mesh_renderer.mesh_cache import get_mesh_cache, get_shape_vertex_data, parse_obj_file
 from igibson.render.mesh_renderer.mesh_renderer_settings import MeshRendererSettings
+from igibson.render.mesh_renderer.optimized_packing import DoubleBufferedPoses, OptimizedRendererPacking
 from igibson.render.mesh_renderer.text import Text, TextManager
 from igibson.render.mesh_renderer.visual_object import VisualObject
 from igibson.robots.robot_base import BaseRobot
@@ -74,6 +74,7 @@ class MeshRenderer(object):
         self.fisheye = rendering_settings.use_fisheye
         self.optimized = rendering_settings.optimized
         self.texture_files = {}
+        self.mesh_cache = get_mesh_cache() if rendering_settings.mesh_cache else None
         self.enable_shadow = rendering_settings.enable_shadow
         self.platform = platform.system()
         self.optimization_process_executed = False
@@ -227,9 +228,15 @@ class MeshRenderer(object):
         # that each shape is mapped to.
         # Number of unique shapes comprising the optimized renderer buffer
         self.or_buffer_shape_num = 0
-        # Store trans and rot data for OR as a single variable that we update every frame - avoids copying variable each frame
-        self.trans_data = None
-        self.rot_data = None
+        # Double buffered trans and rot data for OR, updated in place every frame
+        self.pose_buffers = None
+        # Merged buffers of the optimized renderer, and capacity of their GPU copies
+        self.optimized_packing = None
+        self.optimized_VAO, self.optimized_VBO, self.optimized_EBO = None, None, None
+        self.optimized_vertex_capacity = 0
+        self.optimized_index_capacity = 0
+        # Number of texture files in the array textures of the optimized renderer
+        self.num_optimized_textures = 0
 
         self.skybox_size = rendering_settings.skybox_size
         if not self.platform == "Darwin" and rendering_settings.enable_pbr:
@@ -347,9 +354,11 @@ class MeshRenderer(object):
             # assume optimized renderer will have texture id starting from 0
             texture_id = len(self.texture_files)
         else:
-            texture_id = self.r.loadTexture(
-                tex_filename, texture_scale * self.rendering_settings.texture_scale, igibson.key_path
-            )
+            load_filename = tex_filename
+            load_texture_scale = texture_scale * self.rendering_settings.texture_scale
+            if self.mesh_cache is not None and self.rendering_settings.texture_cache:
+                load_filename, load_texture_scale = self.mesh_cache.get_texture_file(tex_filename, load_texture_scale)
+            texture_id = self.r.loadTexture(load_filename, load_texture_scale, igibson.key_path)
             self.textures.append(texture_id)
 
         self.texture_files[tex_filename] = texture_id
@@ -419,45 +428,35 @@ class MeshRenderer(object):
         :param overwrite_material: whether to overwrite the default Material (usually with a RandomizedMaterial for material randomization)
         :return: VAO_ids
         """
-        if self.optimization_process_executed and self.optimized:
-            log.error("Using optimized renderer and optimization process is already excuted, cannot add new objects")
-            return
-
-        reader = tinyobjloader.ObjReader()
-        log.debug("Loading {}".format(obj_path))
-        if obj_path.endswith("encrypted.obj"):
-            if not os.path.exists(igibson.key_path):
-                raise FileNotFoundError(
-                    "iGibson key file is not found, request here https://forms.gle/oW4xB3tRXyCJa1Ap8"
-                )
-            ret = reader.ParseFromFileWithKey(obj_path, igibson.key_path)
+        if self.mesh_cache is not None:
+            parsed_mesh, shapes_vertex_data, shapes_faces = self.mesh_cache.get_mesh_data(
+                obj_path, scale=scale, transform_orn=transform_orn, transform_pos=transform_pos
+            )
         else:
-            ret = reader.ParseFromFile(obj_path)
+            parsed_mesh = parse_obj_file(obj_path)
+            shapes_vertex_data, shapes_faces = [], []
+            for shape in parsed_mesh.shapes:
+                vertex_data, faces = get_shape_vertex_data(
+                    parsed_mesh, shape, scale=scale, transform_orn=transform_orn, transform_pos=transform_pos
+                )
+                shapes_vertex_data.append(vertex_data)
+                shapes_faces.append(faces)
         vertex_data_indices = []
         face_indices = []
-        if not ret:
-            log.error("Warning: {}".format(reader.Warning()))
-            log.error("Error: {}".format(reader.Error()))
-            log.error("Failed to load: {}".format(obj_path))
-            sys.exit(-1)
 
-        if reader.Warning():
-            log.warning("Warning: {}".format(reader.Warning()))
+        log.debug("Num vertices = {}".format(len(parsed_mesh.vertex_position)))
+        log.debug("Num normals = {}".format(len(parsed_mesh.vertex_normal)))
+        log.debug("Num texcoords = {}".format(len(parsed_mesh.vertex_texcoord)))
 
-        attrib = reader.GetAttrib()
-        log.debug("Num vertices = {}".format(len(attrib.vertices)))
-        log.debug("Num normals = {}".format(len(attrib.normals)))
-        log.debug("Num texcoords = {}".format(len(attrib.texcoords)))
-
-        materials = reader.GetMaterials()
+        materials = parsed_mesh.materials
         log.debug("Num materials: {}".format(len(materials)))
 
         if log.isEnabledFor(logging.DEBUG):  # Only going into this if it is for logging --> efficiency
             for m in materials:
-                log.debug("Material name: {}".format(m.name))
-                log.debug("Material diffuse: {}".format(m.diffuse))
+                log.debug("Material name: {}".format(m["name"]))
+                log.debug("Material diffuse: {}".format(m["diffuse"]))
 
-        shapes = reader.GetShapes()
+        shapes = parsed_mesh.shapes
         log.debug("Num shapes: {}".format(len(shapes)))
 
         if overwrite_material is not None and len(materials) > 1:
@@ -481,16 +480,16 @@ class MeshRenderer(object):
             for i, item in enumerate(materials):
                 if overwrite_material is not None:
                     material = overwrite_material
-                elif item.diffuse_texname != "" and self.rendering_settings.load_textures:
+                elif item["diffuse_texname"] != "" and self.rendering_settings.load_textures:
                     obj_dir = os.path.dirname(obj_path)
-                    texture = self.load_texture_file(os.path.join(obj_dir, item.diffuse_texname), texture_scale)
+                    texture = self.load_texture_file(os.path.join(obj_dir, item["diffuse_texname"]), texture_scale)
                     texture_metallic = self.load_texture_file(
-                        os.path.join(obj_dir, item.metallic_texname), texture_scale
+                        os.path.join(obj_dir, item["metallic_texname"]), texture_scale
                     )
                     texture_roughness = self.load_texture_file(
-                        os.path.join(obj_dir, item.roughness_texname), texture_scale
+                        os.path.join(obj_dir, item["roughness_texname"]), texture_scale
                     )
-                    texture_normal = self.load_texture_file(os.path.join(obj_dir, item.bump_texname), texture_scale)
+                    texture_normal = self.load_texture_file(os.path.join(obj_dir, item["bump_texname"]), texture_scale)
                     material = Material(
                         "texture",
                         texture_id=texture,
@@ -504,7 +503,7 @@ class MeshRenderer(object):
                         # Translucent object is not supported in iG renderer right now, it uses pink color instead.
                         material = Material("color", kd=[1, 0, 1, 1])
                     else:
-                        material = Material("color", kd=item.diffuse)
+                        material = Material("color", kd=item["diffuse"])
                 self.material_idx_to_material_instance_mapping[num_existing_mats + i] = material
 
         # material index = num_existing_mats ... num_existing_mats + num_added_materials - 1 (inclusive) are using
@@ -524,13 +523,9 @@ class MeshRenderer(object):
 
         VAO_ids = []
 
-        vertex_position = np.array(attrib.vertices).reshape((len(attrib.vertices) // 3, 3))
-        vertex_normal = np.array(attrib.normals).reshape((len(attrib.normals) // 3, 3))
-        vertex_texcoord = np.array(attrib.texcoords).reshape((len(attrib.texcoords) // 2, 2))
-
-        for shape in shapes:
+        for shape, vertexData, faces in zip(shapes, shapes_vertex_data, shapes_faces):
             log.debug("Shape name: {}".format(shape.name))
-            if len(shape.mesh.material_ids) == 0 or shape.mesh.material_ids[0] == -1:
+            if shape.material_id == -1:
                 # material not found, or invalid material, as defined here
                 # https://github.com/tinyobjloader/tinyobjloader/blob/master/tiny_obj_loader.h#L2997
                 if overwrite_material is not None:
@@ -540,76 +535,10 @@ class MeshRenderer(object):
                     material_id = NO_MATERIAL_DEFINED_IN_SHAPE_AND_NO_OVERWRITE_SUPPLIED
                     # if no material and no overwrite material is supplied
             else:
-                material_id = shape.mesh.material_ids[0]
-                # assumption: each shape only have one material
+                material_id = shape.material_id
 
             log.debug("material_id = {}".format(material_id))
-            log.debug("num_indices = {}".format(len(shape.mesh.indices)))
-            n_indices = len(shape.mesh.indices)
-            np_indices = shape.mesh.numpy_indices().reshape((n_indices, 3))
-
-            shape_vertex_index = np_indices[:, 0]
-            shape_normal_index = np_indices[:, 1]
-            shape_texcoord_index = np_indices[:, 2]
-            shape_vertex = vertex_position[shape_vertex_index]
-
-            if len(vertex_normal) == 0:
-                # dummy normal if normal is not available
-                shape_normal = np.zeros((shape_vertex.shape[0], 3))
-            else:
-                shape_normal = vertex_normal[shape_normal_index]
-
-            # Scale the shape before transforming
-            # Need to flip normals in axes where we have negative scaling
-            for i in range(3):
-                shape_vertex[:, i] *= scale[i]
-                if scale[i] < 0:
-                    shape_normal[:, i] *= -1
-
-            if len(vertex_texcoord) == 0:
-                # dummy texcoord if texcoord is not available
-                shape_texcoord = np.zeros((shape_vertex.shape[0], 2))
-            else:
-                shape_texcoord = vertex_texcoord[shape_texcoord_index]
-
-            if transform_orn is not None:
-                # Rotate the shape after they are scaled
-                orn = quat2rotmat(xyzw2wxyz(transform_orn))
-                shape_vertex = shape_vertex.dot(orn[:3, :3].T)
-                # Also rotate the surface normal, note that tangent space does not need to be rotated since they
-                # are derived from shape_vertex
-                shape_normal = shape_normal.dot(orn[:3, :3].T)
-            if transform_pos is not None:
-                # Translate the shape after they are scaled
-                shape_vertex += np.array(transform_pos)
-
-            # Compute tangents and bitangents for tangent space normal mapping.
-            v0 = shape_vertex[0::3, :]
-            v1 = shape_vertex[1::3, :]
-            v2 = shape_vertex[2::3, :]
-            uv0 = shape_texcoord[0::3, :]
-            uv1 = shape_texcoord[1::3, :]
-            uv2 = shape_texcoord[2::3, :]
-            delta_pos1 = v1 - v0
-            delta_pos2 = v2 - v0
-            delta_uv1 = uv1 - uv0
-            delta_uv2 = uv2 - uv0
-            d = delta_uv1[:, 0] * delta_uv2[:, 1] - delta_uv1[:, 1] * delta_uv2[:, 0]
-            # filter zero values
-            d[np.abs(d) < 1e-10] = 1e-10
-            tangent = (delta_pos1 * delta_uv2[:, 1][:, None] - delta_pos2 * delta_uv1[:, 1][:, None]) * (1.0 / d)[
-                :, None
-            ]
-            bitangent = (delta_pos2 * delta_uv1[:, 0][:, None] - delta_pos1 * delta_uv2[:, 0][:, None]) * (1.0 / d)[
-                :, None
-            ]
-            # Set the same tangent and bitangent for all three vertices of the triangle.
-            tangent = tangent.repeat(3, axis=0)
-            bitangent = bitangent.repeat(3, axis=0)
-
-            vertices = np.concatenate([shape_vertex, shape_normal, shape_texcoord, tangent, bitangent], axis=-1)
-            faces = np.array(range(len(vertices))).reshape((len(vertices) // 3, 3))
-            vertexData = vertices.astype(np.float32)
+            log.debug("num_indices = {}".format(len(shape.indices)))
             [VAO, VBO] = self.r.load_object_meshrenderer(self.shaderProgram, vertexData)
             self.VAOs.append(VAO)
             self.VBOs.append(VBO)
@@ -672,16 +601,12 @@ class MeshRenderer(object):
         :param shadow_caster: whether to cast shadow
         """
 
-        if self.optimization_process_executed and self.optimized:
-            log.error("Using optimized renderer and optimization process is already excuted, cannot add new " "objects")
-            return
-
         use_pbr = use_pbr and self.rendering_settings.enable_pbr
         use_pbr_mapping = use_pbr_mapping and self.rendering_settings.enable_pbr
 
         instance_group = InstanceGroup(
             [self.visual_objects[object_id] for object_id in object_ids],
-            id=len(self.instances),
+            id=self.instances[-1].id + 1 if len(self.instances) > 0 else 0,
             link_ids=link_ids,
             pybullet_uuid=pybullet_uuid,
             ig_object=ig_object,
@@ -697,6 +622,21 @@ class MeshRenderer(object):
         )
         self.instances.append(instance_group)
         self.update_instance_id_to_pb_id_map()
+        if self.optimized and self.optimization_process_executed:
+            # Uploaded with the next frame
+            self.optimized_packing.add_instance(instance_group)
+
+    def remove_instance_group(self, instance_group):
+        """
+        Remove an instance group from the renderer. Its visual objects stay loaded and can be instanced again.
+        With the optimized renderer, its draws are tombstoned and removed from the merged buffers with the next frame.
+
+        :param instance_group: InstanceGroup to remove
+        """
+        self.instances.remove(instance_group)
+        self.update_instance_id_to_pb_id_map()
+        if self.optimized and self.optimization_process_executed:
+            self.optimized_packing.remove_instance(instance_group)
 
     def add_text(
         self,
@@ -893,6 +833,7 @@ class MeshRenderer(object):
         if self.optimized and not self.optimization_process_executed:
             self.optimize_vertex_and_texture()
         if self.optimized:
+            self.update_optimized_buffers()
             self.update_optimized_texture()
 
         # hide the objects that specified in hidden for optimized renderer
@@ -929,12 +870,8 @@ class MeshRenderer(object):
                 for instance in shadow_hidden_instances:
                     instance.hidden = True
                 self.update_hidden_highlight_state(shadow_hidden_instances)
-                self.r.updateDynamicData(
+                self.r.updateViewData(
                     self.shaderProgram,
-                    self.pose_trans_array,
-                    self.pose_rot_array,
-                    self.last_trans_array,
-                    self.last_rot_array,
                     self.V,
                     self.last_V,
                     self.P,
@@ -975,12 +912,8 @@ class MeshRenderer(object):
 
         if self.optimized:
             if self.enable_shadow:
-                self.r.updateDynamicData(
+                self.r.updateViewData(
                     self.shaderProgram,
-                    self.pose_trans_array,
-                    self.pose_rot_array,
-                    self.last_trans_array,
-                    self.last_rot_array,
                     self.V,
                     self.last_V,
                     self.P,
@@ -990,12 +923,8 @@ class MeshRenderer(object):
                     self.camera,
                 )
             else:
-                self.r.updateDynamicData(
+                self.r.updateViewData(
                     self.shaderProgram,
-                    self.pose_trans_array,
-                    self.pose_rot_array,
-                    self.last_trans_array,
-                    self.last_rot_array,
                     self.V,
                     self.last_V,
                     self.P,
@@ -1313,9 +1242,9 @@ class MeshRenderer(object):
             if isinstance(instance.ig_object, BaseRobot):
                 return instance.ig_object.cameras[idx].camera_name
 
-    def optimize_vertex_and_texture(self):
+    def generate_optimized_textures(self):
         """
-        Optimize vertex and texture for optimized renderer.
+        Generate the array textures of the optimized renderer from all the texture files loaded so far.
         """
         for tex_file in self.texture_files:
             log.debug("Texture: %s", tex_file)
@@ -1333,171 +1262,46 @@ class MeshRenderer(object):
         log.debug(len(self.texture_files), self.texture_files)
         self.textures.append(self.tex_id_1)
         self.textures.append(self.tex_id_2)
+        self.num_optimized_textures = len(self.texture_files)
 
-        offset_faces = []
-
-        curr_index_offset = 0
-        for i in range(len(self.vertex_data)):
-            face_idxs = self.faces[i]
-            offset_face_idxs = face_idxs + curr_index_offset
-            offset_faces.append(offset_face_idxs)
-            curr_index_offset += len(self.vertex_data[i])
-
-        # List of all primitives to render - these are the shapes that each have a vao_id
-        # Some of these may share visual data, but have unique transforms
-        duplicate_vao_ids = []
-        class_id_array = []
-        instance_id_array = []
-        # Stores use_pbr, use_pbr_mapping and shadow caster, with 1.0 for padding of fourth element
-        pbr_data_array = []
-        # Stores whether object is hidden or not - we store as a vec4, since this is the smallest
-        # alignment unit in the std140 layout that our shaders use for their uniform buffers
-        # Note: we can store other variables in the other 3 components in future
-        hidden_array = []
+    def get_shape_material(self, vao_id):
+        return self.material_idx_to_material_instance_mapping[self.shape_material_idx[vao_id]]
 
-        for instance in self.instances:
-            id_sum = 0
-            # Collect OR buffer indices over all visual objects in this group
-            temp_or_buffer_indices = []
-            for vo in instance.objects:
-                ids = vo.VAO_ids
-                or_buffer_idx_start = len(duplicate_vao_ids)
-                duplicate_vao_ids.extend(ids)
-                or_buffer_idx_end = len(duplicate_vao_ids)
-                # Store indices in the duplicate vao ids array, and hence the optimized rendering buffers, that this InstanceGroup will use
-                temp_or_buffer_indices.extend(list(np.arange(or_buffer_idx_start, or_buffer_idx_end)))
-                id_sum += len(ids)
-            instance.or_buffer_indices = list(temp_or_buffer_indices)
-            class_id_array.extend([float(instance.class_id) / MAX_CLASS_COUNT] * id_sum)
-            instance_id_array.extend([float(instance.id) / MAX_INSTANCE_COUNT] * id_sum)
-            pbr_data_array.extend([[float(instance.use_pbr), 1.0, 1.0, 1.0]] * id_sum)
-            hidden_array.extend([[float(instance.hidden), 1.0, 1.0, 1.0]] * id_sum)
-
-        # Number of shapes in the OR buffer is equal to the number of duplicate vao_ids
-        self.or_buffer_shape_num = len(duplicate_vao_ids)
-        # Construct trans and rot data to be the right shape
-        self.trans_data = np.zeros((self.or_buffer_shape_num, 4, 4))
-        self.rot_data = np.zeros((self.or_buffer_shape_num, 4, 4))
-
-        # Variables needed for multi draw elements call
-        index_ptr_offsets = []
-        index_counts = []
-        indices = []
-        diffuse_color_array = []
-        tex_num_array = []
-        tex_layer_array = []
-        roughness_tex_num_array = []
-        roughness_tex_layer_array = []
-        metallic_tex_num_array = []
-        metallic_tex_layer_array = []
-        normal_tex_num_array = []
-        normal_tex_layer_array = []
-        transform_param_array = []
-
-        index_offset = 0
-        for id in duplicate_vao_ids:
-            index_ptr_offsets.append(index_offset)
-            id_idxs = list(offset_faces[id].flatten())
-            indices.extend(id_idxs)
-            index_count = len(id_idxs)
-            index_counts.append(index_count)
-            index_offset += index_count
-
-            # Generate other rendering data, including diffuse color and texture layer
-            id_material = self.material_idx_to_material_instance_mapping[self.shape_material_idx[id]]
-            texture_id = id_material.texture_id
-            if texture_id == -1 or texture_id is None:
-                tex_num_array.append(-1)
-                tex_layer_array.append(-1)
-            else:
-                tex_num, tex_layer = self.tex_id_layer_mapping[texture_id]
-                tex_num_array.append(tex_num)
-                tex_layer_array.append(tex_layer)
-
-            roughness_texture_id = id_material.roughness_texture_id
-            if roughness_texture_id == -1 or roughness_texture_id is None:
-                roughness_tex_num_array.append(-1)
-                roughness_tex_layer_array.append(-1)
-            else:
-                tex_num, tex_layer = self.tex_id_layer_mapping[roughness_texture_id]
-                roughness_tex_num_array.append(tex_num)
-                roughness_tex_layer_array.append(tex_layer)
-
-            metallic_texture_id = id_material.metallic_texture_id
-            if metallic_texture_id == -1 or metallic_texture_id is None:
-                metallic_tex_num_array.append(-1)
-                metallic_tex_layer_array.append(-1)
-            else:
-                tex_num, tex_layer = self.tex_id_layer_mapping[metallic_texture_id]
-                metallic_tex_num_array.append(tex_num)
-                metallic_tex_layer_array.append(tex_layer)
-
-            normal_texture_id = id_material.normal_texture_id
-            if normal_texture_id == -1 or normal_texture_id is None:
-                normal_tex_num_array.append(-1)
-                normal_tex_layer_array.append(-1)
-            else:
-                tex_num, tex_layer = self.tex_id_layer_mapping[normal_texture_id]
-                normal_tex_num_array.append(tex_num)
-                normal_tex_layer_array.append(tex_layer)
-
-            # List of 3 floats
-            transform_param = id_material.transform_param
-            transform_param_array.append([transform_param[0], transform_param[1], transform_param[2], 1.0])
-
-            kd = np.asarray(id_material.kd, dtype=np.float32)
-            # Add padding so can store diffuse color as vec4
-            # The 4th element is set to 1 as that is what is used by the fragment shader
-            kd_vec_4 = [kd[0], kd[1], kd[2], 1.0]
-            diffuse_color_array.append(np.ascontiguousarray(kd_vec_4, dtype=np.float32))
-
-        # Convert data into numpy arrays for easy use in pybind
-        index_ptr_offsets = np.ascontiguousarray(index_ptr_offsets, dtype=np.int32)
-        index_counts = np.ascontiguousarray(index_counts, dtype=np.int32)
-        indices = np.ascontiguousarray(indices, dtype=np.int32)
-
-        # Convert frag shader data to list of vec4 for use in uniform buffer objects
-        frag_shader_data = []
-        pbr_data = []
-        hidden_data = []
-        uv_data = []
-        frag_shader_roughness_metallic_data = []
-        frag_shader_normal_data = []
-
-        for i in range(len(duplicate_vao_ids)):
-            data_list = [float(tex_num_array[i]), float(tex_layer_array[i]), class_id_array[i], instance_id_array[i]]
-            frag_shader_data.append(np.ascontiguousarray(data_list, dtype=np.float32))
-            pbr_data.append(np.ascontiguousarray(pbr_data_array[i], dtype=np.float32))
-            hidden_data.append(np.ascontiguousarray(hidden_array[i], dtype=np.float32))
-            roughness_metallic_data_list = [
-                float(roughness_tex_num_array[i]),
-                float(roughness_tex_layer_array[i]),
-                float(metallic_tex_num_array[i]),
-                float(metallic_tex_layer_array[i]),
-            ]
-            frag_shader_roughness_metallic_data.append(
-                np.ascontiguousarray(roughness_metallic_data_list, dtype=np.float32)
-            )
-            normal_data_list = [float(normal_tex_num_array[i]), float(normal_tex_layer_array[i]), 0.0, 0.0]
-            frag_shader_normal_data.append(np.ascontiguousarray(normal_data_list, dtype=np.float32))
-            uv_data.append(np.ascontiguousarray(transform_param_array[i], dtype=np.float32))
-
-        merged_frag_shader_data = np.ascontiguousarray(np.concatenate(frag_shader_data, axis=0), np.float32)
-        merged_frag_shader_roughness_metallic_data = np.ascontiguousarray(
-            np.concatenate(frag_shader_roughness_metallic_data, axis=0), np.float32
-        )
-        merged_frag_shader_normal_data = np.ascontiguousarray(
-            np.concatenate(frag_shader_normal_data, axis=0), np.float32
+    def optimize_vertex_and_texture(self):
+        """
+        Optimize vertex and texture for optimized renderer.
+        """
+        self.generate_optimized_textures()
+        self.optimized_packing = OptimizedRendererPacking(
+            self.vertex_data, self.faces, self.get_shape_material, self.tex_id_layer_mapping
         )
-        merged_diffuse_color_array = np.ascontiguousarray(np.concatenate(diffuse_color_array, axis=0), np.float32)
-        merged_pbr_data = np.ascontiguousarray(np.concatenate(pbr_data, axis=0), np.float32)
-        self.merged_hidden_data = np.ascontiguousarray(np.concatenate(hidden_data, axis=0), np.float32)
-        self.merged_uv_data = np.ascontiguousarray(np.concatenate(uv_data, axis=0), np.float32)
+        self.optimized_packing.repack(self.instances)
+        self.setup_optimized_buffers()
+        self.optimization_process_executed = True
 
-        merged_vertex_data = np.concatenate(self.vertex_data, axis=0)
+    def setup_optimized_buffers(self):
+        """
+        Upload all the merged buffers of the optimized renderer to new GPU buffers, with the spare capacity of the
+        packing arenas.
+        """
+        packing = self.optimized_packing
+        if self.optimized_VAO is not None:
+            self.r.clean_optimized_buffers([], [self.optimized_VAO], [self.optimized_VBO, self.optimized_EBO])
+
+        merged_vertex_data, indices = packing.get_merged_buffers()
         log.debug("Merged vertex data shape:")
         log.debug(merged_vertex_data.shape)
         log.debug("Enable pbr: {}".format(self.rendering_settings.enable_pbr))
+        index_ptr_offsets, index_counts = packing.get_draw_arrays()
+        (
+            merged_frag_shader_data,
+            merged_frag_shader_roughness_metallic_data,
+            merged_frag_shader_normal_data,
+            merged_diffuse_color_array,
+            merged_pbr_data,
+            merged_hidden_data,
+            merged_uv_data,
+        ) = packing.get_merged_slot_data()
 
         if self.msaa:
             buffer = self.fbo_ms
@@ -1519,8 +1323,8 @@ class MeshRenderer(object):
             merged_frag_shader_normal_data,
             merged_diffuse_color_array,
             merged_pbr_data,
-            self.merged_hidden_data,
-            self.merged_uv_data,
+            merged_hidden_data,
+            merged_uv_data,
             self.tex_id_1,
             self.tex_id_2,
             buffer,
@@ -1528,149 +1332,71 @@ class MeshRenderer(object):
             float(self.rendering_settings.blend_highlight),
             self.depth_tex_shadow,
         )
-        self.optimization_process_executed = True
+        self.optimized_vertex_capacity = packing.vertex_arena.capacity
+        self.optimized_index_capacity = packing.index_arena.capacity
+        packing.clear_pending()
+        self.update_optimized_slot_views(reset_poses=True)
 
-    def update_optimized_texture_internal(self):
+    def update_optimized_slot_views(self, reset_poses=False):
         """
-        Update the texture_id for optimized renderer.
+        Resize the per-draw arrays of the renderer to the number of slots of the packing.
+
+        :param reset_poses: whether to allocate new pose arrays even if the number of slots did not change
         """
-        # Some of these may share visual data, but have unique transforms
-        duplicate_vao_ids = []
-        class_id_array = []
-        instance_id_array = []
-        # Stores use_pbr, use_pbr_mapping and shadow caster, with 1.0 for padding of fourth element
-        pbr_data_array = []
-        # Stores whether object is hidden or not - we store as a vec4, since this is the smallest
-        # alignment unit in the std140 layout that our shaders use for their uniform buffers
-        # Note: we can store other variables in the other 3 components in future
-        hidden_array = []
+        packing = self.optimized_packing
+        # Number of shapes in the OR buffer is equal to the number of slots
+        self.or_buffer_shape_num = packing.num_slots
+        if reset_poses or self.pose_buffers is None or self.pose_buffers.num_slots != self.or_buffer_shape_num:
+            # Construct trans and rot data to be the right shape, uploaded entirely with the next frame
+            # Flow is not available for the frame following a change in the number of draws
+            self.pose_buffers = DoubleBufferedPoses(self.or_buffer_shape_num)
 
-        for instance in self.instances:
-            id_sum = 0
-            # Collect OR buffer indices over all visual objects in this group
-            temp_or_buffer_indices = []
-            for vo in instance.objects:
-                ids = vo.VAO_ids
-                or_buffer_idx_start = len(duplicate_vao_ids)
-                duplicate_vao_ids.extend(ids)
-                or_buffer_idx_end = len(duplicate_vao_ids)
-                # Store indices in the duplicate vao ids array, and hence the optimized rendering buffers, that this InstanceGroup will use
-                temp_or_buffer_indices.extend(list(np.arange(or_buffer_idx_start, or_buffer_idx_end)))
-                id_sum += len(ids)
-            instance.or_buffer_indices = list(temp_or_buffer_indices)
-            class_id_array.extend([float(instance.class_id) / MAX_CLASS_COUNT] * id_sum)
-            instance_id_array.extend([float(instance.id) / MAX_INSTANCE_COUNT] * id_sum)
-            pbr_data_array.extend([[float(instance.use_pbr), 1.0, 1.0, 1.0]] * id_sum)
-            hidden_array.extend([[float(instance.hidden), 1.0, 1.0, 1.0]] * id_sum)
-
-        # Variables needed for multi draw elements call
-        diffuse_color_array = []
-        tex_num_array = []
-        tex_layer_array = []
-        roughness_tex_num_array = []
-        roughness_tex_layer_array = []
-        metallic_tex_num_array = []
-        metallic_tex_layer_array = []
-        normal_tex_num_array = []
-        normal_tex_layer_array = []
-        transform_param_array = []
-
-        for vao_id in duplicate_vao_ids:
-            # Generate other rendering data, including diffuse color and texture layer
-            id_material = self.material_idx_to_material_instance_mapping[self.shape_material_idx[vao_id]]
-            texture_id = id_material.texture_id
-            if texture_id == -1 or texture_id is None:
-                tex_num_array.append(-1)
-                tex_layer_array.append(-1)
-            else:
-                tex_num, tex_layer = self.tex_id_layer_mapping[texture_id]
-                tex_num_array.append(tex_num)
-                tex_layer_array.append(tex_layer)
-
-            roughness_texture_id = id_material.roughness_texture_id
-            if roughness_texture_id == -1 or roughness_texture_id is None:
-                roughness_tex_num_array.append(-1)
-                roughness_tex_layer_array.append(-1)
-            else:
-                tex_num, tex_layer = self.tex_id_layer_mapping[roughness_texture_id]
-                roughness_tex_num_array.append(tex_num)
-                roughness_tex_layer_array.append(tex_layer)
-
-            metallic_texture_id = id_material.metallic_texture_id
-            if metallic_texture_id == -1 or metallic_texture_id is None:
-                metallic_tex_num_array.append(-1)
-                metallic_tex_layer_array.append(-1)
-            else:
-                tex_num, tex_layer = self.tex_id_layer_mapping[metallic_texture_id]
-                metallic_tex_num_array.append(tex_num)
-                metallic_tex_layer_array.append(tex_layer)
-
-            normal_texture_id = id_material.normal_texture_id
-            if normal_texture_id == -1 or normal_texture_id is None:
-                normal_tex_num_array.append(-1)
-                normal_tex_layer_array.append(-1)
-            else:
-                tex_num, tex_layer = self.tex_id_layer_mapping[normal_texture_id]
-                normal_tex_num_array.append(tex_num)
-                normal_tex_layer_array.append(tex_layer)
-
-            # List of 3 floats
-            transform_param = id_material.transform_param
-            transform_param_array.append([transform_param[0], transform_param[1], transform_param[2], 1.0])
-
-            kd = np.asarray(id_material.kd, dtype=np.float32)
-            # Add padding so can store diffuse color as vec4
-            # The 4th element is set to 1 as that is what is used by the fragment shader
-            kd_vec_4 = [kd[0], kd[1], kd[2], 1.0]
-            diffuse_color_array.append(np.ascontiguousarray(kd_vec_4, dtype=np.float32))
-
-        # Convert frag shader data to list of vec4 for use in uniform buffer objects
-        frag_shader_data = []
-        pbr_data = []
-        hidden_data = []
-        uv_data = []
-        frag_shader_roughness_metallic_data = []
-        frag_shader_normal_data = []
-
-        for i in range(len(duplicate_vao_ids)):
-            data_list = [float(tex_num_array[i]), float(tex_layer_array[i]), class_id_array[i], instance_id_array[i]]
-            frag_shader_data.append(np.ascontiguousarray(data_list, dtype=np.float32))
-            pbr_data.append(np.ascontiguousarray(pbr_data_array[i], dtype=np.float32))
-            hidden_data.append(np.ascontiguousarray(hidden_array[i], dtype=np.float32))
-            roughness_metallic_data_list = [
-                float(roughness_tex_num_array[i]),
-                float(roughness_tex_layer_array[i]),
-                float(metallic_tex_num_array[i]),
-                float(metallic_tex_layer_array[i]),
-            ]
-            frag_shader_roughness_metallic_data.append(
-                np.ascontiguousarray(roughness_metallic_data_list, dtype=np.float32)
-            )
-            normal_data_list = [float(normal_tex_num_array[i]), float(normal_tex_layer_array[i]), 0.0, 0.0]
-            frag_shader_normal_data.append(np.ascontiguousarray(normal_data_list, dtype=np.float32))
-            uv_data.append(np.ascontiguousarray(transform_param_array[i], dtype=np.float32))
+    def update_optimized_buffers(self):
+        """
+        Upload the instances added to or removed from the optimized renderer since the last frame. The new shapes are
+        written in the spare capacity of the GPU buffers and only the per-draw arrays are uploaded entirely. The GPU
+        buffers are only set up again when new textures were loaded, when the buffers are full or when they are too
+        fragmented.
+        """
+        packing = self.optimized_packing
+        if not packing.slots_dirty and len(packing.pending_shapes) == 0:
+            return
 
-        merged_frag_shader_data = np.ascontiguousarray(np.concatenate(frag_shader_data, axis=0), np.float32)
-        merged_frag_shader_roughness_metallic_data = np.ascontiguousarray(
-            np.concatenate(frag_shader_roughness_metallic_data, axis=0), np.float32
-        )
-        merged_frag_shader_normal_data = np.ascontiguousarray(
-            np.concatenate(frag_shader_normal_data, axis=0), np.float32
-        )
-        merged_diffuse_color_array = np.ascontiguousarray(np.concatenate(diffuse_color_array, axis=0), np.float32)
-        merged_pbr_data = np.ascontiguousarray(np.concatenate(pbr_data, axis=0), np.float32)
-        self.merged_hidden_data = np.ascontiguousarray(np.concatenate(hidden_data, axis=0), np.float32)
-        self.merged_uv_data = np.ascontiguousarray(np.concatenate(uv_data, axis=0), np.float32)
-        self.r.updateTextureIdArrays(
-            self.shaderProgram,
-            merged_frag_shader_data,
-            merged_frag_shader_roughness_metallic_data,
-            merged_frag_shader_normal_data,
-            merged_diffuse_color_array,
-            merged_pbr_data,
-            self.merged_hidden_data,
-            self.merged_uv_data,
-        )
+        if len(self.texture_files) != self.num_optimized_textures:
+            self.r.clean_optimized_buffers([self.tex_id_1, self.tex_id_2], [], [])
+            self.textures = [texture for texture in self.textures if texture not in (self.tex_id_1, self.tex_id_2)]
+            self.generate_optimized_textures()
+            packing.tex_id_layer_mapping = self.tex_id_layer_mapping
+            packing.refresh()
+            packing.needs_full_upload = True
+
+        if packing.get_fragmentation() > self.rendering_settings.optimized_repack_fragmentation:
+            log.debug("Repacking the optimized renderer buffers, fragmentation {}".format(packing.get_fragmentation()))
+            packing.repack()
+
+        if (
+            packing.needs_full_upload
+            or packing.vertex_arena.capacity > self.optimized_vertex_capacity
+            or packing.index_arena.capacity > self.optimized_index_capacity
+        ):
+            self.setup_optimized_buffers()
+            return
+
+        for vertex_offset, vertex_data, index_offset, indices in packing.get_pending_uploads():
+            self.r.updateOptimizedVertexData(self.optimized_VBO, vertex_offset, vertex_data)
+            self.r.updateOptimizedIndexData(self.optimized_VAO, self.optimized_EBO, index_offset, indices)
+        self.r.updateMultiDrawData(*packing.get_draw_arrays())
+        self.r.updateTextureIdArrays(self.shaderProgram, *packing.get_merged_slot_data())
+        packing.clear_pending()
+        self.update_optimized_slot_views()
+
+    def update_optimized_texture_internal(self):
+        """
+        Update the texture_id for optimized renderer.
+        """
+        self.optimized_packing.refresh()
+        self.r.updateTextureIdArrays(self.shaderProgram, *self.optimized_packing.get_merged_slot_data())
+        self.optimized_packing.slots_dirty = False
 
     def update_hidden_highlight_state(self, instances):
         """
@@ -1681,51 +1407,38 @@ class MeshRenderer(object):
         if not self.optimization_process_executed:
             log.debug("Trying to set hidden state before vertices are merged, converted to no-op")
             return
-        for instance in instances:
-            buf_idxs = instance.or_buffer_indices
-            # if not buf_idxs:
-            #    print(
-            #        'ERROR: trying to set hidden state of an instance that has no visual objects!')
-            # Need to multiply buf_idxs by four so we index into the first element of the vec4 corresponding to each buffer index
-            vec4_buf_idxs = [idx * 4 for idx in buf_idxs]
-            vec4_buf_idxs_highlight = [idx * 4 + 1 for idx in buf_idxs]
-
-            self.merged_hidden_data[vec4_buf_idxs] = float(instance.hidden)
-            # highlight data stored in 4n + 1
-            self.merged_hidden_data[vec4_buf_idxs_highlight] = float(instance.highlight)
-        self.r.updateHiddenData(self.shaderProgram, np.ascontiguousarray(self.merged_hidden_data, dtype=np.float32))
+        instances = [instance for instance in instances if instance.or_buffer_indices]
+        hidden_data = self.optimized_packing.hidden_data
+        if len(instances) > 0:
+            buf_idxs = np.concatenate([instance.or_buffer_indices for instance in instances])
+            num_buf_idxs = [len(instance.or_buffer_indices) for instance in instances]
+            # Hidden state stored in the first element of the vec4 corresponding to each buffer index, highlight in
+            # the second one
+            hidden_data[buf_idxs, 0] = np.repeat([float(instance.hidden) for instance in instances], num_buf_idxs)
+            hidden_data[buf_idxs, 1] = np.repeat([float(instance.highlight) for instance in instances], num_buf_idxs)
+        self.r.updateHiddenData(self.shaderProgram, hidden_data[: self.or_buffer_shape_num].reshape(-1))
 
     def update_dynamic_positions(self, need_flow_info=False):
         """
-        Update all dynamic positions
+        Update all dynamic positions. The poses of the draws are gathered from the pose arrays the instances write in,
+        and only the range of draws whose pose changed since the previous frame is uploaded.
 
         :param need_flow_info: whether flow information is required
         """
-        for instance in self.instances:
-            buf_idxs = instance.or_buffer_indices
-            # Continue if instance has no visual objects
-            if not buf_idxs:
-                continue
-            self.trans_data[buf_idxs] = np.array(instance.poses_trans)
-            self.rot_data[buf_idxs] = np.array(instance.poses_rot)
-
-        if need_flow_info:
-            # this part could be expensive
-            if self.pose_trans_array is not None:
-                self.last_trans_array = np.copy(self.pose_trans_array)
-            else:
-                self.last_trans_array = np.ascontiguousarray(np.concatenate(self.trans_data, axis=0))
-            if self.pose_rot_array is not None:
-                self.last_rot_array = np.copy(self.pose_rot_array)
-            else:
-                self.last_rot_array = np.ascontiguousarray(np.concatenate(self.rot_data, axis=0))
-        else:
-            # dummy pose for zero flow
-            self.last_rot_array = self.pose_rot_array
-            self.last_trans_array = self.pose_trans_array
-
-        self.pose_trans_array = np.ascontiguousarray(self.trans_data)
-        self.pose_rot_array = np.ascontiguousarray(self.rot_data)
+        (
+            self.pose_trans_array,
+            self.pose_rot_array,
+            self.last_trans_array,
+            self.last_rot_array,
+        ) = self.pose_buffers.update(self.optimized_packing, need_flow_info=need_flow_info)
+        self.r.updatePoseData(
+            self.pose_trans_array,
+            self.pose_rot_array,
+            self.last_trans_array,
+            self.last_rot_array,
+            *self.pose_buffers.dirty_range,
+            *self.pose_buffers.last_dirty_range,
+        )
 
     def use_pbr(self, use_pbr, use_pbr_mapping):
         """
@@ -30,6 +30,9 @@ class MeshRendererSettings(object):
         is_robosuite=False,
         glsl_version_override=450,
         load_textures=True,
+        mesh_cache=False,
+        texture_cache=False,
+        optimized_repack_fragmentation=0.5,
     ):
         """
         :param use_fisheye: whether to use fisheye camera
@@ -52,6 +55,12 @@ class MeshRendererSettings(object):
         :param is_robosuite: whether the environment is of robosuite.
         :param glsl_version_override: for backwards compatibility only. Options are 450 or 460.
         :param load_textures: Whether textures should be loaded. Set to False if not using RGB modality to save memory.
+        :param mesh_cache: Whether to cache parsed meshes and vertex buffers, in memory and in the cache folder.
+        :param texture_cache: Whether the mesh cache also stores the textures downscaled by texture_scale in the cache
+            folder. The cached textures are loaded with a texture scale of 1, which still filters them once, so the
+            texels differ slightly from the ones of the original textures.
+        :param optimized_repack_fragmentation: fraction of free space in the merged buffers of the optimized renderer
+            above which they are packed again after objects are removed.
         """
         self.use_fisheye = use_fisheye
         self.msaa = msaa
@@ -79,6 +88,9 @@ class MeshRendererSettings(object):
         self.blend_highlight = blend_highlight
         self.is_robosuite = is_robosuite
         self.load_textures = load_textures
+        self.mesh_cache = mesh_cache
+        self.texture_cache = texture_cache
+        self.optimized_repack_fragmentation = optimized_repack_fragmentation
         self.glsl_version_override = glsl_version_override
 
         if glfw_gl_version is not None:
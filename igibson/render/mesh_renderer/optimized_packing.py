@@ -0,0 +1,560 @@
+"""
+CPU-side packing of the optimized renderer.
+
+The optimized renderer draws all the shapes of all the instances with a single multi-draw call over one merged vertex
+buffer and one merged index buffer. Every draw (a shape of an instance) owns a slot in the per-draw arrays: index
+offset and count, texture layers, class and instance ids, pbr, hidden and uv data.
+
+The merged buffers are managed as growable arenas: the vertices and indices of a shape are placed once, whatever its
+number of instances, in the first free range that fits or at the end of the arena. Removing the last instance of a
+shape frees its ranges, and removing an instance tombstones its slots (drawn with zero indices) until they are reused.
+New instances can thus be added and removed after the first packing, by uploading only what changed. A full re-pack
+is only needed when the arenas become too fragmented.
+
+The poses of the visual objects of all the instances are stored in one contiguous float32 array, allocated the same
+way: the poses of an instance are views into it, so they are updated in place, and the per-draw pose arrays are
+gathered from it with a single indexing operation.
+
+Nothing here needs a GL context: MeshRenderer uploads the arrays built by this module.
+"""
+import bisect
+import heapq
+
+import numpy as np
+
+from igibson.utils.constants import MAX_CLASS_COUNT, MAX_INSTANCE_COUNT
+
+# Number of floats per vertex in the vertex buffers: position, normal, texcoord, tangent and bitangent
+VERTEX_SIZE = 14
+
+
+class ArenaAllocator(object):
+    """
+    First-fit allocator of ranges in a growable linear buffer, with a sorted free list of the ranges freed below the
+    end of the used part
+    """
+
+    def __init__(self, capacity=0, growth_factor=1.5):
+        """
+        :param capacity: initial capacity of the buffer
+        :param growth_factor: factor by which the capacity grows when an allocation does not fit
+        """
+        self.capacity = capacity
+        self.growth_factor = growth_factor
+        # End of the used part of the buffer
+        self.end = 0
+        # Total size of the allocated ranges
+        self.used = 0
+        # Sorted list of (offset, size) of the free ranges below self.end
+        self.free_ranges = []
+
+    def allocate(self, size):
+        """
+        Allocate a range, growing the capacity if needed
+
+        :param size: size of the range
+        :return: offset of the range
+        """
+        if size == 0:
+            return 0
+        for i, (offset, free_size) in enumerate(self.free_ranges):
+            if free_size >= size:
+                if free_size == size:
+                    del self.free_ranges[i]
+                else:
+                    self.free_ranges[i] = (offset + size, free_size - size)
+                self.used += size
+                return offset
+
+        offset = self.end
+        # A free range at the end of the used part is extended instead of left behind
+        if len(self.free_ranges) > 0 and sum(self.free_ranges[-1]) == self.end:
+            offset = self.free_ranges.pop()[0]
+        self.end = offset + size
+        if self.end > self.capacity:
+            self.capacity = max(self.end, int(self.capacity * self.growth_factor))
+        self.used += size
+        return offset
+
+    def free(self, offset, size):
+        """
+        Free a range, merging it with the adjacent free ranges
+
+        :param offset: offset of the range
+        :param size: size of the range
+        """
+        if size == 0:
+            return
+        self.used -= size
+        i = bisect.bisect(self.free_ranges, (offset, size))
+        # Merge with the previous and next free ranges
+        if i > 0 and sum(self.free_ranges[i - 1]) == offset:
+            i -= 1
+            offset, size = self.free_ranges[i][0], self.free_ranges[i][1] + size
+            del self.free_ranges[i]
+        if i < len(self.free_ranges) and offset + size == self.free_ranges[i][0]:
+            size += self.free_ranges[i][1]
+            del self.free_ranges[i]
+        if offset + size == self.end:
+            self.end = offset
+        else:
+            self.free_ranges.insert(i, (offset, size))
+
+    def get_fragmentation(self):
+        """
+        :return: fraction of the used part of the buffer that is free
+        """
+        if self.end == 0:
+            return 0.0
+        return 1.0 - float(self.used) / self.end
+
+
+class PackedShape(object):
+    """
+    Placement of a shape in the merged buffers
+    """
+
+    def __init__(self, vertex_offset, num_vertices, index_offset, num_indices):
+        self.vertex_offset = vertex_offset
+        self.num_vertices = num_vertices
+        self.index_offset = index_offset
+        self.num_indices = num_indices
+        # Number of slots drawing the shape
+        self.ref_count = 0
+
+
+class OptimizedRendererPacking(object):
+    """
+    Merged vertex and index buffers and per-draw slot arrays of the optimized renderer
+    """
+
+    def __init__(self, vertex_data, faces, get_shape_material, tex_id_layer_mapping, growth_factor=1.5):
+        """
+        :param vertex_data: list of the (num vertices, VERTEX_SIZE) vertex data of every shape (VAO id)
+        :param faces: list of the (num triangles, 3) faces of every shape
+        :param get_shape_material: function returning the Material of a shape from its VAO id
+        :param tex_id_layer_mapping: texture id -> (texture array number, layer) in the array textures
+        :param growth_factor: factor by which the buffers and slot arrays grow when they are full
+        """
+        self.vertex_data = vertex_data
+        self.faces = faces
+        self.get_shape_material = get_shape_material
+        self.tex_id_layer_mapping = tex_id_layer_mapping
+        self.growth_factor = growth_factor
+        self.reset()
+
+    def reset(self, vertex_capacity=0, index_capacity=0, slot_capacity=0, pose_capacity=0):
+        self.vertex_arena = ArenaAllocator(vertex_capacity, self.growth_factor)
+        self.index_arena = ArenaAllocator(index_capacity, self.growth_factor)
+        self.pose_arena = ArenaAllocator(pose_capacity, self.growth_factor)
+        self.allocate_pose_arrays(pose_capacity)
+        # VAO id -> PackedShape
+        self.shapes = {}
+        self.instances = []
+        # Heap of the tombstoned slots below num_slots
+        self.free_slots = []
+        self.num_slots = 0
+        self.allocate_slot_arrays(slot_capacity)
+        # VAO ids of the shapes placed since the last upload
+        self.pending_shapes = []
+        # Whether the slot arrays changed since the last upload
+        self.slots_dirty = False
+        # Whether the offsets of already uploaded shapes changed, so the buffers must be uploaded entirely
+        self.needs_full_upload = True
+
+    def allocate_slot_arrays(self, slot_capacity):
+        self.slot_capacity = slot_capacity
+        self.slot_vao_ids = np.full(slot_capacity, -1, dtype=np.int64)
+        # Row of the pose of every slot in the pose arrays
+        self.slot_pose_rows = np.zeros(slot_capacity, dtype=np.int64)
+        self.index_ptr_offsets = np.zeros(slot_capacity, dtype=np.int32)
+        self.index_counts = np.zeros(slot_capacity, dtype=np.int32)
+        self.frag_data = np.zeros((slot_capacity, 4), dtype=np.float32)
+        self.frag_roughness_metallic_data = np.zeros((slot_capacity, 4), dtype=np.float32)
+        self.frag_normal_data = np.zeros((slot_capacity, 4), dtype=np.float32)
+        self.diffuse_color_data = np.zeros((slot_capacity, 4), dtype=np.float32)
+        self.pbr_data = np.zeros((slot_capacity, 4), dtype=np.float32)
+        self.hidden_data = np.zeros((slot_capacity, 4), dtype=np.float32)
+        self.uv_data = np.zeros((slot_capacity, 4), dtype=np.float32)
+
+    def allocate_pose_arrays(self, pose_capacity):
+        self.pose_trans = np.zeros((pose_capacity, 4, 4), dtype=np.float32)
+        self.pose_rot = np.zeros((pose_capacity, 4, 4), dtype=np.float32)
+
+    def get_slot_arrays(self):
+        return [
+            self.slot_vao_ids,
+            self.slot_pose_rows,
+            self.index_ptr_offsets,
+            self.index_counts,
+            self.frag_data,
+            self.frag_roughness_metallic_data,
+            self.frag_normal_data,
+            self.diffuse_color_data,
+            self.pbr_data,
+            self.hidden_data,
+            self.uv_data,
+        ]
+
+    def grow_slot_arrays(self, min_capacity):
+        old_arrays = self.get_slot_arrays()
+        old_capacity = self.slot_capacity
+        self.allocate_slot_arrays(max(min_capacity, int(old_capacity * self.growth_factor)))
+        for old_array, new_array in zip(old_arrays, self.get_slot_arrays()):
+            new_array[:old_capacity] = old_array
+
+    def allocate_slot(self):
+        if len(self.free_slots) > 0:
+            return heapq.heappop(self.free_slots)
+        slot = self.num_slots
+        self.num_slots += 1
+        if self.num_slots > self.slot_capacity:
+            self.grow_slot_arrays(self.num_slots)
+        return slot
+
+    def allocate_pose_rows(self, num_rows):
+        """
+        Allocate pose rows, growing the pose arrays if needed. The poses of the packed instances are moved to the
+        new arrays.
+
+        :param num_rows: number of rows
+        :return: first row
+        """
+        start = self.pose_arena.allocate(num_rows)
+        if self.pose_arena.capacity > len(self.pose_trans):
+            old_pose_trans, old_pose_rot = self.pose_trans, self.pose_rot
+            self.allocate_pose_arrays(self.pose_arena.capacity)
+            self.pose_trans[: len(old_pose_trans)] = old_pose_trans
+            self.pose_rot[: len(old_pose_rot)] = old_pose_rot
+            for instance in self.instances:
+                self.bind_instance_poses(instance)
+        return start
+
+    def bind_instance_poses(self, instance):
+        start, end = instance.or_pose_offset, instance.or_pose_offset + len(instance.objects)
+        instance.bind_pose_buffers(self.pose_trans[start:end], self.pose_rot[start:end])
+
+    def place_shape(self, vao_id):
+        shape = self.shapes.get(vao_id)
+        if shape is None:
+            num_vertices = len(self.vertex_data[vao_id])
+            num_indices = self.faces[vao_id].size
+            shape = PackedShape(
+                self.vertex_arena.allocate(num_vertices),
+                num_vertices,
+                self.index_arena.allocate(num_indices),
+                num_indices,
+            )
+            self.shapes[vao_id] = shape
+            self.pending_shapes.append(vao_id)
+        shape.ref_count += 1
+        return shape
+
+    def release_shape(self, vao_id):
+        shape = self.shapes[vao_id]
+        shape.ref_count -= 1
+        if shape.ref_count == 0:
+            self.vertex_arena.free(shape.vertex_offset, shape.num_vertices)
+            self.index_arena.free(shape.index_offset, shape.num_indices)
+            del self.shapes[vao_id]
+            if vao_id in self.pending_shapes:
+                self.pending_shapes.remove(vao_id)
+
+    def get_texture_num_layer(self, texture_id):
+        # Textures loaded since the array textures were generated are mapped once the renderer generates them again
+        # and refreshes the slots, with the next frame
+        if texture_id == -1 or texture_id is None or texture_id >= len(self.tex_id_layer_mapping):
+            return -1, -1
+        return self.tex_id_layer_mapping[texture_id]
+
+    def update_slot_material(self, slot):
+        """
+        Fill the texture and color data of a slot from the material of its shape
+
+        :param slot: slot index
+        """
+        material = self.get_shape_material(self.slot_vao_ids[slot])
+        tex_num, tex_layer = self.get_texture_num_layer(material.texture_id)
+        roughness_tex_num, roughness_tex_layer = self.get_texture_num_layer(material.roughness_texture_id)
+        metallic_tex_num, metallic_tex_layer = self.get_texture_num_layer(material.metallic_texture_id)
+        normal_tex_num, normal_tex_layer = self.get_texture_num_layer(material.normal_texture_id)
+        self.frag_data[slot, :2] = [tex_num, tex_layer]
+        self.frag_roughness_metallic_data[slot] = [
+            roughness_tex_num,
+            roughness_tex_layer,
+            metallic_tex_num,
+            metallic_tex_layer,
+        ]
+        self.frag_normal_data[slot] = [normal_tex_num, normal_tex_layer, 0.0, 0.0]
+        kd = np.asarray(material.kd, dtype=np.float32)
+        self.diffuse_color_data[slot] = [kd[0], kd[1], kd[2], 1.0]
+        transform_param = material.transform_param
+        self.uv_data[slot] = [transform_param[0], transform_param[1], transform_param[2], 1.0]
+
+    def update_instance_slots(self, instance):
+        """
+        Fill the class, instance, pbr and hidden data of the slots of an instance
+
+        :param instance: InstanceGroup
+        """
+        slots = instance.or_buffer_indices
+        self.frag_data[slots, 2] = float(instance.class_id) / MAX_CLASS_COUNT
+        self.frag_data[slots, 3] = float(instance.id) / MAX_INSTANCE_COUNT
+        self.pbr_data[slots] = [float(instance.use_pbr), 1.0, 1.0, 1.0]
+        self.hidden_data[slots] = [float(instance.hidden), 1.0, 1.0, 1.0]
+
+    def add_instance(self, instance):
+        """
+        Assign a slot to every shape of an instance, placing the shapes that are not in the buffers yet.
+        The slots are stored in instance.or_buffer_indices.
+
+        :param instance: InstanceGroup
+        """
+        instance.or_pose_offset = self.allocate_pose_rows(len(instance.objects))
+        self.bind_instance_poses(instance)
+        slots = []
+        for i, visual_object in enumerate(instance.objects):
+            for vao_id in visual_object.VAO_ids:
+                slot = self.allocate_slot()
+                shape = self.place_shape(vao_id)
+                self.slot_vao_ids[slot] = vao_id
+                self.slot_pose_rows[slot] = instance.or_pose_offset + i
+                self.index_ptr_offsets[slot] = shape.index_offset
+                self.index_counts[slot] = shape.num_indices
+                self.update_slot_material(slot)
+                slots.append(slot)
+        instance.or_buffer_indices = slots
+        self.update_instance_slots(instance)
+        self.instances.append(instance)
+        self.slots_dirty = True
+
+    def remove_instance(self, instance):
+        """
+        Tombstone the slots of an instance and release its shapes and pose rows. The instance keeps a copy of its
+        poses.
+
+        :param instance: InstanceGroup
+        """
+        instance.bind_pose_buffers(np.copy(instance.poses_trans), np.copy(instance.poses_rot))
+        self.pose_arena.free(instance.or_pose_offset, len(instance.objects))
+        instance.or_pose_offset = None
+        for slot in instance.or_buffer_indices:
+            self.release_shape(self.slot_vao_ids[slot])
+            for array in self.get_slot_arrays():
+                array[slot] = 0
+            self.slot_vao_ids[slot] = -1
+            # Tombstones draw a hidden triangle rather than no indices, as Mesa skips the whole multi-draw call when
+            # its first draw is empty
+            self.index_counts[slot] = 3
+            self.hidden_data[slot] = 1.0
+            heapq.heappush(self.free_slots, slot)
+        # Tombstones at the end of the slot arrays are dropped
+        while len(self.free_slots) > 0 and max(self.free_slots) == self.num_slots - 1:
+            self.free_slots.remove(self.num_slots - 1)
+            heapq.heapify(self.free_slots)
+            self.num_slots -= 1
+        self.instances.remove(instance)
+        instance.or_buffer_indices = None
+        self.slots_dirty = True
+
+    def refresh(self):
+        """
+        Fill the slot data again from the current materials and instance attributes
+        """
+        for instance in self.instances:
+            for slot in instance.or_buffer_indices:
+                self.update_slot_material(slot)
+            self.update_instance_slots(instance)
+        self.slots_dirty = True
+
+    def get_fragmentation(self):
+        """
+        :return: largest fraction of free space in the used part of the vertex buffer, index buffer and slot arrays
+        """
+        slot_fragmentation = len(self.free_slots) / float(self.num_slots) if self.num_slots > 0 else 0.0
+        return max(self.vertex_arena.get_fragmentation(), self.index_arena.get_fragmentation(), slot_fragmentation)
+
+    def repack(self, instances=None):
+        """
+        Pack the shapes and slots of the instances contiguously, in order, with spare capacity for later additions
+
+        :param instances: instances to pack, default to the instances already packed
+        """
+        if instances is None:
+            instances = list(self.instances)
+        num_vertices = 0
+        num_indices = 0
+        num_slots = 0
+        num_pose_rows = 0
+        vao_ids = set()
+        for instance in instances:
+            num_pose_rows += len(instance.objects)
+            for visual_object in instance.objects:
+                for vao_id in visual_object.VAO_ids:
+                    num_slots += 1
+                    if vao_id not in vao_ids:
+                        vao_ids.add(vao_id)
+                        num_vertices += len(self.vertex_data[vao_id])
+                        num_indices += self.faces[vao_id].size
+        self.reset(
+            int(num_vertices * self.growth_factor),
+            int(num_indices * self.growth_factor),
+            int(num_slots * self.growth_factor),
+            int(num_pose_rows * self.growth_factor),
+        )
+        for instance in instances:
+            self.add_instance(instance)
+
+    def get_shape_indices(self, vao_id):
+        shape = self.shapes[vao_id]
+        return (self.faces[vao_id].flatten() + shape.vertex_offset).astype(np.int32)
+
+    def get_merged_buffers(self):
+        """
+        Build the merged buffers, padded to the capacity of the arenas
+
+        :return: flat float32 vertex buffer and flat int32 index buffer
+        """
+        merged_vertex_data = np.zeros((max(self.vertex_arena.capacity, 1), VERTEX_SIZE), dtype=np.float32)
+        indices = np.zeros(max(self.index_arena.capacity, 1), dtype=np.int32)
+        for vao_id, shape in self.shapes.items():
+            merged_vertex_data[shape.vertex_offset : shape.vertex_offset + shape.num_vertices] = self.vertex_data[
+                vao_id
+            ]
+            indices[shape.index_offset : shape.index_offset + shape.num_indices] = self.get_shape_indices(vao_id)
+        return merged_vertex_data.reshape(-1), indices
+
+    def get_pending_uploads(self):
+        """
+        Get the data of the shapes placed since the last upload
+
+        :return: list of (vertex offset in floats, vertex data, index offset, indices) of every pending shape
+        """
+        uploads = []
+        for vao_id in self.pending_shapes:
+            shape = self.shapes[vao_id]
+            uploads.append(
+                (
+                    shape.vertex_offset * VERTEX_SIZE,
+                    np.ascontiguousarray(self.vertex_data[vao_id], dtype=np.float32).reshape(-1),
+                    shape.index_offset,
+                    self.get_shape_indices(vao_id),
+                )
+            )
+        return uploads
+
+    def clear_pending(self):
+        """
+        Mark all the data as uploaded
+        """
+        self.pending_shapes = []
+        self.slots_dirty = False
+        self.needs_full_upload = False
+
+    def gather_poses(self, trans_data, rot_data):
+        """
+        Gather the poses of the draws
+
+        :param trans_data: (at least num slots, 4, 4) float32 array, filled with the translation of every draw
+        :param rot_data: (at least num slots, 4, 4) float32 array, filled with the rotation of every draw
+        """
+        pose_rows = self.slot_pose_rows[: self.num_slots]
+        np.take(self.pose_trans, pose_rows, axis=0, out=trans_data[: self.num_slots])
+        np.take(self.pose_rot, pose_rows, axis=0, out=rot_data[: self.num_slots])
+
+    def get_draw_arrays(self):
+        """
+        :return: index offsets and index counts of the draws, for the multi-draw call
+        """
+        return (
+            np.ascontiguousarray(self.index_ptr_offsets[: self.num_slots]),
+            np.ascontiguousarray(self.index_counts[: self.num_slots]),
+        )
+
+    def get_merged_slot_data(self):
+        """
+        :return: flat frag, roughness/metallic, normal, diffuse color, pbr, hidden and uv data of the used slots
+        """
+        return [
+            np.ascontiguousarray(array[: self.num_slots]).reshape(-1)
+            for array in [
+                self.frag_data,
+                self.frag_roughness_metallic_data,
+                self.frag_normal_data,
+                self.diffuse_color_data,
+                self.pbr_data,
+                self.hidden_data,
+                self.uv_data,
+            ]
+        ]
+
+
+class DoubleBufferedPoses(object):
+    """
+    Per-draw pose arrays of the optimized renderer. Two sets of arrays are swapped every frame, so the poses of the
+    previous frame are available for the flow without any copy, and the range of draws whose pose changed since the
+    previous frame is tracked to upload only that range.
+    """
+
+    def __init__(self, num_slots):
+        """
+        :param num_slots: number of draws
+        """
+        self.num_slots = num_slots
+        self.trans_data = [np.zeros((num_slots, 4, 4), dtype=np.float32) for _ in range(2)]
+        self.rot_data = [np.zeros((num_slots, 4, 4), dtype=np.float32) for _ in range(2)]
+        # Index of the arrays of the current frame
+        self.front = 0
+        # Range of draws whose pose changed in the current and previous frames
+        self.dirty_range = (0, num_slots)
+        self.last_dirty_range = (0, num_slots)
+        # Whether the arrays do not hold a previous frame yet
+        self.empty = True
+
+    def update(self, packing, need_flow_info=False):
+        """
+        Gather the poses of the current frame into the back arrays and swap them with the front arrays
+
+        :param packing: OptimizedRendererPacking
+        :param need_flow_info: whether the poses of the previous frame are needed, otherwise the last poses are the
+            current poses (zero flow)
+        :return: current translations, current rotations, last translations and last rotations
+        """
+        last = self.front
+        self.front = 1 - self.front
+        trans_data, rot_data = self.trans_data[self.front], self.rot_data[self.front]
+        last_trans_data, last_rot_data = self.trans_data[last], self.rot_data[last]
+        packing.gather_poses(trans_data, rot_data)
+
+        previous_dirty_range = self.dirty_range
+        if self.empty:
+            # Zero flow for the first frame
+            last_trans_data[:] = trans_data
+            last_rot_data[:] = rot_data
+            self.dirty_range = (0, self.num_slots)
+            self.empty = False
+        else:
+            changed = np.flatnonzero(
+                np.any(trans_data != last_trans_data, axis=(1, 2)) | np.any(rot_data != last_rot_data, axis=(1, 2))
+            )
+            self.dirty_range = (int(changed[0]), int(changed[-1]) + 1) if len(changed) > 0 else (0, 0)
+        # The last poses uploaded are either the poses of the previous frame or of the frame before, depending on
+        # whether the flow was needed. Uploading the union of both ranges is correct in all the cases.
+        self.last_dirty_range = get_range_union(previous_dirty_range, self.dirty_range)
+
+        if need_flow_info:
+            return trans_data, rot_data, last_trans_data, last_rot_data
+        return trans_data, rot_data, trans_data, rot_data
+
+
+def get_range_union(range_a, range_b):
+    """
+    :param range_a: (start, end) range, empty if start >= end
+    :param range_b: (start, end) range, empty if start >= end
+    :return: smallest range containing both ranges
+    """
+    if range_a[0] >= range_a[1]:
+        return range_b
+    if range_b[0] >= range_b[1]:
+        return range_a
+    return min(range_a[0], range_b[0]), max(range_a[1], range_b[1])
@@ -1,5 +1,27 @@
+"""
+Profilers for logging, debugging and triaging the performance of the simulation.
+
+Profiler times a block and logs its duration and fps. StepProfiler records the durations of nested named scopes, such
+as the physics, the object state updates, the renderer sync, the rendering and the task of every step, in ring buffers
+that can be aggregated into percentiles and exported to a Chrome trace (chrome://tracing or https://ui.perfetto.dev) or
+a flat CSV. Simulator.step, iGibsonEnv.step and BehaviorTask.step are instrumented with the global step_profiler,
+which is disabled by default and costs a function call per scope when disabled. It can be enabled with
+step_profiler.enable(), or with the IG_PROFILE environment variable: IG_PROFILE=1 enables it, and
+IG_PROFILE=<prefix> additionally exports <prefix>.json and <prefix>.csv when the process exits.
+"""
+import atexit
+import csv
+import functools
+import json
 import logging
+import os
+import threading
 import time
+from collections import deque
+
+import numpy as np
+
+log = logging.getLogger(__name__)
 
 
 class Profiler(object):
@@ -16,36 +38,243 @@ class Profiler(object):
     def step(self, name):
         """Returns the duration since last step/start"""
         duration = self.summarize_step(start=self.step_start, step_name=name, level=self.level)
-        now = time.time()
+        now = time.perf_counter()
         self.step_start = now
         return duration
 
     def __enter__(self):
-        self.start = time.time()
-        self.step_start = time.time()
+        self.start = time.perf_counter()
+        self.step_start = self.start
         return self
 
     def __exit__(self, exception_type, exception_value, traceback):
         if self.enable:
             self.summarize_step(self.start)
 
-    def summarize_step(self, start, level=None):
+    def summarize_step(self, start, step_name=None, level=None):
         """
         Summarize the step duration and fps
         """
-        duration = time.time() - start
+        duration = time.perf_counter() - start
+        name = self.name if step_name is None else "{}/{}".format(self.name, step_name)
+        message = "{name}: {fps:.2f} fps, {duration:.5f} seconds".format(
+            name=name, fps=1 / duration if duration > 0 else float("inf"), duration=duration
+        )
         if self.logger:
-            level = level or self.level
-            self.logger.log(
-                self.level,
-                "{name}: {fps:.2f} fps, {duration:.5f} seconds".format(
-                    name=self.name, fps=1 / duration, duration=duration
-                ),
-            )
+            self.logger.log(level or self.level, message)
         else:
-            print(
-                "{name}: {fps:.2f} fps, {duration:.5f} seconds".format(
-                    name=self.name, fps=1 / duration, duration=duration
+            print(message)
+        return duration
+
+
+class _NullScope(object):
+    """
+    Scope of a disabled StepProfiler, which does nothing
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class _Scope(object):
+    """
+    Scope of an enabled StepProfiler, which records its duration on exit
+    """
+
+    __slots__ = ("profiler", "name", "path", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        stack = self.profiler._get_stack()
+        self.path = stack[-1] + "/" + self.name if stack else self.name
+        stack.append(self.path)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        end = time.perf_counter_ns()
+        self.profiler._get_stack().pop()
+        self.profiler._record(self.name, self.path, self.start, end - self.start)
+        return False
+
+
+class StepProfiler(object):
+    """
+    Hierarchical profiler of nested named scopes, keeping the last durations of every scope in ring buffers
+    """
+
+    def __init__(self, capacity=1000, max_events=100000, enabled=False):
+        """
+        :param capacity: number of durations kept for every scope, from which the percentiles are computed
+        :param max_events: number of scope events kept for the Chrome trace
+        :param enabled: whether the profiler is enabled
+        """
+        self.capacity = capacity
+        self.max_events = max_events
+        self.enabled = enabled
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the recorded durations and events
+        """
+        with self.lock:
+            # Path of the scope -> [ring buffer of durations in ns, number of durations recorded, total duration in ns]
+            self.durations = {}
+            # (name, path, thread id, start in ns, duration in ns)
+            self.events = deque(maxlen=self.max_events)
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def scope(self, name):
+        """
+        Context manager timing a named scope, nested in the open scopes of the same thread
+
+        :param name: name of the scope
+        :return: context manager
+        """
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _Scope(self, name)
+
+    def profile(self, name):
+        """
+        Decorator timing every call of a function as a named scope
+
+        :param name: name of the scope
+        :return: decorator
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapped_func(*args, **kwargs):
+                with self.scope(name):
+                    return func(*args, **kwargs)
+
+            return wrapped_func
+
+        return decorator
+
+    def _get_stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def _record(self, name, path, start, duration):
+        with self.lock:
+            record = self.durations.get(path)
+            if record is None:
+                record = self.durations[path] = [np.zeros(self.capacity, dtype=np.int64), 0, 0]
+            record[0][record[1] % self.capacity] = duration
+            record[1] += 1
+            record[2] += duration
+            self.events.append((name, path, threading.get_ident(), start, duration))
+
+    def stats(self):
+        """
+        Aggregate the durations of every scope, the percentiles being computed on the last capacity durations
+
+        :return: dict mapping the path of every scope to its count, total, mean, p50, p95, p99 and max in ms
+        """
+        stats = {}
+        with self.lock:
+            for path, (buffer, count, total) in self.durations.items():
+                recent = buffer[: min(count, self.capacity)] / 1e6
+                p50, p95, p99 = np.percentile(recent, [50, 95, 99])
+                stats[path] = {
+                    "count": count,
+                    "total_ms": total / 1e6,
+                    "mean_ms": total / 1e6 / count,
+                    "p50_ms": p50,
+                    "p95_ms": p95,
+                    "p99_ms": p99,
+                    "max_ms": recent.max(),
+                }
+        return stats
+
+    def summary(self):
+        """
+        :return: table of the stats of every scope, nested scopes being indented under their parent
+        """
+        lines = ["{:<50} {:>8} {:>10} {:>10} {:>10} {:>10}".format("scope", "count", "mean ms", "p50", "p95", "p99")]
+        for path, stat in sorted(self.stats().items()):
+            depth = path.count("/")
+            lines.append(
+                "{:<50} {:>8} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f}".format(
+                    "  " * depth + path.rsplit("/", 1)[-1],
+                    stat["count"],
+                    stat["mean_ms"],
+                    stat["p50_ms"],
+                    stat["p95_ms"],
+                    stat["p99_ms"],
                 )
             )
-        return duration
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, filename):
+        """
+        Export the recorded scope events to a Chrome trace JSON file
+
+        :param filename: output file
+        """
+        with self.lock:
+            events = list(self.events)
+        trace_events = [
+            {
+                "name": name,
+                "cat": path,
+                "ph": "X",
+                "ts": start / 1e3,
+                "dur": duration / 1e3,
+                "pid": os.getpid(),
+                "tid": thread_id,
+            }
+            for name, path, thread_id, start, duration in events
+        ]
+        with open(filename, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+    def export_csv(self, filename):
+        """
+        Export the stats of every scope to a flat CSV file, one row per scope
+
+        :param filename: output file
+        """
+        fields = ["count", "total_ms", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+        with open(filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["scope"] + fields)
+            for path, stat in sorted(self.stats().items()):
+                writer.writerow([path] + [stat[field] for field in fields])
+
+
+step_profiler = StepProfiler()
+
+
+def _export_step_profiler(prefix):
+    step_profiler.export_chrome_trace(prefix + ".json")
+    step_profiler.export_csv(prefix + ".csv")
+    log.info("Step profile exported to {}.json and {}.csv".format(prefix, prefix))
+
+
+_PROFILE = os.environ.get("IG_PROFILE", "")
+if _PROFILE and _PROFILE != "0":
+    step_profiler.enable()
+    if _PROFILE != "1":
+        atexit.register(_export_step_profiler, _PROFILE)
@@ -4,7 +4,7 @@ import os
 import random
 import time
 import xml.etree.ElementTree as ET
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from xml.dom import minidom
 
 import numpy as np
@@ -13,6 +13,8 @@ from PIL import Image
 
 import igibson
 from igibson.external.pybullet_tools.utils import euler_from_quat, get_joint_names, get_joints
+from igibson.object_states.object_state_base import AbsoluteObjectState
+from igibson.object_states.utils import clear_cached_states
 from igibson.objects.articulated_object import URDFObject
 from igibson.objects.multi_object_wrappers import ObjectGrouper, ObjectMultiplexer
 from igibson.robots import REGISTERED_ROBOTS
@@ -28,7 +30,13 @@ from igibson.utils.assets_utils import (
     get_ig_scene_path,
 )
 from igibson.utils.semantics_utils import ROOM_NAME_TO_ROOM_ID
-from igibson.utils.utils import NumpyEncoder, restoreState, rotate_vector_3d
+from igibson.utils.utils import (
+    NumpyEncoder,
+    get_body_kinematic_state,
+    restoreState,
+    rotate_vector_3d,
+    set_body_kinematic_state,
+)
 
 SCENE_SOURCE = ["IG", "CUBICASA", "THREEDFRONT"]
 
@@ -70,6 +78,7 @@ class InteractiveIndoorScene(StaticIndoorScene):
         merge_fixed_links=True,
         rendering_params=None,
         include_robots=True,
+        use_reset_snapshot=True,
     ):
         """
         :param scene_id: Scene id
@@ -96,6 +105,8 @@ class InteractiveIndoorScene(StaticIndoorScene):
         :param merge_fixed_links: whether to merge fixed links in pybullet
         :param rendering_params: additional rendering params to be passed into object initializers (e.g. texture scale)
         :param include_robots: whether to also include the robot(s) defined in the scene
+        :param use_reset_snapshot: whether to capture a pybullet state snapshot at the first reset_scene_objects call
+            and restore it on later calls instead of re-applying every object state one call at a time
         """
 
         super(InteractiveIndoorScene, self).__init__(
@@ -152,6 +163,13 @@ class InteractiveIndoorScene(StaticIndoorScene):
         self.merge_fixed_links = merge_fixed_links
         self.include_robots = include_robots
 
+        # Pybullet snapshot of the scene right after reset_scene_objects, used as a fast path for later resets
+        self.use_reset_snapshot = use_reset_snapshot
+        self.reset_snapshot_id = None
+        self.reset_snapshot_signature = None
+        self.reset_snapshot_non_kinematic_states = OrderedDict()
+        self.reset_snapshot_unmanaged_body_ids = []
+
         # Current time string to use to save the temporal urdfs
         timestr = time.strftime("%Y%m%d-%H%M%S")
         # Create the subfolder
@@ -878,17 +896,26 @@ class InteractiveIndoorScene(StaticIndoorScene):
         if obj_kin_state["non_kinematic_states"] is not None:
             obj.load_state(obj_kin_state["non_kinematic_states"])
 
-    def restore_object_states(self, object_states):
+    def iter_object_states(self, object_states):
+        """
+        Iterate over (object, object state) pairs, descending into ObjectMultiplexer and ObjectGrouper
+
+        :param object_states: object states keyed by object name, in the format of self.object_states
+        """
         for obj_name, obj in self.objects_by_name.items():
             if not isinstance(obj, ObjectMultiplexer):
-                self.restore_object_states_single_object(obj, object_states[obj_name])
+                yield obj, object_states[obj_name]
             else:
                 for sub_obj in obj._multiplexed_objects:
                     if isinstance(sub_obj, ObjectGrouper):
                         for obj_part in sub_obj.objects:
-                            self.restore_object_states_single_object(obj_part, object_states[obj_part.name])
+                            yield obj_part, object_states[obj_part.name]
                     else:
-                        self.restore_object_states_single_object(sub_obj, object_states[sub_obj.name])
+                        yield sub_obj, object_states[sub_obj.name]
+
+    def restore_object_states(self, object_states):
+        for obj, obj_kin_state in self.iter_object_states(object_states):
+            self.restore_object_states_single_object(obj, obj_kin_state)
 
     def _load(self, simulator):
         """
@@ -940,13 +967,105 @@ class InteractiveIndoorScene(StaticIndoorScene):
         """
         Reset the pose and joint configuration of all scene objects.
         Also open all doors if self.should_open_all_doors is True
+
+        If self.use_reset_snapshot is True, the first call captures a pybullet state snapshot of the reset scene and
+        later calls restore it in a single call. The snapshot is recaptured whenever the set of loaded objects changes.
         """
+        if self.use_reset_snapshot and self.reset_snapshot_id is not None:
+            if self.reset_snapshot_signature == self.get_reset_snapshot_signature():
+                self.restore_reset_snapshot()
+                return
+            self.clear_reset_snapshot()
+
         self.restore_object_states(self.object_states)
 
         if self.should_open_all_doors:
             self.force_wakeup_scene_objects()
             self.open_all_doors()
 
+        if self.use_reset_snapshot:
+            self.save_reset_snapshot()
+
+    def get_reset_snapshot_signature(self):
+        """
+        Get a signature of the loaded object set. A reset snapshot is only valid for the signature it was captured with.
+
+        :return: hashable signature of the pybullet bodies, loaded objects and multiplexer selections
+        """
+        multiplexer_selections = tuple(
+            (obj_name, obj.current_index)
+            for obj_name, obj in self.objects_by_name.items()
+            if isinstance(obj, ObjectMultiplexer)
+        )
+        return (
+            p.getNumBodies(),
+            tuple(sorted(self.objects_by_id.keys())),
+            multiplexer_selections,
+            id(self.object_states),
+        )
+
+    def save_reset_snapshot(self):
+        """
+        Capture the current (just reset) scene as a pybullet state snapshot, together with the non-kinematic states
+        that restore_object_states would have loaded and the bodies that restore_object_states does not manage
+        """
+        managed_body_ids = set()
+        self.reset_snapshot_non_kinematic_states = OrderedDict()
+        for obj, obj_kin_state in self.iter_object_states(self.object_states):
+            if not obj.loaded or not obj_kin_state:
+                continue
+            managed_body_ids.update(obj.get_body_ids())
+            if obj_kin_state["non_kinematic_states"] is None:
+                continue
+            # Group the dumps by state type so that they are loaded in one batch per state type. States that dump
+            # nothing have nothing to load either, so they are left out.
+            for state_type, state_instance in obj.states.items():
+                if not issubclass(state_type, AbsoluteObjectState):
+                    continue
+                state_dump = state_instance.dump()
+                if state_dump is None:
+                    continue
+                instances, dumps = self.reset_snapshot_non_kinematic_states.setdefault(state_type, ([], []))
+                instances.append(state_instance)
+                dumps.append(state_dump)
+
+        # Bodies that are not reset by restore_object_states (e.g. robots and objects added by the task) keep their
+        # current state, so they have to be carried across the snapshot restore. Body ids are not necessarily
+        # contiguous after bodies have been removed.
+        body_ids = [p.getBodyUniqueId(i) for i in range(p.getNumBodies())]
+        self.reset_snapshot_unmanaged_body_ids = [body_id for body_id in body_ids if body_id not in managed_body_ids]
+        self.reset_snapshot_id = p.saveState()
+        self.reset_snapshot_signature = self.get_reset_snapshot_signature()
+
+    def restore_reset_snapshot(self):
+        """
+        Restore the scene to the snapshot captured by save_reset_snapshot
+        """
+        unmanaged_states = [
+            (body_id, get_body_kinematic_state(body_id)) for body_id in self.reset_snapshot_unmanaged_body_ids
+        ]
+        restoreState(stateId=self.reset_snapshot_id)
+        for body_id, body_state in unmanaged_states:
+            set_body_kinematic_state(body_id, body_state)
+
+        for obj, _ in self.iter_object_states(self.object_states):
+            if hasattr(obj, "states"):
+                clear_cached_states(obj)
+
+        for state_type, (instances, dumps) in self.reset_snapshot_non_kinematic_states.items():
+            state_type.load_batch(instances, dumps)
+
+    def clear_reset_snapshot(self):
+        """
+        Discard the reset snapshot so that the next reset_scene_objects call takes the full reset path
+        """
+        if self.reset_snapshot_id is not None:
+            p.removeState(self.reset_snapshot_id)
+        self.reset_snapshot_id = None
+        self.reset_snapshot_signature = None
+        self.reset_snapshot_non_kinematic_states = OrderedDict()
+        self.reset_snapshot_unmanaged_body_ids = []
+
     def get_num_objects(self):
         """
         Get the number of objects
@@ -1079,6 +1198,21 @@ class InteractiveIndoorScene(StaticIndoorScene):
         else:
             return self.room_ins_id_to_ins_name[ins_id]
 
+    def get_room_instance_ids_by_points(self, xy):
+        """
+        Return the room instance ids of points, as get_room_instance_by_point for a batch of points
+
+        :param xy: (N, 2) array of 2D locations in world reference frame (metric)
+        :return: (N,) array of room instance ids (see room_ins_name_to_ins_id), 0 for the points that are not in a room
+            or not on the room segmentation map
+        """
+        # Same conversion as world_to_seg_map, for a batch of points
+        map_xy = np.flip(np.asarray(xy) / self.seg_map_resolution + self.seg_map_size / 2.0, axis=1).astype(int)
+        in_map = np.all((map_xy >= 0) & (map_xy < np.array(self.room_ins_map.shape)), axis=1)
+        ins_ids = np.zeros(len(map_xy), dtype=self.room_ins_map.dtype)
+        ins_ids[in_map] = self.room_ins_map[map_xy[in_map, 0], map_xy[in_map, 1]]
+        return ins_ids
+
     def get_body_ids(self):
         """
         Return the body ids of all scene objects
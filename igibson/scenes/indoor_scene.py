@@ -9,6 +9,8 @@ import networkx as nx
 import numpy as np
 from future.utils import with_metaclass
 from PIL import Image
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
 
 from igibson.scenes.scene_base import Scene
 from igibson.utils.utils import l2_distance
@@ -70,6 +72,8 @@ class IndoorScene(with_metaclass(ABCMeta, Scene)):
 
         self.floor_map = []
         self.floor_graph = []
+        self.floor_trav_cells = []
+        self.floor_trav_csgraph = {}
         for floor in range(len(self.floor_heights)):
             if self.trav_map_type == "with_obj":
                 trav_map = np.array(Image.open(os.path.join(maps_path, "floor_trav_{}.png".format(floor))))
@@ -103,6 +107,8 @@ class IndoorScene(with_metaclass(ABCMeta, Scene)):
                 self.build_trav_graph(maps_path, floor, trav_map)
 
             self.floor_map.append(trav_map)
+            # Cache the traversable cells, in row-major order like np.where
+            self.floor_trav_cells.append(np.argwhere(trav_map == 255))
 
     # TODO: refactor into C++ for speedup
     def build_trav_graph(self, maps_path, floor, trav_map):
@@ -151,14 +157,65 @@ class IndoorScene(with_metaclass(ABCMeta, Scene)):
         """
         if floor is None:
             floor = self.get_random_floor()
-        trav = self.floor_map[floor]
-        trav_space = np.where(trav == 255)
-        idx = np.random.randint(0, high=trav_space[0].shape[0])
-        xy_map = np.array([trav_space[0][idx], trav_space[1][idx]])
-        x, y = self.map_to_world(xy_map)
+        trav_cells = self.floor_trav_cells[floor]
+        idx = np.random.randint(0, high=trav_cells.shape[0])
+        x, y = self.map_to_world(trav_cells[idx])
         z = self.floor_heights[floor]
         return floor, np.array([x, y, z])
 
+    def get_traversable_cells(self, floor):
+        """
+        Get the traversable cells of the given floor number, cached when the traversability map is loaded
+
+        :param floor: floor number
+        :return: (N, 2) array of traversable cells in map reference frame
+        """
+        return self.floor_trav_cells[floor]
+
+    def get_trav_csgraph(self, floor):
+        """
+        Get the 8-connected traversability graph of the given floor number as a sparse matrix, whose nodes are the
+        traversable cells in the order of get_traversable_cells. It is built once per floor.
+
+        :param floor: floor number
+        :return: (N, N) sparse matrix of edge lengths in map reference frame
+        """
+        if floor not in self.floor_trav_csgraph:
+            trav_cells = self.floor_trav_cells[floor]
+            cell_index = -np.ones((self.trav_map_size, self.trav_map_size), dtype=np.int64)
+            cell_index[trav_cells[:, 0], trav_cells[:, 1]] = np.arange(trav_cells.shape[0])
+            rows, cols, weights = [], [], []
+            for offset in [(-1, -1), (0, -1), (1, -1), (-1, 0)]:
+                neighbors = trav_cells + np.array(offset)
+                in_map = np.all((neighbors >= 0) & (neighbors < self.trav_map_size), axis=1)
+                neighbor_index = -np.ones(trav_cells.shape[0], dtype=np.int64)
+                neighbor_index[in_map] = cell_index[neighbors[in_map, 0], neighbors[in_map, 1]]
+                has_neighbor = neighbor_index >= 0
+                rows.append(np.nonzero(has_neighbor)[0])
+                cols.append(neighbor_index[has_neighbor])
+                weights.append(np.full(np.count_nonzero(has_neighbor), np.linalg.norm(offset)))
+            self.floor_trav_csgraph[floor] = csr_matrix(
+                (np.concatenate(weights), (np.concatenate(rows), np.concatenate(cols))),
+                shape=(trav_cells.shape[0], trav_cells.shape[0]),
+            )
+        return self.floor_trav_csgraph[floor]
+
+    def get_geodesic_distance_field(self, floor, source_world):
+        """
+        Get the geodesic distance from one point to every traversable cell of the floor, with one single-source
+        shortest path search. If the point is not traversable, the distance goes through its closest traversable cell.
+
+        :param floor: floor number
+        :param source_world: 2D source location in world reference frame (metric)
+        :return: (N,) array of geodesic distances (metric) to the cells of get_traversable_cells, inf if unreachable
+        """
+        trav_cells = self.floor_trav_cells[floor]
+        source_map = self.world_to_map(source_world)
+        cell_distance = np.linalg.norm(trav_cells - source_map, axis=1)
+        source_idx = np.argmin(cell_distance)
+        distance = dijkstra(self.get_trav_csgraph(floor), directed=False, indices=source_idx)
+        return (distance + cell_distance[source_idx]) * self.trav_map_resolution
+
     def map_to_world(self, xy):
         """
         Transforms a 2D point in map reference frame into world (simulator) reference frame
@@ -178,6 +235,21 @@ class IndoorScene(with_metaclass(ABCMeta, Scene)):
         """
         return np.flip((np.array(xy) / self.trav_map_resolution + self.trav_map_size / 2.0)).astype(int)
 
+    def get_traversability_by_points(self, floor, xy):
+        """
+        Return whether points are traversable, according to the traversability map of the given floor number
+
+        :param floor: floor number
+        :param xy: (N, 2) array of 2D locations in world reference frame (metric)
+        :return: (N,) boolean array, False for the points outside of the map
+        """
+        # Same conversion as world_to_map, for a batch of points
+        map_xy = np.flip(np.asarray(xy) / self.trav_map_resolution + self.trav_map_size / 2.0, axis=1).astype(int)
+        in_map = np.all((map_xy >= 0) & (map_xy < self.trav_map_size), axis=1)
+        traversable = np.zeros(len(map_xy), dtype=bool)
+        traversable[in_map] = self.floor_map[floor][map_xy[in_map, 0], map_xy[in_map, 1]] == 255
+        return traversable
+
     def has_node(self, floor, world_xy):
         """
         Return whether the traversability graph contains a point
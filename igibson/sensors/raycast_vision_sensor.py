@@ -0,0 +1,124 @@
+import numpy as np
+import pybullet as p
+
+from igibson.sensors.vision_sensor import VisionSensor
+from igibson.utils.constants import MAX_CLASS_COUNT, MAX_INSTANCE_COUNT
+from igibson.utils.mesh_util import quat2rotmat, xyzw2wxyz
+from igibson.utils.raycast_utils import (
+    MAX_RAY_BATCH_SIZE,
+    get_body_id_segmentation_tables,
+    get_body_id_table_size,
+    get_camera_ray_directions,
+    ray_test_batch_ignoring_bodies,
+)
+
+
+class RaycastVisionSensor(VisionSensor):
+    """
+    Vision sensor that computes depth, point cloud, semantic and instance segmentation by casting one ray per pixel
+    with pybullet instead of rendering with MeshRenderer. It runs on the CPU only and scales with the number of cores.
+    """
+
+    SUPPORTED_MODALITIES = ("depth", "pc", "seg", "ins_seg")
+
+    # Same clipping planes as the MeshRenderer projection matrix
+    ZNEAR = 0.1
+    ZFAR = 100.0
+
+    def __init__(self, env, modalities):
+        unsupported_modalities = [modality for modality in modalities if modality not in self.SUPPORTED_MODALITIES]
+        if len(unsupported_modalities) > 0:
+            raise ValueError(
+                "The raycast vision backend only supports {}, but {} were requested.".format(
+                    self.SUPPORTED_MODALITIES, unsupported_modalities
+                )
+            )
+        super(RaycastVisionSensor, self).__init__(env, modalities)
+        self.vertical_fov = self.config.get("vertical_fov", 90)
+        self.num_threads = self.config.get("raycast_num_threads", 0)
+        self.batch_size = self.config.get("raycast_batch_size", MAX_RAY_BATCH_SIZE)
+        self.hide_robot = self.config.get("hide_robot", True)
+
+        # Per-pixel ray directions in the camera frame, only depend on the camera intrinsics
+        self.ray_directions = get_camera_ray_directions(self.image_width, self.image_height, self.vertical_fov).reshape(
+            -1, 3
+        )
+
+        # Lookup tables from pybullet body id + 1 (so that a missed ray, -1, maps to entry 0) to class / instance id
+        self.body_id_to_class_id = None
+        self.body_id_to_instance_id = None
+        self.id_table_key = None
+
+    def get_raw_modalities(self, modalities):
+        """
+        Helper function that gathers raw modalities (e.g. depth is based on 3d)
+
+        :return: raw modalities to compute with ray casting
+        """
+        raw_modalities = []
+        if "depth" in modalities or "pc" in modalities:
+            raw_modalities.append("3d")
+        if "seg" in modalities:
+            raw_modalities.append("seg")
+        if "ins_seg" in modalities:
+            raw_modalities.append("ins_seg")
+        return raw_modalities
+
+    def update_id_tables(self, env):
+        """
+        Update the body id to class id / instance id lookup tables if bodies have been added or removed
+
+        :param env: environment instance
+        """
+        renderer = env.simulator.renderer
+        id_table_key = (
+            p.getNumBodies(),
+            get_body_id_table_size(),
+            len(renderer.instances) if renderer is not None else len(env.scene.objects_by_id),
+        )
+        if id_table_key == self.id_table_key:
+            return
+
+        body_id_to_class_id, body_id_to_instance_id = get_body_id_segmentation_tables(env.simulator, env.scene)
+        self.body_id_to_class_id = body_id_to_class_id.astype(np.float32) / MAX_CLASS_COUNT
+        self.body_id_to_instance_id = body_id_to_instance_id.astype(np.float32) / MAX_INSTANCE_COUNT
+        self.id_table_key = id_table_key
+
+    def get_raw_vision_obs(self, env):
+        """
+        Cast one ray per pixel from the robot camera
+
+        :return: raw modalities keyed by name, as float32 arrays of shape (H, W, 4) in the same format as MeshRenderer
+        """
+        robot = env.robots[0]
+        camera_pos = np.array(robot.eyes.get_position())
+        mat = quat2rotmat(xyzw2wxyz(robot.eyes.get_orientation()))[:3, :3]
+        # Camera frame of MeshRenderer.set_camera: x right, y up, looking along -z
+        camera_rotation = np.stack([-mat[:, 1], mat[:, 2], -mat[:, 0]], axis=1)
+
+        ray_directions_world = self.ray_directions.dot(camera_rotation.T)
+        ray_from = camera_pos + ray_directions_world * self.ZNEAR
+        ray_to = camera_pos + ray_directions_world * self.ZFAR
+        ignored_body_ids = robot.get_body_ids() if self.hide_robot else []
+        body_ids, _, _, hit_positions, _ = ray_test_batch_ignoring_bodies(
+            ray_from, ray_to, ignored_body_ids, num_threads=self.num_threads, batch_size=self.batch_size
+        )
+        hit = body_ids != -1
+
+        raw_vision_obs = {}
+        if "3d" in self.raw_modalities:
+            points = np.zeros((self.ray_directions.shape[0], 4), dtype=np.float32)
+            points[hit, :3] = (hit_positions[hit] - camera_pos).dot(camera_rotation)
+            points[hit, 3] = 1.0
+            raw_vision_obs["3d"] = points.reshape(self.image_height, self.image_width, 4)
+
+        if "seg" in self.raw_modalities or "ins_seg" in self.raw_modalities:
+            self.update_id_tables(env)
+            table_idx = np.clip(body_ids + 1, 0, len(self.body_id_to_class_id) - 1)
+            for mode, table in [("seg", self.body_id_to_class_id), ("ins_seg", self.body_id_to_instance_id)]:
+                if mode in self.raw_modalities:
+                    seg = np.zeros((self.ray_directions.shape[0], 4), dtype=np.float32)
+                    seg[:, 0] = table[table_idx]
+                    raw_vision_obs[mode] = seg.reshape(self.image_height, self.image_width, 4)
+
+        return raw_vision_obs
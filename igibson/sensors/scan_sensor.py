@@ -6,11 +6,18 @@ from transforms3d.quaternions import quat2mat
 from igibson.sensors.dropout_sensor_noise import DropoutSensorNoise
 from igibson.sensors.sensor_base import BaseSensor
 from igibson.utils.constants import OccupancyGridState
+from igibson.utils.raycast_utils import (
+    get_body_id_segmentation_tables,
+    get_body_id_table_size,
+    get_lidar_beam_directions,
+    ray_test_batch,
+    voxel_downsample,
+)
 
 
 class ScanSensor(BaseSensor):
     """
-    1D LiDAR scanner sensor and occupancy grid sensor
+    LiDAR scanner sensor (1D, or multi-beam 3D) and occupancy grid sensor
     """
 
     def __init__(self, env, modalities, rear=False):
@@ -19,7 +26,7 @@ class ScanSensor(BaseSensor):
         self.scan_noise_rate = self.config.get("scan_noise_rate", 0.0)
         self.n_horizontal_rays = self.config.get("n_horizontal_rays", 128)
         self.n_vertical_beams = self.config.get("n_vertical_beams", 1)
-        assert self.n_vertical_beams == 1, "scan can only handle one vertical beam for now"
+        self.laser_vertical_angular_range = self.config.get("laser_vertical_angular_range", 30.0)
         self.laser_linear_range = self.config.get("laser_linear_range", 10.0)
         self.laser_angular_range = self.config.get("laser_angular_range", 180.0)
         self.min_laser_dist = self.config.get("min_laser_dist", 0.05)
@@ -33,11 +40,30 @@ class ScanSensor(BaseSensor):
         self.noise_model.set_noise_value(1.0)
         self.rear = rear
 
+        self.num_threads = self.config.get("scan_num_threads", 6)
+        self.voxel_size = self.config.get("scan_voxel_size", 0.1)
+
         self.laser_position, self.laser_orientation = (
             env.robots[0].links[self.laser_link_name].get_position_orientation()
         )
         self.base_position, self.base_orientation = env.robots[0].base_link.get_position_orientation()
 
+        # Unit vectors of all the beams in the laser frame, computed once, ordered by vertical beam first
+        self.beam_directions_local = get_lidar_beam_directions(
+            self.n_horizontal_rays, self.laser_angular_range, self.n_vertical_beams, self.laser_vertical_angular_range
+        )
+
+        # The occupancy grid is computed from the vertical beam closest to the horizontal plane
+        vertical_angle = np.arcsin(self.beam_directions_local[:: self.n_horizontal_rays, 2])
+        self.occupancy_grid_beam = int(np.argmin(np.abs(vertical_angle)))
+        self.unit_vector_local = self.beam_directions_local[
+            self.occupancy_grid_beam * self.n_horizontal_rays : (self.occupancy_grid_beam + 1) * self.n_horizontal_rays
+        ]
+
+        # Lookup table from pybullet body id + 1 to instance id, for scan_ins_seg
+        self.body_id_to_instance_id = None
+        self.id_table_key = None
+
         if "occupancy_grid" in self.modalities:
             self.grid_resolution = self.config.get("grid_resolution", 128)
             self.occupancy_range = self.config.get("occupancy_range", 5)  # m
@@ -46,39 +72,40 @@ class ScanSensor(BaseSensor):
                 self.robot_footprint_radius / self.occupancy_range * self.grid_resolution
             )
 
+            # The occupancy grid uses the laser pose relative to the robot base at construction time
+            self.laser_rotation = quat2mat(
+                [
+                    self.laser_orientation[3],
+                    self.laser_orientation[0],
+                    self.laser_orientation[1],
+                    self.laser_orientation[2],
+                ]
+            )
+            self.base_rotation = quat2mat(
+                [self.base_orientation[3], self.base_orientation[0], self.base_orientation[1], self.base_orientation[2]]
+            )
+
+            # Pixel offsets of the obstacle marker stamped at every scan point (a filled circle of radius 2)
+            obstacle_radius = 2
+            kernel = np.zeros((2 * obstacle_radius + 1, 2 * obstacle_radius + 1), dtype=np.uint8)
+            cv2.circle(
+                img=kernel, center=(obstacle_radius, obstacle_radius), radius=obstacle_radius, color=1, thickness=-1
+            )
+            kernel_y, kernel_x = np.nonzero(kernel)
+            self.obstacle_kernel_offsets = np.stack([kernel_x, kernel_y], axis=1) - obstacle_radius
+
     def get_local_occupancy_grid(self, scan):
         """
         Get local occupancy grid based on current 1D scan
 
-        :param: 1D LiDAR scan
+        :param: 1D LiDAR scan of the vertical beam closest to the horizontal plane
         :return: local occupancy grid
         """
-        laser_linear_range = self.laser_linear_range
-        laser_angular_range = self.laser_angular_range
-        min_laser_dist = self.min_laser_dist
-
-        laser_angular_half_range = laser_angular_range / 2.0
-
-        angle = np.arange(
-            -np.radians(laser_angular_half_range),
-            np.radians(laser_angular_half_range),
-            np.radians(laser_angular_range) / self.n_horizontal_rays,
-        )
-        unit_vector_laser = np.array([[np.cos(ang), np.sin(ang), 0.0] for ang in angle])
-
-        scan_laser = unit_vector_laser * (scan * (laser_linear_range - min_laser_dist) + min_laser_dist)
-
-        laser_translation = self.laser_position
-        laser_rotation = quat2mat(
-            [self.laser_orientation[3], self.laser_orientation[0], self.laser_orientation[1], self.laser_orientation[2]]
+        scan_laser = self.unit_vector_local * (
+            scan * (self.laser_linear_range - self.min_laser_dist) + self.min_laser_dist
         )
-        scan_world = laser_rotation.dot(scan_laser.T).T + laser_translation
-
-        base_translation = self.base_position
-        base_rotation = quat2mat(
-            [self.base_orientation[3], self.base_orientation[0], self.base_orientation[1], self.base_orientation[2]]
-        )
-        scan_local = base_rotation.T.dot((scan_world - base_translation).T).T
+        scan_world = self.laser_rotation.dot(scan_laser.T).T + self.laser_position
+        scan_local = self.base_rotation.T.dot((scan_world - self.base_position).T).T
         scan_local = scan_local[:, :2]
         scan_local = np.concatenate([np.array([[0, 0]]), scan_local, np.array([[0, 0]])], axis=0)
 
@@ -90,14 +117,14 @@ class ScanSensor(BaseSensor):
         occupancy_grid.fill(int(OccupancyGridState.UNKNOWN * 2.0))
         scan_local_in_map = scan_local / self.occupancy_range * self.grid_resolution + (self.grid_resolution / 2)
         scan_local_in_map = scan_local_in_map.reshape((1, -1, 1, 2)).astype(np.int32)
-        for i in range(scan_local_in_map.shape[1]):
-            cv2.circle(
-                img=occupancy_grid,
-                center=(scan_local_in_map[0, i, 0, 0], scan_local_in_map[0, i, 0, 1]),
-                radius=2,
-                color=int(OccupancyGridState.OBSTACLES * 2.0),
-                thickness=-1,
-            )
+
+        # Stamp the obstacle marker at every scan point at once
+        obstacle_pixels = (scan_local_in_map[0, :, 0, None, :] + self.obstacle_kernel_offsets[None, :, :]).reshape(
+            -1, 2
+        )
+        in_grid = np.all((obstacle_pixels >= 0) & (obstacle_pixels < self.grid_resolution), axis=1)
+        obstacle_pixels = obstacle_pixels[in_grid]
+        occupancy_grid[obstacle_pixels[:, 1], obstacle_pixels[:, 0]] = int(OccupancyGridState.OBSTACLES * 2.0)
         cv2.fillPoly(
             img=occupancy_grid, pts=scan_local_in_map, color=int(OccupancyGridState.FREESPACE * 2.0), lineType=1
         )
@@ -111,41 +138,80 @@ class ScanSensor(BaseSensor):
 
         return occupancy_grid[:, :, None].astype(np.float32) / 2.0
 
+    def update_id_table(self, env):
+        """
+        Update the body id to instance id lookup table if bodies have been added or removed
+
+        :param env: environment instance
+        """
+        id_table_key = (p.getNumBodies(), get_body_id_table_size())
+        if id_table_key == self.id_table_key:
+            return
+        _, self.body_id_to_instance_id = get_body_id_segmentation_tables(env.simulator, env.scene)
+        self.id_table_key = id_table_key
+
     def get_obs(self, env):
         """
-        Get current LiDAR sensor reading and occupancy grid (optional)
+        Get current LiDAR sensor reading and occupancy grid (optional).
+        Optionally, also the point cloud in the laser frame (scan_pc, and voxel-downsampled scan_pc_voxel, whose
+        points are followed by zeros),
+        the return intensity (scan_intensity) and the instance id of the hit bodies (scan_ins_seg).
 
         :return: LiDAR sensor reading and local occupancy grid, normalized to [0.0, 1.0]
         """
-        laser_angular_half_range = self.laser_angular_range / 2.0
         if self.laser_link_name not in env.robots[0].links:
             raise Exception(
                 "Trying to simulate LiDAR sensor, but laser_link_name cannot be found in the robot URDF file. Please add a link named laser_link_name at the intended laser pose. Feel free to check out assets/models/turtlebot/turtlebot.urdf and examples/configs/turtlebot_p2p_nav.yaml for examples."
             )
         laser_position, laser_orientation = env.robots[0].links[self.laser_link_name].get_position_orientation()
-        angle = np.arange(
-            -laser_angular_half_range / 180 * np.pi,
-            laser_angular_half_range / 180 * np.pi,
-            self.laser_angular_range / 180.0 * np.pi / self.n_horizontal_rays,
-        )
-        unit_vector_local = np.array([[np.cos(ang), np.sin(ang), 0.0] for ang in angle])
         transform_matrix = quat2mat(
             [laser_orientation[3], laser_orientation[0], laser_orientation[1], laser_orientation[2]]
         )  # [x, y, z, w]
-        unit_vector_world = transform_matrix.dot(unit_vector_local.T).T
+        unit_vector_world = transform_matrix.dot(self.beam_directions_local.T).T
 
-        start_pose = np.tile(laser_position, (self.n_horizontal_rays, 1))
+        # All the beams are cast in a single batch
+        start_pose = np.tile(laser_position, (self.beam_directions_local.shape[0], 1))
         start_pose += unit_vector_world * self.min_laser_dist
         end_pose = laser_position + unit_vector_world * self.laser_linear_range
-        results = p.rayTestBatch(start_pose, end_pose, numThreads=6)  # numThreads = 6
+        body_ids, _, hit_fraction, _, hit_normals = ray_test_batch(start_pose, end_pose, num_threads=self.num_threads)
+        hit = body_ids != -1
+
+        state = {}
+        # The extra outputs are only computed by the front LiDAR, as they share their names with the rear one
+        if not self.rear:
+            if "scan_pc" in self.modalities or "scan_pc_voxel" in self.modalities:
+                scan_pc = np.zeros((self.beam_directions_local.shape[0], 3), dtype=np.float32)
+                scan_pc[hit] = self.beam_directions_local[hit] * (
+                    hit_fraction[hit, None] * (self.laser_linear_range - self.min_laser_dist) + self.min_laser_dist
+                )
+                if "scan_pc" in self.modalities:
+                    state["scan_pc"] = scan_pc
+                if "scan_pc_voxel" in self.modalities:
+                    # Padded with zeros to the number of beams, so that the observation has a fixed shape
+                    scan_pc_voxel = voxel_downsample(scan_pc[hit], self.voxel_size)
+                    state["scan_pc_voxel"] = np.zeros_like(scan_pc)
+                    state["scan_pc_voxel"][: len(scan_pc_voxel)] = scan_pc_voxel
+            if "scan_intensity" in self.modalities:
+                # Lambertian return: cosine of the incidence angle between the beam and the surface normal
+                scan_intensity = np.zeros((self.beam_directions_local.shape[0], 1), dtype=np.float32)
+                scan_intensity[hit, 0] = np.abs(np.sum(hit_normals[hit] * unit_vector_world[hit], axis=1))
+                state["scan_intensity"] = scan_intensity
+            if "scan_ins_seg" in self.modalities:
+                self.update_id_table(env)
+                table_idx = np.clip(body_ids + 1, 0, len(self.body_id_to_instance_id) - 1)
+                state["scan_ins_seg"] = self.body_id_to_instance_id[table_idx][:, None]
 
         # hit fraction = [0.0, 1.0] of self.laser_linear_range
-        hit_fraction = np.array([item[2] for item in results])
         hit_fraction = self.noise_model.add_noise(hit_fraction)
         scan = np.expand_dims(hit_fraction, 1)
 
-        state = {}
         state["scan" if not self.rear else "scan_rear"] = scan.astype(np.float32)
         if "occupancy_grid" in self.modalities:
-            state["occupancy_grid"] = self.get_local_occupancy_grid(scan)
+            state["occupancy_grid"] = self.get_local_occupancy_grid(
+                scan[
+                    self.occupancy_grid_beam
+                    * self.n_horizontal_rays : (self.occupancy_grid_beam + 1)
+                    * self.n_horizontal_rays
+                ]
+            )
         return state
@@ -1,4 +1,8 @@
+import numpy as np
+from transforms3d.quaternions import quat2mat
+
 from igibson.sensors.sensor_base import BaseSensor
+from igibson.utils.raycast_utils import get_lidar_beam_directions, ray_test_batch_ignoring_bodies, voxel_downsample
 
 
 class VelodyneSensor(BaseSensor):
@@ -8,6 +12,48 @@ class VelodyneSensor(BaseSensor):
 
     def __init__(self, env):
         super(VelodyneSensor, self).__init__(env)
+        self.backend = self.config.get("velodyne_backend", "renderer")
+        if self.backend not in ["renderer", "raycast"]:
+            raise ValueError("Invalid velodyne backend: {}".format(self.backend))
+
+        if self.backend == "raycast":
+            self.n_horizontal_rays = self.config.get("velodyne_n_horizontal_rays", 1024)
+            self.n_vertical_beams = self.config.get("velodyne_n_vertical_beams", 16)
+            self.vertical_angular_range = self.config.get("velodyne_vertical_angular_range", 30.0)
+            self.linear_range = self.config.get("velodyne_linear_range", 100.0)
+            self.min_dist = self.config.get("velodyne_min_dist", 0.1)
+            self.num_threads = self.config.get("scan_num_threads", 6)
+            self.voxel_size = self.config.get("scan_voxel_size", None)
+            self.beam_directions_local = get_lidar_beam_directions(
+                self.n_horizontal_rays, 360.0, self.n_vertical_beams, self.vertical_angular_range
+            )
+
+    def get_lidar_all_raycast(self, env):
+        """
+        Get complete 360 degree LiDAR readings by casting all the beams from the robot camera in one batch.
+        The points have the same frame and format as MeshRenderer.get_lidar_all.
+
+        :return: (N, 3) array of LiDAR hit points (z up, x right, y forward)
+        """
+        robot = env.robots[0]
+        camera_pos = np.array(robot.eyes.get_position())
+        orn = robot.eyes.get_orientation()
+        mat = quat2mat([orn[3], orn[0], orn[1], orn[2]])
+        unit_vector_world = mat.dot(self.beam_directions_local.T).T
+
+        ray_from = camera_pos + unit_vector_world * self.min_dist
+        ray_to = camera_pos + unit_vector_world * self.linear_range
+        body_ids, _, _, hit_positions, _ = ray_test_batch_ignoring_bodies(
+            ray_from, ray_to, robot.get_body_ids(), num_threads=self.num_threads
+        )
+        hit = body_ids != -1
+
+        # From the camera link frame (x forward, y left, z up) to (x right, y forward, z up)
+        points_local = (hit_positions[hit] - camera_pos).dot(mat)
+        lidar_readings = np.stack([-points_local[:, 1], points_local[:, 0], points_local[:, 2]], axis=1)
+        if self.voxel_size is not None:
+            lidar_readings = voxel_downsample(lidar_readings, self.voxel_size)
+        return lidar_readings
 
     def get_obs(self, env):
         """
@@ -15,4 +61,6 @@ class VelodyneSensor(BaseSensor):
 
         :return: velodyne sensor reading
         """
+        if self.backend == "raycast":
+            return self.get_lidar_all_raycast(env)
         return env.simulator.renderer.get_lidar_all()
@@ -145,15 +145,22 @@ class VisionSensor(BaseSensor):
         seg = np.round(raw_vision_obs["ins_seg"][:, :, 0:1] * MAX_INSTANCE_COUNT).astype(np.int32)
         return seg
 
+    def get_raw_vision_obs(self, env):
+        """
+        Render the raw modalities from the robot camera
+
+        :return: raw modalities keyed by name, as float32 arrays of shape (H, W, 4)
+        """
+        raw_vision_obs = env.simulator.renderer.render_robot_cameras(modes=self.raw_modalities)
+        return {mode: value for mode, value in zip(self.raw_modalities, raw_vision_obs)}
+
     def get_obs(self, env):
         """
         Get vision sensor reading
 
         :return: vision sensor reading
         """
-        raw_vision_obs = env.simulator.renderer.render_robot_cameras(modes=self.raw_modalities)
-
-        raw_vision_obs = {mode: value for mode, value in zip(self.raw_modalities, raw_vision_obs)}
+        raw_vision_obs = self.get_raw_vision_obs(env)
 
         vision_obs = OrderedDict()
         if "rgb" in self.modalities:
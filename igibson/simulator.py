@@ -14,6 +14,7 @@ from igibson.render.mesh_renderer.materials import ProceduralMaterial, Randomize
 from igibson.render.mesh_renderer.mesh_renderer_cpu import MeshRenderer
 from igibson.render.mesh_renderer.mesh_renderer_settings import MeshRendererSettings
 from igibson.render.mesh_renderer.mesh_renderer_tensor import MeshRendererG2G
+from igibson.render.profiler import step_profiler
 from igibson.render.viewer import Viewer, ViewerSimple
 from igibson.scenes.scene_base import Scene
 from igibson.utils.assets_utils import get_ig_avg_category_specs
@@ -56,6 +57,7 @@ class Simulator:
         device_idx=0,
         rendering_settings=MeshRendererSettings(),
         use_pb_gui=False,
+        use_renderer=True,
     ):
         """
         :param gravity: gravity on z direction.
@@ -71,6 +73,9 @@ class Simulator:
         :param device_idx: GPU device index to run rendering on
         :param rendering_settings: settings to use for mesh renderer
         :param use_pb_gui: concurrently display the interactive pybullet gui (for debugging)
+        :param use_renderer: whether to create a MeshRenderer. Without it, objects are only loaded in pybullet and no
+            rendering context is created, so that the simulator runs on nodes without a GPU. Only supported in headless
+            mode, with sensors that do not render (e.g. the raycast vision backend).
         """
         # physics simulator
         self.gravity = gravity
@@ -89,6 +94,9 @@ class Simulator:
         self.device_idx = device_idx
         self.rendering_settings = rendering_settings
         self.use_pb_gui = use_pb_gui
+        self.use_renderer = use_renderer
+        if not self.use_renderer and self.mode != SimulatorMode.HEADLESS:
+            raise ValueError("Simulator mode {} requires a renderer.".format(mode))
 
         plt = platform.system()
         if plt == "Darwin" and self.mode == SimulatorMode.GUI_INTERACTIVE and use_pb_gui:
@@ -136,7 +144,7 @@ class Simulator:
             p.resetSimulation(physicsClientId=self.cid)
             p.disconnect(self.cid)
             # print("PyBullet Logging Information******************")
-        if release_renderer:
+        if release_renderer and self.renderer is not None:
             self.renderer.release()
 
     def reload(self):
@@ -166,7 +174,9 @@ class Simulator:
         Initialize the MeshRenderer.
         """
         self.visual_object_cache = {}
-        if self.mode == SimulatorMode.HEADLESS_TENSOR:
+        if not self.use_renderer:
+            self.renderer = None
+        elif self.mode == SimulatorMode.HEADLESS_TENSOR:
             self.renderer = MeshRendererG2G(
                 width=self.image_width,
                 height=self.image_height,
@@ -297,6 +307,10 @@ class Simulator:
         :param softbody: whether the instance group is for a soft body
         :param texture_scale: texture scale for the object, downsample to save memory
         """
+        # Without a renderer, objects only exist in pybullet
+        if self.renderer is None:
+            return
+
         # First, grab all the visual shapes.
         if link_name_to_vm:
             # If a manual link-name-to-visual-mesh mapping is given, use that to generate list of shapes.
@@ -435,28 +449,36 @@ class Simulator:
         Complete any non-physics steps such as state updates.
         """
         # Step all of the particle systems.
-        for particle_system in self.particle_systems:
-            particle_system.update(self)
+        with step_profiler.scope("particle_systems"):
+            for particle_system in self.particle_systems:
+                particle_system.update(self)
 
         # Step the object states in global topological order.
-        for state_type in self.object_state_types:
-            for obj in self.scene.get_objects_with_state(state_type):
-                obj.states[state_type].update()
+        with step_profiler.scope("object_states"):
+            for state_type in self.object_state_types:
+                with step_profiler.scope(state_type.__name__):
+                    for obj in self.scene.get_objects_with_state(state_type):
+                        obj.states[state_type].update()
 
         # Step the object procedural materials based on the updated object states.
-        for obj in self.scene.get_objects():
-            if hasattr(obj, "procedural_material") and obj.procedural_material is not None:
-                obj.procedural_material.update()
+        with step_profiler.scope("procedural_materials"):
+            for obj in self.scene.get_objects():
+                if hasattr(obj, "procedural_material") and obj.procedural_material is not None:
+                    obj.procedural_material.update()
 
     def step(self):
         """
         Step the simulation at self.render_timestep and update positions in renderer.
         """
-        for _ in range(self.physics_timestep_num):
-            p.stepSimulation()
+        with step_profiler.scope("simulator_step"):
+            with step_profiler.scope("physics"):
+                for _ in range(self.physics_timestep_num):
+                    p.stepSimulation()
 
-        self._non_physics_step()
-        self.sync()
+            with step_profiler.scope("non_physics_step"):
+                self._non_physics_step()
+            with step_profiler.scope("sync"):
+                self.sync()
         self.frame_count += 1
 
     def sync(self, force_sync=False):
@@ -466,11 +488,13 @@ class Simulator:
         :param force_sync: whether to force sync the objects in renderer
         """
         self.body_links_awake = 0
-        for instance in self.renderer.instances:
-            if instance.dynamic:
-                self.body_links_awake += self.update_position(instance, force_sync=force_sync or self.first_sync)
+        if self.renderer is not None:
+            for instance in self.renderer.instances:
+                if instance.dynamic:
+                    self.body_links_awake += self.update_position(instance, force_sync=force_sync or self.first_sync)
         if self.viewer is not None:
-            self.viewer.update()
+            with step_profiler.scope("viewer"):
+                self.viewer.update()
         if self.first_sync:
             self.first_sync = False
 
@@ -517,6 +541,9 @@ class Simulator:
         :param obj: an object to set the hidden state
         :param hide: the hidden state to set
         """
+        if self.renderer is None:
+            return
+
         # Find instance corresponding to this id in the renderer
         for instance in self.renderer.instances:
             if instance.pybullet_uuid in obj.get_body_ids():
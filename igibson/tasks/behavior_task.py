@@ -1,7 +1,6 @@
 import copy
 import datetime
 import logging
-from collections import OrderedDict
 
 import networkx as nx
 import pybullet as p
@@ -23,11 +22,14 @@ from igibson.external.pybullet_tools.utils import *
 from igibson.object_states.on_floor import RoomFloor
 from igibson.objects.articulated_object import URDFObject
 from igibson.objects.multi_object_wrappers import ObjectGrouper, ObjectMultiplexer
+from igibson.render.profiler import step_profiler
 from igibson.reward_functions.potential_reward import PotentialReward
+from igibson.robots.manipulation_robot import IsGraspingState, ManipulationRobot
 from igibson.robots.robot_base import BaseRobot
 from igibson.scenes.igibson_indoor_scene import InteractiveIndoorScene
 from igibson.tasks.bddl_backend import IGibsonBDDLBackend
 from igibson.tasks.task_base import BaseTask
+from igibson.tasks.task_obs_layout import TaskObsLayout
 from igibson.termination_conditions.predicate_goal import PredicateGoal
 from igibson.termination_conditions.timeout import Timeout
 from igibson.utils.assets_utils import get_ig_avg_category_specs, get_ig_model_path, get_object_models_of_category
@@ -41,6 +43,7 @@ from igibson.utils.constants import (
     SimulatorMode,
 )
 from igibson.utils.ig_logging import IGLogWriter
+from igibson.utils.transform_utils import quat2euler
 from igibson.utils.utils import restoreState
 
 log = logging.getLogger(__name__)
@@ -75,6 +78,9 @@ class BehaviorTask(BaseTask):
         self.task_obs_dim = MAX_TASK_RELEVANT_OBJS * TASK_RELEVANT_OBJS_OBS_DIM + AGENT_POSE_DIM
 
         self.initialized, self.feedback = self.initialize(env)
+        self.task_obs_layout = None
+        if self.initialized and len(env.robots) > 0 and isinstance(env.robots[0], ManipulationRobot):
+            self.compile_task_obs_layout(env)
         self.state_history = {}
         self.initial_state = self.save_scene(env)
         if self.config.get("should_highlight_task_relevant_objs", True):
@@ -193,18 +199,20 @@ class BehaviorTask(BaseTask):
 
     def step(self, env):
         if self.log_writer is not None:
-            self.log_writer.process_frame()
+            with step_profiler.scope("log_writer"):
+                self.log_writer.process_frame()
 
         # Update the overlay.
         if env.simulator.mode == SimulatorMode.VR:
-            if self.current_goal_status != self.previous_goal_status:
-                self.refresh_overlay(switch=False)
+            with step_profiler.scope("overlay"):
+                if self.current_goal_status != self.previous_goal_status:
+                    self.refresh_overlay(switch=False)
 
-            if env.simulator.query_vr_event("right_controller", "overlay_toggle"):
-                self.refresh_overlay()
+                if env.simulator.query_vr_event("right_controller", "overlay_toggle"):
+                    self.refresh_overlay()
 
-            if env.simulator.query_vr_event("left_controller", "overlay_toggle"):
-                self.toggle_overlay(env.simulator)
+                if env.simulator.query_vr_event("left_controller", "overlay_toggle"):
+                    self.toggle_overlay(env.simulator)
 
         # Record the current goal status as the next state's previous.
         self.previous_goal_status = self.current_goal_status
@@ -938,40 +946,85 @@ class BehaviorTask(BaseTask):
             env=env, clutter_scene=clutter_scene, existing_objects=existing_objects, min_distance=0.5
         )
 
-    def get_task_obs(self, env):
-        state = OrderedDict()
-        task_obs = np.zeros((self.task_obs_dim))
-        state["robot_pos"] = np.array(env.robots[0].get_position())
-        state["robot_orn"] = np.array(env.robots[0].get_rpy())
-
-        i = 0
-        for _, v in self.object_scope.items():
-            if isinstance(v, URDFObject):
-                state["obj_{}_valid".format(i)] = 1.0
-                state["obj_{}_pos".format(i)] = np.array(v.get_position())
-                state["obj_{}_orn".format(i)] = np.array(p.getEulerFromQuaternion(v.get_orientation()))
-                grasping_objects = env.robots[0].is_grasping_all_arms(candidate_obj=v.get_body_ids())
-                for grasp_idx, grasping in enumerate(grasping_objects):
-                    state["obj_{}_pos_in_gripper_{}".format(i, grasp_idx)] = float(grasping)
-                i += 1
-
-        state_list = []
-        for k, v in state.items():
-            if isinstance(v, list):
-                state_list.extend(v)
-            elif isinstance(v, tuple):
-                state_list.extend(list(v))
-            elif isinstance(v, np.ndarray):
-                state_list.extend(list(v))
-            elif isinstance(v, (float, int)):
-                state_list.append(v)
-            else:
-                raise ValueError("cannot serialize task obs")
+    def compile_task_obs_layout(self, env):
+        """
+        Compile the layout of the task observation: the position and orientation of the robot, then for every
+        URDFObject of the object scope, in order, its validity flag, position, orientation and whether every arm grasps
+        it. The validity flags are set once in the observation buffer, which is filled in place every step.
 
-        assert len(state_list) <= len(task_obs)
-        task_obs[: len(state_list)] = state_list
+        :param env: environment
+        """
+        robot = env.robots[0]
+        self.task_obs_layout = TaskObsLayout()
+        self.task_obs_layout.add_field("robot_pos", 3)
+        self.task_obs_layout.add_field("robot_orn", 3)
+
+        objects = [obj for obj in self.object_scope.values() if isinstance(obj, URDFObject)]
+        arm_names = list(robot.arm_names)
+        for i in range(len(objects)):
+            self.task_obs_layout.add_field("obj_{}_valid".format(i), 1)
+            self.task_obs_layout.add_field("obj_{}_pos".format(i), 3)
+            self.task_obs_layout.add_field("obj_{}_orn".format(i), 3)
+            for grasp_idx in range(len(arm_names)):
+                self.task_obs_layout.add_field("obj_{}_pos_in_gripper_{}".format(i, grasp_idx), 1)
+
+        # The pose of a URDFObject is the base pose of its main body
+        self.task_obs_objects = objects
+        self.task_obs_body_ids = [obj.get_body_ids()[obj.main_body] for obj in objects]
+        self.task_obs_arm_names = arm_names
+        self.task_obs_pos_indices = self.task_obs_layout.get_indices(
+            ["obj_{}_pos".format(i) for i in range(len(objects))]
+        )
+        self.task_obs_orn_indices = self.task_obs_layout.get_indices(
+            ["obj_{}_orn".format(i) for i in range(len(objects))]
+        )
+        self.task_obs_grasp_indices = self.task_obs_layout.get_indices(
+            [
+                "obj_{}_pos_in_gripper_{}".format(i, grasp_idx)
+                for i in range(len(objects))
+                for grasp_idx in range(len(arm_names))
+            ]
+        ).reshape(len(objects), len(arm_names))
 
-        return task_obs
+        self.task_obs_buffer = np.zeros(max(self.task_obs_dim, self.task_obs_layout.size))
+        for i in range(len(objects)):
+            self.task_obs_buffer[self.task_obs_layout.index["obj_{}_valid".format(i)]] = 1.0
+
+    def get_task_obs_grasping(self, robot):
+        """
+        Get whether every arm of the robot grasps every object of the task observation, as is_grasping_all_arms does
+        for each of them. An arm that grasps no object grasps none of them, and the candidate object is ignored in
+        physical grasping mode, so the objects are only checked one by one for the arms that grasp an object in the
+        other modes.
+
+        :param robot: robot
+        :return: [number of objects, number of arms] array of IsGraspingState values
+        """
+        grasping_any = np.array(robot.is_grasping_all_arms(), dtype=float)
+        grasping = np.tile(grasping_any, (len(self.task_obs_objects), 1))
+        if robot.grasping_mode != "physical":
+            for arm_idx in np.flatnonzero(grasping_any == IsGraspingState.TRUE):
+                arm = self.task_obs_arm_names[arm_idx]
+                for obj_idx, obj in enumerate(self.task_obs_objects):
+                    grasping[obj_idx, arm_idx] = float(robot.is_grasping(arm=arm, candidate_obj=obj.get_body_ids()))
+        return grasping
+
+    def get_task_obs(self, env):
+        if self.task_obs_layout is None:
+            self.compile_task_obs_layout(env)
+        assert self.task_obs_layout.size <= self.task_obs_dim
+
+        robot = env.robots[0]
+        task_obs = self.task_obs_buffer
+        task_obs[self.task_obs_layout.index["robot_pos"]] = robot.get_position()
+        task_obs[self.task_obs_layout.index["robot_orn"]] = robot.get_rpy()
+        if self.task_obs_objects:
+            poses = np.array([sum(p.getBasePositionAndOrientation(body_id), ()) for body_id in self.task_obs_body_ids])
+            task_obs[self.task_obs_pos_indices] = poses[:, :3]
+            task_obs[self.task_obs_orn_indices] = quat2euler(poses[:, 3:])
+            task_obs[self.task_obs_grasp_indices] = self.get_task_obs_grasping(robot)
+
+        return task_obs.copy()
 
     def check_success(self):
         self.current_success, self.current_goal_status = evaluate_goal_conditions(self.goal_conditions)
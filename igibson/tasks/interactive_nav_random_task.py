@@ -1,9 +1,7 @@
 import numpy as np
-import pybullet as p
 
 from igibson.objects.ycb_object import YCBObject
 from igibson.tasks.point_nav_random_task import PointNavRandomTask
-from igibson.utils.utils import restoreState
 
 
 class InteractiveNavRandomTask(PointNavRandomTask):
@@ -46,24 +44,23 @@ class InteractiveNavRandomTask(PointNavRandomTask):
         :param env: environment instance
         """
         max_trials = 100
+        trials_per_batch = 10
 
         for obj in self.interactive_objects:
-            # TODO: p.saveState takes a few seconds, need to speed up
-            state_id = p.saveState()
-            for _ in range(max_trials):
-                _, pos = env.scene.get_random_point(floor=self.floor_num)
-                orn = np.array([0, 0, np.random.uniform(0, np.pi * 2)])
-                reset_success = env.test_valid_position(obj, pos, orn)
-                restoreState(state_id)
+            # The candidate poses are tested in batches
+            for _ in range(max_trials // trials_per_batch):
+                positions = [env.scene.get_random_point(floor=self.floor_num)[1] for _ in range(trials_per_batch)]
+                orns = [np.array([0, 0, np.random.uniform(0, np.pi * 2)]) for _ in range(trials_per_batch)]
+                valid = env.test_valid_positions(obj, positions, orns, stop_at_first_valid=True)
+                reset_success = np.any(valid)
                 if reset_success:
                     break
 
             if not reset_success:
                 print("WARNING: Failed to reset interactive obj without collision")
 
-            env.land(obj, pos, orn)
-
-            p.removeState(state_id)
+            idx = np.argmax(valid) if reset_success else -1
+            env.land(obj, positions[idx], orns[idx])
 
     def reset_scene(self, env):
         """
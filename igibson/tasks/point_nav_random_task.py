@@ -1,10 +1,11 @@
+import hashlib
 import logging
+import os
 
 import numpy as np
-import pybullet as p
 
+import igibson
 from igibson.tasks.point_nav_fixed_task import PointNavFixedTask
-from igibson.utils.utils import l2_distance, restoreState
 
 log = logging.getLogger(__name__)
 
@@ -20,6 +21,178 @@ class PointNavRandomTask(PointNavFixedTask):
         self.target_dist_min = self.config.get("target_dist_min", 1.0)
         self.target_dist_max = self.config.get("target_dist_max", 10.0)
 
+        # Optional pool of precomputed episodes per floor, persisted in the cache folder
+        self.episode_pool_size = self.config.get("episode_pool_size", 0)
+        episode_pool_seed = self.config.get("episode_pool_seed", None)
+        self.episode_rng = np.random if episode_pool_seed is None else np.random.RandomState(episode_pool_seed)
+        self.episode_pools = {}
+
+    def sample_initial_pos_on_floor(self, env, floor, rng):
+        """
+        Sample an initial position among the traversable cells of a floor
+
+        :param env: environment instance
+        :param floor: floor number
+        :param rng: random number generator (np.random or a RandomState)
+        :return: initial position
+        """
+        trav_cells = env.scene.get_traversable_cells(floor)
+        trav_world = env.scene.map_to_world(trav_cells[rng.randint(0, high=trav_cells.shape[0])])
+        return np.append(trav_world, env.scene.floor_heights[floor])
+
+    def sample_target_pos_on_floor(self, env, floor, initial_pos, rng):
+        """
+        Sample a target position at a valid distance from an initial position. The distance from the initial
+        position to every traversable cell is computed at once, and the target is drawn among the valid cells.
+
+        :param env: environment instance
+        :param floor: floor number
+        :param initial_pos: initial position
+        :param rng: random number generator (np.random or a RandomState)
+        :return: target position and its distance, or None if no target is at a valid distance
+        """
+        trav_world = env.scene.map_to_world(env.scene.get_traversable_cells(floor))
+        if env.scene.build_graph:
+            dist = env.scene.get_geodesic_distance_field(floor, initial_pos[:2])
+        else:
+            dist = np.linalg.norm(trav_world - initial_pos[:2], axis=1)
+
+        valid_targets = np.nonzero((self.target_dist_min < dist) & (dist < self.target_dist_max))[0]
+        if valid_targets.shape[0] == 0:
+            return None
+        target_idx = valid_targets[rng.randint(0, high=valid_targets.shape[0])]
+        target_pos = np.append(trav_world[target_idx], env.scene.floor_heights[floor])
+        return target_pos, dist[target_idx]
+
+    def sample_episode(self, env, floor, rng):
+        """
+        Sample an initial position and a target position at a valid distance
+
+        :param env: environment instance
+        :param floor: floor number
+        :param rng: random number generator (np.random or a RandomState)
+        :return: initial position, target position and their distance, or None if no target is at a valid distance
+        """
+        initial_pos = self.sample_initial_pos_on_floor(env, floor, rng)
+        target = self.sample_target_pos_on_floor(env, floor, initial_pos, rng)
+        if target is None:
+            return None
+        return (initial_pos,) + target
+
+    def get_episode_pool_file(self, env, floor):
+        """
+        Get the cache file of the episode pool of a floor, keyed by everything its episodes depend on
+
+        :param env: environment instance
+        :param floor: floor number
+        :return: path of the episode pool file
+        """
+        scene = env.scene
+        key = hashlib.md5()
+        key.update(scene.floor_map[floor].tobytes())
+        key.update(
+            repr(
+                (
+                    scene.trav_map_resolution,
+                    scene.build_graph,
+                    scene.floor_heights[floor],
+                    self.target_dist_min,
+                    self.target_dist_max,
+                    self.episode_pool_size,
+                )
+            ).encode()
+        )
+        return os.path.join(
+            igibson.cache_path,
+            "episode_pools",
+            "{}_floor_{}_{}.npz".format(scene.scene_id, floor, key.hexdigest()),
+        )
+
+    def get_episode_pool(self, env, floor):
+        """
+        Get the pool of (initial position, target position, geodesic distance) episodes of a floor.
+        It is loaded from the cache folder if available, otherwise it is generated with a fixed seed and saved,
+        so that all the workers that share the cache folder draw from the same pool.
+
+        :param env: environment instance
+        :param floor: floor number
+        :return: episode pool, a dictionary of arrays
+        """
+        if floor in self.episode_pools:
+            return self.episode_pools[floor]
+
+        pool_file = self.get_episode_pool_file(env, floor)
+        if os.path.isfile(pool_file):
+            with np.load(pool_file) as data:
+                episode_pool = {key: data[key] for key in data.files}
+        else:
+            log.info("Generating {} episodes for floor {} of {}".format(self.episode_pool_size, floor, pool_file))
+            rng = np.random.RandomState(floor)
+            initial_pos, target_pos, geodesic_dist = [], [], []
+            max_trials = self.episode_pool_size * 10
+            for _ in range(max_trials):
+                episode = self.sample_episode(env, floor, rng)
+                if episode is None:
+                    continue
+                initial_pos.append(episode[0])
+                target_pos.append(episode[1])
+                geodesic_dist.append(episode[2])
+                if len(initial_pos) == self.episode_pool_size:
+                    break
+            assert len(initial_pos) > 0, "Failed to sample any episode on floor {}".format(floor)
+            episode_pool = {
+                "initial_pos": np.array(initial_pos),
+                "target_pos": np.array(target_pos),
+                "geodesic_dist": np.array(geodesic_dist),
+            }
+            os.makedirs(os.path.dirname(pool_file), exist_ok=True)
+            # Write to a temporary file first, workers may generate the same pool concurrently
+            tmp_file = "{}.{}.tmp.npz".format(pool_file[: -len(".npz")], os.getpid())
+            np.savez(tmp_file, **episode_pool)
+            os.replace(tmp_file, pool_file)
+
+        self.episode_pools[floor] = episode_pool
+        return episode_pool
+
+    def sample_initial_pose(self, env):
+        """
+        Sample robot initial pose, its target position is sampled by sample_target_pos
+
+        :param env: environment instance
+        :return: initial position, initial orientation and index of the episode in the episode pool (None without
+            episode pool)
+        """
+        episode_idx = None
+        if self.episode_pool_size > 0:
+            episode_pool = self.get_episode_pool(env, self.floor_num)
+            episode_idx = self.episode_rng.randint(0, high=episode_pool["initial_pos"].shape[0])
+            initial_pos = episode_pool["initial_pos"][episode_idx].copy()
+        else:
+            initial_pos = self.sample_initial_pos_on_floor(env, self.floor_num, self.episode_rng)
+        initial_orn = np.array([0, 0, self.episode_rng.uniform(0, np.pi * 2)])
+        log.debug("Sampled initial pose: {}, {}".format(initial_pos, initial_orn))
+        return initial_pos, initial_orn, episode_idx
+
+    def sample_target_pos(self, env, initial_pos, episode_idx=None):
+        """
+        Sample the target position of an initial position. Without episode pool, this computes the distance from the
+        initial position to the whole floor, so it is only done for the initial poses that are valid.
+
+        :param env: environment instance
+        :param initial_pos: initial position
+        :param episode_idx: index of the episode of the initial position in the episode pool
+        :return: target position, or None if no target is at a valid distance
+        """
+        if episode_idx is not None:
+            target_pos = self.get_episode_pool(env, self.floor_num)["target_pos"][episode_idx].copy()
+        else:
+            target = self.sample_target_pos_on_floor(env, self.floor_num, initial_pos, self.episode_rng)
+            if target is None:
+                return None
+            target_pos = target[0]
+        log.debug("Sampled target position: {}".format(target_pos))
+        return target_pos
+
     def sample_initial_pose_and_target_pos(self, env):
         """
         Sample robot initial pose and target position
@@ -27,24 +200,12 @@ class PointNavRandomTask(PointNavFixedTask):
         :param env: environment instance
         :return: initial pose and target position
         """
-        _, initial_pos = env.scene.get_random_point(floor=self.floor_num)
-        max_trials = 100
-        dist = 0.0
-        for _ in range(max_trials):
-            _, target_pos = env.scene.get_random_point(floor=self.floor_num)
-            if env.scene.build_graph:
-                _, dist = env.scene.get_shortest_path(
-                    self.floor_num, initial_pos[:2], target_pos[:2], entire_path=False
-                )
-            else:
-                dist = l2_distance(initial_pos, target_pos)
-            if self.target_dist_min < dist < self.target_dist_max:
-                break
-        if not (self.target_dist_min < dist < self.target_dist_max):
+        initial_pos, initial_orn, episode_idx = self.sample_initial_pose(env)
+        target_pos = self.sample_target_pos(env, initial_pos, episode_idx)
+        if target_pos is None:
             log.warning("Failed to sample initial and target positions")
-        initial_orn = np.array([0, 0, np.random.uniform(0, np.pi * 2)])
-        log.debug("Sampled initial pose: {}, {}".format(initial_pos, initial_orn))
-        log.debug("Sampled target position: {}".format(target_pos))
+            _, initial_pos = env.scene.get_random_point(floor=self.floor_num)
+            _, target_pos = env.scene.get_random_point(floor=self.floor_num)
         return initial_pos, initial_orn, target_pos
 
     def reset_scene(self, env):
@@ -68,23 +229,31 @@ class PointNavRandomTask(PointNavFixedTask):
         env.robots[0].reset()
         reset_success = False
         max_trials = 100
+        trials_per_batch = 10
 
-        # cache pybullet state
-        # TODO: p.saveState takes a few seconds, need to speed up
-        state_id = p.saveState()
-        for i in range(max_trials):
-            initial_pos, initial_orn, target_pos = self.sample_initial_pose_and_target_pos(env)
-            reset_success = env.test_valid_position(
-                env.robots[0], initial_pos, initial_orn, ignore_self_collision=True
-            ) and env.test_valid_position(env.robots[0], target_pos, ignore_self_collision=True)
-            restoreState(state_id)
+        # The initial poses are tested in batches. The target positions, whose sampling computes the distance to the
+        # whole floor, are only sampled and tested for the valid initial poses, in order, until one is valid
+        for _ in range(max_trials // trials_per_batch):
+            initial_poses = [self.sample_initial_pose(env) for _ in range(trials_per_batch)]
+            initial_valid = env.test_valid_positions(
+                env.robots[0],
+                [initial_pos for initial_pos, _, _ in initial_poses],
+                [initial_orn for _, initial_orn, _ in initial_poses],
+                ignore_self_collision=True,
+            )
+            for i in np.nonzero(initial_valid)[0]:
+                initial_pos, initial_orn, episode_idx = initial_poses[i]
+                target_pos = self.sample_target_pos(env, initial_pos, episode_idx)
+                if target_pos is None:
+                    continue
+                reset_success = env.test_valid_positions(env.robots[0], [target_pos], ignore_self_collision=True)[0]
+                if reset_success:
+                    break
             if reset_success:
                 break
 
         assert reset_success, "WARNING: Failed to reset robot without collision"
 
-        p.removeState(state_id)
-
         self.target_pos = target_pos
         self.initial_pos = initial_pos
         self.initial_orn = initial_orn
@@ -40,16 +40,19 @@ class ReachingRandomTask(PointNavRandomTask):
         """
         return self.get_l2_potential(env)
 
-    def sample_initial_pose_and_target_pos(self, env):
+    def sample_target_pos(self, env, initial_pos, episode_idx=None):
         """
-        Sample robot initial pose and target position
+        Sample the target position of an initial position, above the floor
 
         :param env: environment instance
-        :return: initial pose and target position
+        :param initial_pos: initial position
+        :param episode_idx: index of the episode of the initial position in the episode pool
+        :return: target position, or None if no target is at a valid distance
         """
-        initial_pos, initial_orn, target_pos = super(ReachingRandomTask, self).sample_initial_pose_and_target_pos(env)
-        target_pos[2] += np.random.uniform(self.target_height_range[0], self.target_height_range[1])
-        return initial_pos, initial_orn, target_pos
+        target_pos = super(ReachingRandomTask, self).sample_target_pos(env, initial_pos, episode_idx)
+        if target_pos is not None:
+            target_pos[2] += np.random.uniform(self.target_height_range[0], self.target_height_range[1])
+        return target_pos
 
     def get_task_obs(self, env):
         """
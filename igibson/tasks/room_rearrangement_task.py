@@ -9,7 +9,6 @@ from igibson.tasks.task_base import BaseTask
 from igibson.termination_conditions.max_collision import MaxCollision
 from igibson.termination_conditions.out_of_bound import OutOfBound
 from igibson.termination_conditions.timeout import Timeout
-from igibson.utils.utils import restoreState
 
 log = logging.getLogger(__name__)
 
@@ -97,22 +96,27 @@ class RoomRearrangementTask(BaseTask):
         """
         reset_success = False
         max_trials = 100
-
-        # cache pybullet state
-        # TODO: p.saveState takes a few seconds, need to speed up
-        state_id = p.saveState()
-        for _ in range(max_trials):
-            initial_pos, initial_orn = self.sample_initial_pose(env)
-            reset_success = env.test_valid_position(env.robots[0], initial_pos, initial_orn, ignore_self_collision=True)
-            restoreState(state_id)
+        trials_per_batch = 10
+
+        # The candidate poses are tested in batches
+        for _ in range(max_trials // trials_per_batch):
+            initial_poses = [self.sample_initial_pose(env) for _ in range(trials_per_batch)]
+            valid = env.test_valid_positions(
+                env.robots[0],
+                [initial_pos for initial_pos, _ in initial_poses],
+                [initial_orn for _, initial_orn in initial_poses],
+                ignore_self_collision=True,
+                stop_at_first_valid=True,
+            )
+            reset_success = np.any(valid)
             if reset_success:
                 break
 
         if not reset_success:
             log.warning("WARNING: Failed to reset robot without collision")
 
+        initial_pos, initial_orn = initial_poses[np.argmax(valid) if reset_success else -1]
         env.land(env.robots[0], initial_pos, initial_orn)
-        p.removeState(state_id)
 
     def get_task_obs(self, env):
         """
@@ -1,5 +1,7 @@
 from abc import ABCMeta, abstractmethod
 
+from igibson.render.profiler import step_profiler
+
 
 class BaseTask:
     """
@@ -64,7 +66,8 @@ class BaseTask:
         """
         reward = 0.0
         for reward_function in self.reward_functions:
-            reward += reward_function.get_reward(self, env)
+            with step_profiler.scope(type(reward_function).__name__):
+                reward += reward_function.get_reward(self, env)
 
         return reward, info
 
@@ -82,7 +85,8 @@ class BaseTask:
         done = False
         success = False
         for condition in self.termination_conditions:
-            d, s = condition.get_termination(self, env)
+            with step_profiler.scope(type(condition).__name__):
+                d, s = condition.get_termination(self, env)
             done = done or d
             success = success or s
         info["done"] = done
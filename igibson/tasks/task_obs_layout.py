@@ -0,0 +1,40 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+class TaskObsLayout(object):
+    """
+    Layout of a task observation vector, compiled once: every named field has a fixed slice of the vector, so that the
+    observation is filled in place every step and downstream learners can look up the fields of the vector.
+    """
+
+    def __init__(self):
+        self.index = OrderedDict()
+        self.size = 0
+
+    def add_field(self, name, dim):
+        """
+        Append a field to the layout
+
+        :param name: name of the field
+        :param dim: dimension of the field
+        :return: slice of the field in the observation vector
+        """
+        assert name not in self.index, "Duplicate task observation field {}".format(name)
+        field = slice(self.size, self.size + dim)
+        self.index[name] = field
+        self.size += dim
+        return field
+
+    def get_indices(self, names):
+        """
+        Get the indices of fields of the same dimension, to read or write them at once
+
+        :param names: names of the fields
+        :return: [len(names), dim] array of the indices of the fields in the observation vector
+        """
+        indices = [np.arange(self.index[name].start, self.index[name].stop) for name in names]
+        if not indices:
+            return np.zeros((0, 0), dtype=int)
+        return np.array(indices, dtype=int)
@@ -1,4 +1,6 @@
 import argparse
+import copy
+import hashlib
 import json
 import logging
 import os
@@ -48,14 +50,217 @@ def folder_is_hidden(p):
         return p.startswith(".")  # linux-osx
 
 
+class AssetMetadataRegistry(object):
+    """
+    In-process registry of the iGibson dataset metadata and of its object directory tree.
+
+    Files in ig_dataset/metadata are loaded lazily and memoized. The index of object categories and models is built by
+    walking ig_dataset/objects once and persisted under igibson.cache_path, keyed by get_ig_assets_hash(), so that a
+    new process can answer category/model lookups without walking the dataset tree again.
+    """
+
+    INDEX_VERSION = 1
+
+    def __init__(self, dataset_path=None, cache_path=None):
+        """
+        :param dataset_path: iGibson dataset path, default to igibson.ig_dataset_path
+        :param cache_path: directory of the persisted object index, default to igibson.cache_path
+        """
+        self.dataset_path = dataset_path if dataset_path is not None else igibson.ig_dataset_path
+        self.cache_path = cache_path if cache_path is not None else igibson.cache_path
+        self.metadata = {}
+        self.category_name_to_id = None
+        self.assets_hash = None
+        self.object_index = None
+
+    def clear(self):
+        """
+        Drop all memoized metadata and the in-process object index
+        """
+        self.metadata = {}
+        self.category_name_to_id = None
+        self.assets_hash = None
+        self.object_index = None
+
+    def get_metadata(self, file_name):
+        """
+        Load a file from ig_dataset/metadata. JSON files are parsed, other files are returned as a list of lines.
+
+        :param file_name: file name relative to ig_dataset/metadata
+        :return: parsed content, or None if the file does not exist. The content is shared by all the callers and must
+            not be modified.
+        """
+        if file_name not in self.metadata:
+            metadata_file = os.path.join(self.dataset_path, "metadata", file_name)
+            if not os.path.exists(metadata_file):
+                return None
+            with open(metadata_file, "r") as f:
+                if file_name.endswith(".json"):
+                    self.metadata[file_name] = json.load(f)
+                else:
+                    self.metadata[file_name] = [line.rstrip() for line in f.readlines()]
+        return self.metadata[file_name]
+
+    def get_avg_category_specs(self):
+        """
+        Get average object specs (dimension and mass) for objects
+
+        :return: average specs keyed by object category, or None if the file does not exist
+        """
+        return self.get_metadata("avg_category_specs.json")
+
+    def get_category_ids(self):
+        """
+        Get iGibson object categories
+
+        :return: mapping from category name to category id
+        """
+        if self.category_name_to_id is None:
+            categories = self.get_metadata("categories.txt")
+            if categories is None:
+                raise FileNotFoundError(os.path.join(self.dataset_path, "metadata", "categories.txt"))
+            self.category_name_to_id = {category: i for i, category in enumerate(categories)}
+        return self.category_name_to_id
+
+    def get_assets_hash(self):
+        """
+        Get the iGibson dataset version, memoized for the lifetime of the registry
+
+        :return: iGibson dataset version
+        """
+        if self.assets_hash is None:
+            self.assets_hash = get_ig_assets_hash()
+        return self.assets_hash
+
+    def get_object_index_file(self):
+        """
+        Get the file path of the persisted object index for the current dataset version
+
+        :return: file path, or None if the dataset version cannot be determined
+        """
+        assets_hash = self.get_assets_hash()
+        # An empty hash (b'') means that the dataset is not a git checkout, so there is no key to validate against
+        if assets_hash in ["", "b''"]:
+            return None
+        key = hashlib.md5("{}:{}".format(os.path.realpath(self.dataset_path), assets_hash).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_path, "ig_object_index_{}.json".format(key))
+
+    def build_object_index(self):
+        """
+        Walk ig_dataset/objects and build the index of object categories and models
+
+        :return: object index, mapping from category to a dict with the entries of the category folder, the entries
+            that are model folders and, for those, whether the model has object parts (None if unknown)
+        """
+        ig_categories_path = os.path.join(self.dataset_path, "objects")
+        categories = {}
+        for category in os.listdir(ig_categories_path):
+            category_path = os.path.join(ig_categories_path, category)
+            if not os.path.isdir(category_path):
+                categories[category] = None
+                continue
+            entries = os.listdir(category_path)
+            models = {}
+            for model in entries:
+                model_path = os.path.join(category_path, model)
+                if not os.path.isdir(model_path):
+                    continue
+                metadata_json = os.path.join(model_path, "misc", "metadata.json")
+                has_object_parts = None
+                if os.path.isfile(metadata_json):
+                    with open(metadata_json) as f:
+                        has_object_parts = "object_parts" in json.load(f)
+                models[model] = has_object_parts
+            categories[category] = {"entries": entries, "models": models}
+        return {"version": self.INDEX_VERSION, "categories": categories}
+
+    def get_object_index(self, rebuild=False):
+        """
+        Get the object index, loading it from the persisted cache or building it if needed
+
+        :param rebuild: whether to rebuild the index from the dataset tree, e.g. after objects have been added
+        :return: object index, see build_object_index
+        """
+        if self.object_index is not None and not rebuild:
+            return self.object_index
+
+        index_file = self.get_object_index_file()
+        if not rebuild and index_file is not None and os.path.isfile(index_file):
+            try:
+                with open(index_file, "r") as f:
+                    object_index = json.load(f)
+                if object_index.get("version") == self.INDEX_VERSION:
+                    self.object_index = object_index
+                    return self.object_index
+            except ValueError:
+                log.warning("Corrupted object index cache {}, rebuilding it".format(index_file))
+
+        self.object_index = self.build_object_index()
+        if index_file is not None:
+            try:
+                os.makedirs(self.cache_path, exist_ok=True)
+                tmp_file = "{}.{}.tmp".format(index_file, os.getpid())
+                with open(tmp_file, "w") as f:
+                    json.dump(self.object_index, f, separators=(",", ":"))
+                os.replace(tmp_file, index_file)
+            except OSError:
+                log.warning("Could not write the object index cache to {}".format(index_file))
+        return self.object_index
+
+    def get_category_entry(self, category_name):
+        """
+        Get the index entry of an object category, rebuilding the index once if the category is unknown
+        (e.g. it has been added to the dataset after the index was built)
+
+        :param category_name: object category
+        :return: index entry of the category, or None if it does not exist
+        """
+        categories = self.get_object_index()["categories"]
+        if category_name not in categories and os.path.isdir(os.path.join(self.dataset_path, "objects", category_name)):
+            categories = self.get_object_index(rebuild=True)["categories"]
+        return categories.get(category_name)
+
+    def has_model(self, category_name, model_name):
+        """
+        Check whether an object model exists, rebuilding the index once if the model is unknown
+
+        :param category_name: object category
+        :param model_name: object model
+        :return: whether the model exists
+        """
+        category_entry = self.get_category_entry(category_name)
+        if category_entry is None:
+            return False
+        if model_name not in category_entry["entries"] and os.path.exists(
+            os.path.join(self.dataset_path, "objects", category_name, model_name)
+        ):
+            category_entry = self.get_object_index(rebuild=True)["categories"][category_name]
+        return model_name in category_entry["entries"]
+
+
+_asset_metadata_registry = None
+
+
+def get_asset_metadata_registry():
+    """
+    Get the in-process asset metadata registry of the iGibson dataset
+
+    :return: AssetMetadataRegistry instance
+    """
+    global _asset_metadata_registry
+    if _asset_metadata_registry is None or _asset_metadata_registry.dataset_path != igibson.ig_dataset_path:
+        _asset_metadata_registry = AssetMetadataRegistry()
+    return _asset_metadata_registry
+
+
 def get_ig_avg_category_specs():
     """
     Load average object specs (dimension and mass) for objects
     """
-    avg_obj_dim_file = os.path.join(igibson.ig_dataset_path, "metadata", "avg_category_specs.json")
-    if os.path.exists(avg_obj_dim_file):
-        with open(avg_obj_dim_file) as f:
-            return json.load(f)
+    avg_category_specs = get_asset_metadata_registry().get_avg_category_specs()
+    if avg_category_specs is not None:
+        # Callers may modify the specs, which must not leak into the memoized metadata
+        return copy.deepcopy(avg_category_specs)
     else:
         log.warning(
             "Requested average specs of the object categories in the iGibson Dataset of objects, but the "
@@ -70,13 +275,7 @@ def get_ig_category_ids():
 
     :return: file path to the scene name
     """
-    ig_dataset_path = igibson.ig_dataset_path
-    ig_categories_files = os.path.join(ig_dataset_path, "metadata", "categories.txt")
-    name_to_id = {}
-    with open(ig_categories_files, "r") as fp:
-        for i, l in enumerate(fp.readlines()):
-            name_to_id[l.rstrip()] = i
-    return defaultdict(lambda: 255, name_to_id)
+    return defaultdict(lambda: 255, get_asset_metadata_registry().get_category_ids())
 
 
 def get_available_ig_scenes():
@@ -141,7 +340,9 @@ def get_ig_category_path(category_name):
     """
     ig_dataset_path = igibson.ig_dataset_path
     ig_categories_path = os.path.join(ig_dataset_path, "objects")
-    assert category_name in os.listdir(ig_categories_path), "Category {} does not exist".format(category_name)
+    assert (
+        get_asset_metadata_registry().get_category_entry(category_name) is not None
+    ), "Category {} does not exist".format(category_name)
     return os.path.join(ig_categories_path, category_name)
 
 
@@ -154,9 +355,9 @@ def get_ig_model_path(category_name, model_name):
     :return: file path to the object model
     """
     ig_category_path = get_ig_category_path(category_name)
-    assert model_name in os.listdir(ig_category_path), "Model {} from category {} does not exist".format(
-        model_name, category_name
-    )
+    assert get_asset_metadata_registry().has_model(
+        category_name, model_name
+    ), "Model {} from category {} does not exist".format(model_name, category_name)
     return os.path.join(ig_category_path, model_name)
 
 
@@ -166,18 +367,20 @@ def get_object_models_of_category(category_name, filter_method=None):
 
     :return: a list of all object models of a given
     """
+    get_ig_category_path(category_name)
+    category_entry = get_asset_metadata_registry().get_category_entry(category_name)
     models = []
-    ig_category_path = get_ig_category_path(category_name)
-    for model_name in os.listdir(ig_category_path):
+    for model_name in category_entry["entries"]:
         if filter_method is None:
             models.append(model_name)
         elif filter_method in ["sliceable_part", "sliceable_whole"]:
-            model_path = get_ig_model_path(category_name, model_name)
-            metadata_json = os.path.join(model_path, "misc", "metadata.json")
-            with open(metadata_json) as f:
-                metadata = json.load(f)
-            if (filter_method == "sliceable_part" and "object_parts" not in metadata) or (
-                filter_method == "sliceable_whole" and "object_parts" in metadata
+            has_object_parts = category_entry["models"].get(model_name)
+            if has_object_parts is None:
+                raise FileNotFoundError(
+                    os.path.join(get_ig_model_path(category_name, model_name), "misc", "metadata.json")
+                )
+            if (filter_method == "sliceable_part" and not has_object_parts) or (
+                filter_method == "sliceable_whole" and has_object_parts
             ):
                 models.append(model_name)
         else:
@@ -191,10 +394,8 @@ def get_all_object_categories():
 
     :return: a list of all object categories
     """
-    ig_dataset_path = igibson.ig_dataset_path
-    ig_categories_path = os.path.join(ig_dataset_path, "objects")
-
-    categories = sorted([f for f in os.listdir(ig_categories_path) if not folder_is_hidden(f)])
+    categories = get_asset_metadata_registry().get_object_index()["categories"]
+    categories = sorted([f for f in categories if not folder_is_hidden(f)])
     return categories
 
 
@@ -207,15 +408,12 @@ def get_all_object_models():
     ig_dataset_path = igibson.ig_dataset_path
     ig_categories_path = os.path.join(ig_dataset_path, "objects")
 
-    categories = os.listdir(ig_categories_path)
-    categories = [item for item in categories if os.path.isdir(os.path.join(ig_categories_path, item))]
+    categories = get_asset_metadata_registry().get_object_index()["categories"]
     models = []
-    for category in categories:
-        category_models = os.listdir(os.path.join(ig_categories_path, category))
-        category_models = [
-            item for item in category_models if os.path.isdir(os.path.join(ig_categories_path, category, item))
-        ]
-        models.extend([os.path.join(ig_categories_path, category, item) for item in category_models])
+    for category, category_entry in categories.items():
+        if category_entry is None:
+            continue
+        models.extend([os.path.join(ig_categories_path, category, item) for item in category_entry["models"]])
     return models
 
 
@@ -0,0 +1,58 @@
+"""
+Collision queries between a body and the rest of the pybullet world, with a broad phase.
+
+Checking a body against every body of the world with p.getClosestPoints runs one narrow-phase query per body. The
+broad phase of pybullet keeps the AABB of every link up to date, including when bodies or joints are reset without
+stepping the simulation, so only the bodies whose AABB overlaps the AABB of the queried body, padded by the query
+distance, can be within that distance. The narrow phase is only run for those bodies.
+"""
+import numpy as np
+import pybullet as p
+
+
+def get_body_aabb(body_id):
+    """
+    Get the AABB of all the links of a body
+
+    :param body_id: pybullet body id
+    :return: lower and upper corners of the AABB
+    """
+    aabbs = np.array([p.getAABB(body_id, link_id) for link_id in range(-1, p.getNumJoints(body_id))])
+    return aabbs[:, 0].min(axis=0), aabbs[:, 1].max(axis=0)
+
+
+def get_broad_phase_candidates(body_id, distance=0.0, exclude_body_ids=()):
+    """
+    Get the bodies that may be within a distance of a body
+
+    :param body_id: pybullet body id
+    :param distance: distance below which bodies are considered in collision
+    :param exclude_body_ids: body ids to ignore
+    :return: sorted list of candidate body ids
+    """
+    aabb_min, aabb_max = get_body_aabb(body_id)
+    overlapping = p.getOverlappingObjects(aabb_min - distance, aabb_max + distance)
+    if overlapping is None:
+        return []
+    exclude_body_ids = set(exclude_body_ids)
+    exclude_body_ids.add(body_id)
+    return sorted(set(other_id for other_id, _ in overlapping if other_id not in exclude_body_ids))
+
+
+def detect_collisions(body_id, distance=0.01, exclude_body_ids=(), find_all=False):
+    """
+    Detect the bodies within a distance of a body
+
+    :param body_id: pybullet body id
+    :param distance: distance below which bodies are considered in collision
+    :param exclude_body_ids: body ids to ignore
+    :param find_all: whether to find all the colliding bodies, otherwise stop at the first one (lowest body id)
+    :return: list of (body_id, colliding body id) pairs
+    """
+    collisions = []
+    for other_id in get_broad_phase_candidates(body_id, distance=distance, exclude_body_ids=exclude_body_ids):
+        if len(p.getClosestPoints(body_id, other_id, distance=distance)) > 0:
+            collisions.append((body_id, other_id))
+            if not find_all:
+                break
+    return collisions
@@ -1,11 +1,16 @@
 from __future__ import print_function
 
+import argparse
 import ctypes as ct
 
 # import torchvision.transforms as transforms
+import functools
 import json
+import logging
 import os
 import os.path
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2
 import numpy as np
@@ -15,6 +20,8 @@ from numpy.linalg import inv
 # import torch.utils.data as data
 from PIL import Image
 
+log = logging.getLogger(__name__)
+
 IMG_EXTENSIONS = [
     ".jpg",
     ".JPG",
@@ -48,6 +55,27 @@ def depth_loader(path):
     return img
 
 
+# Rotation applied to the camera_rt_matrix of the pose files, in float32 so that the poses stay float32 matrices, as
+# the point cloud renderer reads them
+POSE_ROTATION = np.array([[0, 1, 0, 0], [0, 0, 1, 0], [-1, 0, 0, 0], [0, 0, 0, 1]], dtype=np.float32)
+
+
+@functools.lru_cache(maxsize=65536)
+def load_view_pose(pose_path):
+    """
+    Load the camera pose of a view from its pose file. Poses are cached, since every view is part of many items
+
+    :param pose_path: path to the point_<uuid>.json file
+    :return: 4x4 float32 camera pose
+    """
+    with open(pose_path) as f:
+        pose_dict = json.load(f)
+    p = np.concatenate(np.array(pose_dict[1]["camera_rt_matrix"])).astype(np.float32).reshape((4, 4))
+    p = np.dot(p, POSE_ROTATION)
+    p.setflags(write=False)
+    return p
+
+
 def get_item_fn(
     inds, select, root, loader, transform, off_3d, target_transform, depth_trans, off_pc_render, dll, train, require_rgb
 ):
@@ -77,15 +105,7 @@ def get_item_fn(
         os.path.join(root, scene, "pano", "semantic", "point_" + item + "_view_equirectangular_domain_semantic.png")
         for item in uuids
     ]
-    poses = []
-    for i, item in enumerate(pose_paths):
-        f = open(item)
-        pose_dict = json.load(f)
-        p = np.concatenate(np.array(pose_dict[1]["camera_rt_matrix"])).astype(np.float32).reshape((4, 4))
-        rotation = np.array([[0, 1, 0, 0], [0, 0, 1, 0], [-1, 0, 0, 0], [0, 0, 0, 1]])
-        p = np.dot(p, rotation)
-        poses.append(p)
-        f.close()
+    poses = [load_view_pose(item) for item in pose_paths]
 
     img_paths = paths[1:]
     target_path = paths[0]
@@ -182,6 +202,466 @@ def get_item_fn(
     return (out_i, out)
 
 
+PACKED_VERSION = 1
+PACKED_INDEX_FILENAME = "index.json"
+PACKED_SCENES_FILENAME = "scenes.json"
+PACKED_POSES_FILENAME = "poses.npy"
+
+# Modality name: (folder and file name suffix in the pano folder, cv2.imread flag)
+PANO_MODALITIES = {
+    "rgb": ("rgb", cv2.IMREAD_COLOR),
+    "mist": ("mist", cv2.IMREAD_UNCHANGED),
+    "normal": ("normal", cv2.IMREAD_COLOR),
+    "semantic": ("semantic", cv2.IMREAD_UNCHANGED),
+}
+
+
+def get_pano_path(root, scene, uuid, modality):
+    """
+    Get the path to the equirectangular image of a view
+
+    :param root: dataset root
+    :param scene: scene name
+    :param uuid: view uuid
+    :param modality: modality name, among PANO_MODALITIES
+    :return: image path
+    """
+    folder = PANO_MODALITIES[modality][0]
+    return os.path.join(
+        root, scene, "pano", folder, "point_" + uuid + "_view_equirectangular_domain_" + folder + ".png"
+    )
+
+
+def decode_pano(path, modality):
+    """
+    Decode the equirectangular image of a view, with the same values as default_loader and depth_loader
+
+    :param path: image path
+    :param modality: modality name, among PANO_MODALITIES
+    :return: image array, RGB for color modalities
+    """
+    img = cv2.imread(path, PANO_MODALITIES[modality][1])
+    if img is None:
+        raise IOError("Cannot read image {}".format(path))
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    return img
+
+
+def get_scene_views(root, scene):
+    """
+    Get the registered views of a scene, from its camera_poses.csv file
+
+    :param root: dataset root
+    :param scene: scene name
+    :return: list of view uuids and array of their positions
+    """
+    uuids = []
+    xyzs = []
+    with open(os.path.join(root, scene, "camera_poses.csv")) as f:
+        for line in f:
+            l = line.strip().split(",")
+            if len(l) < 8:
+                continue
+            uuid = l[0]
+            xyz = list(map(float, l[1:4]))
+            if not os.path.isfile(os.path.join(root, scene, "pano", "points", "point_" + uuid + ".json")):
+                continue
+            # remove scans that are not registered
+            if np.linalg.norm(xyz) <= 1e-5:
+                continue
+            uuids.append(uuid)
+            xyzs.append(xyz)
+    return uuids, np.array(xyzs, dtype=np.float32).reshape(-1, 3)
+
+
+def pack_scene(
+    root,
+    scene,
+    output_root,
+    modalities=("rgb", "mist", "normal"),
+    chunk_size=64,
+    compress=False,
+    num_threads=4,
+    force=False,
+):
+    """
+    Pack the views of a scene for PackedViewDataset: the poses of all the views go in a single array, and the
+    decoded images of each modality go in chunks of chunk_size views. Raw chunks are .npy files that are memory
+    mapped at loading time, compressed chunks are .npz files that are decompressed a chunk at a time.
+    The index file is written last, so a scene that was not completely packed is packed again.
+
+    :param root: dataset root, with one folder per scene
+    :param scene: scene name
+    :param output_root: root of the packed dataset
+    :param modalities: modalities to pack, among PANO_MODALITIES
+    :param chunk_size: number of views per chunk
+    :param compress: whether to compress the chunks
+    :param num_threads: number of threads decoding the images
+    :param force: whether to pack the scene even if it is already packed with the same parameters
+    :return: scene index, or None if the scene has no registered view
+    """
+    output_folder = os.path.join(output_root, scene)
+    index_file = os.path.join(output_folder, PACKED_INDEX_FILENAME)
+    params = {
+        "version": PACKED_VERSION,
+        "chunk_size": chunk_size,
+        "compress": compress,
+        "modalities": sorted(modalities),
+    }
+    if not force and os.path.isfile(index_file):
+        with open(index_file) as f:
+            index = json.load(f)
+        if all(index.get(key) == value for key, value in params.items()):
+            return index
+
+    uuids, xyzs = get_scene_views(root, scene)
+    if len(uuids) == 0:
+        log.warning("Scene {} has no registered view".format(scene))
+        return None
+
+    os.makedirs(output_folder, exist_ok=True)
+    poses = np.stack(
+        [load_view_pose(os.path.join(root, scene, "pano", "points", "point_" + uuid + ".json")) for uuid in uuids]
+    ).astype(np.float32)
+    np.save(os.path.join(output_folder, PACKED_POSES_FILENAME), poses)
+
+    index = dict(params)
+    index["uuids"] = uuids
+    index["xyz"] = xyzs.tolist()
+    index["num_chunks"] = (len(uuids) + chunk_size - 1) // chunk_size
+    index["shapes"] = {}
+    index["dtypes"] = {}
+    with ThreadPoolExecutor(max_workers=max(num_threads, 1)) as executor:
+        for modality in modalities:
+            os.makedirs(os.path.join(output_folder, modality), exist_ok=True)
+            for chunk_i in range(index["num_chunks"]):
+                paths = [
+                    get_pano_path(root, scene, uuid, modality)
+                    for uuid in uuids[chunk_i * chunk_size : (chunk_i + 1) * chunk_size]
+                ]
+                chunk = np.stack(list(executor.map(decode_pano, paths, [modality] * len(paths))))
+                if modality not in index["shapes"]:
+                    index["shapes"][modality] = list(chunk.shape[1:])
+                    index["dtypes"][modality] = chunk.dtype.str
+                elif list(chunk.shape[1:]) != index["shapes"][modality]:
+                    raise ValueError("Images of different sizes for {} in scene {}".format(modality, scene))
+                chunk_file = get_chunk_path(output_folder, modality, chunk_i, compress)
+                tmp_chunk_file = chunk_file + ".tmp"
+                with open(tmp_chunk_file, "wb") as f:
+                    if compress:
+                        np.savez_compressed(f, views=chunk)
+                    else:
+                        np.save(f, chunk)
+                os.replace(tmp_chunk_file, chunk_file)
+            log.info("Packed {} {} views of scene {}".format(len(uuids), modality, scene))
+
+    tmp_index_file = index_file + ".tmp"
+    with open(tmp_index_file, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_index_file, index_file)
+    return index
+
+
+def get_chunk_path(scene_folder, modality, chunk_i, compress):
+    return os.path.join(scene_folder, modality, "chunk_{:05d}.{}".format(chunk_i, "npz" if compress else "npy"))
+
+
+def get_gibson_scenes(root):
+    """
+    Get the scenes of a dataset root that have camera poses and panoramas
+
+    :param root: dataset root
+    :return: sorted list of scene names
+    """
+    return sorted(
+        [
+            d
+            for d in os.listdir(root)
+            if os.path.isfile(os.path.join(root, d, "camera_poses.csv"))
+            and os.path.isdir(os.path.join(root, d, "pano"))
+        ]
+    )
+
+
+def pack_dataset(root, output_root, scenes=None, **kwargs):
+    """
+    Pack the scenes of a dataset root for PackedViewDataset, and record the list of packed scenes so that the
+    dataset does not need to scan the directory tree
+
+    :param root: dataset root, with one folder per scene
+    :param output_root: root of the packed dataset
+    :param scenes: names of the scenes to pack, default to all the scenes with panoramas
+    :param kwargs: parameters of pack_scene
+    :return: dict from scene name to number of packed views
+    """
+    if scenes is None:
+        scenes = get_gibson_scenes(root)
+    num_views = {}
+    for scene in scenes:
+        index = pack_scene(root, scene, output_root, **kwargs)
+        if index is not None:
+            num_views[scene] = len(index["uuids"])
+    os.makedirs(output_root, exist_ok=True)
+    scenes_file = os.path.join(output_root, PACKED_SCENES_FILENAME)
+    tmp_scenes_file = scenes_file + ".tmp"
+    with open(tmp_scenes_file, "w") as f:
+        json.dump(num_views, f, indent=2, sort_keys=True)
+    os.replace(tmp_scenes_file, scenes_file)
+    return num_views
+
+
+class PackedScene(object):
+    """
+    Views of a scene packed by pack_scene. Raw chunks are memory mapped, so that a view is a slice of the mapped
+    file and is only read from disk when it is used.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        with open(os.path.join(folder, PACKED_INDEX_FILENAME)) as f:
+            self.index = json.load(f)
+        if self.index["version"] != PACKED_VERSION:
+            raise ValueError("{} was packed with version {}, pack it again".format(folder, self.index["version"]))
+        self.uuids = self.index["uuids"]
+        self.xyz = np.array(self.index["xyz"], dtype=np.float32).reshape(-1, 3)
+        self.chunk_size = self.index["chunk_size"]
+        self.compress = self.index["compress"]
+        self.poses = np.load(os.path.join(folder, PACKED_POSES_FILENAME), mmap_mode="r")
+        self.chunks = {}
+        # Compressed chunks are decompressed as a whole, each thread keeps the last one of each modality it read,
+        # so that the prefetch threads do not evict the chunks of each other
+        self.local = threading.local()
+
+    def get_chunk(self, modality, chunk_i):
+        if self.compress:
+            if not hasattr(self.local, "last_chunks"):
+                self.local.last_chunks = {}
+            last_chunk_i, chunk = self.local.last_chunks.get(modality, (None, None))
+            if last_chunk_i != chunk_i:
+                with np.load(get_chunk_path(self.folder, modality, chunk_i, True)) as data:
+                    chunk = data["views"]
+                self.local.last_chunks[modality] = (chunk_i, chunk)
+            return chunk
+        key = (modality, chunk_i)
+        if key not in self.chunks:
+            self.chunks[key] = np.load(get_chunk_path(self.folder, modality, chunk_i, False), mmap_mode="r")
+        return self.chunks[key]
+
+    def get_view(self, modality, view_i):
+        """
+        Get the image of a view, without copy for raw chunks
+
+        :param modality: modality name
+        :param view_i: view index in the scene
+        :return: read-only image array
+        """
+        if modality not in self.index["shapes"]:
+            raise ValueError("Modality {} is not packed in {}".format(modality, self.folder))
+        return self.get_chunk(modality, view_i // self.chunk_size)[view_i % self.chunk_size]
+
+    def __getstate__(self):
+        # Memory maps are opened again in each process
+        state = self.__dict__.copy()
+        state["chunks"] = {}
+        del state["local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.local = threading.local()
+
+
+class PackedViewDataset(object):
+    """
+    Gibson panorama dataset read from the output of pack_dataset. Items are sequences of seqlen views of a scene:
+    a target view and its nearest views, with the same content as get_item_fn. The images are memory-mapped slices
+    and the poses are read from a single array, so no image is decoded and no pose file is parsed.
+    Use prefetch to overlap the loading and point cloud rendering of the next items with training.
+    """
+
+    def __init__(
+        self,
+        root,
+        train=False,
+        transform=None,
+        mist_transform=None,
+        seqlen=5,
+        dist_filter=None,
+        off_3d=True,
+        off_pc_render=True,
+        require_rgb=True,
+        only_load=None,
+    ):
+        """
+        :param root: root of the packed dataset
+        :param train: whether to use the train split (first 90% of the scenes) instead of all the scenes
+        :param transform: transform applied to the RGB and normal images, which are given to it as PIL images
+        :param mist_transform: transform applied to the depth images
+        :param seqlen: number of views per item, the target view and seqlen - 1 nearest views
+        :param dist_filter: if set, only keep the target views whose nearest view is closer than this distance
+        :param off_3d: whether to skip the depth and normal images
+        :param off_pc_render: whether to skip the point cloud rendering of the nearest view
+        :param require_rgb: whether to load images at all, otherwise items only contain the relative poses
+        :param only_load: name of the only scene to load
+        """
+        self.root = root
+        self.train = train
+        self.transform = transform
+        self.target_transform = transform
+        self.depth_trans = mist_transform
+        self.seqlen = seqlen
+        self.off_3d = off_3d
+        self.off_pc_render = off_pc_render
+        self.require_rgb = require_rgb
+        self.dll = None
+        if not self.off_pc_render:
+            self.dll = np.ctypeslib.load_library("render", "")
+
+        if only_load is None:
+            with open(os.path.join(root, PACKED_SCENES_FILENAME)) as f:
+                self.scenes = sorted(json.load(f).keys())
+            num_train = int(len(self.scenes) * 0.9)
+            if train:
+                self.scenes = self.scenes[:num_train]
+        else:
+            self.scenes = [only_load]
+
+        self.packed_scenes = [PackedScene(os.path.join(root, scene)) for scene in self.scenes]
+        select_scenes = []
+        select_views = []
+        for scene_i, packed_scene in enumerate(self.packed_scenes):
+            if len(packed_scene.uuids) < seqlen:
+                continue
+            dists = np.linalg.norm(packed_scene.xyz[:, None, :] - packed_scene.xyz[None, :, :], axis=2)
+            # Stable sort, so that ties are ordered by view index and each view comes first in its own sequence
+            nearest = np.argsort(dists, axis=1, kind="stable")[:, :seqlen]
+            if dist_filter is not None and seqlen > 1:
+                nearest = nearest[dists[np.arange(len(nearest)), nearest[:, 1]] < dist_filter]
+            select_scenes.append(np.full(len(nearest), scene_i))
+            select_views.append(nearest)
+        self.select_scenes = np.concatenate(select_scenes) if select_scenes else np.zeros(0, dtype=int)
+        self.select_views = np.concatenate(select_views) if select_views else np.zeros((0, seqlen), dtype=int)
+        log.info("{} scenes, {} items".format(len(self.scenes), len(self)))
+
+    def __len__(self):
+        return len(self.select_scenes)
+
+    def get_select(self, index):
+        """
+        Get the views of an item, in the format of the select list of get_item_fn
+
+        :param index: item index
+        :return: list of [scene, uuid, xyz] of the views, target view first
+        """
+        packed_scene = self.packed_scenes[self.select_scenes[index]]
+        scene = self.scenes[self.select_scenes[index]]
+        return [[scene, packed_scene.uuids[i], packed_scene.xyz[i].tolist()] for i in self.select_views[index]]
+
+    def get_views(self, packed_scene, modality, view_indices):
+        return [packed_scene.get_view(modality, view_i) for view_i in view_indices]
+
+    def transform_views(self, transform, views):
+        """
+        Apply a transform to RGB or normal views. Views are converted to PIL images first, so that the transforms
+        written for the PIL images of the panorama loaders (e.g. torchvision transforms) get the same input
+
+        :param transform: transform, or None to keep the views as arrays
+        :param views: list of images
+        :return: list of transformed views
+        """
+        if transform is None:
+            return views
+        return [transform(Image.fromarray(np.ascontiguousarray(view))) for view in views]
+
+    def __getitem__(self, index):
+        packed_scene = self.packed_scenes[self.select_scenes[index]]
+        view_indices = self.select_views[index]
+        # Float32 4x4 poses, as load_view_pose: the point cloud renderer reads the relative pose as such
+        poses = np.asarray(packed_scene.poses[view_indices], dtype=np.float32)
+        target_pose_inv = inv(poses[0])
+        poses_relative = [torch.from_numpy(np.dot(target_pose_inv, pose)) for pose in poses[1:]]
+
+        imgs, target = None, None
+        mist_imgs, mist_target = None, None
+        normal_imgs, normal_target = None, None
+        if self.require_rgb:
+            target, *imgs = self.get_views(packed_scene, "rgb", view_indices)
+            org_img = imgs[0]
+            imgs = self.transform_views(self.transform, imgs)
+            target = self.transform_views(self.target_transform, [target])[0]
+
+            if not self.off_3d:
+                mist_target, *mist_imgs = [
+                    np.expand_dims(item.astype(np.float32) / 65536.0, 2)
+                    for item in self.get_views(packed_scene, "mist", view_indices)
+                ]
+                org_mist = mist_imgs[0][:, :, 0]
+                if self.depth_trans is not None:
+                    mist_imgs = [self.depth_trans(item) for item in mist_imgs]
+                    mist_target = self.depth_trans(mist_target)
+                if self.train:
+                    normal_target, *normal_imgs = self.get_views(packed_scene, "normal", view_indices)
+                    normal_imgs = self.transform_views(self.transform, normal_imgs)
+                    normal_target = self.transform_views(self.target_transform, [normal_target])[0]
+
+        if self.off_3d:
+            return imgs, target, poses_relative
+        elif self.off_pc_render or not self.require_rgb:
+            return imgs, target, mist_imgs, mist_target, normal_imgs, normal_target, poses_relative
+
+        img = np.ascontiguousarray(org_img)
+        depth = np.ascontiguousarray(org_mist)
+        pose = np.ascontiguousarray(poses_relative[0].numpy())
+        h, w, _ = img.shape
+        render = np.zeros((h, w, 3), dtype="uint8")
+        target_depth = np.zeros((h, w), dtype=np.float32)
+        self.dll.render(
+            ct.c_int(h),
+            ct.c_int(w),
+            img.ctypes.data_as(ct.c_void_p),
+            depth.ctypes.data_as(ct.c_void_p),
+            pose.ctypes.data_as(ct.c_void_p),
+            render.ctypes.data_as(ct.c_void_p),
+            target_depth.ctypes.data_as(ct.c_void_p),
+        )
+        if self.transform is not None:
+            render = self.transform(Image.fromarray(render))
+        if self.depth_trans is not None:
+            target_depth = self.depth_trans(np.expand_dims(target_depth, 2))
+        return imgs, target, mist_imgs, mist_target, normal_imgs, normal_target, poses_relative, render, target_depth
+
+
+def prefetch(dataset, indices=None, num_workers=4, max_prefetch=16):
+    """
+    Iterate over the items of a dataset while the next items are loaded in background threads. Reading the memory
+    mapped images, decoding and the point cloud rendering (a ctypes call) release the GIL, so they overlap with
+    the consumer of the items.
+
+    :param dataset: dataset supporting __getitem__, e.g. PackedViewDataset
+    :param indices: indices of the items to iterate over, in order, default to all the items
+    :param num_workers: number of loading threads
+    :param max_prefetch: maximum number of items loaded ahead of the consumer
+    :return: generator of the items, in the order of indices
+    """
+    if indices is None:
+        indices = range(len(dataset))
+    indices = iter(indices)
+    max_prefetch = max(max_prefetch, 1)
+    pending = []
+    with ThreadPoolExecutor(max_workers=max(num_workers, 1)) as executor:
+        try:
+            for index in indices:
+                pending.append(executor.submit(dataset.__getitem__, index))
+                if len(pending) >= max_prefetch:
+                    yield pending.pop(0).result()
+            while len(pending) > 0:
+                yield pending.pop(0).result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
 """ class ViewDataSet3D(data.Dataset):
     def __init__(self,
                  root=None,
@@ -648,3 +1128,35 @@ if __name__ == '__main__':
         print(len(d))
         sample = d[0]
         print(sample[0].size(), sample[1].size()) """
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack Gibson panoramas for PackedViewDataset")
+    parser.add_argument("--dataroot", required=True, help="path to dataset")
+    parser.add_argument("--output", required=True, help="path to the packed dataset")
+    parser.add_argument("--scenes", nargs="+", default=None, help="scenes to pack, default to all")
+    parser.add_argument(
+        "--modalities", nargs="+", default=["rgb", "mist", "normal"], choices=sorted(PANO_MODALITIES.keys())
+    )
+    parser.add_argument("--chunk_size", type=int, default=64, help="number of views per chunk")
+    parser.add_argument("--compress", action="store_true", help="compress the chunks instead of memory mapping them")
+    parser.add_argument("--num_threads", type=int, default=4, help="number of threads decoding the images")
+    parser.add_argument("--force", action="store_true", help="pack the scenes even if they are already packed")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    num_views = pack_dataset(
+        args.dataroot,
+        args.output,
+        scenes=args.scenes,
+        modalities=args.modalities,
+        chunk_size=args.chunk_size,
+        compress=args.compress,
+        num_threads=args.num_threads,
+        force=args.force,
+    )
+    print("Packed {} scenes, {} views".format(len(num_views), sum(num_views.values())))
+
+
+if __name__ == "__main__":
+    main()
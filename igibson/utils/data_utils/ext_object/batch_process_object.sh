@@ -1,17 +1,9 @@
 #!/bin/bash
 
+# Process all the <category>_<id>.blend files of a folder, see object_pipeline.py for the options
+# (e.g. --num_workers 8, --force). Steps whose inputs did not change since the last run are skipped.
 BASE_DIR=$1
+shift
 
-for FNAME in "$BASE_DIR"/*
-do
-  BASENAME="$(basename $FNAME)"
-  if [[ $BASENAME == *.blend ]]
-  then
-    OBJECT_ID=${BASENAME:0:-6}
-    CATEGORY=${OBJECT_ID:0:-4}
-    echo "File name: "$FNAME
-    echo "Category: "$CATEGORY
-    echo "Object ID: "$OBJECT_ID
-    ./process_object_new.sh $FNAME $CATEGORY $OBJECT_ID
-  fi
-done
\ No newline at end of file
+cd "$(dirname "$0")"
+python object_pipeline.py import --blend_dir "$BASE_DIR" --manifest "$BASE_DIR"/object_pipeline_manifest.json "$@"
@@ -0,0 +1,643 @@
+"""
+Parallel, incremental driver of the object asset processing pipelines.
+
+Each object goes through a small dependency graph of steps (e.g. visual meshes -> collision meshes and metadata ->
+URDF -> visualizations). The steps of all the objects are scheduled on a process pool as soon as their dependencies
+are done, so independent objects (and independent steps of the same object) run in parallel. A step is skipped when
+the content hash of its inputs is the same as in its last successful run and its outputs exist. The status, input
+hash, duration and error of every step are recorded in a JSON manifest, which is saved after every step so that an
+interrupted run can be resumed.
+
+Import objects from .blend files (same layout as batch_process_object.sh):
+    python object_pipeline.py import --blend_dir /path/to/blend_files --num_workers 8
+
+Import objects from folders of meshes (same layout as process_object.sh):
+    python object_pipeline.py import --source_root /path/to/models --category chair --num_workers 8
+
+Recompute the collision meshes of the dataset objects with VHACD (same as mesh_decimation/batch_process_vhacd.py):
+    python object_pipeline.py vhacd --num_workers 8
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import time
+import traceback
+
+import networkx as nx
+
+import igibson
+
+log = logging.getLogger(__name__)
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts")
+VHACD_PATH = os.path.join(igibson.root_path, "utils", "data_utils", "blender_utils", "vhacd")
+
+STATUS_SUCCESS = "success"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+STATUS_DEPENDENCY_FAILED = "dependency_failed"
+
+
+def get_content_hash(paths, extra=None):
+    """
+    Get a hash of the content of files and folders (recursively), and of their names relative to the given paths
+
+    :param paths: list of files or folders, missing paths are part of the hash
+    :param extra: any additional JSON-serializable value that affects the result (e.g. the command line)
+    :return: hex digest
+    """
+    md5 = hashlib.md5()
+    md5.update(json.dumps(extra, sort_keys=True).encode("utf-8"))
+    for path in paths:
+        md5.update(b"\0path\0" + path.encode("utf-8"))
+        if os.path.isdir(path):
+            files = []
+            for root, dirs, file_names in os.walk(path):
+                dirs.sort()
+                files += [os.path.join(root, file_name) for file_name in sorted(file_names)]
+        elif os.path.isfile(path):
+            files = [path]
+        else:
+            md5.update(b"\0missing\0")
+            continue
+        for file_path in files:
+            md5.update(b"\0file\0" + os.path.relpath(file_path, path).encode("utf-8"))
+            with open(file_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    md5.update(chunk)
+    return md5.hexdigest()
+
+
+class ObjectProcessingStep(object):
+    """
+    A step of an object processing pipeline. The functions of the step take the object dict (with at least "key"
+    and "export_dir") and must be defined at module level so that the step can be run in a worker process.
+    """
+
+    def __init__(self, name, dependencies, get_commands, get_inputs, get_outputs, prepare=None, modifies_inputs_of=()):
+        """
+        :param name: name of the step
+        :param dependencies: names of the steps of the same object that need to run before this one
+        :param get_commands: function returning the list of commands (argv lists) to run, in order
+        :param get_inputs: function returning the files and folders whose content determines the step outputs
+        :param get_outputs: function returning the files and folders the step produces
+        :param prepare: optional function called before hashing the inputs (e.g. to back up files modified in place)
+        :param modifies_inputs_of: names of the steps of the same object whose inputs this step modifies in place, so
+            that they are not run again only because of this modification
+        """
+        self.name = name
+        self.dependencies = dependencies
+        self.get_commands = get_commands
+        self.get_inputs = get_inputs
+        self.get_outputs = get_outputs
+        self.prepare = prepare
+        self.modifies_inputs_of = modifies_inputs_of
+
+
+def get_visual_mesh_commands(obj):
+    if obj["source"].endswith(".blend"):
+        script_args = ["--bake", "--source_blend_file", obj["source"]]
+        script = "step_1_visual_mesh_multi_uv.py"
+    else:
+        script_args = ["--source_dir", obj["source"]]
+        script = "step_1_visual_mesh.py"
+    # Without --python-exit-code, blender returns 0 even if the script raised an exception
+    return [
+        ["blender", "-b", "--python-exit-code", "1", "--python", script, "--"]
+        + script_args
+        + ["--dest_dir", obj["export_dir"]]
+    ]
+
+
+def get_visual_mesh_inputs(obj):
+    script = "step_1_visual_mesh_multi_uv.py" if obj["source"].endswith(".blend") else "step_1_visual_mesh.py"
+    return [obj["source"], os.path.join(SCRIPT_DIR, script)]
+
+
+def get_collision_mesh_commands(obj):
+    command = [
+        sys.executable,
+        "step_2_collision_mesh.py",
+        "--input_dir",
+        os.path.join(obj["export_dir"], "shape", "visual"),
+        "--output_dir",
+        os.path.join(obj["export_dir"], "shape", "collision"),
+        "--object_name",
+        obj["object_id"],
+    ]
+    if obj.get("split_loose", False):
+        command.append("--split_loose")
+    return [command]
+
+
+def get_collision_mesh_inputs(obj):
+    return [os.path.join(obj["export_dir"], "shape", "visual"), os.path.join(SCRIPT_DIR, "step_2_collision_mesh.py")]
+
+
+def get_metadata_commands(obj):
+    return [[sys.executable, "step_3_metadata.py", "--input_dir", obj["export_dir"]]]
+
+
+def get_metadata_inputs(obj):
+    return [
+        os.path.join(obj["export_dir"], "shape", "visual"),
+        os.path.join(obj["export_dir"], "shape", "collision"),
+        os.path.join(obj["export_dir"], "material"),
+        os.path.join(SCRIPT_DIR, "step_3_metadata.py"),
+    ]
+
+
+def get_urdf_commands(obj):
+    return [[sys.executable, "step_4_urdf.py", "--input_dir", obj["export_dir"]]]
+
+
+def get_urdf_inputs(obj):
+    return [
+        os.path.join(obj["export_dir"], "shape"),
+        os.path.join(obj["export_dir"], "misc"),
+        os.path.join(SCRIPT_DIR, "step_4_urdf.py"),
+    ]
+
+
+def get_urdf_file(obj):
+    return os.path.join(obj["export_dir"], "{}.urdf".format(obj["object_id"]))
+
+
+def get_visualization_commands(obj):
+    return [[sys.executable, "step_5_visualizations.py", "--input_dir", obj["export_dir"]]]
+
+
+def get_visualization_inputs(obj):
+    return [
+        get_urdf_file(obj),
+        os.path.join(obj["export_dir"], "shape"),
+        os.path.join(obj["export_dir"], "material"),
+        os.path.join(obj["export_dir"], "misc"),
+        os.path.join(SCRIPT_DIR, "step_5_visualizations.py"),
+    ]
+
+
+def get_collision_meshes(obj):
+    collision_dir = os.path.join(obj["export_dir"], "shape", "collision")
+    if not os.path.isdir(collision_dir):
+        return []
+    return sorted(
+        os.path.join(collision_dir, mesh)
+        for mesh in os.listdir(collision_dir)
+        if mesh.endswith(".obj") and not mesh.endswith("_original.obj")
+    )
+
+
+def get_original_collision_mesh(mesh):
+    return os.path.splitext(mesh)[0] + "_original.obj"
+
+
+def backup_collision_meshes(obj):
+    # VHACD overwrites the collision meshes, it always starts from a backup of the original ones
+    for mesh in get_collision_meshes(obj):
+        if not os.path.exists(get_original_collision_mesh(mesh)):
+            shutil.copyfile(mesh, get_original_collision_mesh(mesh))
+
+
+def get_vhacd_commands(obj):
+    return [
+        [VHACD_PATH, "--input", get_original_collision_mesh(mesh), "--output", mesh]
+        for mesh in get_collision_meshes(obj)
+    ]
+
+
+def get_vhacd_inputs(obj):
+    return [get_original_collision_mesh(mesh) for mesh in get_collision_meshes(obj)] + [VHACD_PATH]
+
+
+def get_vhacd_outputs(obj):
+    return get_collision_meshes(obj)
+
+
+PIPELINES = {
+    "import": [
+        ObjectProcessingStep(
+            "visual_mesh",
+            [],
+            get_visual_mesh_commands,
+            get_visual_mesh_inputs,
+            lambda obj: [os.path.join(obj["export_dir"], "shape", "visual")],
+        ),
+        ObjectProcessingStep(
+            "collision_mesh",
+            ["visual_mesh"],
+            get_collision_mesh_commands,
+            get_collision_mesh_inputs,
+            lambda obj: [os.path.join(obj["export_dir"], "shape", "collision")],
+        ),
+        # The bounding box is computed from the collision meshes, and the visual meshes are modified in place
+        ObjectProcessingStep(
+            "metadata",
+            ["visual_mesh", "collision_mesh"],
+            get_metadata_commands,
+            get_metadata_inputs,
+            lambda obj: [os.path.join(obj["export_dir"], "misc")],
+            modifies_inputs_of=["collision_mesh"],
+        ),
+        ObjectProcessingStep(
+            "urdf", ["collision_mesh", "metadata"], get_urdf_commands, get_urdf_inputs, lambda obj: [get_urdf_file(obj)]
+        ),
+        ObjectProcessingStep(
+            "visualization",
+            ["urdf"],
+            get_visualization_commands,
+            get_visualization_inputs,
+            lambda obj: [os.path.join(obj["export_dir"], "visualizations")],
+        ),
+    ],
+    "vhacd": [
+        ObjectProcessingStep(
+            "vhacd",
+            [],
+            get_vhacd_commands,
+            get_vhacd_inputs,
+            get_vhacd_outputs,
+            prepare=backup_collision_meshes,
+        ),
+    ],
+}
+
+
+def get_pipeline_step(pipeline, step_name):
+    """
+    Get a step of a pipeline by name
+
+    :param pipeline: pipeline name, key of PIPELINES
+    :param step_name: step name
+    :return: ObjectProcessingStep
+    """
+    return [step for step in PIPELINES[pipeline] if step.name == step_name][0]
+
+
+def run_object_step(pipeline, step_name, obj, previous_record, force=False, timeout=None, log_file=None):
+    """
+    Run one step of one object, unless its inputs did not change since its last successful run.
+    This is the function executed in the worker processes.
+
+    :param pipeline: pipeline name, key of PIPELINES
+    :param step_name: step name
+    :param obj: object dict
+    :param previous_record: manifest record of the last run of this step, or None
+    :param force: whether to run the step even if its inputs did not change
+    :param timeout: timeout of each command of the step in seconds, None for no timeout
+    :param log_file: file the output of the commands is written to
+    :return: manifest record of this run
+    """
+    step = get_pipeline_step(pipeline, step_name)
+    start_time = time.time()
+    record = {"status": STATUS_FAILED, "started_at": start_time}
+    try:
+        if step.prepare is not None:
+            step.prepare(obj)
+        commands = step.get_commands(obj)
+        input_hash = get_content_hash(step.get_inputs(obj), extra=commands)
+        record["input_hash"] = input_hash
+
+        # Some steps modify their inputs in place, so the hash of the inputs after the last run also counts as
+        # unchanged
+        outputs_exist = all(os.path.exists(output) for output in step.get_outputs(obj))
+        if (
+            not force
+            and previous_record is not None
+            and previous_record["status"] in [STATUS_SUCCESS, STATUS_SKIPPED]
+            and input_hash in [previous_record.get("input_hash"), previous_record.get("input_hash_after_run")]
+            and outputs_exist
+        ):
+            record.update(previous_record)
+            record["status"] = STATUS_SKIPPED
+            record["started_at"] = start_time
+            record["duration"] = time.time() - start_time
+            return record
+
+        if log_file is not None:
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+            record["log_file"] = log_file
+        with open(log_file if log_file is not None else os.devnull, "w") as log_f:
+            for command in commands:
+                log_f.write("$ {}\n".format(" ".join(command)))
+                log_f.flush()
+                result = subprocess.run(
+                    command, cwd=SCRIPT_DIR, stdout=log_f, stderr=subprocess.STDOUT, timeout=timeout
+                )
+                if result.returncode != 0:
+                    record["returncode"] = result.returncode
+                    record["error"] = "Command failed with return code {}: {}".format(
+                        result.returncode, " ".join(command)
+                    )
+                    break
+            else:
+                missing_outputs = [output for output in step.get_outputs(obj) if not os.path.exists(output)]
+                if len(missing_outputs) > 0:
+                    record["error"] = "Missing outputs: {}".format(missing_outputs)
+                else:
+                    record["status"] = STATUS_SUCCESS
+                    record["input_hash_after_run"] = get_content_hash(step.get_inputs(obj), extra=commands)
+                    record["modified_input_hashes"] = {}
+                    for modified_step_name in step.modifies_inputs_of:
+                        modified_step = get_pipeline_step(pipeline, modified_step_name)
+                        record["modified_input_hashes"][modified_step_name] = get_content_hash(
+                            modified_step.get_inputs(obj), extra=modified_step.get_commands(obj)
+                        )
+    except subprocess.TimeoutExpired as e:
+        record["error"] = "Timeout after {}s: {}".format(timeout, " ".join(e.cmd))
+    except Exception:
+        record["error"] = traceback.format_exc()
+
+    record["duration"] = time.time() - start_time
+    return record
+
+
+class ObjectPipelineRunner(object):
+    """
+    Schedule the steps of a pipeline for a list of objects on a process pool, following their dependencies
+    """
+
+    def __init__(self, pipeline, objects, manifest_file, num_workers=1, force=False, timeout=None, log_dir=None):
+        """
+        :param pipeline: pipeline name, key of PIPELINES
+        :param objects: list of object dicts with a unique "key"
+        :param manifest_file: JSON manifest with the record of every step of every object
+        :param num_workers: number of worker processes
+        :param force: whether to run all the steps even if their inputs did not change
+        :param timeout: timeout of each command in seconds, None for no timeout
+        :param log_dir: folder for the output of the commands, next to the manifest by default
+        """
+        self.pipeline = pipeline
+        self.objects = {obj["key"]: obj for obj in objects}
+        self.manifest_file = manifest_file
+        self.num_workers = num_workers
+        self.force = force
+        self.timeout = timeout
+        self.log_dir = log_dir if log_dir is not None else os.path.splitext(manifest_file)[0] + "_logs"
+        self.manifest = self.load_manifest()
+
+        # Dependency graph of (object key, step name) nodes
+        self.graph = nx.DiGraph()
+        for key in self.objects:
+            for step in PIPELINES[pipeline]:
+                self.graph.add_node((key, step.name))
+                for dependency in step.dependencies:
+                    self.graph.add_edge((key, dependency), (key, step.name))
+        assert nx.is_directed_acyclic_graph(self.graph), "The steps of pipeline {} have a cycle".format(pipeline)
+
+    def load_manifest(self):
+        if os.path.isfile(self.manifest_file):
+            with open(self.manifest_file, "r") as f:
+                manifest = json.load(f)
+        else:
+            manifest = {}
+        manifest.setdefault("objects", {})
+        manifest["pipeline"] = self.pipeline
+        return manifest
+
+    def save_manifest(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest_file)), exist_ok=True)
+        tmp_manifest_file = self.manifest_file + ".tmp"
+        with open(tmp_manifest_file, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_manifest_file, self.manifest_file)
+
+    def get_record(self, key, step_name):
+        return self.manifest["objects"].get(key, {}).get("steps", {}).get(step_name)
+
+    def set_record(self, key, step_name, record):
+        object_entry = self.manifest["objects"].setdefault(key, {"steps": {}})
+        object_entry["category"] = self.objects[key].get("category")
+        object_entry["export_dir"] = self.objects[key]["export_dir"]
+        object_entry["steps"][step_name] = record
+
+    def run(self):
+        """
+        Run the pipeline for all the objects
+
+        :return: manifest
+        """
+        remaining_dependencies = {node: self.graph.in_degree(node) for node in self.graph.nodes}
+        ready = [node for node, count in remaining_dependencies.items() if count == 0]
+        running = {}
+        self.manifest["started_at"] = time.time()
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+            while len(ready) > 0 or len(running) > 0:
+                while len(ready) > 0:
+                    key, step_name = ready.pop(0)
+                    log_file = os.path.join(self.log_dir, key, "{}.log".format(step_name))
+                    future = executor.submit(
+                        run_object_step,
+                        self.pipeline,
+                        step_name,
+                        self.objects[key],
+                        self.get_record(key, step_name),
+                        self.force,
+                        self.timeout,
+                        log_file,
+                    )
+                    running[future] = (key, step_name)
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    key, step_name = running.pop(future)
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        # The worker process died
+                        record = {"status": STATUS_FAILED, "error": repr(e)}
+                    self.set_record(key, step_name, record)
+                    log.info("{} {}: {}".format(key, step_name, record["status"]))
+
+                    if record["status"] in [STATUS_SUCCESS, STATUS_SKIPPED]:
+                        # The inputs of the earlier steps that this step modified count as unchanged in the next run
+                        for modified_step_name, input_hash in record.get("modified_input_hashes", {}).items():
+                            modified_record = self.get_record(key, modified_step_name)
+                            if modified_record is not None:
+                                modified_record["input_hash_after_run"] = input_hash
+                        for successor in self.graph.successors((key, step_name)):
+                            remaining_dependencies[successor] -= 1
+                            if remaining_dependencies[successor] == 0:
+                                ready.append(successor)
+                    else:
+                        for descendant in nx.descendants(self.graph, (key, step_name)):
+                            self.set_record(
+                                descendant[0],
+                                descendant[1],
+                                {"status": STATUS_DEPENDENCY_FAILED, "error": "{} failed".format(step_name)},
+                            )
+                    self.save_manifest()
+
+        self.manifest["finished_at"] = time.time()
+        self.save_manifest()
+        return self.manifest
+
+    def get_report(self):
+        """
+        Get the number of steps per status and the total duration of each step, over the objects of this run
+
+        :return: dict from step name to dict with the count per status and the total duration
+        """
+        report = {}
+        for key in self.objects:
+            for step in PIPELINES[self.pipeline]:
+                record = self.get_record(key, step.name)
+                if record is None:
+                    continue
+                step_report = report.setdefault(step.name, {"duration": 0.0})
+                step_report[record["status"]] = step_report.get(record["status"], 0) + 1
+                if record["status"] != STATUS_SKIPPED:
+                    step_report["duration"] += record.get("duration", 0.0)
+        return report
+
+
+def get_blend_objects(blend_dir):
+    """
+    Get the objects to import from a folder of <category>_<4 digit id>.blend files, as in batch_process_object.sh
+
+    :param blend_dir: folder of .blend files, the objects are exported to blend_dir/objects/<category>/<object id>
+    :return: list of object dicts
+    """
+    objects = []
+    for file_name in sorted(os.listdir(blend_dir)):
+        if not file_name.endswith(".blend"):
+            continue
+        object_id = file_name[: -len(".blend")]
+        category = object_id[:-4]
+        objects.append(
+            {
+                "key": "{}/{}".format(category, object_id),
+                "category": category,
+                "object_id": object_id,
+                "source": os.path.join(blend_dir, file_name),
+                "export_dir": os.path.join(blend_dir, "objects", category, object_id),
+            }
+        )
+    return objects
+
+
+def get_source_dir_objects(source_root, category, objects_dir=None, split_loose=True):
+    """
+    Get the objects to import from a folder with one folder of meshes per object, as in process_object.sh
+
+    :param source_root: folder with one subfolder per object
+    :param category: category of all the objects
+    :param objects_dir: folder the objects are exported to, the iGibson dataset objects by default
+    :param split_loose: whether to split the visual meshes into loose parts for the collision meshes
+    :return: list of object dicts
+    """
+    if objects_dir is None:
+        objects_dir = os.path.join(igibson.ig_dataset_path, "objects")
+    objects = []
+    for object_id in sorted(os.listdir(source_root)):
+        if not os.path.isdir(os.path.join(source_root, object_id)):
+            continue
+        objects.append(
+            {
+                "key": "{}/{}".format(category, object_id),
+                "category": category,
+                "object_id": object_id,
+                "source": os.path.join(source_root, object_id),
+                "export_dir": os.path.join(objects_dir, category, object_id),
+                "split_loose": split_loose,
+            }
+        )
+    return objects
+
+
+def get_dataset_objects(objects_dir=None):
+    """
+    Get the objects of a dataset that have collision meshes
+
+    :param objects_dir: folder with one folder per category, the iGibson dataset objects by default
+    :return: list of object dicts
+    """
+    if objects_dir is None:
+        objects_dir = os.path.join(igibson.ig_dataset_path, "objects")
+    objects = []
+    for category in sorted(os.listdir(objects_dir)):
+        category_dir = os.path.join(objects_dir, category)
+        if "json" in category or not os.path.isdir(category_dir):
+            continue
+        for object_id in sorted(os.listdir(category_dir)):
+            collision_dir = os.path.join(category_dir, object_id, "shape", "collision")
+            if not os.path.isdir(collision_dir) or len(os.listdir(collision_dir)) == 0:
+                log.warning("Inputs dir {} does not exist, or is missing mesh files.".format(collision_dir))
+                continue
+            objects.append(
+                {
+                    "key": "{}/{}".format(category, object_id),
+                    "category": category,
+                    "object_id": object_id,
+                    "export_dir": os.path.join(category_dir, object_id),
+                }
+            )
+    return objects
+
+
+def print_report(report):
+    print(
+        "{:<16} {:>8} {:>8} {:>8} {:>18} {:>12}".format(
+            "step", "success", "skipped", "failed", "dependency_failed", "time (s)"
+        )
+    )
+    for step_name, step_report in report.items():
+        print(
+            "{:<16} {:>8} {:>8} {:>8} {:>18} {:>12.1f}".format(
+                step_name,
+                step_report.get(STATUS_SUCCESS, 0),
+                step_report.get(STATUS_SKIPPED, 0),
+                step_report.get(STATUS_FAILED, 0),
+                step_report.get(STATUS_DEPENDENCY_FAILED, 0),
+                step_report["duration"],
+            )
+        )
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Process object assets in parallel, skipping unchanged steps.")
+    parser.add_argument("pipeline", choices=sorted(PIPELINES.keys()), help="Pipeline to run")
+    parser.add_argument("--blend_dir", help="import: folder of <category>_<id>.blend files")
+    parser.add_argument("--source_root", help="import: folder with one folder of meshes per object")
+    parser.add_argument("--category", help="import: category of the objects in --source_root")
+    parser.add_argument("--no_split_loose", action="store_true", help="import: do not split --source_root meshes")
+    parser.add_argument("--objects_dir", help="Folder of the processed objects, the iGibson dataset by default")
+    parser.add_argument("--manifest", help="Manifest file, object_pipeline_<pipeline>.json in the current folder")
+    parser.add_argument("--num_workers", type=int, default=1, help="Number of steps run in parallel")
+    parser.add_argument("--timeout", type=float, default=None, help="Timeout of each command in seconds")
+    parser.add_argument("--force", action="store_true", help="Run all the steps even if their inputs did not change")
+    args = parser.parse_args(args)
+
+    if args.pipeline == "import":
+        if args.blend_dir is not None:
+            objects = get_blend_objects(args.blend_dir)
+        elif args.source_root is not None and args.category is not None:
+            objects = get_source_dir_objects(
+                args.source_root, args.category, args.objects_dir, split_loose=not args.no_split_loose
+            )
+        else:
+            parser.error("import needs either --blend_dir or --source_root and --category")
+    else:
+        objects = get_dataset_objects(args.objects_dir)
+
+    manifest_file = args.manifest if args.manifest is not None else "object_pipeline_{}.json".format(args.pipeline)
+    runner = ObjectPipelineRunner(
+        args.pipeline, objects, manifest_file, num_workers=args.num_workers, force=args.force, timeout=args.timeout
+    )
+    runner.run()
+    report = runner.get_report()
+    print_report(report)
+    print("Manifest saved to {}".format(manifest_file))
+    failed = any(step_report.get(STATUS_FAILED, 0) > 0 for step_report in report.values())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
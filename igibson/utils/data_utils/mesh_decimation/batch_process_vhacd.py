@@ -1,62 +1,14 @@
-import csv
-import os
-import subprocess
-from shutil import copyfile
+import sys
 
-import igibson
+from igibson.utils.data_utils.ext_object.object_pipeline import main
 
-base_dir = os.path.join(igibson.ig_dataset_path, "objects")
+"""
+Recompute the collision meshes of all the iGibson dataset objects with VHACD, starting from a backup of the original
+collision meshes (<mesh>_original.obj). Objects whose original collision meshes did not change since the last run are
+skipped, and the status and duration of every object are recorded in vhacd_manifest.json.
 
-objects = []
-categories = os.listdir(base_dir)
-for category in categories:
-    if "json" not in category:
-        objs = os.listdir(os.path.join(base_dir, category))
-        for obj in objs:
-            objects.append({"category": category, "object_id": obj})
+Additional arguments (e.g. --num_workers 8, --force) are passed to ext_object/object_pipeline.py.
+"""
 
-mesh_names = []
-successes = []
-mesh_counts = []
-
-for obj in objects:
-    category = obj["category"]
-    object_id = obj["object_id"]
-
-    object_export_dir = base_dir + "/{}/{}/shape".format(category, object_id)
-    input_dir = os.path.join(object_export_dir, "collision")
-
-    if not os.path.exists(input_dir) or len(os.listdir(input_dir)) == 0:
-        print("Inputs dir {} does not exist, or is missing mesh files.".format(input_dir))
-        continue
-
-    success = True
-    mesh_count = 0
-    meshes = [mesh for mesh in os.listdir(input_dir) if not mesh.endswith("_original.obj")]
-    # if category != "swivel_chair" or object_id != "2627":
-    #     continue
-    for mesh in meshes:
-        # Copy the original mesh to a backup file
-        backup_mesh = os.path.join(input_dir, os.path.splitext(mesh)[0] + "_original.obj")
-        input_mesh = os.path.join(input_dir, mesh)
-
-        if not os.path.exists(backup_mesh):
-            copyfile(input_mesh, backup_mesh)
-        try:
-            vhacd_path = os.path.join(igibson.root_path, "utils", "data_utils", "blender_utils", "vhacd")
-            # Note, probably should parse the output to make sure this was actually succesful
-            pipe = subprocess.run([vhacd_path, "--input", backup_mesh, "--output", input_mesh])
-            mesh_count += 1
-        except:
-            print("couldn't process {}".format(input_dir))
-            success = False
-
-    mesh_names.append("{}/{}".format(category, object_id))
-    successes.append(success)
-    mesh_counts.append(mesh_count)
-
-with open("vhacd_manifest.csv", "w") as f:
-    writer = csv.writer(f)
-    writer.writerow(["video_id", "category", "object_id"])
-    for mesh_name, success, mesh_count in zip(mesh_names, successes, mesh_counts):
-        writer.writerow([mesh_name, success, mesh_count])
+if __name__ == "__main__":
+    sys.exit(main(["vhacd", "--manifest", "vhacd_manifest.json"] + sys.argv[1:]))
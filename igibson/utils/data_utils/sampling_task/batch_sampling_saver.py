@@ -1,8 +1,10 @@
 import argparse
+import json
+import logging
 import os
-import subprocess
 
-import bddl
+import igibson
+from igibson.utils.data_utils.sampling_task.sampling_farm import SamplingFarm, get_sampling_jobs, print_report
 
 
 def main():
@@ -12,26 +14,30 @@ def main():
         "--num_initializations", type=int, default=1, help="Number of initialization per PDDL per scene."
     )
     parser.add_argument("--start_initialization", type=int, default=0, help="Starting idx for initialization")
+    parser.add_argument("--num_workers", type=int, default=1, help="Number of sampling worker processes.")
+    parser.add_argument("--timeout", type=float, default=1800.0, help="Timeout of a sampling trial in seconds.")
+    parser.add_argument(
+        "--manifest", type=str, default="sampling_manifest.json", help="Manifest file used to resume sampling."
+    )
+    parser.add_argument("--report", type=str, default=None, help="Optional JSON file to write the summary report.")
     args = parser.parse_args()
 
-    condition_dir = os.path.join(os.path.dirname(bddl.__file__), "activity_conditions")
-    for task in sorted(os.listdir(condition_dir)):
-        task_dir = os.path.join(condition_dir, task)
-        if os.path.isdir(task_dir):
-            for task_id_file in sorted(os.listdir(task_dir)):
-                task_id = task_id_file.replace("problem", "")[0]
-                if task_id != "0":
-                    continue
-                subprocess.call(
-                    "python sampling_saver.py --task {} --task_id {} --max_trials {} --num_initializations {} --start_initialization {}".format(
-                        task,
-                        task_id,
-                        args.max_trials,
-                        args.num_initializations,
-                        args.start_initialization,
-                    ),
-                    shell=True,
-                )
+    logging.basicConfig(level=logging.INFO)
+    jobs = get_sampling_jobs(
+        task_ids=[0], num_initializations=args.num_initializations, start_initialization=args.start_initialization
+    )
+    farm = SamplingFarm(
+        config_file=os.path.join(igibson.configs_path, "behavior_robot_vr_behavior_task.yaml"),
+        manifest_file=args.manifest,
+        num_workers=args.num_workers,
+        timeout=args.timeout,
+        max_trials=args.max_trials,
+    )
+    report = farm.run(jobs)
+    print_report(report)
+    if args.report is not None:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
 
 
 if __name__ == "__main__":
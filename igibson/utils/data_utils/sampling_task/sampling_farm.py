@@ -0,0 +1,523 @@
+"""
+Sampling farm for BEHAVIOR activity instances.
+
+A pool of worker processes samples (task, task id, scene, initialization) jobs in parallel. Each worker keeps one
+simulator alive and reuses the loaded scene across jobs: the objects added by the previous task are removed from the
+scene and the scene state is restored, instead of reconstructing the environment. Jobs are recorded in an on-disk
+manifest so that an interrupted run can be resumed, every job has a timeout, and a summary report of the success
+rate and sampling time per task is written at the end.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+from collections import defaultdict
+
+import bddl
+import numpy as np
+import pybullet as p
+
+import igibson
+from igibson.envs.igibson_env import iGibsonEnv
+from igibson.tasks.behavior_task import BehaviorTask
+from igibson.utils.assets_utils import get_available_ig_scenes
+from igibson.utils.utils import parse_config
+
+log = logging.getLogger(__name__)
+
+# Bodies of the objects added by a previous task are moved here, without collisions
+PARKING_POSITION = [0.0, 0.0, -100.0]
+
+
+def get_job_key(job):
+    """
+    Get the unique key of a sampling job, which is also the name of the scene URDF it produces
+
+    :param job: sampling job
+    :return: job key
+    """
+    return "{}_task_{}_{}_{}".format(job["scene_id"], job["task"], job["task_id"], job["init_id"])
+
+
+def get_sampling_jobs(tasks=None, task_ids=(0,), scenes=None, num_initializations=1, start_initialization=0):
+    """
+    Get the list of sampling jobs, sorted by scene so that workers can reuse the loaded scenes
+
+    :param tasks: BEHAVIOR activities to sample, all of them if None
+    :param task_ids: BDDL definition ids to sample
+    :param scenes: scenes to sample in, the preselected scenes of each activity if None
+    :param num_initializations: number of initializations per activity definition per scene
+    :param start_initialization: index of the first initialization
+    :return: list of sampling jobs
+    """
+    condition_dir = os.path.join(os.path.dirname(bddl.__file__), "activity_conditions")
+    if tasks is None:
+        tasks = sorted(task for task in os.listdir(condition_dir) if os.path.isdir(os.path.join(condition_dir, task)))
+
+    with open(os.path.join(os.path.dirname(bddl.__file__), "activity_to_preselected_scenes.json")) as f:
+        activity_to_scenes = json.load(f)
+
+    jobs = []
+    for task in tasks:
+        if scenes is not None:
+            scene_choices = scenes
+        elif task in activity_to_scenes:
+            scene_choices = activity_to_scenes[task]
+        else:
+            scene_choices = [item for item in get_available_ig_scenes() if item.endswith("_int")]
+        for scene_id in scene_choices:
+            for task_id in task_ids:
+                for init_id in range(start_initialization, start_initialization + num_initializations):
+                    jobs.append({"task": task, "task_id": task_id, "scene_id": scene_id, "init_id": init_id})
+
+    return sorted(jobs, key=lambda job: (job["scene_id"], job["task"], job["task_id"], job["init_id"]))
+
+
+class SamplingWorker(object):
+    """
+    Samples activity instances in one simulator, reusing the loaded scene across jobs
+    """
+
+    def __init__(self, config_file, max_jobs_per_env=10):
+        """
+        :param config_file: config file of the environment used for sampling
+        :param max_jobs_per_env: number of jobs after which the environment is rebuilt, because the objects added
+            by the previous tasks can only be parked, not unloaded
+        """
+        self.config_file = config_file
+        self.max_jobs_per_env = max_jobs_per_env
+        self.env = None
+        self.scene_id = None
+        self.num_jobs_on_env = 0
+        self.base_object_names = None
+        self.base_scene_tree = None
+
+    def load_env(self, scene_id):
+        """
+        Build a new environment for the given scene, without any task, and record the initial scene state
+
+        :param scene_id: scene id
+        """
+        self.close_env()
+        env_config = parse_config(self.config_file)
+        env_config.pop("task", None)
+        env_config["scene_id"] = scene_id
+        env_config["online_sampling"] = True
+        env_config["load_clutter"] = True
+        self.env = iGibsonEnv(config_file=env_config, mode="headless")
+        self.scene_id = scene_id
+        self.num_jobs_on_env = 0
+        self.base_object_names = set(self.env.scene.objects_by_name.keys())
+        self.base_scene_tree = self.env.scene.save()
+
+    def close_env(self):
+        """
+        Close the current environment, if any
+        """
+        if self.env is not None:
+            self.env.close()
+        self.env = None
+        self.scene_id = None
+
+    def clear_task(self):
+        """
+        Remove the objects added by the previous task from the scene and restore the initial scene state
+        """
+        scene = self.env.scene
+        for obj_name in list(scene.objects_by_name.keys()):
+            if obj_name in self.base_object_names:
+                continue
+            obj = scene.objects_by_name[obj_name]
+            scene.remove_object(obj)
+            for body_id in obj.get_body_ids():
+                p.resetBasePositionAndOrientation(body_id, PARKING_POSITION, [0, 0, 0, 1])
+                p.changeDynamics(body_id, -1, mass=0.0)
+                for link_id in range(-1, p.getNumJoints(body_id)):
+                    p.setCollisionFilterGroupMask(body_id, link_id, 0, 0)
+        scene.restore(scene_tree=self.base_scene_tree)
+
+    def sample(self, job):
+        """
+        Sample one activity instance and save it as a scene URDF
+
+        :param job: sampling job
+        :return: whether sampling succeeded and the sampling feedback
+        """
+        if self.env is None or self.scene_id != job["scene_id"] or self.num_jobs_on_env >= self.max_jobs_per_env:
+            self.load_env(job["scene_id"])
+        else:
+            self.clear_task()
+
+        self.env.config["task"] = job["task"]
+        self.env.config["task_id"] = job["task_id"]
+        self.env.task = BehaviorTask(self.env)
+        self.num_jobs_on_env += 1
+
+        success = self.env.task.initialized
+        if success:
+            sim_obj_to_bddl_obj = {
+                value.name: {"object_scope": key} for key, value in self.env.task.object_scope.items()
+            }
+            self.env.scene.save(
+                get_job_key(job), save_agent_pose_only=True, additional_attribs_by_name=sim_obj_to_bddl_obj
+            )
+        return success, self.env.task.feedback
+
+
+def sampling_worker_main(worker_id, config_file, max_jobs_per_env, job_queue, result_queue):
+    """
+    Main loop of a sampling worker process: sample the jobs from its job queue until it receives None
+
+    :param worker_id: worker id
+    :param config_file: config file of the environment used for sampling
+    :param max_jobs_per_env: number of jobs after which the environment is rebuilt
+    :param job_queue: queue of (attempt id, job) for this worker
+    :param result_queue: queue of (worker id, attempt id, status, feedback, time) shared by all the workers
+    """
+    worker = SamplingWorker(config_file, max_jobs_per_env=max_jobs_per_env)
+    while True:
+        assignment = job_queue.get()
+        if assignment is None:
+            break
+        attempt_id, job = assignment
+        start = time.time()
+        try:
+            success, feedback = worker.sample(job)
+            status = "success" if success else "failed"
+        except Exception:
+            status, feedback = "error", traceback.format_exc()
+            # The environment may be in an inconsistent state
+            worker.close_env()
+        result_queue.put(
+            (worker_id, attempt_id, status, None if feedback is None else str(feedback), time.time() - start)
+        )
+    worker.close_env()
+
+
+class SamplingFarm(object):
+    """
+    Runs sampling jobs on a pool of worker processes, with a resumable manifest and per-job timeouts
+    """
+
+    def __init__(
+        self,
+        config_file,
+        manifest_file,
+        num_workers=1,
+        timeout=1800.0,
+        max_trials=1,
+        max_jobs_per_env=10,
+        retry_failed=False,
+        worker_main=sampling_worker_main,
+    ):
+        """
+        :param config_file: config file of the environment used for sampling
+        :param manifest_file: JSON file that records the status of every job
+        :param num_workers: number of worker processes
+        :param timeout: maximum time in seconds of a single sampling attempt
+        :param max_trials: maximum number of attempts per job
+        :param max_jobs_per_env: number of jobs after which a worker rebuilds its environment
+        :param retry_failed: whether to retry the jobs that used all their attempts in a previous run
+        :param worker_main: main function of the worker processes
+        """
+        self.config_file = config_file
+        self.manifest_file = manifest_file
+        self.num_workers = num_workers
+        self.timeout = timeout
+        self.max_trials = max_trials
+        self.max_jobs_per_env = max_jobs_per_env
+        self.retry_failed = retry_failed
+        self.worker_main = worker_main
+        self.manifest = self.load_manifest()
+        self.context = multiprocessing.get_context("spawn")
+        self.result_queue = None
+        self.workers = {}
+        self.num_assignments = 0
+
+    def load_manifest(self):
+        """
+        Load the manifest of a previous run, if any
+
+        :return: manifest, job key to job record
+        """
+        if os.path.isfile(self.manifest_file):
+            with open(self.manifest_file) as f:
+                return json.load(f)
+        return {}
+
+    def save_manifest(self):
+        """
+        Save the manifest atomically, so that an interrupted run never leaves a truncated file
+        """
+        manifest_dir = os.path.dirname(os.path.abspath(self.manifest_file))
+        os.makedirs(manifest_dir, exist_ok=True)
+        tmp_file = self.manifest_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, self.manifest_file)
+
+    def get_pending_jobs(self, jobs):
+        """
+        Get the jobs that still need to be sampled, and record the ones already sampled
+
+        :param jobs: all the sampling jobs
+        :return: pending jobs
+        """
+        pending_jobs = []
+        for job in jobs:
+            job_key = get_job_key(job)
+            record = self.manifest.setdefault(job_key, dict(job, status="pending", attempts=0, times=[], feedback=None))
+            if record["status"] == "success":
+                continue
+            urdf_file = os.path.join(igibson.ig_dataset_path, "scenes", job["scene_id"], "urdf", job_key + ".urdf")
+            if os.path.isfile(urdf_file):
+                log.debug("Already cached: {}".format(urdf_file))
+                record["status"] = "success"
+                continue
+            if record["attempts"] >= self.max_trials:
+                if not self.retry_failed:
+                    continue
+                record["attempts"] = 0
+            pending_jobs.append(job)
+        self.save_manifest()
+        return pending_jobs
+
+    def start_worker(self, worker_id):
+        """
+        Start (or restart) a worker process
+
+        :param worker_id: worker id
+        """
+        job_queue = self.context.Queue()
+        process = self.context.Process(
+            target=self.worker_main,
+            args=(worker_id, self.config_file, self.max_jobs_per_env, job_queue, self.result_queue),
+            daemon=True,
+        )
+        process.start()
+        self.workers[worker_id] = {
+            "process": process,
+            "job_queue": job_queue,
+            "job": None,
+            "attempt_id": None,
+            "start": None,
+            "scene_id": None,
+        }
+
+    def stop_worker(self, worker_id):
+        """
+        Kill a worker process
+
+        :param worker_id: worker id
+        """
+        process = self.workers[worker_id]["process"]
+        if process.is_alive():
+            process.terminate()
+        process.join()
+
+    def assign_job(self, worker_id, pending_jobs):
+        """
+        Send the next job to an idle worker, preferring a job in the scene the worker has already loaded. Every
+        assignment gets a new attempt id, so that the result of a killed attempt that was already in the result queue
+        is not taken as the result of the next attempt on the restarted worker.
+
+        :param worker_id: worker id
+        :param pending_jobs: pending jobs, sorted by scene
+        """
+        worker = self.workers[worker_id]
+        job_idx = next((i for i, job in enumerate(pending_jobs) if job["scene_id"] == worker["scene_id"]), 0)
+        job = pending_jobs.pop(job_idx)
+        worker["job"] = job
+        worker["attempt_id"] = self.num_assignments
+        self.num_assignments += 1
+        worker["start"] = time.time()
+        worker["scene_id"] = job["scene_id"]
+        worker["job_queue"].put((worker["attempt_id"], job))
+
+    def record_result(self, job, status, feedback, elapsed, pending_jobs):
+        """
+        Record the result of one sampling attempt in the manifest, and retry the job if it has attempts left
+
+        :param job: sampling job
+        :param status: success, failed, error or timeout
+        :param feedback: sampling feedback or error message
+        :param elapsed: time of the attempt in seconds
+        :param pending_jobs: pending jobs
+        """
+        job_key = get_job_key(job)
+        record = self.manifest[job_key]
+        record["status"] = status
+        record["attempts"] += 1
+        record["times"].append(elapsed)
+        record["feedback"] = feedback
+        self.save_manifest()
+        log.info("{}: {} in {:.1f} s (attempt {})".format(job_key, status, elapsed, record["attempts"]))
+        if status != "success" and record["attempts"] < self.max_trials:
+            pending_jobs.insert(0, job)
+
+    def run(self, jobs):
+        """
+        Sample all the given jobs that are not done yet
+
+        :param jobs: sampling jobs
+        :return: summary report
+        """
+        pending_jobs = self.get_pending_jobs(jobs)
+        log.info("{} jobs, {} pending".format(len(jobs), len(pending_jobs)))
+        self.result_queue = self.context.Queue()
+        for worker_id in range(min(self.num_workers, len(pending_jobs))):
+            self.start_worker(worker_id)
+
+        try:
+            while len(pending_jobs) > 0 or any(worker["job"] is not None for worker in self.workers.values()):
+                for worker_id, worker in self.workers.items():
+                    if worker["job"] is None and len(pending_jobs) > 0:
+                        self.assign_job(worker_id, pending_jobs)
+
+                try:
+                    worker_id, attempt_id, status, feedback, elapsed = self.result_queue.get(timeout=1.0)
+                    worker = self.workers[worker_id]
+                    if worker["job"] is not None and worker["attempt_id"] == attempt_id:
+                        job, worker["job"] = worker["job"], None
+                        self.record_result(job, status, feedback, elapsed, pending_jobs)
+                    else:
+                        log.debug("Ignoring the result of the stale attempt {}".format(attempt_id))
+                except queue.Empty:
+                    pass
+
+                # Kill and restart the workers that exceeded the timeout or crashed
+                for worker_id, worker in list(self.workers.items()):
+                    if worker["job"] is None:
+                        continue
+                    elapsed = time.time() - worker["start"]
+                    if elapsed > self.timeout:
+                        status, feedback = "timeout", "Sampling took more than {} s".format(self.timeout)
+                    elif not worker["process"].is_alive():
+                        status, feedback = "error", "Worker exited with code {}".format(worker["process"].exitcode)
+                    else:
+                        continue
+                    job = worker["job"]
+                    self.stop_worker(worker_id)
+                    self.record_result(job, status, feedback, elapsed, pending_jobs)
+                    self.start_worker(worker_id)
+        finally:
+            for worker_id, worker in self.workers.items():
+                if worker["process"].is_alive():
+                    worker["job_queue"].put(None)
+            for worker_id in self.workers:
+                self.workers[worker_id]["process"].join(timeout=10.0)
+                self.stop_worker(worker_id)
+            self.workers = {}
+
+        return self.get_report(jobs)
+
+    def get_report(self, jobs):
+        """
+        Get the summary report of the given jobs from the manifest
+
+        :param jobs: sampling jobs
+        :return: per-task report of the number of jobs, success rate and sampling time
+        """
+        records_by_task = defaultdict(list)
+        for job in jobs:
+            records_by_task[job["task"]].append(self.manifest[get_job_key(job)])
+
+        report = {}
+        for task, records in sorted(records_by_task.items()):
+            times = [t for record in records for t in record["times"]]
+            num_success = sum(record["status"] == "success" for record in records)
+            report[task] = {
+                "num_jobs": len(records),
+                "num_success": num_success,
+                "success_rate": num_success / len(records),
+                "num_attempts": len(times),
+                "mean_attempt_time": float(np.mean(times)) if len(times) > 0 else None,
+                "total_time": float(np.sum(times)),
+                "status": {
+                    status: sum(record["status"] == status for record in records)
+                    for status in sorted(set(record["status"] for record in records))
+                },
+            }
+        return report
+
+
+def print_report(report):
+    """
+    Print a summary report
+
+    :param report: report returned by SamplingFarm.run
+    """
+    print("{:<50} {:>6} {:>8} {:>9} {:>10}".format("task", "jobs", "success", "attempts", "s/attempt"))
+    for task, task_report in report.items():
+        print(
+            "{:<50} {:>6} {:>7.0%} {:>9} {:>10}".format(
+                task,
+                task_report["num_jobs"],
+                task_report["success_rate"],
+                task_report["num_attempts"],
+                "-" if task_report["mean_attempt_time"] is None else "{:.1f}".format(task_report["mean_attempt_time"]),
+            )
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=str, nargs="+", help="BEHAVIOR activities to sample (default: all).")
+    parser.add_argument("--task_ids", type=int, nargs="+", default=[0], help="BDDL integer IDs to sample.")
+    parser.add_argument("--scenes", type=str, nargs="+", help="Scenes to sample in (default: preselected scenes).")
+    parser.add_argument("--max_trials", type=int, default=1, help="Maximum number of trials to try sampling.")
+    parser.add_argument(
+        "--num_initializations", type=int, default=1, help="Number of initialization per PDDL per scene."
+    )
+    parser.add_argument("--start_initialization", type=int, default=0, help="Starting idx for initialization")
+    parser.add_argument("--num_workers", type=int, default=1, help="Number of worker processes.")
+    parser.add_argument("--timeout", type=float, default=1800.0, help="Timeout of a sampling trial in seconds.")
+    parser.add_argument(
+        "--max_jobs_per_env", type=int, default=10, help="Number of jobs after which a worker reloads its scene."
+    )
+    parser.add_argument(
+        "--manifest", type=str, default="sampling_manifest.json", help="Manifest file used to resume sampling."
+    )
+    parser.add_argument("--report", type=str, default=None, help="Optional JSON file to write the summary report.")
+    parser.add_argument("--retry_failed", action="store_true", help="Retry the jobs that failed in a previous run.")
+    parser.add_argument(
+        "--config",
+        type=str,
+        default=os.path.join(igibson.configs_path, "behavior_robot_vr_behavior_task.yaml"),
+        help="Environment config file used for sampling.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    jobs = get_sampling_jobs(
+        tasks=args.tasks,
+        task_ids=args.task_ids,
+        scenes=args.scenes,
+        num_initializations=args.num_initializations,
+        start_initialization=args.start_initialization,
+    )
+    farm = SamplingFarm(
+        config_file=args.config,
+        manifest_file=args.manifest,
+        num_workers=args.num_workers,
+        timeout=args.timeout,
+        max_trials=args.max_trials,
+        max_jobs_per_env=args.max_jobs_per_env,
+        retry_failed=args.retry_failed,
+    )
+    report = farm.run(jobs)
+    print_report(report)
+    if args.report is not None:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,10 @@ import logging
 import os
 
 import bddl
-from IPython import embed
 
 import igibson
 from igibson.envs.igibson_env import iGibsonEnv
+from igibson.utils.assets_utils import get_available_ig_scenes
 from igibson.utils.utils import parse_config
 
 log = logging.getLogger(__name__)
@@ -88,7 +88,6 @@ def main():
                 env.scene.save(urdf_path, save_agent_pose_only=True, additional_attribs_by_name=sim_obj_to_bddl_obj)
                 log.warning(("Saved:", urdf_path))
                 env.close()
-                embed()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,736 @@
+"""
+Replay farm for batches of BEHAVIOR demos.
+
+A pool of worker processes replays the demos of a manifest in parallel. Each worker keeps its environment alive and
+resets it between consecutive demos of the same scene and activity instance, instead of rebuilding it for every demo.
+The demos can be split into shards that are processed independently, e.g. on different machines. The status, replay
+times and output hashes of every demo are recorded in an on-disk manifest so that an interrupted run can be resumed,
+every replay attempt has a timeout and runs isolated in its worker process, failed attempts are retried, and a report
+of the replay time and failures of every demo is produced at the end. A single worker can also replay the demos in the
+calling process, without timeout or isolation, so that its callbacks do not need to be picklable.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Metadata attributes of a demo that determine the environment it is replayed in
+ENV_KEY_ATTRS = [
+    "/metadata/scene_id",
+    "/metadata/atus_activity",
+    "/metadata/activity_definition",
+    "/metadata/instance_id",
+    "/metadata/urdf_file",
+    "/metadata/physics_timestep",
+    "/metadata/render_timestep",
+    "/metadata/vr_settings",
+]
+
+
+def get_replay_env_key(demo_file):
+    """
+    Get the key of the environment a demo is replayed in. Demos with the same key can be replayed in the same
+    environment, which is reset between them.
+
+    :param demo_file: demo file
+    :return: environment key, or None if the metadata of the demo cannot be read
+    """
+    try:
+        with h5py.File(demo_file, "r") as f:
+            values = [f.attrs.get(attr_name) for attr_name in ENV_KEY_ATTRS]
+    except (OSError, KeyError):
+        return None
+    return "|".join(value.decode("utf-8") if isinstance(value, bytes) else str(value) for value in values)
+
+
+def get_shard_id(demo, num_shards):
+    """
+    Get the shard of a demo, which only depends on its name so that the shards are stable when demos are added
+
+    :param demo: demo name, as listed in the manifest
+    :param num_shards: number of shards
+    :return: shard id
+    """
+    return int(hashlib.md5(Path(demo).name.encode("utf-8")).hexdigest(), 16) % num_shards
+
+
+def get_replay_jobs(demo_dir, demos, num_shards=1, shard_id=0):
+    """
+    Get the replay jobs of the demos of a shard
+
+    :param demo_dir: directory containing the demo files
+    :param demos: demo names, as listed in the manifest
+    :param num_shards: number of shards the demos are split into
+    :param shard_id: shard to replay
+    :return: list of replay jobs, in the order of the demos
+    """
+    jobs = []
+    for demo in demos:
+        if "replay" in demo or get_shard_id(demo, num_shards) != shard_id:
+            continue
+        demo_file = os.path.join(demo_dir, demo)
+        jobs.append(
+            {
+                "demo": demo,
+                "demo_file": demo_file,
+                "demo_name": os.path.splitext(demo)[0],
+                "env_key": get_replay_env_key(demo_file),
+            }
+        )
+    return jobs
+
+
+def get_replay_log_file(out_dir, demo_name):
+    """
+    :param out_dir: output directory
+    :param demo_name: demo name, without extension
+    :return: replay log file of the demo
+    """
+    return os.path.join(out_dir, demo_name + "_replay_log.json")
+
+
+def hash_file(filename):
+    """
+    :param filename: file
+    :return: md5 hash of the file content
+    """
+    md5 = hashlib.md5()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def get_demo_outputs(out_dir, demo_name):
+    """
+    Hash the outputs of a demo, which are the files of the output directory named after the demo: the replay log,
+    the frames and whatever the callbacks saved as <demo_name>_<suffix> or <demo_name>.<extension>
+
+    :param out_dir: output directory
+    :param demo_name: demo name, without extension
+    :return: dict mapping the path of every output relative to out_dir to its md5 hash
+    """
+    prefix = os.path.join(out_dir, demo_name)
+    folder, name = os.path.split(prefix)
+    if not os.path.isdir(folder):
+        return {}
+    outputs = {}
+    for filename in sorted(os.listdir(folder)):
+        path = os.path.join(folder, filename)
+        if filename.startswith((name + "_", name + ".")) and os.path.isfile(path):
+            outputs[os.path.relpath(path, out_dir)] = hash_file(path)
+    return outputs
+
+
+def check_demo_outputs(out_dir, outputs):
+    """
+    :param out_dir: output directory
+    :param outputs: dict mapping the path of every output relative to out_dir to its md5 hash
+    :return: whether all the outputs exist with the same content
+    """
+    for path, md5 in outputs.items():
+        path = os.path.join(out_dir, path)
+        if not os.path.isfile(path) or hash_file(path) != md5:
+            return False
+    return len(outputs) > 0
+
+
+class DemoReplayWorker(object):
+    """
+    Replays demos one after the other, reusing its environment across demos with the same environment key
+    """
+
+    def __init__(
+        self,
+        out_dir,
+        get_callbacks_callback=None,
+        save_frames=False,
+        debug_display=False,
+        image_size=(1280, 720),
+        reuse_env=True,
+        max_demos_per_env=100,
+        replay_function=None,
+        create_env_function=None,
+    ):
+        """
+        :param out_dir: directory to store results in
+        :param get_callbacks_callback: function called for each demo with demo_name and out_dir, returning the
+            (start_callbacks, step_callbacks, end_callbacks, data_callbacks) of the demo, see replay_demo_batch
+        :param save_frames: whether the frames of the demos should be saved alongside statistics
+        :param debug_display: whether a debug display (the pybullet GUI) should be enabled
+        :param image_size: image size used by the renderer
+        :param reuse_env: whether the environment is reused for consecutive demos with the same environment key
+        :param max_demos_per_env: number of demos after which the environment is rebuilt, to bound the effect of any
+            state that leaks across resets
+        :param replay_function: function replaying a demo, replay_demo if None
+        :param create_env_function: function creating the environment of a demo, create_replay_env if None
+        """
+        if replay_function is None or create_env_function is None:
+            # Imported here so that the parent process of the farm does not need to load the simulator
+            from igibson.examples.learning.demo_replaying_example import create_replay_env, replay_demo
+
+            replay_function = replay_function or replay_demo
+            create_env_function = create_env_function or create_replay_env
+        self.out_dir = out_dir
+        self.get_callbacks_callback = get_callbacks_callback
+        self.save_frames = save_frames
+        self.debug_display = debug_display
+        self.image_size = image_size
+        self.reuse_env = reuse_env
+        self.max_demos_per_env = max_demos_per_env
+        self.replay_function = replay_function
+        self.create_env_function = create_env_function
+        self.env = None
+        self.env_key = None
+        self.num_demos_on_env = 0
+
+    def get_env(self, job):
+        """
+        Get the environment to replay a demo in, reusing the current one if it has the same environment key
+
+        :param job: replay job
+        :return: environment, or None to let the replay function create and close its own environment
+        """
+        # The frame save path is set when the environment is created, so frames require a new environment
+        if not self.reuse_env or self.save_frames or job["env_key"] is None:
+            self.close_env()
+            return None
+        if self.env is None or self.env_key != job["env_key"] or self.num_demos_on_env >= self.max_demos_per_env:
+            self.close_env()
+            self.env = self.create_env_function(
+                job["demo_file"], mode="headless", image_size=self.image_size, use_pb_gui=self.debug_display
+            )
+            self.env_key = job["env_key"]
+            self.num_demos_on_env = 0
+        self.num_demos_on_env += 1
+        return self.env
+
+    def close_env(self):
+        """
+        Close the current environment, if any
+        """
+        if self.env is not None:
+            self.env.close()
+        self.env = None
+        self.env_key = None
+
+    def replay(self, job):
+        """
+        Replay one demo, run its data callbacks and save its replay log
+
+        :param job: replay job
+        :return: replay information of the demo
+        """
+        if self.get_callbacks_callback is not None:
+            start_callbacks, step_callbacks, end_callbacks, data_callbacks = self.get_callbacks_callback(
+                demo_name=job["demo_name"], out_dir=self.out_dir
+            )
+        else:
+            start_callbacks, step_callbacks, end_callbacks, data_callbacks = [], [], [], []
+
+        frame_save_path = None
+        if self.save_frames:
+            frame_save_path = os.path.join(self.out_dir, job["demo_name"] + ".mp4")
+
+        demo_information = self.replay_function(
+            in_demo_file=job["demo_file"],
+            frame_save_dir=frame_save_path,
+            start_callbacks=start_callbacks,
+            step_callbacks=step_callbacks,
+            end_callbacks=end_callbacks,
+            mode="headless",
+            use_pb_gui=self.debug_display,
+            verbose=False,
+            image_size=self.image_size,
+            env=self.get_env(job),
+        )
+        demo_information["failed"] = False
+        demo_information["filename"] = Path(job["demo"]).name
+
+        for callback in data_callbacks:
+            demo_information.update(callback())
+
+        replay_log_file = get_replay_log_file(self.out_dir, job["demo_name"])
+        os.makedirs(os.path.dirname(replay_log_file), exist_ok=True)
+        with open(replay_log_file, "w") as f:
+            json.dump(demo_information, f)
+        return demo_information
+
+
+def run_replay_job(worker, job):
+    """
+    Run one replay attempt, catching its errors
+
+    :param worker: DemoReplayWorker
+    :param job: replay job
+    :return: status, error message, time in seconds, number of frames and outputs of the attempt
+    """
+    start = time.time()
+    num_frames = None
+    try:
+        demo_information = worker.replay(job)
+        num_frames = demo_information.get("total_frame_num")
+        status, error = "success", None
+    except Exception:
+        status, error = "error", traceback.format_exc()
+        # The environment may be in an inconsistent state
+        worker.close_env()
+    elapsed = time.time() - start
+    outputs = get_demo_outputs(worker.out_dir, job["demo_name"]) if status == "success" else {}
+    return status, error, elapsed, num_frames, outputs
+
+
+def replay_worker_main(worker_id, worker_kwargs, deactivate_logger, job_queue, result_queue):
+    """
+    Main loop of a replay worker process: replay the jobs from its job queue until it receives None
+
+    :param worker_id: worker id
+    :param worker_kwargs: keyword arguments of DemoReplayWorker
+    :param deactivate_logger: whether to deactivate the root logger of the worker
+    :param job_queue: queue of (attempt id, job) for this worker
+    :param result_queue: queue of results shared by all the workers
+    """
+    if deactivate_logger:
+        logging.getLogger().disabled = True
+    worker = DemoReplayWorker(**worker_kwargs)
+    while True:
+        assignment = job_queue.get()
+        if assignment is None:
+            break
+        attempt_id, job = assignment
+        result_queue.put((worker_id, attempt_id) + run_replay_job(worker, job))
+    worker.close_env()
+
+
+def pop_next_job(pending_jobs, env_key):
+    """
+    Pop the next pending job, preferring a demo that can be replayed in the environment that is already loaded
+
+    :param pending_jobs: pending jobs
+    :param env_key: environment key of the loaded environment, or None
+    :return: replay job
+    """
+    job_idx = 0
+    if env_key is not None:
+        job_idx = next((i for i, job in enumerate(pending_jobs) if job["env_key"] == env_key), 0)
+    return pending_jobs.pop(job_idx)
+
+
+class DemoReplayFarm(object):
+    """
+    Replays demos on a pool of worker processes, or in this process with a single worker, with a resumable manifest,
+    per-demo timeouts and retries
+    """
+
+    def __init__(
+        self,
+        out_dir,
+        manifest_file=None,
+        get_callbacks_callback=None,
+        num_workers=1,
+        timeout=7200.0,
+        max_trials=2,
+        skip_existing=True,
+        retry_failed=False,
+        reuse_env=True,
+        max_demos_per_env=100,
+        save_frames=False,
+        debug_display=False,
+        image_size=(1280, 720),
+        deactivate_logger=True,
+        replay_function=None,
+        create_env_function=None,
+        use_processes=None,
+    ):
+        """
+        :param out_dir: directory to store results in
+        :param manifest_file: JSON file that records the status of every demo, replay_manifest.json in out_dir if None
+        :param get_callbacks_callback: function called for each demo with demo_name and out_dir, returning the
+            (start_callbacks, step_callbacks, end_callbacks, data_callbacks) of the demo. With worker processes, it is
+            called in the workers, so it must be defined at module level.
+        :param num_workers: number of worker processes
+        :param timeout: maximum time in seconds of a single replay attempt, only enforced with worker processes
+        :param max_trials: maximum number of attempts per demo
+        :param skip_existing: whether the demos whose outputs are recorded in the manifest, or that have a replay log
+            from a previous run without manifest, should be skipped. Replay logs marked as failed count as failures.
+        :param retry_failed: whether to retry the demos that used all their attempts in a previous run
+        :param reuse_env: whether the workers reuse their environment for demos of the same scene and activity instance
+        :param max_demos_per_env: number of demos after which a worker rebuilds its environment
+        :param save_frames: whether the frames of the demos should be saved alongside statistics
+        :param debug_display: whether a debug display (the pybullet GUI) should be enabled
+        :param image_size: image size used by the renderer
+        :param deactivate_logger: whether to deactivate the root logger of the worker processes
+        :param replay_function: function replaying a demo, replay_demo if None. Must be defined at module level with
+            worker processes.
+        :param create_env_function: function creating the environment of a demo, create_replay_env if None. Must be
+            defined at module level with worker processes.
+        :param use_processes: whether to replay the demos in worker processes, with a timeout and isolation of every
+            attempt. If False, a single worker replays the demos in this process, and a crash of a replay stops the
+            run. Defaults to worker processes only when num_workers is more than 1.
+        """
+        self.out_dir = out_dir
+        self.manifest_file = manifest_file or os.path.join(out_dir, "replay_manifest.json")
+        self.num_workers = num_workers
+        self.timeout = timeout
+        self.max_trials = max_trials
+        self.skip_existing = skip_existing
+        self.retry_failed = retry_failed
+        self.deactivate_logger = deactivate_logger
+        self.use_processes = num_workers > 1 if use_processes is None else use_processes
+        self.worker_kwargs = {
+            "out_dir": out_dir,
+            "get_callbacks_callback": get_callbacks_callback,
+            "save_frames": save_frames,
+            "debug_display": debug_display,
+            "image_size": image_size,
+            "reuse_env": reuse_env,
+            "max_demos_per_env": max_demos_per_env,
+            "replay_function": replay_function,
+            "create_env_function": create_env_function,
+        }
+        self.manifest = self.load_manifest()
+        self.context = multiprocessing.get_context("spawn")
+        self.result_queue = None
+        self.workers = {}
+        # Number of jobs assigned to the workers, used as the id of each attempt
+        self.num_assignments = 0
+
+    def load_manifest(self):
+        """
+        Load the manifest of a previous run, if any
+
+        :return: manifest, demo to demo record
+        """
+        if os.path.isfile(self.manifest_file):
+            with open(self.manifest_file) as f:
+                return json.load(f)
+        return {}
+
+    def save_manifest(self):
+        """
+        Save the manifest atomically, so that an interrupted run never leaves a truncated file
+        """
+        manifest_dir = os.path.dirname(os.path.abspath(self.manifest_file))
+        os.makedirs(manifest_dir, exist_ok=True)
+        tmp_file = self.manifest_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, self.manifest_file)
+
+    def get_pending_jobs(self, jobs):
+        """
+        Get the jobs that still need to be replayed, and record the ones already replayed
+
+        :param jobs: all the replay jobs
+        :return: pending jobs, in the order of the given jobs
+        """
+        pending_jobs = []
+        for job in jobs:
+            record = self.manifest.get(job["demo"])
+            if record is None or not self.skip_existing:
+                record = self.manifest[job["demo"]] = {
+                    "status": "pending",
+                    "attempts": 0,
+                    "times": [],
+                    "num_frames": None,
+                    "error": None,
+                    "outputs": {},
+                }
+            if record["status"] == "pending" and self.skip_existing:
+                self.record_previous_replay(job, record)
+            if record["status"] == "success":
+                if check_demo_outputs(self.out_dir, record["outputs"]):
+                    continue
+                log.info("Outputs of {} are missing or modified, replaying it again".format(job["demo"]))
+                record["status"] = "pending"
+                record["attempts"] = 0
+            elif record["attempts"] >= self.max_trials:
+                if not self.retry_failed:
+                    continue
+                record["attempts"] = 0
+            pending_jobs.append(job)
+        self.save_manifest()
+        return pending_jobs
+
+    def record_previous_replay(self, job, record):
+        """
+        Record the replay log of a demo replayed before the manifest existed, if any. The demos whose log marks them
+        as failed used all their attempts, the other ones succeeded.
+
+        :param job: replay job
+        :param record: manifest record of the demo, which is pending
+        """
+        replay_log_file = get_replay_log_file(self.out_dir, job["demo_name"])
+        if not os.path.isfile(replay_log_file):
+            return
+        try:
+            with open(replay_log_file) as f:
+                demo_information = json.load(f)
+        except ValueError:
+            log.warning("Invalid replay log {}, replaying the demo again".format(replay_log_file))
+            return
+        log.debug("Already replayed before the manifest: {}".format(job["demo"]))
+        if demo_information.get("failed", False):
+            record["status"] = "error"
+            record["attempts"] = self.max_trials
+            record["error"] = demo_information.get("failure_reason")
+        else:
+            record["status"] = "success"
+            record["outputs"] = get_demo_outputs(self.out_dir, job["demo_name"])
+
+    def start_worker(self, worker_id):
+        """
+        Start (or restart) a worker process
+
+        :param worker_id: worker id
+        """
+        job_queue = self.context.Queue()
+        process = self.context.Process(
+            target=replay_worker_main,
+            args=(worker_id, self.worker_kwargs, self.deactivate_logger, job_queue, self.result_queue),
+            daemon=True,
+        )
+        process.start()
+        self.workers[worker_id] = {
+            "process": process,
+            "job_queue": job_queue,
+            "job": None,
+            "attempt_id": None,
+            "start": None,
+            "env_key": None,
+        }
+
+    def stop_worker(self, worker_id):
+        """
+        Kill a worker process
+
+        :param worker_id: worker id
+        """
+        process = self.workers[worker_id]["process"]
+        if process.is_alive():
+            process.terminate()
+        process.join()
+
+    def assign_job(self, worker_id, pending_jobs):
+        """
+        Send the next job to an idle worker, preferring a demo that can be replayed in the environment the worker
+        has already loaded
+
+        :param worker_id: worker id
+        :param pending_jobs: pending jobs
+        """
+        worker = self.workers[worker_id]
+        job = pop_next_job(pending_jobs, worker["env_key"])
+        self.num_assignments += 1
+        worker["job"] = job
+        worker["attempt_id"] = self.num_assignments
+        worker["start"] = time.time()
+        worker["env_key"] = job["env_key"]
+        worker["job_queue"].put((worker["attempt_id"], job))
+
+    def record_result(self, job, status, error, elapsed, num_frames, outputs, pending_jobs):
+        """
+        Record the result of one replay attempt in the manifest, and retry the demo if it has attempts left. A demo
+        that used all its attempts gets a replay log marking it as failed, as the serial batch replay did.
+
+        :param job: replay job
+        :param status: success, error or timeout
+        :param error: error message
+        :param elapsed: time of the attempt in seconds
+        :param num_frames: number of frames of the demo
+        :param outputs: outputs of the demo and their hashes
+        :param pending_jobs: pending jobs
+        """
+        record = self.manifest[job["demo"]]
+        record["status"] = status
+        record["attempts"] += 1
+        record["times"].append(elapsed)
+        record["num_frames"] = num_frames
+        record["error"] = error
+        record["outputs"] = outputs
+        log.info("{}: {} in {:.1f} s (attempt {})".format(job["demo"], status, elapsed, record["attempts"]))
+        if status != "success":
+            if record["attempts"] < self.max_trials:
+                pending_jobs.insert(0, job)
+            else:
+                log.info("Demo failed with the error: {}".format(error))
+                with open(get_replay_log_file(self.out_dir, job["demo_name"]), "w") as f:
+                    json.dump({"demo_id": Path(job["demo"]).name, "failed": True, "failure_reason": error}, f)
+        self.save_manifest()
+
+    def run(self, jobs):
+        """
+        Replay all the given jobs that are not done yet
+
+        :param jobs: replay jobs
+        :return: report of the replay times and failures
+        """
+        os.makedirs(self.out_dir, exist_ok=True)
+        pending_jobs = self.get_pending_jobs(jobs)
+        log.info("{} demos, {} pending".format(len(jobs), len(pending_jobs)))
+        if self.use_processes:
+            self.run_in_processes(pending_jobs)
+        else:
+            self.run_in_process(pending_jobs)
+        return self.get_report(jobs)
+
+    def run_in_process(self, pending_jobs):
+        """
+        Replay the pending jobs one after the other in this process
+
+        :param pending_jobs: pending jobs
+        """
+        worker = DemoReplayWorker(**self.worker_kwargs)
+        try:
+            while len(pending_jobs) > 0:
+                job = pop_next_job(pending_jobs, worker.env_key)
+                status, error, elapsed, num_frames, outputs = run_replay_job(worker, job)
+                self.record_result(job, status, error, elapsed, num_frames, outputs, pending_jobs)
+        finally:
+            worker.close_env()
+
+    def run_in_processes(self, pending_jobs):
+        """
+        Replay the pending jobs on the worker processes, killing and restarting the workers that time out or crash
+
+        :param pending_jobs: pending jobs
+        """
+        self.result_queue = self.context.Queue()
+        for worker_id in range(min(self.num_workers, len(pending_jobs))):
+            self.start_worker(worker_id)
+
+        try:
+            while len(pending_jobs) > 0 or any(worker["job"] is not None for worker in self.workers.values()):
+                for worker_id, worker in self.workers.items():
+                    if worker["job"] is None and len(pending_jobs) > 0:
+                        self.assign_job(worker_id, pending_jobs)
+
+                try:
+                    worker_id, attempt_id, status, error, elapsed, num_frames, outputs = self.result_queue.get(
+                        timeout=1.0
+                    )
+                    worker = self.workers[worker_id]
+                    # A result sent by an attempt that was then killed is not the result of the current attempt
+                    if worker["job"] is not None and worker["attempt_id"] == attempt_id:
+                        job, worker["job"] = worker["job"], None
+                        if status != "success":
+                            # The worker closed its environment
+                            worker["env_key"] = None
+                        self.record_result(job, status, error, elapsed, num_frames, outputs, pending_jobs)
+                    else:
+                        log.debug(
+                            "Ignoring the result of the killed attempt {} of worker {}".format(attempt_id, worker_id)
+                        )
+                except queue.Empty:
+                    pass
+
+                # Kill and restart the workers that exceeded the timeout or crashed
+                for worker_id, worker in list(self.workers.items()):
+                    if worker["job"] is None:
+                        continue
+                    elapsed = time.time() - worker["start"]
+                    if elapsed > self.timeout:
+                        status, error = "timeout", "Replay took more than {} s".format(self.timeout)
+                    elif not worker["process"].is_alive():
+                        status, error = "error", "Worker exited with code {}".format(worker["process"].exitcode)
+                    else:
+                        continue
+                    job = worker["job"]
+                    self.stop_worker(worker_id)
+                    self.record_result(job, status, error, elapsed, None, {}, pending_jobs)
+                    self.start_worker(worker_id)
+        finally:
+            for worker_id, worker in self.workers.items():
+                if worker["process"].is_alive():
+                    worker["job_queue"].put(None)
+            for worker_id in self.workers:
+                self.workers[worker_id]["process"].join(timeout=10.0)
+                self.stop_worker(worker_id)
+            self.workers = {}
+
+    def get_report(self, jobs):
+        """
+        Get the report of the given jobs from the manifest
+
+        :param jobs: replay jobs
+        :return: report with the status, attempts, replay time and error of every demo, in the order of the jobs, and
+            a summary of the replay times and failures
+        """
+        demos = {}
+        for job in jobs:
+            record = self.manifest[job["demo"]]
+            demos[job["demo"]] = {
+                "status": record["status"],
+                "attempts": record["attempts"],
+                "time": record["times"][-1] if len(record["times"]) > 0 else None,
+                "total_time": float(np.sum(record["times"])),
+                "num_frames": record["num_frames"],
+                "error": record["error"],
+            }
+
+        times = [demo["time"] for demo in demos.values() if demo["status"] == "success" and demo["time"] is not None]
+        num_frames = [
+            demo["num_frames"]
+            for demo in demos.values()
+            if demo["status"] == "success" and demo["time"] is not None and demo["num_frames"] is not None
+        ]
+        summary = {
+            "num_demos": len(demos),
+            "status": {
+                status: sum(demo["status"] == status for demo in demos.values())
+                for status in sorted(set(demo["status"] for demo in demos.values()))
+            },
+            "total_time": float(sum(demo["total_time"] for demo in demos.values())),
+            "mean_time": float(np.mean(times)) if len(times) > 0 else None,
+            "median_time": float(np.median(times)) if len(times) > 0 else None,
+            "max_time": float(np.max(times)) if len(times) > 0 else None,
+            "frames_per_second": float(np.sum(num_frames) / np.sum(times))
+            if len(num_frames) == len(times) and np.sum(times) > 0
+            else None,
+            "failed": [demo for demo, record in demos.items() if record["status"] != "success"],
+        }
+        return {"summary": summary, "demos": demos}
+
+
+def print_report(report):
+    """
+    Print a replay report
+
+    :param report: report returned by DemoReplayFarm.run
+    """
+    print("{:<70} {:>10} {:>9} {:>9} {:>8}".format("demo", "status", "attempts", "time (s)", "frames"))
+    for demo, record in report["demos"].items():
+        print(
+            "{:<70} {:>10} {:>9} {:>9} {:>8}".format(
+                demo,
+                record["status"],
+                record["attempts"],
+                "-" if record["time"] is None else "{:.1f}".format(record["time"]),
+                "-" if record["num_frames"] is None else record["num_frames"],
+            )
+        )
+    summary = report["summary"]
+    print(
+        "{} demos: {}, {:.1f} s in total".format(
+            summary["num_demos"],
+            ", ".join("{} {}".format(count, status) for status, count in summary["status"].items()),
+            summary["total_time"],
+        )
+    )
+    if summary["median_time"] is not None:
+        print("Replay time: median {:.1f} s, max {:.1f} s".format(summary["median_time"], summary["max_time"]))
+    for demo in summary["failed"]:
+        error = report["demos"][demo]["error"]
+        print(
+            "Failed: {}: {}".format(demo, error.strip().splitlines()[-1] if error else report["demos"][demo]["status"])
+        )
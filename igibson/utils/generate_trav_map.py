@@ -1,13 +1,22 @@
 #!/usr/bin/env python
 
 import argparse
+import json
+import logging
+import multiprocessing
 import os
-import random
 
-from igibson.scenes.igibson_indoor_scene import SCENE_SOURCE, InteractiveIndoorScene
-from igibson.simulator import Simulator
-from igibson.utils.assets_utils import get_3dfront_scene_path, get_cubicasa_scene_path, get_ig_scene_path
+import numpy as np
+
+from igibson.scenes.igibson_indoor_scene import SCENE_SOURCE
 from igibson.utils.map_utils import gen_trav_map
+from igibson.utils.scene_mesh_utils import (
+    STRUCTURE_CATEGORIES,
+    get_scene_dir,
+    get_scene_mesh,
+    get_scene_mesh_hash,
+    get_scene_object_entries,
+)
 
 """
 script to generate all traversability maps:
@@ -15,66 +24,149 @@ script to generate all traversability maps:
 for file in ../../igibson/ig_dataset/scenes/*
   python generate_trav_map.py $(basename $file)
 
+or, for several scenes in parallel:
+
+  python generate_trav_map.py --num_workers 8 Rs_int Beechwood_0_int ...
+
 to generate traversability maps for cubicasa5k or 3dfront:
 pass in additional flag --source CUBICASA or --source THREEDFRONT
 
+The meshes are read directly from the scene URDF, no renderer is needed. The objects are at the pose given by the
+URDF: unlike the previous generation with the Simulator, no physics step is run to let them settle before the meshes
+are read. The maps of a scene are only generated again if the files they are built from have changed since the last
+run (use --force to always generate them).
 """
 
+log = logging.getLogger(__name__)
 
-def generate_trav_map(scene_name, scene_source, load_full_scene=True):
-    if scene_source not in SCENE_SOURCE:
-        raise ValueError("Unsupported scene source: {}".format(scene_source))
-    if scene_source == "IG":
-        scene_dir = get_ig_scene_path(scene_name)
-    elif scene_source == "CUBICASA":
-        scene_dir = get_cubicasa_scene_path(scene_name)
-    else:
-        scene_dir = get_3dfront_scene_path(scene_name)
-    random.seed(0)
-    scene = InteractiveIndoorScene(
-        scene_name, build_graph=False, texture_randomization=False, scene_source=scene_source
-    )
-    if not load_full_scene:
-        scene._set_first_n_objects(3)
-    s = Simulator(mode="headless", image_width=512, image_height=512, device_idx=0)
-    s.import_scene(scene)
+# Increase when the map generation changes, to invalidate the maps generated before
+TRAV_MAP_VERSION = 1
+TRAV_MAP_INPUTS_FILENAME = "trav_map_inputs.json"
 
-    if load_full_scene:
-        scene.open_all_doors()
+# Variants of the maps: name, whether objects are included, traversability and obstacle map file name formats
+TRAV_MAP_VARIANTS = [
+    ("no_obj", False, "floor_trav_no_obj_{}.png", "floor_no_obj_{}.png"),
+    ("full", True, "floor_trav_{}.png", "floor_{}.png"),
+]
 
-    for i in range(20):
-        s.step()
 
-    vertices_info, faces_info = s.renderer.dump()
-    s.disconnect()
+def generate_trav_map(scene_name, scene_source="IG", floors=(0.0,), force=False, urdf_file=None):
+    """
+    Generate the traversability and obstacle maps of a scene, with and without objects, from a single read of its
+    meshes. The doors are opened for the maps with objects.
 
-    if load_full_scene:
-        trav_map_filename_format = "floor_trav_{}.png"
-        obstacle_map_filename_format = "floor_{}.png"
-    else:
-        trav_map_filename_format = "floor_trav_no_obj_{}.png"
-        obstacle_map_filename_format = "floor_no_obj_{}.png"
-
-    gen_trav_map(
-        vertices_info,
-        faces_info,
-        output_folder=os.path.join(scene_dir, "layout"),
-        trav_map_filename_format=trav_map_filename_format,
-        obstacle_map_filename_format=obstacle_map_filename_format,
-    )
+    :param scene_name: scene name
+    :param scene_source: source of the scene, among IG, CUBICASA and THREEDFRONT
+    :param floors: height of each floor
+    :param force: whether to generate the maps even if their inputs did not change
+    :param urdf_file: name of the scene URDF file (without .urdf), default to <scene_name>_best
+    :return: dict from variant name to whether its maps were generated
+    """
+    if scene_source not in SCENE_SOURCE:
+        raise ValueError("Unsupported scene source: {}".format(scene_source))
+    output_folder = os.path.join(get_scene_dir(scene_name, scene_source), "layout")
+    inputs_file = os.path.join(output_folder, TRAV_MAP_INPUTS_FILENAME)
+    previous_inputs = {}
+    if os.path.isfile(inputs_file):
+        with open(inputs_file, "r") as f:
+            previous_inputs = json.load(f)
+
+    entries = get_scene_object_entries(scene_name, scene_source, urdf_file=urdf_file)
+    inputs = {}
+    to_generate = []
+    for variant, with_objects, trav_map_filename_format, obstacle_map_filename_format in TRAV_MAP_VARIANTS:
+        variant_entries = [entry for entry in entries if with_objects or entry["category"] in STRUCTURE_CATEGORIES]
+        inputs[variant] = get_scene_mesh_hash(
+            variant_entries, extra={"version": TRAV_MAP_VERSION, "floors": list(floors), "variant": variant}
+        )
+        outputs_exist = all(
+            os.path.isfile(os.path.join(output_folder, filename_format.format(i_floor)))
+            for filename_format in [trav_map_filename_format, obstacle_map_filename_format]
+            for i_floor in range(len(floors))
+        )
+        if force or not outputs_exist or previous_inputs.get(variant) != inputs[variant]:
+            to_generate.append(variant)
+
+    if len(to_generate) > 0:
+        # Read the meshes once for all the variants
+        vertices, faces, face_entries = get_scene_mesh(entries)
+        is_structure = np.array([entry["category"] in STRUCTURE_CATEGORIES for entry in entries])[face_entries]
+        for variant, with_objects, trav_map_filename_format, obstacle_map_filename_format in TRAV_MAP_VARIANTS:
+            if variant not in to_generate:
+                continue
+            log.info("Generating {} traversability maps of {}".format(variant, scene_name))
+            variant_faces = faces if with_objects else faces[is_structure]
+            # Only keep the vertices used by the variant, they determine the size of the maps
+            used_vertices, variant_faces = np.unique(variant_faces, return_inverse=True)
+            gen_trav_map(
+                vertices[used_vertices],
+                variant_faces.reshape(-1, 3),
+                output_folder=output_folder,
+                trav_map_filename_format=trav_map_filename_format,
+                obstacle_map_filename_format=obstacle_map_filename_format,
+                floors=floors,
+            )
+            previous_inputs[variant] = inputs[variant]
+
+        tmp_inputs_file = inputs_file + ".tmp"
+        with open(tmp_inputs_file, "w") as f:
+            json.dump(previous_inputs, f, indent=2)
+        os.replace(tmp_inputs_file, inputs_file)
+
+    return {variant: variant in to_generate for variant, _, _, _ in TRAV_MAP_VARIANTS}
+
+
+def generate_trav_map_worker(args):
+    scene_name, scene_source, floors, force = args
+    try:
+        return scene_name, generate_trav_map(scene_name, scene_source, floors=floors, force=force), None
+    except Exception as e:
+        log.exception("Failed to generate the traversability maps of {}".format(scene_name))
+        return scene_name, None, repr(e)
 
 
 def main():
     parser = argparse.ArgumentParser(description="Generate Traversability Map")
     parser.add_argument("scene_names", metavar="s", type=str, nargs="+", help="The name of the scene to process")
     parser.add_argument(
-        "--source", dest="source", help="Source of the scene, should be among [CUBICASA, IG, THREEDFRONT]"
+        "--source",
+        dest="source",
+        default="IG",
+        help="Source of the scene, should be among [CUBICASA, IG, THREEDFRONT]",
     )
+    parser.add_argument("--floors", type=float, nargs="+", default=[0.0], help="Height of each floor")
+    parser.add_argument("--num_workers", type=int, default=1, help="Number of scenes processed in parallel")
+    parser.add_argument("--force", action="store_true", help="Generate the maps even if their inputs did not change")
 
     args = parser.parse_args()
-    for scene_name in args.scene_names:
-        generate_trav_map(scene_name, args.source, False)
-        generate_trav_map(scene_name, args.source, True)
+    # Each scene is processed once, and its results are reported in the order of the arguments
+    scene_names = list(dict.fromkeys(args.scene_names))
+    jobs = [(scene_name, args.source, tuple(args.floors), args.force) for scene_name in scene_names]
+    if args.num_workers > 1:
+        with multiprocessing.Pool(min(args.num_workers, len(jobs))) as pool:
+            results = list(pool.imap_unordered(generate_trav_map_worker, jobs))
+    else:
+        results = [generate_trav_map_worker(job) for job in jobs]
+    results = {scene_name: (generated, error) for scene_name, generated, error in results}
+
+    failed = False
+    for scene_name in scene_names:
+        generated, error = results[scene_name]
+        if error is not None:
+            print("{}: failed ({})".format(scene_name, error))
+            failed = True
+        else:
+            print(
+                "{}: {}".format(
+                    scene_name,
+                    ", ".join(
+                        "{} {}".format(variant, "generated" if is_generated else "up to date")
+                        for variant, is_generated in generated.items()
+                    ),
+                )
+            )
+    if failed:
+        exit(1)
 
 
 if __name__ == "__main__":
@@ -4,21 +4,27 @@ import cv2
 import numpy as np
 from PIL import Image
 from scipy.spatial import ConvexHull
-from tqdm import tqdm
 
 
 def get_xy_floors(vertices, faces, dist_threshold=-0.98):
-    z_faces = []
-    z = np.array([0, 0, 1])
-    faces_selected = []
-    for face in tqdm(faces):
-        normal = np.cross(vertices[face[2]] - vertices[face[1]], vertices[face[1]] - vertices[face[0]])
-        dist = np.dot(normal, z) / np.linalg.norm(normal)
-        if (dist_threshold is None) or ((dist_threshold is not None) and (dist < dist_threshold)):
-            z_faces.append(vertices[face[0]][2])
-            faces_selected.append(face)
+    """
+    Select the faces whose normal points downwards, i.e. the floor faces with the winding order of the scene meshes
+
+    :param vertices: (V, 3) array of vertices
+    :param faces: (F, 3) array of vertex indices
+    :param dist_threshold: maximum cosine between the face normal and the z axis, None to select all the faces
+    :return: height of the selected faces, vertices and selected faces
+    """
+    faces = np.asarray(faces)
+    if dist_threshold is None:
+        return vertices[faces[:, 0], 2], vertices, faces
 
-    return np.array(z_faces), vertices, faces_selected
+    triangles = vertices[faces]
+    normal = np.cross(triangles[:, 2] - triangles[:, 1], triangles[:, 1] - triangles[:, 0])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dist = normal[:, 2] / np.linalg.norm(normal, axis=1)
+    faces_selected = faces[dist < dist_threshold]
+    return vertices[faces_selected[:, 0], 2], vertices, faces_selected
 
 
 def gen_trav_map(
@@ -28,11 +34,19 @@ def gen_trav_map(
     add_clutter=False,
     trav_map_filename_format="floor_trav_{}.png",
     obstacle_map_filename_format="floor_{}.png",
+    floors=(0.0,),
 ):
     """
     Generate traversability maps.
+
+    :param vertices: (V, 3) array of scene vertices in the world frame
+    :param faces: (F, 3) array of vertex indices
+    :param output_folder: folder to save the maps in
+    :param add_clutter: whether to remove the area below objects from the traversable area
+    :param trav_map_filename_format: file name format of the traversability maps, formatted with the floor index
+    :param obstacle_map_filename_format: file name format of the obstacle maps, formatted with the floor index
+    :param floors: height of each floor
     """
-    floors = [0.0]
 
     z_faces, vertices, faces_selected = get_xy_floors(vertices, faces)
     z_faces_all, vertices_all, faces_selected_all = get_xy_floors(vertices, faces, dist_threshold=None)
@@ -43,20 +57,23 @@ def gen_trav_map(
     max_length = np.max([np.abs(xmin), np.abs(ymin), np.abs(xmax), np.abs(ymax)])
     max_length = np.ceil(max_length).astype(int)
 
-    wall_maps = gen_map(vertices, faces, output_folder, img_filename_format=obstacle_map_filename_format)
-    wall_pts = np.array(np.where(wall_maps[0] == 0)).T
-    wall_convex_hull = ConvexHull(wall_pts)
-    wall_map_hull = np.zeros(wall_maps[0].shape).astype(np.uint8)
-    cv2.fillPoly(
-        wall_map_hull,
-        [wall_convex_hull.points[wall_convex_hull.vertices][:, ::-1].reshape((-1, 1, 2)).astype(np.int32)],
-        255,
-    )
+    wall_maps = gen_map(vertices, faces, output_folder, img_filename_format=obstacle_map_filename_format, floors=floors)
 
     for i_floor in range(len(floors)):
         floor = floors[i_floor]
+
+        # Each floor is cropped with the convex hull of its own walls
+        wall_pts = np.array(np.where(wall_maps[i_floor] == 0)).T
+        wall_convex_hull = ConvexHull(wall_pts)
+        wall_map_hull = np.zeros(wall_maps[i_floor].shape).astype(np.uint8)
+        cv2.fillPoly(
+            wall_map_hull,
+            [wall_convex_hull.points[wall_convex_hull.vertices][:, ::-1].reshape((-1, 1, 2)).astype(np.int32)],
+            255,
+        )
+
         mask = np.abs(z_faces - floor) < 0.2
-        faces_new = np.array(faces_selected)[mask, :]
+        faces_new = faces_selected[mask, :]
 
         t = (vertices[faces_new][:, :, :2] + max_length) * 100
         t = t.astype(np.int32)
@@ -67,7 +84,7 @@ def gen_trav_map(
 
         if add_clutter is True:  # Build clutter map
             mask1 = ((z_faces_all - floor) < 2.0) * ((z_faces_all - floor) > 0.05)
-            faces_new1 = np.array(faces_selected_all)[mask1, :]
+            faces_new1 = faces_selected_all[mask1, :]
 
             t1 = (vertices_all[faces_new1][:, :, :2] + max_length) * 100
             t1 = t1.astype(np.int32)
@@ -165,39 +182,71 @@ def compute_triangle_plane_intersections(vertices, faces, tid, plane, dists, dis
     return intersections
 
 
-def gen_map(vertices, faces, output_folder, img_filename_format="floor_{}.png"):
+def compute_mesh_plane_intersections(vertices, faces, plane, dist_tol=1e-8):
+    """
+    Compute the segments along which a plane cuts the triangles of a mesh, for all the triangles at once.
+    This gives the same segments as calling compute_triangle_plane_intersections on every triangle and keeping the
+    ones with two intersections.
+
+    :param vertices: (V, 3) array of vertices
+    :param faces: (F, 3) array of vertex indices
+    :param plane: Plane to intersect the mesh with
+    :param dist_tol: distance below which a vertex is considered on the plane
+    :return: (S, 2, 3) array with the end points of the S intersection segments
+    """
+    dists = np.dot(vertices - plane.orig, plane.n)
+    faces = np.asarray(faces)
+    triangles = vertices[faces]
+    face_dists = dists[faces]
+    on_plane = np.abs(face_dists) < dist_tol
+
+    # Candidate intersections in the order compute_triangle_plane_intersections finds them: the vertices on the plane,
+    # then the edges whose vertices are on opposite sides of the plane
+    points = [triangles[:, 0], triangles[:, 1], triangles[:, 2]]
+    found = [on_plane[:, 0], on_plane[:, 1], on_plane[:, 2]]
+    for v1, v2 in ((0, 1), (0, 2), (1, 2)):
+        d1, d2 = face_dists[:, v1], face_dists[:, v2]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            s = d1 / (d1 - d2)
+            points.append(triangles[:, v1] + (triangles[:, v2] - triangles[:, v1]) * s[:, None])
+        found.append((d1 * d2 < 0) & ~on_plane[:, v1] & ~on_plane[:, v2])
+    points = np.stack(points, axis=1)
+    found = np.stack(found, axis=1)
+
+    # Only the triangles that are sliced in two parts give a segment
+    sliced = np.sum(found, axis=1) == 2
+    return points[sliced][found[sliced]].reshape(-1, 2, 3)
+
+
+def gen_map(vertices, faces, output_folder, img_filename_format="floor_{}.png", floors=(0.0,)):
+    """
+    Generate obstacle maps from the cross section of the scene 0.5m above each floor
+
+    :param vertices: (V, 3) array of scene vertices in the world frame
+    :param faces: (F, 3) array of vertex indices
+    :param output_folder: folder to save the maps in
+    :param img_filename_format: file name format of the maps, formatted with the floor index
+    :param floors: height of each floor
+    :return: list of obstacle maps, one per floor
+    """
     xmin, ymin, _ = vertices.min(axis=0)
     xmax, ymax, _ = vertices.max(axis=0)
 
     max_length = np.max([np.abs(xmin), np.abs(ymin), np.abs(xmax), np.abs(ymax)])
     max_length = np.ceil(max_length).astype(int)
 
-    floors = [0.0]
-    print(floors)
-
     floor_maps = []
 
     for i_floor, floor in enumerate(floors):
-        dists = []
         z = float(floor) + 0.5
-        cross_section = []
         plane = Plane(np.array([0, 0, z]), np.array([0, 0, 1]))
-
-        for v in vertices:
-            dists.append(point_to_plane_dist(v, plane))
-
-        for i in tqdm(range(len(faces))):
-            res = compute_triangle_plane_intersections(vertices, faces, i, plane, dists)
-            if len(res) == 2:
-                cross_section.append((res[0][1], res[1][1]))
+        cross_section = compute_mesh_plane_intersections(vertices, faces, plane)
 
         floor_map = np.ones((2 * max_length * 100, 2 * max_length * 100))
 
-        for item in cross_section:
-            x1, x2 = (item[0][0] + max_length) * 100, (item[1][0] + max_length) * 100
-            y1, y2 = (item[0][1] + max_length) * 100, (item[1][1] + max_length) * 100
-
-            cv2.line(floor_map, (int(x1), int(y1)), (int(x2), int(y2)), color=(0, 0, 0), thickness=2)
+        # Draw every segment as an open polyline, which rasterizes the same way as cv2.line
+        segments = ((cross_section[:, :, :2] + max_length) * 100).astype(np.int32)
+        cv2.polylines(floor_map, list(segments.reshape(-1, 2, 1, 2)), False, color=(0, 0, 0), thickness=2)
 
         floor_maps.append(floor_map)
         cur_img = Image.fromarray((floor_map * 255).astype(np.uint8))
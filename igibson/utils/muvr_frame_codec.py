@@ -0,0 +1,390 @@
+"""
+Binary frame format of the multi-user VR server, in pure numpy.
+
+A frame holds the pose (position and orientation) of every visual object of every instance of the renderer, in the
+order of renderer.get_instances(), as one record per visual object. A frame starts with a fixed-size header (frame id,
+base frame id, number of instances, records and changed records), followed by the indices of the changed records and
+their poses, as float32 (position and (x, y, z, w) quaternion) or quantized (fixed-point position and smallest-three
+quaternion).
+
+A keyframe holds every record. Other frames are deltas against the last frame the client acknowledged: they only hold
+the records whose pose moved by more than an epsilon since that frame. Since the base of a delta has been received,
+lost frames never need to be resent, and keyframes are sent periodically, on the first frame and when the base frame
+is too old, to resynchronize the client.
+
+Frames are binary, while the PodSixNet channels of the server decode byte strings as UTF-8 and split their stream on
+a '\\0---\\0' terminator, so frames are sent as base64 text, see frame_to_text.
+"""
+
+import base64
+
+import numpy as np
+
+FRAME_MAGIC = 0x4656
+FRAME_VERSION = 1
+
+FLAG_KEYFRAME = 1
+FLAG_QUANTIZED = 2
+FLAG_SHORT_INDICES = 4
+
+# Base frame id of keyframes
+NO_BASE_FRAME = 0xFFFFFFFF
+
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "<u2"),
+        ("version", "u1"),
+        ("flags", "u1"),
+        ("frame_id", "<u4"),
+        ("base_frame_id", "<u4"),
+        ("num_instances", "<u4"),
+        ("num_records", "<u4"),
+        ("num_changed", "<u4"),
+        ("position_resolution", "<f4"),
+    ]
+)
+
+# Smallest-three quaternions: index of the largest component in 2 bits, and the three other components in 10 bits each
+QUATERNION_COMPONENT_BITS = 10
+QUATERNION_COMPONENT_MAX = (1 << QUATERNION_COMPONENT_BITS) - 1
+QUATERNION_COMPONENT_RANGE = 1.0 / np.sqrt(2.0)
+
+
+def rotation_matrices_to_quaternions(rmats):
+    """
+    Convert rotation matrices to quaternions, as transform_utils.mat2quat for a batch
+
+    :param rmats: (N, 3, 3) or (N, 4, 4) rotation matrices
+    :return: (N, 4) quaternions in (x, y, z, w)
+    """
+    m = np.asarray(rmats, dtype=np.float64)[:, :3, :3]
+    m00, m01, m02 = m[:, 0, 0], m[:, 0, 1], m[:, 0, 2]
+    m10, m11, m12 = m[:, 1, 0], m[:, 1, 1], m[:, 1, 2]
+    m20, m21, m22 = m[:, 2, 0], m[:, 2, 1], m[:, 2, 2]
+    # Shepperd's method: compute the largest of the four components from the diagonal, and the others from it
+    diagonal = np.stack([m00 + m11 + m22, m00 - m11 - m22, m11 - m00 - m22, m22 - m00 - m11], axis=1)
+    largest = np.argmax(diagonal, axis=1)
+    s = 2.0 * np.sqrt(np.maximum(1.0 + diagonal[np.arange(len(m)), largest], 1e-12))
+    candidates = np.stack(
+        [
+            [(m21 - m12) / s, (m02 - m20) / s, (m10 - m01) / s, 0.25 * s],
+            [0.25 * s, (m01 + m10) / s, (m02 + m20) / s, (m21 - m12) / s],
+            [(m01 + m10) / s, 0.25 * s, (m12 + m21) / s, (m02 - m20) / s],
+            [(m02 + m20) / s, (m12 + m21) / s, 0.25 * s, (m10 - m01) / s],
+        ]
+    )
+    quats = candidates[largest, :, np.arange(len(m))]
+    quats[quats[:, 3] < 0] *= -1
+    return quats / np.linalg.norm(quats, axis=1, keepdims=True)
+
+
+def quaternions_to_rotation_matrices(quats):
+    """
+    Convert quaternions to rotation matrices, as transform_utils.quat2mat for a batch
+
+    :param quats: (N, 4) quaternions in (x, y, z, w)
+    :return: (N, 3, 3) rotation matrices
+    """
+    quats = np.asarray(quats, dtype=np.float64)
+    quats = quats / np.linalg.norm(quats, axis=1, keepdims=True)
+    x, y, z, w = quats.T
+    return np.stack(
+        [
+            np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)], axis=1),
+            np.stack([2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)], axis=1),
+            np.stack([2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)], axis=1),
+        ],
+        axis=1,
+    )
+
+
+def pack_quaternions(quats):
+    """
+    Quantize quaternions with the smallest-three encoding
+
+    :param quats: (N, 4) unit quaternions
+    :return: (N,) uint32 packed quaternions
+    """
+    quats = np.asarray(quats, dtype=np.float64)
+    rows = np.arange(len(quats))
+    largest = np.argmax(np.abs(quats), axis=1)
+    # q and -q are the same rotation: make the largest component positive so that it can be recovered from the others
+    quats = quats * np.where(quats[rows, largest] < 0, -1.0, 1.0)[:, None]
+    others = (largest[:, None] + np.arange(1, 4)[None, :]) % 4
+    components = quats[rows[:, None], others]
+    quantized = np.rint(
+        (components + QUATERNION_COMPONENT_RANGE) / (2 * QUATERNION_COMPONENT_RANGE) * QUATERNION_COMPONENT_MAX
+    )
+    quantized = np.clip(quantized, 0, QUATERNION_COMPONENT_MAX).astype(np.uint32)
+    packed = largest.astype(np.uint32) << np.uint32(3 * QUATERNION_COMPONENT_BITS)
+    for i in range(3):
+        packed |= quantized[:, i] << np.uint32((2 - i) * QUATERNION_COMPONENT_BITS)
+    return packed
+
+
+def unpack_quaternions(packed):
+    """
+    Recover quaternions from the smallest-three encoding
+
+    :param packed: (N,) uint32 packed quaternions
+    :return: (N, 4) unit quaternions
+    """
+    packed = np.asarray(packed, dtype=np.uint32)
+    rows = np.arange(len(packed))
+    largest = (packed >> np.uint32(3 * QUATERNION_COMPONENT_BITS)).astype(np.int64)
+    quantized = np.stack(
+        [(packed >> np.uint32((2 - i) * QUATERNION_COMPONENT_BITS)) & QUATERNION_COMPONENT_MAX for i in range(3)],
+        axis=1,
+    )
+    components = (
+        quantized.astype(np.float64) / QUATERNION_COMPONENT_MAX * (2 * QUATERNION_COMPONENT_RANGE)
+        - QUATERNION_COMPONENT_RANGE
+    )
+    quats = np.zeros((len(packed), 4))
+    quats[rows[:, None], (largest[:, None] + np.arange(1, 4)[None, :]) % 4] = components
+    quats[rows, largest] = np.sqrt(np.maximum(0.0, 1.0 - np.sum(components**2, axis=1)))
+    return quats / np.linalg.norm(quats, axis=1, keepdims=True)
+
+
+def get_instance_poses(instances):
+    """
+    Get the poses of the visual objects of renderer instances, as records of a frame
+
+    :param instances: renderer instances
+    :return: (N, 3) positions, (N, 4) quaternions in (x, y, z, w) and number of visual objects of each instance
+    """
+    num_parts = np.array([len(instance.poses_trans) for instance in instances], dtype=np.int64)
+    if num_parts.sum() == 0:
+        return np.zeros((0, 3)), np.zeros((0, 4)), num_parts
+    # Translations are stored in the last row of the matrices, see mesh_util.xyz2mat
+    positions = np.concatenate(
+        [np.asarray(instance.poses_trans)[:, 3, :3] for instance in instances if len(instance.poses_trans)]
+    )
+    rmats = np.concatenate([np.asarray(instance.poses_rot) for instance in instances if len(instance.poses_rot)])
+    return positions.astype(np.float64), rotation_matrices_to_quaternions(rmats), num_parts
+
+
+def set_instance_poses(instances, positions, quats):
+    """
+    Set the poses of the visual objects of renderer instances from the records of a frame
+
+    :param instances: renderer instances, in the order of the frame records
+    :param positions: (N, 3) positions
+    :param quats: (N, 4) quaternions in (x, y, z, w)
+    """
+    trans = np.tile(np.eye(4), (len(positions), 1, 1))
+    trans[:, 3, :3] = positions
+    rots = np.tile(np.eye(4), (len(quats), 1, 1))
+    rots[:, :3, :3] = quaternions_to_rotation_matrices(quats)
+    start = 0
+    for instance in instances:
+        end = start + len(instance.poses_trans)
+        instance.poses_trans = trans[start:end]
+        instance.poses_rot = rots[start:end]
+        start = end
+
+
+def frame_to_text(data):
+    """
+    Encode a frame as ASCII text that can be sent through a PodSixNet channel
+
+    :param data: frame as bytes
+    :return: base64 text of the frame
+    """
+    return base64.b64encode(data).decode("ascii")
+
+
+def text_to_frame(text):
+    """
+    Decode a frame encoded by frame_to_text
+
+    :param text: base64 text of the frame
+    :return: frame as bytes
+    """
+    return base64.b64decode(text)
+
+
+class FrameEncoder(object):
+    """
+    Encode the poses of the server into keyframes and delta frames against the last frame acknowledged by the client
+    """
+
+    def __init__(
+        self,
+        quantize=True,
+        position_resolution=1e-4,
+        position_epsilon=1e-4,
+        rotation_epsilon=1e-6,
+        keyframe_interval=90,
+        max_history=64,
+    ):
+        """
+        :param quantize: whether to quantize the poses, otherwise send them as float32
+        :param position_resolution: resolution in meters of the fixed-point positions
+        :param position_epsilon: distance in meters above which a record is considered moved
+        :param rotation_epsilon: 1 - |cos(angle / 2)| above which a record is considered rotated
+        :param keyframe_interval: number of frames between keyframes
+        :param max_history: number of unacknowledged frames kept as bases of deltas, older bases trigger a keyframe
+        """
+        self.quantize = quantize
+        self.position_resolution = position_resolution
+        self.position_epsilon = position_epsilon
+        self.rotation_epsilon = rotation_epsilon
+        self.keyframe_interval = keyframe_interval
+        self.max_history = max_history
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the frames sent so far, for instance when a new client connects, so that the next frame is a keyframe
+        """
+        self.frame_id = 0
+        self.last_keyframe_id = None
+        self.acked_frame_id = None
+        # Poses the client has after receiving each frame, as sent (before quantization) so that errors do not build up
+        self.history = {}
+
+    def ack(self, frame_id):
+        """
+        Record that the client received a frame, which becomes the base of the next deltas
+
+        :param frame_id: id of the frame received by the client
+        """
+        if frame_id not in self.history:
+            return
+        if self.acked_frame_id is not None and frame_id <= self.acked_frame_id:
+            return
+        self.acked_frame_id = frame_id
+        for old_frame_id in [i for i in self.history if i < frame_id]:
+            del self.history[old_frame_id]
+
+    def encode(self, positions, quats, num_instances):
+        """
+        Encode the poses of a frame
+
+        :param positions: (N, 3) positions of the records
+        :param quats: (N, 4) quaternions in (x, y, z, w) of the records
+        :param num_instances: number of instances the records belong to
+        :return: frame as bytes
+        """
+        positions = np.asarray(positions, dtype=np.float64)
+        quats = np.asarray(quats, dtype=np.float64)
+        frame_id = self.frame_id
+        self.frame_id += 1
+
+        base = self.history.get(self.acked_frame_id)
+        is_keyframe = (
+            base is None or len(base[0]) != len(positions) or frame_id - self.last_keyframe_id >= self.keyframe_interval
+        )
+        if is_keyframe:
+            changed = np.arange(len(positions))
+            self.last_keyframe_id = frame_id
+            sent_positions, sent_quats = positions.copy(), quats.copy()
+        else:
+            base_positions, base_quats = base
+            moved = np.any(np.abs(positions - base_positions) > self.position_epsilon, axis=1)
+            rotated = 1.0 - np.abs(np.sum(quats * base_quats, axis=1)) > self.rotation_epsilon
+            changed = np.flatnonzero(moved | rotated)
+            sent_positions, sent_quats = base_positions.copy(), base_quats.copy()
+            sent_positions[changed] = positions[changed]
+            sent_quats[changed] = quats[changed]
+
+        self.history[frame_id] = (sent_positions, sent_quats)
+        if len(self.history) > self.max_history:
+            del self.history[min(self.history)]
+
+        flags = 0
+        if is_keyframe:
+            flags |= FLAG_KEYFRAME
+        if self.quantize:
+            flags |= FLAG_QUANTIZED
+        index_dtype = "<u4"
+        if len(positions) <= 0xFFFF:
+            flags |= FLAG_SHORT_INDICES
+            index_dtype = "<u2"
+
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header["magic"] = FRAME_MAGIC
+        header["version"] = FRAME_VERSION
+        header["flags"] = flags
+        header["frame_id"] = frame_id
+        header["base_frame_id"] = NO_BASE_FRAME if is_keyframe else self.acked_frame_id
+        header["num_instances"] = num_instances
+        header["num_records"] = len(positions)
+        header["num_changed"] = len(changed)
+        header["position_resolution"] = self.position_resolution
+
+        chunks = [header.tobytes()]
+        if not is_keyframe:
+            chunks.append(changed.astype(index_dtype).tobytes())
+        if self.quantize:
+            fixed_point = np.rint(positions[changed] / np.float32(self.position_resolution))
+            chunks.append(fixed_point.astype("<i4").tobytes())
+            chunks.append(pack_quaternions(quats[changed]).astype("<u4").tobytes())
+        else:
+            chunks.append(positions[changed].astype("<f4").tobytes())
+            chunks.append(quats[changed].astype("<f4").tobytes())
+        return b"".join(chunks)
+
+
+class FrameDecoder(object):
+    """
+    Decode the keyframes and delta frames of FrameEncoder
+    """
+
+    def __init__(self, max_history=64):
+        """
+        :param max_history: number of decoded frames kept as bases of the next deltas
+        """
+        self.max_history = max_history
+        self.history = {}
+
+    def decode(self, data):
+        """
+        Decode a frame
+
+        :param data: frame as bytes
+        :return: frame id, (N, 3) positions, (N, 4) quaternions in (x, y, z, w) and number of instances, or None if
+            the base of a delta frame is unknown, in which case the frame is dropped until the next keyframe
+        """
+        header = np.frombuffer(data, dtype=HEADER_DTYPE, count=1)[0]
+        if header["magic"] != FRAME_MAGIC or header["version"] != FRAME_VERSION:
+            raise ValueError("Not a frame of version {}".format(FRAME_VERSION))
+        flags = int(header["flags"])
+        frame_id = int(header["frame_id"])
+        num_records = int(header["num_records"])
+        num_changed = int(header["num_changed"])
+        offset = HEADER_DTYPE.itemsize
+
+        if flags & FLAG_KEYFRAME:
+            changed = np.arange(num_records)
+            positions = np.zeros((num_records, 3))
+            quats = np.zeros((num_records, 4))
+        else:
+            base = self.history.get(int(header["base_frame_id"]))
+            if base is None or len(base[0]) != num_records:
+                return None
+            index_dtype = np.dtype("<u2" if flags & FLAG_SHORT_INDICES else "<u4")
+            changed = np.frombuffer(data, dtype=index_dtype, count=num_changed, offset=offset).astype(np.int64)
+            offset += index_dtype.itemsize * num_changed
+            positions, quats = base[0].copy(), base[1].copy()
+
+        if flags & FLAG_QUANTIZED:
+            fixed_point = np.frombuffer(data, dtype="<i4", count=3 * num_changed, offset=offset)
+            offset += 12 * num_changed
+            positions[changed] = fixed_point.reshape(-1, 3) * np.float64(np.float32(header["position_resolution"]))
+            quats[changed] = unpack_quaternions(np.frombuffer(data, dtype="<u4", count=num_changed, offset=offset))
+        else:
+            positions[changed] = np.frombuffer(data, dtype="<f4", count=3 * num_changed, offset=offset).reshape(-1, 3)
+            offset += 12 * num_changed
+            quats[changed] = np.frombuffer(data, dtype="<f4", count=4 * num_changed, offset=offset).reshape(-1, 4)
+
+        if not flags & FLAG_KEYFRAME:
+            # The server never goes back to bases older than the base of its last delta. Bases older than a keyframe
+            # are kept, since the server may not have received the acknowledgment of the keyframe yet
+            for old_frame_id in [i for i in self.history if i < int(header["base_frame_id"])]:
+                del self.history[old_frame_id]
+        self.history[frame_id] = (positions, quats)
+        if len(self.history) > self.max_history:
+            del self.history[min(self.history)]
+        return frame_id, positions, quats, int(header["num_instances"])
@@ -6,11 +6,18 @@ import time
 from collections import defaultdict
 from time import sleep
 
-import numpy as np
 from PodSixNet.Channel import Channel
 from PodSixNet.Connection import ConnectionListener, connection
 from PodSixNet.Server import Server
 
+from igibson.utils.muvr_frame_codec import (
+    FrameDecoder,
+    FrameEncoder,
+    frame_to_text,
+    get_instance_poses,
+    set_instance_poses,
+    text_to_frame,
+)
 from igibson.utils.vr_utils import VrData
 
 # An FPS cap is needed to ensure that the client and server don't fall too far out of sync
@@ -26,7 +33,8 @@ class IGVRClient(ConnectionListener):
 
     def __init__(self, host, port):
         self.Connect((host, port))
-        self.frame_data = {}
+        self.frame_data = None
+        self.frame_decoder = FrameDecoder()
         self.frame_start = 0
         self.vr_offset = [0, 0, 0]
 
@@ -42,23 +50,19 @@ class IGVRClient(ConnectionListener):
         if not self.frame_data:
             return
 
-        # Deep copy frame data so it doesn't get overwritten by a random async callback
-        self.latest_frame_data = copy.deepcopy(self.frame_data)
-        for instance in self.renderer.get_instances():
-            data = self.latest_frame_data[instance.pybullet_uuid]
-            poses_trans = []
-            poses_rot = []
-            data_trans = data[0]
-            data_rot = data[1]
-            num_links = len(data_trans)
-            for i in range(num_links):
-                next_trans = np.array(data_trans[i])
-                next_rot = np.array(data_rot[i])
-                poses_trans.append(np.ascontiguousarray(next_trans))
-                poses_rot.append(np.ascontiguousarray(next_rot))
-
-            instance.poses_trans = poses_trans
-            instance.poses_rot = poses_rot
+        # Frame data is an immutable string, so it can't be overwritten by a random async callback
+        self.latest_frame_data = self.frame_data
+        self.frame_data = None
+        decoded = self.frame_decoder.decode(text_to_frame(self.latest_frame_data))
+        if decoded is None:
+            # Delta against a frame this client never received, wait for the next keyframe
+            return
+        frame_id, positions, orientations, num_instances = decoded
+        # It is assumed that the client renderer has loaded instances in the same order as the server
+        instances = self.renderer.get_instances()
+        assert num_instances == len(instances), "Server and client have different instances"
+        set_instance_poses(instances, positions, orientations)
+        self.Send({"action": "frame_ack", "frame_id": frame_id})
 
     def client_step(self):
         self.s.viewer.update()
@@ -128,6 +132,7 @@ class IGVRChannel(Channel):
     def __init__(self, *args, **kwargs):
         Channel.__init__(self, *args, **kwargs)
         self.vr_data = {}
+        self.acked_frame_id = None
 
     def Close(self):
         print(self, "Client disconnected")
@@ -137,8 +142,13 @@ class IGVRChannel(Channel):
         # This avoids the overhead of updating the physics simulation every time this function is called
         self.vr_data = data["vr_data"]
 
+    def Network_frame_ack(self, data):
+        # Last frame decoded by the client, used as the base of the next delta frames
+        self.acked_frame_id = data["frame_id"]
+
     def send_frame_data(self, frame_data):
-        self.Send({"action": "frame_data", "frame_data": frame_data})
+        # Binary frames can't go through the channel serialization and framing, so they are sent as text
+        self.Send({"action": "frame_data", "frame_data": frame_to_text(frame_data)})
 
 
 class IGVRServer(Server):
@@ -151,10 +161,13 @@ class IGVRServer(Server):
         self.client = None
         self.latest_vr_data = None
         self.frame_start = 0
+        self.frame_encoder = FrameEncoder()
 
     def Connected(self, channel, addr):
         # print("Someone connected to the server!")
         self.client = channel
+        # The first frame sent to a new client is a keyframe
+        self.frame_encoder.reset()
 
     def register_data(self, sim, client_agent):
         self.s = sim
@@ -178,20 +191,15 @@ class IGVRServer(Server):
         self.latest_vr_data.refresh_muvr_data(copy.deepcopy(self.client.vr_data))
 
     def gen_frame_data(self):
-        # Frame data is stored as a dictionary mapping pybullet uuid to pose/rot data
-        self.frame_data = {}
+        # Frame data is a binary frame of muvr_frame_codec holding the poses of all the visual objects of all the
+        # instances, in the order of the renderer instances, or only the ones that moved since the last frame
+        # acknowledged by the client
         # It is assumed that the client renderer will have loaded instances in the same order as the server
-        for instance in self.renderer.get_instances():
-            # Loop through all instances and get pos and rot data
-            # We convert numpy arrays into lists so they can be serialized and sent over the network
-            # Lists can also be easily reconstructed back into numpy arrays on the client side
-            poses = []
-            rots = []
-            for pose in instance.poses_trans:
-                poses.append(pose.tolist())
-            for rot in instance.poses_rot:
-                rots.append(rot.tolist())
-            self.frame_data[instance.pybullet_uuid] = [poses, rots]
+        if self.client and self.client.acked_frame_id is not None:
+            self.frame_encoder.ack(self.client.acked_frame_id)
+        instances = self.renderer.get_instances()
+        positions, orientations, _ = get_instance_poses(instances)
+        self.frame_data = self.frame_encoder.encode(positions, orientations, len(instances))
 
     def send_frame_data(self):
         if self.client:
@@ -0,0 +1,144 @@
+"""
+Physics-free placement queries: check whether bodies placed at a candidate pose collide with the scene, and find the
+height at which they rest on the surface below, without stepping the simulator.
+"""
+import numpy as np
+import pybullet as p
+
+from igibson.utils.raycast_utils import ray_test_batch
+
+
+def get_body_aabb(body_id):
+    """
+    Get the AABB of a body, including all its links
+
+    :param body_id: pybullet body id
+    :return: AABB lower corner and upper corner
+    """
+    aabbs = [p.getAABB(body_id, link_id) for link_id in range(-1, p.getNumJoints(body_id))]
+    lower = np.min([aabb[0] for aabb in aabbs], axis=0)
+    upper = np.max([aabb[1] for aabb in aabbs], axis=0)
+    return lower, upper
+
+
+def get_bodies_aabb(body_ids):
+    """
+    Get the AABB of a group of bodies
+
+    :param body_ids: pybullet body ids
+    :return: AABB lower corner and upper corner
+    """
+    aabbs = [get_body_aabb(body_id) for body_id in body_ids]
+    lower = np.min([aabb[0] for aabb in aabbs], axis=0)
+    upper = np.max([aabb[1] for aabb in aabbs], axis=0)
+    return lower, upper
+
+
+def get_nearby_body_ids(lower, upper, margin=0.0):
+    """
+    Broad phase: get the bodies with at least one link whose AABB overlaps the given (enlarged) AABB
+
+    :param lower: AABB lower corner
+    :param upper: AABB upper corner
+    :param margin: distance by which the AABB is enlarged in every direction
+    :return: set of pybullet body ids
+    """
+    overlapping_objects = p.getOverlappingObjects(np.array(lower) - margin, np.array(upper) + margin)
+    if overlapping_objects is None:
+        return set()
+    return set(body_id for body_id, _ in overlapping_objects)
+
+
+def check_self_collision(body_ids, margin=0.0):
+    """
+    Check whether the links of any of the given bodies collide with each other. Which pairs of links can collide
+    depends on how each body was loaded (e.g. URDF_USE_SELF_COLLISION) and on its collision filters, which only the
+    collision detection of pybullet applies, so it is run once without stepping the simulator. The result only depends
+    on the joint configurations, not on the poses of the bodies.
+
+    :param body_ids: pybullet body ids to test
+    :param margin: links closer than this distance are considered in collision
+    :return: whether there is any self-collision
+    """
+    if len(body_ids) == 0:
+        return False
+    p.performCollisionDetection()
+    for body_id in body_ids:
+        # Contact points also include links that are within the contact breaking threshold of each other
+        if any(point[8] <= margin for point in p.getContactPoints(bodyA=body_id, bodyB=body_id)):
+            return True
+    return False
+
+
+def check_bodies_collision(body_ids, ignore_ids=(), margin=0.0, check_self_collisions=True):
+    """
+    Check whether any of the given bodies collides with another body, at their current poses and without stepping
+    the simulator. Only the bodies that pass the AABB broad phase are tested with p.getClosestPoints.
+    Collisions between the given bodies are included unless they are ignored. Collisions between the links of a
+    single body are included unless the body is ignored, see check_self_collision.
+
+    :param body_ids: pybullet body ids to test
+    :param ignore_ids: pybullet body ids to ignore collisions with
+    :param margin: bodies closer than this distance are considered in collision
+    :param check_self_collisions: whether to check the collisions between the links of a single body, e.g. False if
+        they have already been checked for the current joint configurations
+    :return: whether there is any collision
+    """
+    ignore_ids = set(ignore_ids)
+    for body_id in body_ids:
+        lower, upper = get_body_aabb(body_id)
+        for other_body_id in get_nearby_body_ids(lower, upper, margin):
+            if other_body_id == body_id or other_body_id in ignore_ids:
+                continue
+            if len(p.getClosestPoints(bodyA=body_id, bodyB=other_body_id, distance=margin)) > 0:
+                return True
+    if check_self_collisions:
+        return check_self_collision([body_id for body_id in body_ids if body_id not in ignore_ids], margin)
+    return False
+
+
+def get_min_distance(body_ids, ignore_ids=(), max_distance=0.1):
+    """
+    Get the signed distance between the given bodies and the closest other body, negative if they penetrate
+
+    :param body_ids: pybullet body ids to test
+    :param ignore_ids: pybullet body ids to ignore
+    :param max_distance: bodies further than this distance are not considered
+    :return: minimum distance, or max_distance if no body is closer
+    """
+    ignore_ids = set(ignore_ids) | set(body_ids)
+    min_distance = max_distance
+    for body_id in body_ids:
+        lower, upper = get_body_aabb(body_id)
+        for other_body_id in get_nearby_body_ids(lower, upper, max_distance):
+            if other_body_id in ignore_ids:
+                continue
+            for point in p.getClosestPoints(bodyA=body_id, bodyB=other_body_id, distance=max_distance):
+                min_distance = min(min_distance, point[8])
+    return min_distance
+
+
+def get_resting_height_offset(body_ids, max_drop=5.0, n_rays_per_axis=5, num_threads=0):
+    """
+    Get the vertical offset that brings the bottom of the given bodies onto the highest surface below them.
+    Rays are cast downwards from just below the bottom of their AABB, over a grid that covers its footprint, so
+    they never hit the bodies themselves.
+
+    :param body_ids: pybullet body ids that are placed together
+    :param max_drop: maximum distance below the bottom of the AABB to look for a surface
+    :param n_rays_per_axis: number of rays along each horizontal axis of the AABB
+    :param num_threads: number of threads used by pybullet (0 means all available cores)
+    :return: z offset to apply to the bodies (negative to move them down), or None if there is no surface below
+    """
+    lower, upper = get_bodies_aabb(body_ids)
+    x, y = np.meshgrid(
+        np.linspace(lower[0], upper[0], n_rays_per_axis), np.linspace(lower[1], upper[1], n_rays_per_axis)
+    )
+    x, y = x.reshape(-1), y.reshape(-1)
+    ray_from = np.stack([x, y, np.full_like(x, lower[2] - 1e-3)], axis=1)
+    ray_to = np.stack([x, y, np.full_like(x, lower[2] - max_drop)], axis=1)
+    hit_body_ids, _, _, hit_positions, _ = ray_test_batch(ray_from, ray_to, num_threads=num_threads)
+    hit = hit_body_ids != -1
+    if not np.any(hit):
+        return None
+    return np.max(hit_positions[hit, 2]) - lower[2]
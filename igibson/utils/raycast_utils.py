@@ -0,0 +1,214 @@
+import numpy as np
+import pybullet as p
+
+from igibson.utils.constants import SemanticClass
+from igibson.utils.semantics_utils import CLASS_NAME_TO_CLASS_ID
+
+# Maximum number of rays pybullet accepts in a single rayTestBatch call. pybullet silently returns no result for a batch
+# of exactly MAX_RAY_INTERSECTION_BATCH_SIZE rays, hence the - 1.
+MAX_RAY_BATCH_SIZE = getattr(p, "MAX_RAY_INTERSECTION_BATCH_SIZE", 16384) - 1
+
+
+def ray_test_batch(ray_from, ray_to, num_threads=0, batch_size=MAX_RAY_BATCH_SIZE, **kwargs):
+    """
+    Cast a batch of rays with pybullet, in tiles of at most batch_size rays, and return the results as numpy arrays
+
+    :param ray_from: (N, 3) array of ray start positions
+    :param ray_to: (N, 3) array of ray end positions
+    :param num_threads: number of threads used by pybullet (0 means all available cores)
+    :param batch_size: maximum number of rays per rayTestBatch call
+    :param kwargs: additional keyword arguments for p.rayTestBatch (e.g. reportHitNumber)
+    :return: body ids (N,), link ids (N,), hit fractions (N,), hit positions (N, 3) and hit normals (N, 3)
+    """
+    ray_from = np.asarray(ray_from, dtype=np.float64).reshape(-1, 3)
+    ray_to = np.asarray(ray_to, dtype=np.float64).reshape(-1, 3)
+    assert ray_from.shape == ray_to.shape, "ray_from and ray_to need to have the same shape"
+    batch_size = min(batch_size, MAX_RAY_BATCH_SIZE)
+
+    results = []
+    for start in range(0, ray_from.shape[0], batch_size):
+        results += p.rayTestBatch(
+            rayFromPositions=ray_from[start : start + batch_size],
+            rayToPositions=ray_to[start : start + batch_size],
+            numThreads=num_threads,
+            **kwargs,
+        )
+
+    if len(results) == 0:
+        return (
+            np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=np.int32),
+            np.zeros(0),
+            np.zeros((0, 3)),
+            np.zeros((0, 3)),
+        )
+
+    body_ids, link_ids, hit_fractions, hit_positions, hit_normals = zip(*results)
+    return (
+        np.array(body_ids, dtype=np.int32),
+        np.array(link_ids, dtype=np.int32),
+        np.array(hit_fractions),
+        np.array(hit_positions),
+        np.array(hit_normals),
+    )
+
+
+def ray_test_batch_ignoring_bodies(
+    ray_from, ray_to, ignored_body_ids, max_passes=3, num_threads=0, batch_size=MAX_RAY_BATCH_SIZE
+):
+    """
+    Cast a batch of rays that pass through a set of ignored bodies (e.g. the robot carrying the sensor).
+    Rays that hit an ignored body are cast again from just beyond the hit point, up to max_passes times.
+
+    :param ray_from: (N, 3) array of ray start positions
+    :param ray_to: (N, 3) array of ray end positions
+    :param ignored_body_ids: pybullet body ids the rays should pass through
+    :param max_passes: maximum number of casts per ray
+    :param num_threads: number of threads used by pybullet (0 means all available cores)
+    :param batch_size: maximum number of rays per rayTestBatch call
+    :return: same as ray_test_batch, with hit fractions relative to the original rays
+    """
+    ray_from = np.asarray(ray_from, dtype=np.float64).reshape(-1, 3)
+    ray_to = np.asarray(ray_to, dtype=np.float64).reshape(-1, 3)
+    body_ids, link_ids, hit_fractions, hit_positions, hit_normals = ray_test_batch(
+        ray_from, ray_to, num_threads=num_threads, batch_size=batch_size
+    )
+    if len(ignored_body_ids) == 0:
+        return body_ids, link_ids, hit_fractions, hit_positions, hit_normals
+
+    ignored_body_ids = np.asarray(list(ignored_body_ids), dtype=np.int32)
+    ray_length = np.linalg.norm(ray_to - ray_from, axis=1)
+    for _ in range(max_passes - 1):
+        recast = np.nonzero(np.isin(body_ids, ignored_body_ids))[0]
+        if len(recast) == 0:
+            break
+        # Restart just beyond the current hit so that the ignored body is not hit again at the same point
+        fraction_epsilon = 1e-4 / np.maximum(ray_length[recast], 1e-9)
+        restart_fractions = np.minimum(hit_fractions[recast] + fraction_epsilon, 1.0)
+        restart = ray_from[recast] + restart_fractions[:, None] * (ray_to[recast] - ray_from[recast])
+        recast_results = ray_test_batch(restart, ray_to[recast], num_threads=num_threads, batch_size=batch_size)
+        body_ids[recast] = recast_results[0]
+        link_ids[recast] = recast_results[1]
+        hit_fractions[recast] = restart_fractions + recast_results[2] * (1.0 - restart_fractions)
+        hit_positions[recast] = recast_results[3]
+        hit_normals[recast] = recast_results[4]
+
+    # Rays that still end on an ignored body after max_passes are reported as misses
+    missed = np.isin(body_ids, ignored_body_ids)
+    body_ids[missed] = -1
+    link_ids[missed] = -1
+    hit_fractions[missed] = 1.0
+    hit_positions[missed] = 0.0
+    hit_normals[missed] = 0.0
+    return body_ids, link_ids, hit_fractions, hit_positions, hit_normals
+
+
+def get_camera_ray_directions(width, height, vertical_fov):
+    """
+    Get the per-pixel ray directions of a pinhole camera, in the OpenGL camera frame used by MeshRenderer
+    (x right, y up, looking along -z). Row 0 is the top of the image.
+
+    :param width: image width
+    :param height: image height
+    :param vertical_fov: vertical field of view in degrees
+    :return: (height, width, 3) array of ray directions, scaled so that their z component is -1
+    """
+    focal = (height / 2.0) / np.tan(np.radians(vertical_fov) / 2.0)
+    u = (np.arange(width) + 0.5 - width / 2.0) / focal
+    v = (height / 2.0 - (np.arange(height) + 0.5)) / focal
+    directions = np.empty((height, width, 3))
+    directions[:, :, 0] = u[None, :]
+    directions[:, :, 1] = v[:, None]
+    directions[:, :, 2] = -1.0
+    return directions
+
+
+def get_lidar_beam_directions(
+    n_horizontal_rays, horizontal_angular_range, n_vertical_beams=1, vertical_angular_range=0.0
+):
+    """
+    Get the unit direction of every beam of a (multi-beam) LiDAR in the sensor frame (x forward, z up).
+    Beams are ordered by vertical beam first, then by horizontal angle.
+
+    :param n_horizontal_rays: number of rays per vertical beam
+    :param horizontal_angular_range: horizontal field of view in degrees, centered on the x axis
+    :param n_vertical_beams: number of vertical beams
+    :param vertical_angular_range: vertical field of view in degrees, centered on the horizontal plane
+    :return: (n_vertical_beams * n_horizontal_rays, 3) array of unit vectors
+    """
+    horizontal_half_range = horizontal_angular_range / 2.0
+    horizontal_angle = np.arange(
+        -horizontal_half_range / 180 * np.pi,
+        horizontal_half_range / 180 * np.pi,
+        horizontal_angular_range / 180.0 * np.pi / n_horizontal_rays,
+    )
+    if n_vertical_beams == 1:
+        vertical_angle = np.zeros(1)
+    else:
+        vertical_half_range = vertical_angular_range / 2.0 / 180.0 * np.pi
+        vertical_angle = np.linspace(-vertical_half_range, vertical_half_range, n_vertical_beams)
+
+    cos_vertical = np.cos(vertical_angle)[:, None]
+    directions = np.empty((n_vertical_beams, len(horizontal_angle), 3))
+    directions[:, :, 0] = cos_vertical * np.cos(horizontal_angle)[None, :]
+    directions[:, :, 1] = cos_vertical * np.sin(horizontal_angle)[None, :]
+    directions[:, :, 2] = np.sin(vertical_angle)[:, None]
+    return directions.reshape(-1, 3)
+
+
+def voxel_downsample(points, voxel_size):
+    """
+    Downsample a point cloud by averaging the points that fall in the same voxel
+
+    :param points: (N, 3) array of points
+    :param voxel_size: voxel edge length
+    :return: (M, 3) array of points, one per occupied voxel
+    """
+    if len(points) == 0:
+        return np.zeros((0, 3), dtype=points.dtype)
+    voxels = np.floor(points / voxel_size).astype(np.int64)
+    _, voxel_idx, voxel_count = np.unique(voxels, axis=0, return_inverse=True, return_counts=True)
+    voxel_idx = voxel_idx.reshape(-1)
+    downsampled = np.zeros((len(voxel_count), 3))
+    np.add.at(downsampled, voxel_idx, points)
+    return (downsampled / voxel_count[:, None]).astype(points.dtype)
+
+
+def get_body_id_table_size():
+    """
+    Get the size of the lookup tables indexed by pybullet body id + 1. Body ids are not contiguous once bodies have
+    been removed, so the tables are sized by the largest body id rather than by the number of bodies.
+
+    :return: largest body id + 2
+    """
+    return max([p.getBodyUniqueId(i) for i in range(p.getNumBodies())], default=-1) + 2
+
+
+def get_body_id_segmentation_tables(simulator, scene):
+    """
+    Get lookup tables from pybullet body id + 1 (so that a missed ray, -1, maps to entry 0) to semantic class id and
+    instance id. The tables of MeshRenderer are used if available, so that the ids match the rendered segmentation.
+    Otherwise, class ids are derived from the object categories and instance ids are the pybullet body ids.
+
+    :param simulator: Simulator instance
+    :param scene: current scene
+    :return: class id table and instance id table, int32 arrays of size get_body_id_table_size()
+    """
+    table_size = get_body_id_table_size()
+    body_id_to_class_id = np.zeros(table_size, dtype=np.int32)
+    body_id_to_instance_id = np.zeros(table_size, dtype=np.int32)
+    renderer = simulator.renderer
+    if renderer is not None:
+        for instance in renderer.instances:
+            if instance.pybullet_uuid is None or instance.pybullet_uuid + 1 >= table_size:
+                continue
+            body_id_to_class_id[instance.pybullet_uuid + 1] = instance.class_id
+            body_id_to_instance_id[instance.pybullet_uuid + 1] = instance.id
+    else:
+        for body_id, obj in scene.objects_by_id.items():
+            if body_id + 1 >= table_size:
+                continue
+            category = getattr(obj, "category", None)
+            body_id_to_class_id[body_id + 1] = CLASS_NAME_TO_CLASS_ID.get(category, SemanticClass.SCENE_OBJS)
+            body_id_to_instance_id[body_id + 1] = body_id
+    return body_id_to_class_id, body_id_to_instance_id
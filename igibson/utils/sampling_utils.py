@@ -10,12 +10,15 @@ from scipy.stats import truncnorm
 import igibson
 from igibson.objects.visual_marker import VisualMarker
 from igibson.utils import utils
+from igibson.utils.raycast_utils import ray_test_batch
 
 _DEFAULT_AABB_OFFSET = 0.1
 _PARALLEL_RAY_NORMAL_ANGLE_TOLERANCE = 1.0  # Around 60 degrees
 _DEFAULT_HIT_TO_PLANE_THRESHOLD = 0.05
 _DEFAULT_MAX_ANGLE_WITH_Z_AXIS = 3 * np.pi / 4
 _DEFAULT_MAX_SAMPLING_ATTEMPTS = 10
+# Minimum number of attempts cast in a single batch by sample_cuboid_on_object, as long as attempts remain.
+_MIN_CUBOID_SAMPLE_ATTEMPTS_PER_BATCH = 32
 _DEFAULT_CUBOID_BOTTOM_PADDING = 0.005
 # We will cast an additional parallel ray for each additional this much distance.
 _DEFAULT_NEW_RAY_PER_HORIZONTAL_DISTANCE = 0.1
@@ -107,6 +110,55 @@ def get_parallel_rays(
     return sources, destinations, ray_grid
 
 
+def get_parallel_ray_grid_steps(offset, new_ray_per_horizontal_distance=_DEFAULT_NEW_RAY_PER_HORIZONTAL_DISTANCE):
+    """Get the number of parallel rays along each axis of the grid used by get_parallel_rays.
+
+    :param offset: Array of shape (2, ) or (N, 2), orthogonal distance of parallel rays from input ray.
+    :param new_ray_per_horizontal_distance: See get_parallel_rays.
+    :return Array of shape (2, ) or (N, 2) with the number of rays along each axis.
+    """
+    steps = (np.asarray(offset) / new_ray_per_horizontal_distance).astype(int) * 2 + 1
+    return np.maximum(steps, 3)
+
+
+def get_parallel_rays_batch(
+    sources, destinations, offsets, new_ray_per_horizontal_distance=_DEFAULT_NEW_RAY_PER_HORIZONTAL_DISTANCE
+):
+    """Batched version of get_parallel_rays for N rays whose offsets give the same number of parallel rays.
+
+    :param sources: Array of shape (N, 3), sources of the rays to sample parallel rays of.
+    :param destinations: Array of shape (N, 3), destinations of the rays to sample parallel rays of.
+    :param offsets: Array of shape (N, 2), orthogonal distance of parallel rays from each input ray.
+    :param new_ray_per_horizontal_distance: See get_parallel_rays.
+    :return Tuple[Array[N, R, 3], Array[N, R, 3], Array[N, W, H, 2]] containing the sources and destinations of the
+        R = W * H parallel rays of each input ray, and the unflattened, untransformed grids in object coordinates.
+    """
+    ray_directions = destinations - sources
+
+    # Get orthogonal vectors using random vectors.
+    random_vectors = np.random.rand(*ray_directions.shape)
+    orthogonal_vectors_1 = np.cross(ray_directions, random_vectors)
+    orthogonal_vectors_1 /= np.linalg.norm(orthogonal_vectors_1, axis=1)[:, None]
+    orthogonal_vectors_2 = -np.cross(ray_directions, orthogonal_vectors_1)
+    orthogonal_vectors_2 /= np.linalg.norm(orthogonal_vectors_2, axis=1)[:, None]
+    assert np.all(np.isfinite(orthogonal_vectors_1)) and np.all(np.isfinite(orthogonal_vectors_2))
+
+    # Compute the grids of rays
+    steps = get_parallel_ray_grid_steps(offsets, new_ray_per_horizontal_distance)
+    assert np.all(steps == steps[0]), "All the rays of a batch need the same number of parallel rays."
+    x_range = np.linspace(-1.0, 1.0, steps[0, 0])[None, :] * offsets[:, 0:1]
+    y_range = np.linspace(-1.0, 1.0, steps[0, 1])[None, :] * offsets[:, 1:2]
+    ray_grids = np.stack(np.broadcast_arrays(x_range[:, :, None], y_range[:, None, :]), axis=-1)
+    ray_grids_flattened = ray_grids.reshape(len(sources), -1, 2)
+
+    # Apply the grids onto the orthogonal vectors to obtain the rays.
+    ray_offsets = (
+        ray_grids_flattened[:, :, 0:1] * orthogonal_vectors_1[:, None, :]
+        + ray_grids_flattened[:, :, 1:2] * orthogonal_vectors_2[:, None, :]
+    )
+    return sources[:, None, :] + ray_offsets, destinations[:, None, :] + ray_offsets, ray_grids
+
+
 def sample_origin_positions(mins, maxes, count, bimodal_mean_fraction, bimodal_stdev_fraction, axis_probabilities):
     """
     Sample ray casting origin positions with a given distribution.
@@ -129,35 +181,33 @@ def sample_origin_positions(mins, maxes, count, bimodal_mean_fraction, bimodal_s
     assert len(mins.shape) == 1
     assert mins.shape == maxes.shape
 
-    results = []
-    for i in range(count):
-        # Get the uniform sample first.
-        position = np.random.rand(3)
-
-        # Sample the bimodal normal.
-        bottom = (0 - bimodal_mean_fraction) / bimodal_stdev_fraction
-        top = (1 - bimodal_mean_fraction) / bimodal_stdev_fraction
-        bimodal_sample = truncnorm.rvs(bottom, top, loc=bimodal_mean_fraction, scale=bimodal_stdev_fraction)
+    # Get the uniform samples first.
+    positions = np.random.rand(count, 3)
 
-        # Pick which axis the bimodal normal sample should go to.
-        bimodal_axis = np.random.choice([0, 1, 2], p=axis_probabilities)
+    # Sample the bimodal normal.
+    bottom = (0 - bimodal_mean_fraction) / bimodal_stdev_fraction
+    top = (1 - bimodal_mean_fraction) / bimodal_stdev_fraction
+    bimodal_samples = truncnorm.rvs(bottom, top, loc=bimodal_mean_fraction, scale=bimodal_stdev_fraction, size=count)
 
-        # Choose which side of the axis to sample from. We only sample from the top for the Z axis.
-        if bimodal_axis == 2:
-            bimodal_axis_top_side = True
-        else:
-            bimodal_axis_top_side = np.random.choice([True, False])
+    # Pick which axis the bimodal normal sample should go to.
+    bimodal_axes = np.random.choice([0, 1, 2], size=count, p=axis_probabilities)
 
-        # Move sample based on chosen side.
-        position[bimodal_axis] = bimodal_sample if bimodal_axis_top_side else 1 - bimodal_sample
+    # Choose which side of the axis to sample from. We only sample from the top for the Z axis.
+    bimodal_axes_top_side = np.random.choice([True, False], size=count)
+    bimodal_axes_top_side[bimodal_axes == 2] = True
 
-        # Scale the position from the standard normal range to the min-max range.
-        scaled_position = mins + (maxes - mins) * position
+    # Move samples based on chosen side.
+    positions[np.arange(count), bimodal_axes] = np.where(bimodal_axes_top_side, bimodal_samples, 1 - bimodal_samples)
 
-        # Save the result.
-        results.append((bimodal_axis, bimodal_axis_top_side, scaled_position))
+    # Scale the positions from the standard normal range to the min-max range.
+    scaled_positions = mins + (maxes - mins) * positions
 
-    return results
+    return [
+        (bimodal_axis, bimodal_axis_top_side, scaled_position)
+        for bimodal_axis, bimodal_axis_top_side, scaled_position in zip(
+            bimodal_axes.tolist(), bimodal_axes_top_side.tolist(), scaled_positions
+        )
+    ]
 
 
 def sample_cuboid_on_object(
@@ -215,145 +265,89 @@ def sample_cuboid_on_object(
         assert cuboid_dimensions.shape[0] == num_samples, "Need as many offsets as samples requested."
 
     results = [(None, None, None, None, defaultdict(list)) for _ in range(num_samples)]
+    if num_samples == 0:
+        return results
+
+    # If we have a list of offset distances, pick the distance for each particular sample we're getting.
+    sample_cuboid_dimensions = np.broadcast_to(
+        cuboid_dimensions if cuboid_dimensions.ndim == 2 else cuboid_dimensions[None, :], (num_samples, 3)
+    ).astype(float)
+    to_wf_transform = utils.quat_pos_to_mat(bbox_center, bbox_orn)
+
+    # Each round casts the next attempts of every sample that has not been placed yet in a single batch, and keeps the
+    # first successful attempt of each sample in attempt order, so the result is the same as trying the attempts of each
+    # sample one at a time. A round makes all the attempts when there are few samples (e.g. the single sample of the
+    # object states), and one attempt per sample when there are enough samples to fill a batch, so that the samples
+    # stop at their first successful attempt.
+    remaining_samples = np.arange(num_samples)
+    num_attempts_made = 0
+    while len(remaining_samples) > 0 and num_attempts_made < max_sampling_attempts:
+        attempts_per_sample = min(
+            max_sampling_attempts - num_attempts_made,
+            max(1, int(np.ceil(_MIN_CUBOID_SAMPLE_ATTEMPTS_PER_BATCH / len(remaining_samples)))),
+        )
+        num_attempts_made += attempts_per_sample
+        attempt_samples = np.repeat(remaining_samples, attempts_per_sample)
 
-    for i in range(num_samples):
-        # Sample the starting positions in advance.
-        # TODO: Narrow down the sampling domain so that we don't sample scenarios where the center is in-domain but the
-        # full extent isn't. Currently a lot of samples are being wasted because of this.
-        samples = sample_origin_positions(
-            -half_extent_with_offset,
+        attempt_cuboid_dimensions = sample_cuboid_dimensions[attempt_samples]
+        attempts = _cast_cuboid_sample_attempts(
             half_extent_with_offset,
-            max_sampling_attempts,
+            to_wf_transform,
+            attempt_cuboid_dimensions,
+            body_ids,
             bimodal_mean_fraction,
             bimodal_stdev_fraction,
             axis_probabilities,
+            max_angle_with_z_axis,
+            hit_to_plane_threshold,
+            refuse_downwards,
         )
 
-        refusal_reasons = results[i][4]
-
-        # Try each sampled position in the AABB.
-        for axis, is_top, start_pos in samples:
-            # Compute the ray's destination using the sampling & AABB information.
-            point_on_face = compute_ray_destination(
-                axis, is_top, start_pos, -half_extent_with_offset, half_extent_with_offset
+        # The attempts that pass all the checks still have to pass the cuboid emptiness check.
+        passed = [k for k, attempt in enumerate(attempts) if attempt["passed"]]
+        cuboid_checks = {}
+        if len(passed) > 0:
+            cuboids = [_get_cuboid_sample(attempts[k], attempt_cuboid_dimensions[k]) for k in passed]
+            check_ray_from, check_ray_to = get_cuboid_check_rays(
+                np.array([plane_normal for _, plane_normal, _, _, _ in cuboids]),
+                np.array([corner_positions for _, _, _, corner_positions, _ in cuboids]),
+                attempt_cuboid_dimensions[passed],
             )
-
-            # If we have a list of offset distances, pick the distance for this particular sample we're getting.
-            this_cuboid_dimensions = cuboid_dimensions if cuboid_dimensions.ndim == 1 else cuboid_dimensions[i]
-
-            # Obtain the parallel rays using the direction sampling method.
-            bbf_sources, bbf_destinations, grid = get_parallel_rays(
-                start_pos, point_on_face, this_cuboid_dimensions[:2] / 2.0
-            )
-
-            # Transform the sources, destinations and grid to the world frame coordinates.
-            to_wf_transform = utils.quat_pos_to_mat(bbox_center, bbox_orn)
-            sources = trimesh.transformations.transform_points(bbf_sources, to_wf_transform)
-            destinations = trimesh.transformations.transform_points(bbf_destinations, to_wf_transform)
-
-            # Time to cast the rays.
-            cast_results = p.rayTestBatch(rayFromPositions=sources, rayToPositions=destinations, numThreads=0)
-
-            # for ray_start, ray_end in zip(sources, destinations):
-            #     p.addUserDebugLine(ray_start, ray_end, lineWidth=4)
-
-            threshold, hits = check_rays_hit_object(cast_results, body_ids, refusal_reasons["missed_object"], 0.6)
-            if not threshold:
-                continue
-
-            filtered_cast_results = []
-            center_idx = int(len(cast_results) / 2)
-            filtered_center_idx = None
-            center_hit = False
-            for idx, hit in enumerate(hits):
-                if hit:
-                    filtered_cast_results.append(cast_results[idx])
-                    if idx == center_idx:
-                        center_hit = True
-                        filtered_center_idx = len(filtered_cast_results) - 1
-
-            # Only consider objects whose center idx has a ray hit
-            if not center_hit:
-                continue
-
-            # Process the hit positions and normals.
-            hit_positions = np.array([ray_res[3] for ray_res in filtered_cast_results])
-            hit_normals = np.array([ray_res[4] for ray_res in filtered_cast_results])
-            hit_normals /= np.linalg.norm(hit_normals, axis=1)[:, np.newaxis]
-
-            assert filtered_center_idx
-            hit_link = filtered_cast_results[filtered_center_idx][1]
-            center_hit_normal = hit_normals[filtered_center_idx]
-
-            # Reject anything facing more than 45deg downwards if requested.
-            if refuse_downwards:
-                if not check_hit_max_angle_from_z_axis(
-                    center_hit_normal, max_angle_with_z_axis, refusal_reasons["downward_normal"]
-                ):
+            check_cast_results = [
+                result.reshape((len(passed), -1) + result.shape[1:])
+                for result in ray_test_batch(check_ray_from.reshape(-1, 3), check_ray_to.reshape(-1, 3))
+            ]
+            for idx, k in enumerate(passed):
+                if igibson.debug_sampling:
+                    draw_debug_markers(cuboids[idx][3])
+                empty = np.all(check_cast_results[0][idx] == -1)
+                cuboid_checks[k] = (cuboids[idx], empty, [result[idx] for result in check_cast_results])
+
+        placed = np.zeros(len(remaining_samples), dtype=bool)
+        for j, i in enumerate(remaining_samples):
+            refusal_reasons = results[i][4]
+            # The attempts after the first successful one are dropped, as if they had not been made.
+            for k in range(j * attempts_per_sample, (j + 1) * attempts_per_sample):
+                _log_cuboid_sample_refusal(attempts[k], cuboid_checks.get(k), refuse_downwards, refusal_reasons)
+                if k not in cuboid_checks or not cuboid_checks[k][1]:
                     continue
 
-            # Check that none of the parallel rays' hit normal differs from center ray by more than threshold.
-            if not check_normal_similarity(center_hit_normal, hit_normals, refusal_reasons["hit_normal_similarity"]):
-                continue
-
-            # Fit a plane to the points.
-            plane_centroid, plane_normal = fit_plane(hit_positions)
-
-            # The fit_plane normal can be facing either direction on the normal axis, but we want it to face away from
-            # the object for purposes of normal checking and padding. To do this:
-            # We get a vector from the centroid towards the center ray source, and flip the plane normal to match it.
-            # The cosine has positive sign if the two vectors are similar and a negative one if not.
-            plane_to_source = sources[center_idx] - plane_centroid
-            plane_normal *= np.sign(np.dot(plane_to_source, plane_normal))
-
-            # Check that the plane normal is similar to the hit normal
-            if not check_normal_similarity(
-                center_hit_normal, plane_normal[None, :], refusal_reasons["plane_normal_similarity"]
-            ):
-                continue
-
-            # Check that the points are all within some acceptable distance of the plane.
-            distances = get_distance_to_plane(hit_positions, plane_centroid, plane_normal)
-            if np.any(distances > hit_to_plane_threshold):
-                if igibson.debug_sampling:
-                    refusal_reasons["dist_to_plane"].append("distances to plane: %r" % (distances,))
-                continue
-
-            # Get projection of the base onto the plane, fit a rotation, and compute the new center hit / corners.
-            hit_positions = np.array([ray_res[3] for ray_res in cast_results])
-            projected_hits = get_projection_onto_plane(hit_positions, plane_centroid, plane_normal)
-            padding = _DEFAULT_CUBOID_BOTTOM_PADDING * plane_normal
-            projected_hits += padding
-            center_projected_hit = projected_hits[center_idx]
-            cuboid_centroid = center_projected_hit + plane_normal * this_cuboid_dimensions[2] / 2.0
-            rotation = compute_rotation_from_grid_sample(grid, projected_hits, cuboid_centroid, this_cuboid_dimensions)
-            corner_positions = cuboid_centroid[None, :] + (
-                rotation.apply(
-                    0.5
-                    * this_cuboid_dimensions
-                    * np.array(
-                        [
-                            [1, 1, -1],
-                            [-1, 1, -1],
-                            [-1, -1, -1],
-                            [1, -1, -1],
-                        ]
-                    )
+                cuboid_centroid, plane_normal, rotation, _, padding = cuboid_checks[k][0]
+                if undo_padding:
+                    cuboid_centroid -= padding
+
+                # We've found a nice attachment point.
+                results[i] = (
+                    cuboid_centroid,
+                    plane_normal,
+                    rotation.as_quat(),
+                    attempts[k]["hit_link"],
+                    refusal_reasons,
                 )
-            )
-
-            # Now we use the cuboid's diagonals to check that the cuboid is actually empty.
-            if not check_cuboid_empty(
-                plane_normal, corner_positions, refusal_reasons["cuboid_not_empty"], this_cuboid_dimensions
-            ):
-                continue
+                placed[j] = True
+                break
 
-            if undo_padding:
-                cuboid_centroid -= padding
-
-            # We've found a nice attachment point. Continue onto next point to sample.
-            results[i] = (cuboid_centroid, plane_normal, rotation.as_quat(), hit_link, refusal_reasons)
-            break
+        remaining_samples = remaining_samples[~placed]
 
     if igibson.debug_sampling:
         print("Sampling rejection reasons:")
@@ -368,6 +362,303 @@ def sample_cuboid_on_object(
     return results
 
 
+def _cast_cuboid_sample_attempts(
+    half_extent_with_offset,
+    to_wf_transform,
+    attempt_cuboid_dimensions,
+    body_ids,
+    bimodal_mean_fraction,
+    bimodal_stdev_fraction,
+    axis_probabilities,
+    max_angle_with_z_axis,
+    hit_to_plane_threshold,
+    refuse_downwards,
+):
+    """
+    Sample the rays of a batch of attempts of sample_cuboid_on_object, cast them all at once and run their checks.
+
+    :param half_extent_with_offset: Array of shape (3, ), the half extent of the sampling domain in the bounding box
+        frame.
+    :param to_wf_transform: Array of shape (4, 4), the transform from the bounding box frame to the world frame.
+    :param attempt_cuboid_dimensions: Array of shape (K, 3), the size of the cuboid of each of the K attempts.
+    :param body_ids: The body ids of the object being sampled on.
+    :param bimodal_mean_fraction: See sample_cuboid_on_object.
+    :param bimodal_stdev_fraction: See sample_cuboid_on_object.
+    :param axis_probabilities: See sample_cuboid_on_object.
+    :param max_angle_with_z_axis: See sample_cuboid_on_object.
+    :param hit_to_plane_threshold: See sample_cuboid_on_object.
+    :param refuse_downwards: See sample_cuboid_on_object.
+    :return List of K dicts, the attempts returned by _check_cuboid_sample_attempts with their ray grids.
+    """
+    num_attempts = len(attempt_cuboid_dimensions)
+
+    # TODO: Narrow down the sampling domain so that we don't sample scenarios where the center is in-domain but the
+    # full extent isn't. Currently a lot of samples are being wasted because of this.
+    samples = sample_origin_positions(
+        -half_extent_with_offset,
+        half_extent_with_offset,
+        num_attempts,
+        bimodal_mean_fraction,
+        bimodal_stdev_fraction,
+        axis_probabilities,
+    )
+    axes = np.array([axis for axis, _, _ in samples])
+    is_top = np.array([top for _, top, _ in samples])
+    start_positions = np.array([start_pos for _, _, start_pos in samples])
+
+    # Compute the rays' destinations using the sampling & AABB information.
+    points_on_face = start_positions.copy()
+    points_on_face[np.arange(num_attempts), axes] = np.where(
+        is_top, -half_extent_with_offset[axes], half_extent_with_offset[axes]
+    )
+
+    # The attempts are evaluated in groups that cast the same number of parallel rays, which is a single group unless
+    # the cuboid dimensions differ between samples.
+    grid_steps = get_parallel_ray_grid_steps(attempt_cuboid_dimensions[:, :2] / 2.0)
+    attempt_groups = []
+    for steps in np.unique(grid_steps, axis=0):
+        group = np.nonzero(np.all(grid_steps == steps, axis=1))[0]
+
+        # Obtain the parallel rays using the direction sampling method.
+        bbf_sources, bbf_destinations, grids = get_parallel_rays_batch(
+            start_positions[group], points_on_face[group], attempt_cuboid_dimensions[group, :2] / 2.0
+        )
+
+        # Transform the sources and destinations to the world frame coordinates.
+        sources = trimesh.transformations.transform_points(bbf_sources.reshape(-1, 3), to_wf_transform)
+        destinations = trimesh.transformations.transform_points(bbf_destinations.reshape(-1, 3), to_wf_transform)
+        attempt_groups.append(
+            (group, sources.reshape(bbf_sources.shape), destinations.reshape(bbf_sources.shape), grids)
+        )
+
+    # Time to cast the rays of all the attempts at once.
+    cast_results = ray_test_batch(
+        np.concatenate([sources.reshape(-1, 3) for _, sources, _, _ in attempt_groups]),
+        np.concatenate([destinations.reshape(-1, 3) for _, _, destinations, _ in attempt_groups]),
+    )
+
+    # Run the checks of every attempt, one stage at a time.
+    attempts = [None] * num_attempts
+    ray_offset = 0
+    for group, sources, destinations, grids in attempt_groups:
+        num_rays = sources.shape[0] * sources.shape[1]
+        group_results = [
+            result[ray_offset : ray_offset + num_rays].reshape((sources.shape[0], sources.shape[1]) + result.shape[1:])
+            for result in cast_results
+        ]
+        ray_offset += num_rays
+        for attempt, group_attempt in zip(
+            group,
+            _check_cuboid_sample_attempts(
+                sources,
+                group_results,
+                body_ids,
+                max_angle_with_z_axis,
+                hit_to_plane_threshold,
+                refuse_downwards,
+            ),
+        ):
+            group_attempt["grid"] = grids[group_attempt["index"]]
+            attempts[attempt] = group_attempt
+    return attempts
+
+
+_CUBOID_SAMPLE_CHECK_STAGES = [
+    "missed_object",
+    "center_missed",
+    "downward_normal",
+    "hit_normal_similarity",
+    "plane_normal_similarity",
+    "dist_to_plane",
+]
+
+
+def _check_cuboid_sample_attempts(
+    sources, cast_results, body_ids, max_angle_with_z_axis, hit_to_plane_threshold, refuse_downwards
+):
+    """
+    Run the ray hit, normal and plane checks of sample_cuboid_on_object on a batch of attempts at once.
+
+    :param sources: Array of shape (K, R, 3), the world frame sources of the R parallel rays of each of the K attempts.
+    :param cast_results: Tuple of ray_test_batch results, each reshaped to (K, R, ...).
+    :param body_ids: The body ids of the object being sampled on.
+    :param max_angle_with_z_axis: See sample_cuboid_on_object.
+    :param hit_to_plane_threshold: See sample_cuboid_on_object.
+    :param refuse_downwards: See sample_cuboid_on_object.
+    :return List of K dicts with the first failed stage of each attempt (None if all the checks passed) and the
+        intermediate results needed to place the cuboid and to log the refusal reasons.
+    """
+    hit_body_ids, hit_link_ids, _, hit_positions, hit_normals = cast_results
+    num_attempts, num_rays = hit_body_ids.shape
+    center_idx = int(num_rays / 2)
+    all_attempts = np.arange(num_attempts)
+
+    # Check that enough of the parallel rays hit the object, including the center ray.
+    hits = np.isin(hit_body_ids, list(body_ids))
+    num_hits = np.sum(hits, axis=1)
+    failed = {"missed_object": num_hits / num_rays < 0.6, "center_missed": ~hits[:, center_idx]}
+
+    # Process the hit normals, the normals of the rays that missed are not used.
+    hit_normal_norms = np.linalg.norm(hit_normals, axis=2)
+    hit_normals = hit_normals / np.where(hits, hit_normal_norms, 1.0)[:, :, None]
+    center_hit_normals = hit_normals[:, center_idx]
+
+    # Reject anything facing more than 45deg downwards if requested.
+    center_angles_with_z = np.arccos(np.clip(center_hit_normals[:, 2], -1.0, 1.0))
+    failed["downward_normal"] = (
+        center_angles_with_z > max_angle_with_z_axis if refuse_downwards else np.zeros(num_attempts, dtype=bool)
+    )
+
+    # Check that none of the parallel rays' hit normal differs from center ray by more than threshold.
+    with np.errstate(invalid="ignore", divide="ignore"):
+        hit_normal_angles = np.arccos(
+            np.clip(
+                np.einsum("kri,ki->kr", hit_normals, center_hit_normals)
+                / (np.linalg.norm(hit_normals, axis=2) * np.linalg.norm(center_hit_normals, axis=1)[:, None]),
+                -1.0,
+                1.0,
+            )
+        )
+    failed["hit_normal_similarity"] = np.any(hits & ~(hit_normal_angles < _PARALLEL_RAY_NORMAL_ANGLE_TOLERANCE), axis=1)
+
+    # Fit a plane to the hit points of each attempt.
+    weights = hits.astype(float)[:, :, None]
+    plane_centroids = np.sum(hit_positions * weights, axis=1) / np.maximum(num_hits, 1)[:, None]
+    centered_hit_positions = (hit_positions - plane_centroids[:, None, :]) * weights
+    plane_normals = np.linalg.svd(np.einsum("kri,krj->kij", centered_hit_positions, centered_hit_positions))[0][
+        :, :, -1
+    ]
+    plane_normals /= np.linalg.norm(plane_normals, axis=1)[:, None]
+
+    # The fit plane normal can be facing either direction on the normal axis, but we want it to face away from
+    # the object for purposes of normal checking and padding. To do this:
+    # We get a vector from the centroid towards the center ray source, and flip the plane normal to match it.
+    # The cosine has positive sign if the two vectors are similar and a negative one if not.
+    plane_to_sources = sources[:, center_idx] - plane_centroids
+    plane_normals *= np.sign(np.sum(plane_to_sources * plane_normals, axis=1))[:, None]
+
+    # Check that the plane normal is similar to the hit normal
+    plane_normal_angles = np.arccos(np.clip(np.sum(plane_normals * center_hit_normals, axis=1), -1.0, 1.0))
+    failed["plane_normal_similarity"] = ~(plane_normal_angles < _PARALLEL_RAY_NORMAL_ANGLE_TOLERANCE)
+
+    # Check that the points are all within some acceptable distance of the plane.
+    distances = np.abs(np.einsum("kri,ki->kr", hit_positions - plane_centroids[:, None, :], plane_normals))
+    failed["dist_to_plane"] = np.any(hits & (distances > hit_to_plane_threshold), axis=1)
+
+    # The first failed stage of each attempt, in the order the checks are run.
+    failed = np.stack([failed[stage] for stage in _CUBOID_SAMPLE_CHECK_STAGES], axis=1)
+    first_failed = np.where(np.any(failed, axis=1), np.argmax(failed, axis=1), len(_CUBOID_SAMPLE_CHECK_STAGES))
+
+    attempts = []
+    for k in all_attempts:
+        stage = _CUBOID_SAMPLE_CHECK_STAGES[first_failed[k]] if first_failed[k] < len(failed[k]) else None
+        attempts.append(
+            {
+                "index": k,
+                "failed_stage": stage,
+                "passed": stage is None,
+                "center_idx": center_idx,
+                "hit_link": int(hit_link_ids[k, center_idx]),
+                "hits": hits[k],
+                "hit_body_ids": hit_body_ids[k],
+                "hit_positions": hit_positions[k],
+                "center_hit_normal": center_hit_normals[k],
+                "hit_normal_angles": hit_normal_angles[k],
+                "plane_centroid": plane_centroids[k],
+                "plane_normal": plane_normals[k],
+                "plane_normal_angle": plane_normal_angles[k],
+                "distances": distances[k],
+            }
+        )
+    return attempts
+
+
+def _get_cuboid_sample(attempt, this_cuboid_dimensions):
+    """
+    Place the cuboid of an attempt that passed the checks of _check_cuboid_sample_attempts onto its fit plane.
+
+    :param attempt: dict, the attempt returned by _check_cuboid_sample_attempts.
+    :param this_cuboid_dimensions: Array of shape (3, ), the size of the cuboid.
+    :return Tuple of the cuboid centroid, its up vector, rotation, bottom corner positions and bottom padding.
+    """
+    plane_centroid, plane_normal = attempt["plane_centroid"], attempt["plane_normal"]
+
+    # Get projection of the base onto the plane, fit a rotation, and compute the new center hit / corners.
+    projected_hits = get_projection_onto_plane(attempt["hit_positions"], plane_centroid, plane_normal)
+    padding = _DEFAULT_CUBOID_BOTTOM_PADDING * plane_normal
+    projected_hits += padding
+    center_projected_hit = projected_hits[attempt["center_idx"]]
+    cuboid_centroid = center_projected_hit + plane_normal * this_cuboid_dimensions[2] / 2.0
+    rotation = compute_rotation_from_grid_sample(
+        attempt["grid"], projected_hits, cuboid_centroid, this_cuboid_dimensions
+    )
+    corner_positions = cuboid_centroid[None, :] + (
+        rotation.apply(
+            0.5
+            * this_cuboid_dimensions
+            * np.array(
+                [
+                    [1, 1, -1],
+                    [-1, 1, -1],
+                    [-1, -1, -1],
+                    [1, -1, -1],
+                ]
+            )
+        )
+    )
+    return cuboid_centroid, plane_normal, rotation, corner_positions, padding
+
+
+def _log_cuboid_sample_refusal(attempt, cuboid_check, refuse_downwards, refusal_log):
+    """
+    Log why an attempt of sample_cuboid_on_object was refused. Every check that was run on the attempt gets an entry in
+    the refusal log, even when it passed, while the refusal details are only logged with debug_sampling.
+
+    :param attempt: dict, the attempt returned by _check_cuboid_sample_attempts.
+    :param cuboid_check: Tuple of the cuboid sample, whether it was empty and its check ray results, or None if the
+        emptiness check was not run for this attempt.
+    :param refuse_downwards: See sample_cuboid_on_object.
+    :param refusal_log: defaultdict(list) of refusal reasons of the sample.
+    """
+    # The entry of a check is created when the check is run, whether it passes or not. setdefault is used instead of
+    # the defaultdict lookup so that the entries of the passed checks are created explicitly.
+    failed_stage = attempt["failed_stage"]
+    hits = attempt["hits"]
+    missed_object_log = refusal_log.setdefault("missed_object", [])
+    if failed_stage == "missed_object":
+        if igibson.debug_sampling:
+            missed_object_log.append("hits %r" % attempt["hit_body_ids"].tolist())
+        return
+    if failed_stage == "center_missed":
+        return
+    if refuse_downwards:
+        downward_normal_log = refusal_log.setdefault("downward_normal", [])
+        if failed_stage == "downward_normal":
+            if igibson.debug_sampling:
+                downward_normal_log.append("normal %r" % attempt["center_hit_normal"])
+            return
+    hit_normal_similarity_log = refusal_log.setdefault("hit_normal_similarity", [])
+    if failed_stage == "hit_normal_similarity":
+        if igibson.debug_sampling:
+            hit_normal_similarity_log.append("angles %r" % (np.rad2deg(attempt["hit_normal_angles"][hits]),))
+        return
+    plane_normal_similarity_log = refusal_log.setdefault("plane_normal_similarity", [])
+    if failed_stage == "plane_normal_similarity":
+        if igibson.debug_sampling:
+            plane_normal_similarity_log.append("angles %r" % (np.rad2deg(np.array([attempt["plane_normal_angle"]])),))
+        return
+    if failed_stage == "dist_to_plane":
+        if igibson.debug_sampling:
+            refusal_log["dist_to_plane"].append("distances to plane: %r" % (attempt["distances"][hits],))
+        return
+    if cuboid_check is None:
+        return
+    cuboid_not_empty_log = refusal_log.setdefault("cuboid_not_empty", [])
+    _, empty, check_cast_results = cuboid_check
+    if not empty and igibson.debug_sampling:
+        cuboid_not_empty_log.append("check ray info: %r" % (list(zip(*check_cast_results)),))
+
+
 def compute_rotation_from_grid_sample(two_d_grid, hit_positions, cuboid_centroid, this_cuboid_dimensions):
     # TODO: Figure out if the normalization has any advantages.
     grid_in_planar_coordinates = two_d_grid.reshape(-1, 2)
@@ -465,6 +756,31 @@ def compute_ray_destination(axis, is_top, start_pos, aabb_min, aabb_max):
     return point_on_face
 
 
+# Pairs of corner indices checked by the cuboid emptiness check, with the 4 bottom corners followed by the 4 top corners.
+# Top-to-bottom pairs check that the cuboid height is actually available, and the faces & volume of the cuboid are
+# unoccupied. Same-height pairs also check that the surfaces areas are empty.
+_CUBOID_CHECK_RAY_PAIRS = np.array(
+    list(itertools.product(range(4, 8), range(4)))
+    + list(itertools.combinations(range(4), 2))
+    + list(itertools.combinations(range(4, 8), 2))
+)
+
+
+def get_cuboid_check_rays(hit_normals, bottom_corner_positions, cuboid_dimensions):
+    """
+    Get the rays cast between the corners of a batch of cuboids to check that they are empty.
+
+    :param hit_normals: Array of shape (N, 3), the up vector of each cuboid.
+    :param bottom_corner_positions: Array of shape (N, 4, 3), the bottom corners of each cuboid.
+    :param cuboid_dimensions: Array of shape (N, 3), the size of each cuboid.
+    :return Tuple[Array[N, 28, 3], Array[N, 28, 3]] containing the sources and destinations of the check rays.
+    """
+    # Compute top corners.
+    top_corner_positions = bottom_corner_positions + (hit_normals * cuboid_dimensions[:, 2:3])[:, None, :]
+    corner_positions = np.concatenate([bottom_corner_positions, top_corner_positions], axis=1)
+    return corner_positions[:, _CUBOID_CHECK_RAY_PAIRS[:, 0]], corner_positions[:, _CUBOID_CHECK_RAY_PAIRS[:, 1]]
+
+
 def check_cuboid_empty(hit_normal, bottom_corner_positions, refusal_log, this_cuboid_dimensions):
     if igibson.debug_sampling:
         draw_debug_markers(bottom_corner_positions)
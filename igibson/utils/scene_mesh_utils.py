@@ -0,0 +1,363 @@
+"""
+Read the meshes of an iGibson scene directly from its URDF, without pybullet or a renderer. Objects are scaled and
+placed the same way as InteractiveIndoorScene and URDFObject do, and their links are posed by forward kinematics.
+Objects stay at the pose given by the URDF, they are not settled by running physics steps.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import trimesh
+
+import igibson
+from igibson.utils.assets_utils import (
+    get_3dfront_scene_path,
+    get_cubicasa_scene_path,
+    get_ig_category_path,
+    get_ig_model_path,
+    get_ig_scene_path,
+)
+from igibson.utils.urdf_utils import get_base_link_name
+from igibson.utils.utils import get_transform_from_xyz_rpy, rotate_vector_3d
+
+log = logging.getLogger(__name__)
+
+STRUCTURE_CATEGORIES = ["walls", "floors", "ceilings"]
+
+
+def get_scene_dir(scene_name, scene_source="IG"):
+    """
+    Get the folder of a scene
+
+    :param scene_name: scene name
+    :param scene_source: source of the scene, among IG, CUBICASA and THREEDFRONT
+    :return: scene folder
+    """
+    if scene_source == "IG":
+        return get_ig_scene_path(scene_name)
+    elif scene_source == "CUBICASA":
+        return get_cubicasa_scene_path(scene_name)
+    elif scene_source == "THREEDFRONT":
+        return get_3dfront_scene_path(scene_name)
+    raise ValueError("Unsupported scene source: {}".format(scene_source))
+
+
+def get_origin_transform(element):
+    """
+    Get the transform of the origin of a URDF element
+
+    :param element: URDF element that can have an origin child (joint, visual)
+    :return: 4x4 transform, identity if there is no origin
+    """
+    origin = element.find("origin")
+    if origin is None:
+        return np.eye(4)
+    xyz = [float(val) for val in origin.attrib.get("xyz", "0 0 0").split()]
+    rpy = [float(val) for val in origin.attrib.get("rpy", "0 0 0").split()]
+    return get_transform_from_xyz_rpy(xyz, rpy)
+
+
+def get_joint_motion_transform(joint_type, axis, position):
+    """
+    Get the transform of a joint at a given position, in the joint frame
+
+    :param joint_type: URDF joint type
+    :param axis: unit joint axis
+    :param position: joint position
+    :return: 4x4 transform
+    """
+    transform = np.eye(4)
+    if position == 0.0:
+        return transform
+    if joint_type in ["revolute", "continuous"]:
+        transform[:3, :3] = trimesh.transformations.rotation_matrix(position, axis)[:3, :3]
+    elif joint_type == "prismatic":
+        transform[:3, 3] = axis * position
+    return transform
+
+
+def load_mesh_file(filename):
+    """
+    Load the vertices and faces of a mesh file
+
+    :param filename: mesh file, encrypted meshes are read with the iGibson key
+    :return: (V, 3) vertices and (F, 3) faces
+    """
+    if filename.endswith("encrypted.obj"):
+        from igibson.render.mesh_renderer import tinyobjloader
+
+        reader = tinyobjloader.ObjReader()
+        if not reader.ParseFromFileWithKey(filename, igibson.key_path):
+            raise ValueError("Cannot read {}: {}".format(filename, reader.Error()))
+        attrib = reader.GetAttrib()
+        vertices = np.array(attrib.vertices).reshape(-1, 3)
+        faces = np.concatenate(
+            [
+                shape.mesh.numpy_indices().reshape((len(shape.mesh.indices), 3))[:, 0].reshape(-1, 3)
+                for shape in reader.GetShapes()
+            ]
+        )
+        return vertices, faces
+
+    mesh = trimesh.load(filename, force="mesh", process=False)
+    return np.array(mesh.vertices), np.array(mesh.faces)
+
+
+def get_model_bbox_info(model_path):
+    """
+    Get the bounding box size of a model at scale 1 and the offset of its base link from the bounding box center,
+    from the same files URDFObject reads
+
+    :param model_path: model folder
+    :return: bounding box size (None if unknown) and base link offset
+    """
+    meta_json = os.path.join(model_path, "misc", "metadata.json")
+    bbox_json = os.path.join(model_path, "misc", "bbox.json")
+    if os.path.isfile(meta_json):
+        with open(meta_json, "r") as f:
+            metadata = json.load(f)
+        return np.array(metadata["bbox_size"]), np.array(metadata["base_link_offset"])
+    elif os.path.isfile(bbox_json):
+        with open(bbox_json, "r") as f:
+            bbox_data = json.load(f)
+        bbox_max = np.array(bbox_data["max"])
+        bbox_min = np.array(bbox_data["min"])
+        return bbox_max - bbox_min, (bbox_min + bbox_max) / 2.0
+    return None, np.zeros(3)
+
+
+def get_scene_object_entries(scene_name, scene_source="IG", urdf_file=None, seed=0):
+    """
+    Parse the scene URDF into the list of objects to load, with their URDF, scale and pose.
+    Only the objects that are currently selected by their multiplexer are returned, and random models are chosen with
+    a fixed seed.
+
+    :param scene_name: scene name
+    :param scene_source: source of the scene, among IG, CUBICASA and THREEDFRONT
+    :param urdf_file: name of the scene URDF file (without .urdf), default to <scene_name>_best
+    :param seed: seed used to choose random models
+    :return: list of dicts with the object name, category, urdf file, model path, scale, bbox center pose (world
+        transform) and base link offset in the bounding box frame
+    """
+    scene_dir = get_scene_dir(scene_name, scene_source)
+    if urdf_file is None:
+        urdf_file = "{}_best".format(scene_name)
+        if not os.path.exists(os.path.join(scene_dir, "urdf", "{}.urdf".format(urdf_file))):
+            urdf_file = scene_name
+    scene_tree = ET.parse(os.path.join(scene_dir, "urdf", "{}.urdf".format(urdf_file)))
+    connecting_joints = {joint.find("child").attrib["link"]: joint for joint in scene_tree.findall("joint")}
+
+    # Multiplexers select either the whole object (index 0) or its parts (index 1)
+    multiplexer_indices = {
+        link.attrib["name"]: int(link.attrib["current_index"])
+        for link in scene_tree.findall("link")
+        if link.attrib.get("category") == "multiplexer"
+    }
+    grouper_multiplexers = {
+        link.attrib["name"]: link.attrib["multiplexer"]
+        for link in scene_tree.findall("link")
+        if link.attrib.get("category") == "grouper"
+    }
+
+    rng = random.Random(seed)
+    random_groups = {}
+    entries = []
+    for link in scene_tree.findall("link"):
+        object_name = link.attrib["name"]
+        category = link.attrib.get("category")
+        if object_name == "world" or category in ["multiplexer", "grouper", "agent_pose", "agent"]:
+            continue
+        if "multiplexer" in link.keys() and multiplexer_indices[link.attrib["multiplexer"]] != 0:
+            continue
+        if "grouper" in link.keys() and multiplexer_indices[grouper_multiplexers[link.attrib["grouper"]]] != 1:
+            continue
+
+        model = link.attrib["model"]
+        if category in STRUCTURE_CATEGORIES:
+            model_path = scene_dir
+            filename = os.path.join(model_path, "urdf", model + "_" + category + ".urdf")
+        else:
+            if model == "random":
+                category_path = get_ig_category_path(category)
+                random_group_key = (category, link.attrib.get("random_group"))
+                if random_group_key[1] is None or random_group_key not in random_groups:
+                    random_groups[random_group_key] = rng.choice(sorted(os.listdir(category_path)))
+                model = random_groups[random_group_key]
+            model_path = get_ig_model_path(category, model)
+            filename = os.path.join(model_path, model + ".urdf")
+
+        bbox_size, base_link_offset = get_model_bbox_info(model_path)
+        if "bounding_box" in link.keys() and bbox_size is not None:
+            bounding_box = np.array([float(val) for val in link.attrib["bounding_box"].split(" ")])
+            scale = bounding_box / bbox_size
+        elif "scale" in link.keys():
+            scale = np.array([float(val) for val in link.attrib["scale"].split(" ")])
+        else:
+            scale = np.ones(3)
+
+        entries.append(
+            {
+                "name": object_name,
+                "category": category,
+                "filename": filename,
+                "model_path": model_path,
+                "scale": scale,
+                "bbox_center_transform": get_origin_transform(connecting_joints[object_name]),
+                "base_link_offset": base_link_offset,
+            }
+        )
+
+    return entries
+
+
+def get_urdf_mesh(filename, model_path, scale, base_transform, open_joints=False):
+    """
+    Get the visual meshes of all the links of a URDF in the world frame, scaled as URDFObject.scale_object does
+
+    :param filename: URDF file
+    :param model_path: folder the mesh file names of the URDF are relative to
+    :param scale: scale of the base link
+    :param base_transform: 4x4 world transform of the base link frame
+    :param open_joints: whether to set the joints attached to the base link to their upper limit (e.g. open doors)
+        instead of 0
+    :return: (V, 3) vertices and (F, 3) faces
+    """
+    tree = ET.parse(filename)
+    links = {link.attrib["name"]: link for link in tree.findall("link")}
+    base_link_name = get_base_link_name(tree)
+    child_joints = {}
+    for joint in tree.findall("joint"):
+        child_joints.setdefault(joint.find("parent").attrib["link"], []).append(joint)
+
+    vertices, faces = [], []
+    num_vertices = 0
+    stack = [(base_link_name, base_transform, np.asarray(scale, dtype=float))]
+    while len(stack) > 0:
+        link_name, link_transform, scale_in_lf = stack.pop()
+
+        for visual in links[link_name].findall("visual"):
+            mesh = visual.find("geometry/mesh")
+            box = visual.find("geometry/box")
+            if mesh is not None:
+                mesh_vertices, mesh_faces = load_mesh_file(os.path.join(model_path, mesh.attrib["filename"]))
+                if "scale" in mesh.attrib:
+                    mesh_vertices = mesh_vertices * np.array([float(val) for val in mesh.attrib["scale"].split()])
+            elif box is not None:
+                box_mesh = trimesh.creation.box(np.array([float(val) for val in box.attrib["size"].split()]))
+                mesh_vertices, mesh_faces = np.array(box_mesh.vertices), np.array(box_mesh.faces)
+            else:
+                continue
+            visual_transform = get_origin_transform(visual)
+            visual_transform[:3, 3] *= scale_in_lf
+            transform = link_transform.dot(visual_transform)
+            vertices.append((mesh_vertices * scale_in_lf).dot(transform[:3, :3].T) + transform[:3, 3])
+            faces.append(mesh_faces + num_vertices)
+            num_vertices += len(mesh_vertices)
+
+        for joint in child_joints.get(link_name, []):
+            joint_type = joint.attrib["type"]
+            joint_transform = get_origin_transform(joint)
+            joint_transform[:3, 3] *= scale_in_lf
+            if "rpy" in joint.keys():
+                joint_frame_rot = np.array([float(val) for val in joint.attrib["rpy"].split(" ")])
+                scale_in_child_lf = np.absolute(rotate_vector_3d(scale_in_lf, *joint_frame_rot, cck=True))
+            else:
+                scale_in_child_lf = scale_in_lf
+
+            position = 0.0
+            axis = np.array([1.0, 0.0, 0.0])
+            if joint.find("axis") is not None:
+                axis = np.array([float(val) for val in joint.find("axis").attrib["xyz"].split()]) * scale_in_child_lf
+                axis /= np.linalg.norm(axis)
+            limit = joint.find("limit")
+            if open_joints and link_name == base_link_name and limit is not None:
+                lower, upper = float(limit.attrib.get("lower", 0.0)), float(limit.attrib.get("upper", 0.0))
+                if joint_type == "prismatic":
+                    major_axis = np.argmax(np.abs(axis))
+                    lower, upper = lower * scale_in_lf[major_axis], upper * scale_in_lf[major_axis]
+                if joint_type in ["revolute", "prismatic"] and lower < upper:
+                    position = upper
+
+            child_transform = link_transform.dot(joint_transform).dot(
+                get_joint_motion_transform(joint_type, axis, position)
+            )
+            stack.append((joint.find("child").attrib["link"], child_transform, scale_in_child_lf))
+
+    if len(vertices) == 0:
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64)
+    return np.concatenate(vertices), np.concatenate(faces)
+
+
+def get_scene_mesh(entries, open_door=True):
+    """
+    Get the visual meshes of the objects of a scene in the world frame
+
+    :param entries: object entries returned by get_scene_object_entries
+    :param open_door: whether to open the doors, like InteractiveIndoorScene.open_all_doors
+    :return: (V, 3) vertices, (F, 3) faces and (F, ) index of the entry each face belongs to
+    """
+    vertices, faces, face_entries = [], [], []
+    num_vertices = 0
+    for i, entry in enumerate(entries):
+        # The scene URDF gives the pose of the bounding box center, the base link is offset from it
+        base_transform = entry["bbox_center_transform"].copy()
+        base_transform[:3, 3] += base_transform[:3, :3].dot(-entry["scale"] * entry["base_link_offset"])
+        object_vertices, object_faces = get_urdf_mesh(
+            entry["filename"],
+            entry["model_path"],
+            entry["scale"],
+            base_transform,
+            open_joints=open_door and entry["category"] == "door",
+        )
+        vertices.append(object_vertices)
+        faces.append(object_faces + num_vertices)
+        face_entries.append(np.full(len(object_faces), i))
+        num_vertices += len(object_vertices)
+    return np.concatenate(vertices), np.concatenate(faces).astype(np.int64), np.concatenate(face_entries)
+
+
+def get_urdf_input_files(filename, model_path):
+    """
+    Get the files the mesh of a URDF is built from
+
+    :param filename: URDF file
+    :param model_path: folder the mesh file names of the URDF are relative to
+    :return: list of files
+    """
+    files = [filename]
+    for mesh in ET.parse(filename).iter("mesh"):
+        files.append(os.path.join(model_path, mesh.attrib["filename"]))
+    for misc_file in ["metadata.json", "bbox.json"]:
+        if os.path.isfile(os.path.join(model_path, "misc", misc_file)):
+            files.append(os.path.join(model_path, "misc", misc_file))
+    return files
+
+
+def get_scene_mesh_hash(entries, extra=None):
+    """
+    Get a hash of the content of all the files the mesh of a set of scene objects is built from, and of their poses
+
+    :param entries: object entries returned by get_scene_object_entries
+    :param extra: any additional JSON-serializable parameter that affects the result
+    :return: hex digest
+    """
+    md5 = hashlib.md5()
+    md5.update(json.dumps(extra, sort_keys=True).encode("utf-8"))
+    hashed_files = set()
+    for entry in entries:
+        md5.update(entry["name"].encode("utf-8"))
+        md5.update(np.asarray(entry["scale"], dtype=np.float64).tobytes())
+        md5.update(np.asarray(entry["bbox_center_transform"], dtype=np.float64).tobytes())
+        for input_file in get_urdf_input_files(entry["filename"], entry["model_path"]):
+            md5.update(input_file.encode("utf-8"))
+            if input_file in hashed_files:
+                continue
+            hashed_files.add(input_file)
+            with open(input_file, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    md5.update(chunk)
+    return md5.hexdigest()
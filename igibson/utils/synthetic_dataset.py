@@ -0,0 +1,412 @@
+"""
+Procedurally generated iGibson datasets, for the benchmarks and tests that cannot rely on the licensed dataset.
+
+generate_synthetic_dataset writes a grid of rooms in the layout of ig_dataset: a scene URDF listing the objects of every
+room, the URDFs and meshes of the walls and floors, the traversability and room segmentation maps, and a few object
+models (tables, cabinets with a revolute door, apples and bowls) with their metadata and bounding box annotations. The
+object categories are real iGibson categories, so that the objects get their object states from the BDDL taxonomy.
+The meshes are boxes and the objects have no textures, so the dataset exercises the physics, the object states and the
+navigation code, not the renderer.
+"""
+import json
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+from PIL import Image
+
+import igibson
+from igibson.utils import semantics_utils
+
+# Every pixel of the maps of ig_dataset represents 0.01m
+MAP_DEFAULT_RESOLUTION = 0.01
+
+ROOM_TYPES = ["living_room", "kitchen", "bedroom", "bathroom", "dining_room", "corridor"]
+
+# Object models: category -> (bounding box size, density)
+OBJECT_MODELS = {
+    "breakfast_table": ([1.2, 0.8, 0.75], 400.0),
+    "bottom_cabinet": ([0.52, 0.8, 0.9], 200.0),
+    "apple": ([0.08, 0.08, 0.08], 800.0),
+    "bowl": ([0.16, 0.16, 0.06], 500.0),
+}
+SMALL_OBJECT_CATEGORIES = ["apple", "bowl"]
+BUILDING_CATEGORIES = ["walls", "floors", "ceilings"]
+MODEL_NAME = "synthetic_0"
+
+# Thickness of the cabinet door, which is part of its bounding box
+CABINET_DOOR_THICKNESS = 0.02
+
+
+def box_vertices_faces(center, extent):
+    """
+    Get the mesh of an axis-aligned box
+
+    :param center: center of the box
+    :param extent: size of the box
+    :return: (8, 3) vertices and (12, 3) triangles, with their normals pointing outwards
+    """
+    corners = np.array([[x, y, z] for x in (-0.5, 0.5) for y in (-0.5, 0.5) for z in (-0.5, 0.5)])
+    vertices = np.array(center) + corners * np.array(extent)
+    faces = np.array(
+        [
+            [0, 1, 3],
+            [0, 3, 2],
+            [4, 6, 7],
+            [4, 7, 5],
+            [0, 4, 5],
+            [0, 5, 1],
+            [2, 3, 7],
+            [2, 7, 6],
+            [0, 2, 6],
+            [0, 6, 4],
+            [1, 5, 7],
+            [1, 7, 3],
+        ]
+    )
+    return vertices, faces
+
+
+def write_box_obj(filename, center, extent):
+    """
+    Write the mesh of an axis-aligned box to an OBJ file
+
+    :param filename: OBJ file
+    :param center: center of the box
+    :param extent: size of the box
+    """
+    vertices, faces = box_vertices_faces(center, extent)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, "w") as f:
+        for vertex in vertices:
+            f.write("v {:.6f} {:.6f} {:.6f}\n".format(*vertex))
+        for face in faces + 1:
+            f.write("f {} {} {}\n".format(*face))
+
+
+def _vec(values):
+    return " ".join("{:.6f}".format(value) for value in values)
+
+
+def _add_mesh_link(robot, link_name, visual_meshes, collision_meshes):
+    link = ET.SubElement(robot, "link", {"name": link_name})
+    for tag, mesh_filenames in [("visual", visual_meshes), ("collision", collision_meshes)]:
+        for mesh_filename in mesh_filenames:
+            element = ET.SubElement(link, tag)
+            ET.SubElement(element, "origin", {"xyz": "0 0 0", "rpy": "0 0 0"})
+            geometry = ET.SubElement(element, "geometry")
+            ET.SubElement(geometry, "mesh", {"filename": mesh_filename})
+    return link
+
+
+def _add_static_inertial(link):
+    # Building structures are fixed, their inertial only keeps pybullet from warning about its absence
+    inertial = ET.SubElement(link, "inertial")
+    ET.SubElement(inertial, "origin", {"xyz": "0 0 0", "rpy": "0 0 0"})
+    ET.SubElement(inertial, "mass", {"value": "0"})
+    ET.SubElement(inertial, "inertia", {"ixx": "0", "ixy": "0", "ixz": "0", "iyy": "0", "iyz": "0", "izz": "0"})
+
+
+def _add_box_link(robot, model_path, link_name, center, extent):
+    meshes = []
+    for mesh_type in ["visual", "collision"]:
+        mesh = "shape/{}/{}.obj".format(mesh_type, link_name)
+        write_box_obj(os.path.join(model_path, mesh), center, extent)
+        meshes.append(mesh)
+    return _add_mesh_link(robot, link_name, [meshes[0]], [meshes[1]])
+
+
+def _add_joint(robot, name, joint_type, parent, child, xyz=(0, 0, 0), rpy=(0, 0, 0), axis=None, limit=None):
+    joint = ET.SubElement(robot, "joint", {"name": name, "type": joint_type})
+    ET.SubElement(joint, "origin", {"xyz": _vec(xyz), "rpy": _vec(rpy)})
+    ET.SubElement(joint, "parent", {"link": parent})
+    ET.SubElement(joint, "child", {"link": child})
+    if axis is not None:
+        ET.SubElement(joint, "axis", {"xyz": _vec(axis)})
+    if limit is not None:
+        ET.SubElement(
+            joint, "limit", {"lower": str(limit[0]), "upper": str(limit[1]), "effort": "100", "velocity": "1"}
+        )
+    return joint
+
+
+def _write_urdf(robot, filename):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    ET.ElementTree(robot).write(filename, xml_declaration=True, encoding="utf-8")
+
+
+def _link_bounding_box(center, extent):
+    transform = np.eye(4)
+    transform[:3, 3] = center
+    bounding_box = {
+        "axis_aligned": {"extent": list(extent), "transform": transform.tolist()},
+        "oriented": {"extent": list(extent), "transform": transform.tolist()},
+    }
+    return {"collision": bounding_box, "visual": bounding_box}
+
+
+def generate_object_model(dataset_path, category):
+    """
+    Write the URDF, the meshes and the metadata of the synthetic model of a category
+
+    :param dataset_path: root of the dataset
+    :param category: category in OBJECT_MODELS
+    """
+    bbox_size = np.array(OBJECT_MODELS[category][0])
+    model_path = os.path.join(dataset_path, "objects", category, MODEL_NAME)
+    robot = ET.Element("robot", {"name": MODEL_NAME})
+    metadata = {"bbox_size": bbox_size.tolist(), "link_bounding_boxes": {}}
+
+    if category == "bottom_cabinet":
+        # Body centered on the base link origin, and a door on its front (+x) face, hinged on its -y edge
+        body_size = bbox_size - [CABINET_DOOR_THICKNESS, 0, 0]
+        door_size = np.array([CABINET_DOOR_THICKNESS, body_size[1], body_size[2] * 0.95])
+        door_center = np.array([0.0, door_size[1] / 2, 0.0])
+        _add_box_link(robot, model_path, "base_link", np.zeros(3), body_size)
+        _add_box_link(robot, model_path, "door", door_center, door_size)
+        hinge = [body_size[0] / 2 + CABINET_DOOR_THICKNESS / 2, -body_size[1] / 2, 0.0]
+        _add_joint(robot, "j_door", "revolute", "base_link", "door", xyz=hinge, axis=[0, 0, -1], limit=[0.0, 1.57])
+        metadata["base_link_offset"] = [CABINET_DOOR_THICKNESS / 2, 0.0, 0.0]
+        metadata["openable_joint_ids"] = [[0, "j_door"]]
+        metadata["link_bounding_boxes"]["base_link"] = _link_bounding_box(np.zeros(3), body_size)
+        metadata["link_bounding_boxes"]["door"] = _link_bounding_box(door_center, door_size)
+    else:
+        _add_box_link(robot, model_path, "base_link", np.zeros(3), bbox_size)
+        metadata["base_link_offset"] = [0.0, 0.0, 0.0]
+        metadata["link_bounding_boxes"]["base_link"] = _link_bounding_box(np.zeros(3), bbox_size)
+
+    _write_urdf(robot, os.path.join(model_path, MODEL_NAME + ".urdf"))
+    os.makedirs(os.path.join(model_path, "misc"), exist_ok=True)
+    with open(os.path.join(model_path, "misc", "metadata.json"), "w") as f:
+        json.dump(metadata, f)
+
+
+def _wall_boxes(grid_size, room_size, wall_thickness, door_width):
+    """
+    Get the wall boxes of a grid of rooms, with a door in the middle of every wall between two rooms
+
+    :return: list of (x_min, x_max, y_min, y_max)
+    """
+    nx, ny = grid_size
+    x_min, y_min = -nx * room_size / 2, -ny * room_size / 2
+    t = wall_thickness / 2
+    boxes = []
+    # Walls along y, at every x grid line
+    for i in range(nx + 1):
+        x = x_min + i * room_size
+        for j in range(ny):
+            y0, y1 = y_min + j * room_size, y_min + (j + 1) * room_size
+            if i in [0, nx]:
+                boxes.append((x - t, x + t, y0 - t, y1 + t))
+            else:
+                y_mid = (y0 + y1) / 2
+                boxes.append((x - t, x + t, y0 - t, y_mid - door_width / 2))
+                boxes.append((x - t, x + t, y_mid + door_width / 2, y1 + t))
+    # Walls along x, at every y grid line
+    for j in range(ny + 1):
+        y = y_min + j * room_size
+        for i in range(nx):
+            x0, x1 = x_min + i * room_size, x_min + (i + 1) * room_size
+            if j in [0, ny]:
+                boxes.append((x0 - t, x1 + t, y - t, y + t))
+            else:
+                x_mid = (x0 + x1) / 2
+                boxes.append((x0 - t, x_mid - door_width / 2, y - t, y + t))
+                boxes.append((x_mid + door_width / 2, x1 + t, y - t, y + t))
+    return boxes
+
+
+def _fill_map(image, box, value, map_size):
+    """
+    Fill the pixels of a map covered by a world box, the rows of the map being along y and its columns along x
+    """
+    x_min, x_max, y_min, y_max = box
+    c0, c1 = [int(np.clip(round(v / MAP_DEFAULT_RESOLUTION + map_size / 2), 0, map_size)) for v in (x_min, x_max)]
+    r0, r1 = [int(np.clip(round(v / MAP_DEFAULT_RESOLUTION + map_size / 2), 0, map_size)) for v in (y_min, y_max)]
+    image[r0:r1, c0:c1] = value
+
+
+def generate_synthetic_dataset(
+    dataset_path,
+    scene_id="Synthetic_int",
+    grid_size=(2, 2),
+    room_size=4.0,
+    objects_per_room=4,
+    wall_thickness=0.1,
+    wall_height=2.5,
+    door_width=1.0,
+    seed=0,
+):
+    """
+    Generate a synthetic iGibson dataset with one interactive scene made of a grid of rooms. Every room has a table
+    with objects_per_room apples and bowls on it, and a cabinet in a corner. The rooms are connected by doors.
+
+    :param dataset_path: root of the dataset, used as igibson.ig_dataset_path (see set_ig_dataset_path)
+    :param scene_id: scene id, loaded with InteractiveIndoorScene(scene_id)
+    :param grid_size: number of rooms along x and y
+    :param room_size: size of the square rooms, in meters
+    :param objects_per_room: number of small objects on the table of every room
+    :param wall_thickness: thickness of the walls, in meters
+    :param wall_height: height of the walls, in meters
+    :param door_width: width of the doors between the rooms, in meters
+    :param seed: random seed of the placement of the objects
+    :return: dataset_path
+    """
+    rng = np.random.RandomState(seed)
+    nx, ny = grid_size
+    scene_dir = os.path.join(dataset_path, "scenes", scene_id)
+
+    # Metadata
+    categories = BUILDING_CATEGORIES + sorted(OBJECT_MODELS)
+    os.makedirs(os.path.join(dataset_path, "metadata"), exist_ok=True)
+    with open(os.path.join(dataset_path, "metadata", "categories.txt"), "w") as f:
+        f.write("\n".join(categories) + "\n")
+    with open(os.path.join(dataset_path, "metadata", "room_categories.txt"), "w") as f:
+        f.write("\n".join(ROOM_TYPES) + "\n")
+    avg_category_specs = {
+        category: {"size": size, "density": density, "enable_ag": category in SMALL_OBJECT_CATEGORIES}
+        for category, (size, density) in OBJECT_MODELS.items()
+    }
+    with open(os.path.join(dataset_path, "metadata", "avg_category_specs.json"), "w") as f:
+        json.dump(avg_category_specs, f)
+
+    for category in OBJECT_MODELS:
+        generate_object_model(dataset_path, category)
+
+    # Rooms: (name, room type id, box)
+    rooms = []
+    room_type_counts = {}
+    for j in range(ny):
+        for i in range(nx):
+            room_type = ROOM_TYPES[(j * nx + i) % len(ROOM_TYPES)]
+            name = "{}_{}".format(room_type, room_type_counts.get(room_type, 0))
+            room_type_counts[room_type] = room_type_counts.get(room_type, 0) + 1
+            x0, y0 = (i - nx / 2) * room_size, (j - ny / 2) * room_size
+            rooms.append((name, ROOM_TYPES.index(room_type) + 1, (x0, x0 + room_size, y0, y0 + room_size)))
+
+    # Walls and floors, whose meshes are in world coordinates
+    wall_boxes = _wall_boxes(grid_size, room_size, wall_thickness, door_width)
+    walls = ET.Element("robot", {"name": scene_id + "_walls"})
+    wall_meshes = []
+    for k, (x0, x1, y0, y1) in enumerate(wall_boxes):
+        mesh = "shape/walls/wall_{}.obj".format(k)
+        write_box_obj(
+            os.path.join(scene_dir, mesh),
+            [(x0 + x1) / 2, (y0 + y1) / 2, wall_height / 2],
+            [x1 - x0, y1 - y0, wall_height],
+        )
+        wall_meshes.append(mesh)
+    _add_static_inertial(_add_mesh_link(walls, "base_link", wall_meshes, wall_meshes))
+    _write_urdf(walls, os.path.join(scene_dir, "urdf", scene_id + "_walls.urdf"))
+
+    floors = ET.Element("robot", {"name": scene_id + "_floors"})
+    _add_static_inertial(ET.SubElement(floors, "link", {"name": "base_link"}))
+    for name, _, (x0, x1, y0, y1) in rooms:
+        mesh = "shape/floors/floor_{}.obj".format(name)
+        write_box_obj(os.path.join(scene_dir, mesh), [(x0 + x1) / 2, (y0 + y1) / 2, -0.025], [x1 - x0, y1 - y0, 0.05])
+        _add_static_inertial(_add_mesh_link(floors, "room_floor_" + name, [mesh], [mesh]))
+        _add_joint(floors, "j_room_floor_" + name, "fixed", "base_link", "room_floor_" + name)
+    _write_urdf(floors, os.path.join(scene_dir, "urdf", scene_id + "_floors.urdf"))
+
+    # Scene URDF, with the objects of every room
+    scene = ET.Element("robot", {"name": "igibson_scene"})
+    ET.SubElement(scene, "link", {"name": "world"})
+    for category in ["walls", "floors"]:
+        ET.SubElement(scene, "link", {"name": category, "category": category, "model": scene_id})
+        _add_joint(scene, "j_" + category, "fixed", "world", category)
+
+    object_boxes = []
+    object_counts = {}
+
+    def add_object(category, room, position, yaw=0.0):
+        index = object_counts.get(category, 0)
+        object_counts[category] = index + 1
+        name = "{}_{}".format(category, index)
+        size = OBJECT_MODELS[category][0]
+        link = {"name": name, "category": category, "model": MODEL_NAME, "room": room}
+        link["bounding_box"] = _vec(size)
+        ET.SubElement(scene, "link", link)
+        joint_type = "floating" if category in SMALL_OBJECT_CATEGORIES else "fixed"
+        _add_joint(scene, "j_" + name, joint_type, "world", name, xyz=position, rpy=(0, 0, yaw))
+        object_boxes.append(
+            (position[0] - size[0] / 2, position[0] + size[0] / 2, position[1] - size[1] / 2, position[1] + size[1] / 2)
+        )
+
+    for name, _, (x0, x1, y0, y1) in rooms:
+        table_size = OBJECT_MODELS["breakfast_table"][0]
+        table_pos = [
+            (x0 + x1) / 2 + rng.uniform(-0.3, 0.3),
+            (y0 + y1) / 2 + rng.uniform(-0.3, 0.3),
+            table_size[2] / 2,
+        ]
+        add_object("breakfast_table", name, table_pos)
+
+        cabinet_size = OBJECT_MODELS["bottom_cabinet"][0]
+        add_object(
+            "bottom_cabinet",
+            name,
+            [
+                x0 + wall_thickness / 2 + cabinet_size[0] / 2 + 0.02,
+                y0 + wall_thickness / 2 + cabinet_size[1] / 2 + 0.3,
+                cabinet_size[2] / 2,
+            ],
+        )
+
+        # Small objects on a grid on the table top
+        columns = int(np.ceil(np.sqrt(objects_per_room)))
+        for k in range(objects_per_room):
+            category = SMALL_OBJECT_CATEGORIES[k % len(SMALL_OBJECT_CATEGORIES)]
+            size = OBJECT_MODELS[category][0]
+            u = ((k % columns) + 0.5) / columns - 0.5
+            v = ((k // columns) + 0.5) / columns - 0.5
+            add_object(
+                category,
+                name,
+                [
+                    table_pos[0] + u * (table_size[0] - 0.2),
+                    table_pos[1] + v * (table_size[1] - 0.2),
+                    table_size[2] + size[2] / 2 + 0.01,
+                ],
+                yaw=rng.uniform(-np.pi, np.pi),
+            )
+
+    _write_urdf(scene, os.path.join(scene_dir, "urdf", scene_id + "_best.urdf"))
+
+    # Layout maps: traversability with and without the objects, and room semantic and instance segmentation
+    map_size = int(np.ceil((max(nx, ny) * room_size + 2.0) / MAP_DEFAULT_RESOLUTION / 2)) * 2
+    trav_no_obj = np.zeros((map_size, map_size), dtype=np.uint8)
+    ins_seg = np.zeros((map_size, map_size), dtype=np.uint8)
+    sem_seg = np.zeros((map_size, map_size), dtype=np.uint8)
+    for k, (_, room_type_id, box) in enumerate(rooms):
+        _fill_map(trav_no_obj, box, 255, map_size)
+        _fill_map(ins_seg, box, k + 1, map_size)
+        _fill_map(sem_seg, box, room_type_id, map_size)
+    for box in wall_boxes:
+        _fill_map(trav_no_obj, box, 0, map_size)
+    trav = trav_no_obj.copy()
+    for box in object_boxes:
+        _fill_map(trav, box, 0, map_size)
+
+    layout_dir = os.path.join(scene_dir, "layout")
+    os.makedirs(layout_dir, exist_ok=True)
+    Image.fromarray(trav).save(os.path.join(layout_dir, "floor_trav_0.png"))
+    Image.fromarray(trav_no_obj).save(os.path.join(layout_dir, "floor_trav_no_obj_0.png"))
+    Image.fromarray(ins_seg).save(os.path.join(layout_dir, "floor_insseg_0.png"))
+    Image.fromarray(sem_seg).save(os.path.join(layout_dir, "floor_semseg_0.png"))
+    return dataset_path
+
+
+def set_ig_dataset_path(dataset_path):
+    """
+    Point iGibson to another dataset, such as a synthetic dataset. The category and room ids read from the metadata of
+    the dataset when igibson.utils.semantics_utils is imported are updated in place.
+
+    :param dataset_path: root of the dataset
+    """
+    igibson.ig_dataset_path = dataset_path
+    class_name_to_class_id = semantics_utils.get_class_name_to_class_id()
+    semantics_utils.CLASS_NAME_TO_CLASS_ID.clear()
+    semantics_utils.CLASS_NAME_TO_CLASS_ID.update(class_name_to_class_id)
+    room_name_to_room_id = semantics_utils.get_room_name_to_room_id()
+    semantics_utils.ROOM_NAME_TO_ROOM_ID.clear()
+    semantics_utils.ROOM_NAME_TO_ROOM_ID.update(room_name_to_room_id)
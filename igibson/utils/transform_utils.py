@@ -503,6 +503,45 @@ def mat2euler(rmat, axes="sxyz"):
     return vec((ax, ay, az))
 
 
+# libm's atan2 and asin as ufuncs, since the vectorized numpy versions may differ from them in the last bit
+_atan2 = np.frompyfunc(math.atan2, 2, 1)
+_asin = np.frompyfunc(math.asin, 1, 1)
+
+
+def quat2euler(quaternions):
+    """
+    Converts quaternions into (r,p,y) euler angles in radian, exactly as pybullet's getEulerFromQuaternion does for
+    each of them
+
+    Args:
+        quaternions (np.array): (..., 4) (x,y,z,w) quaternions
+
+    Returns:
+        np.array: (..., 3) (r,p,y) euler angles in radian
+    """
+    q = np.asarray(quaternions, dtype=np.float64)
+    x, y, z, w = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    sqx, sqy, sqz, squ = x * x, y * y, z * z, w * w
+    sarg = -2 * (x * z - w * y)
+
+    euler = np.empty(q.shape[:-1] + (3,))
+    euler[..., 0] = _atan2(2 * (y * z + w * x), squ - sqx - sqy + sqz)
+    # Clipping only changes the pitch of the singular quaternions below, which is replaced
+    euler[..., 1] = _asin(np.clip(sarg, -1.0, 1.0))
+    euler[..., 2] = _atan2(2 * (x * y + w * z), squ + sqx - sqy - sqz)
+
+    # At a pitch of +-pi/2, only the sum of the roll and the yaw is defined, and the roll is set to 0
+    pitch_down = sarg <= -0.99999
+    pitch_up = sarg >= 0.99999
+    if np.any(pitch_down) or np.any(pitch_up):
+        euler[pitch_down | pitch_up, 0] = 0.0
+        euler[pitch_down, 1] = -0.5 * PI
+        euler[pitch_down, 2] = 2 * _atan2(x[pitch_down], -y[pitch_down])
+        euler[pitch_up, 1] = 0.5 * PI
+        euler[pitch_up, 2] = 2 * _atan2(-x[pitch_up], y[pitch_up])
+    return euler
+
+
 def pose2mat(pose):
     """
     Converts pose to homogeneous matrix.
@@ -260,13 +260,45 @@ def restoreState(*args, **kwargs):
     sleep code to update each object's wake zone.
     """
     p.restoreState(*args, **kwargs)
-    for body_id in range(p.getNumBodies()):
+    physics_client_id = kwargs.get("physicsClientId", 0)
+    for i in range(p.getNumBodies(physicsClientId=physics_client_id)):
+        body_id = p.getBodyUniqueId(i, physicsClientId=physics_client_id)
         p.resetBasePositionAndOrientation(
-            body_id, *p.getBasePositionAndOrientation(body_id), physicsClientId=kwargs.get("physicsClientId", 0)
+            body_id,
+            *p.getBasePositionAndOrientation(body_id, physicsClientId=physics_client_id),
+            physicsClientId=physics_client_id,
         )
     return p.restoreState(*args, **kwargs)
 
 
+def get_body_kinematic_state(body_id):
+    """Get the base pose, base velocity and joint states of a pybullet body.
+
+    :param body_id: pybullet body id
+    :return: tuple of base position, base orientation, linear velocity, angular velocity and joint states
+    """
+    pos, orn = p.getBasePositionAndOrientation(body_id)
+    lin_vel, ang_vel = p.getBaseVelocity(body_id)
+    joint_states = []
+    num_joints = p.getNumJoints(body_id)
+    if num_joints > 0:
+        joint_states = [joint_state[:2] for joint_state in p.getJointStates(body_id, range(num_joints))]
+    return pos, orn, lin_vel, ang_vel, joint_states
+
+
+def set_body_kinematic_state(body_id, body_state):
+    """Set the base pose, base velocity and joint states of a pybullet body.
+
+    :param body_id: pybullet body id
+    :param body_state: kinematic state returned by get_body_kinematic_state
+    """
+    pos, orn, lin_vel, ang_vel, joint_states = body_state
+    p.resetBasePositionAndOrientation(body_id, pos, orn)
+    p.resetBaseVelocity(body_id, lin_vel, ang_vel)
+    for joint_id, (joint_pos, joint_vel) in enumerate(joint_states):
+        p.resetJointState(body_id, joint_id, joint_pos, targetVelocity=joint_vel)
+
+
 def let_user_pick(options, print_intro=True, selection="user"):
     """
     Tool to make a selection among a set of possibilities
@@ -1,33 +1,271 @@
+"""
+Converter of the HDF5 logs written by IGLogWriter.
+
+The logs store every logged quantity as a dataset with one row per frame. The converter reads and writes these
+datasets in blocks of frames instead of one row of one dataset at a time, and produces one of two layouts:
+
+- columnar: the layout of IGLogWriter and IGLogReader, with the same dataset paths, shapes, dtypes and metadata
+  attributes, written to preallocated, chunked and optionally compressed datasets. The datasets can be converted in
+  parallel by worker processes, each writing its datasets to a temporary file from which they are copied as is.
+- time_ordered: one group per frame holding one row of every dataset, <frame>/<dataset path>.
+
+The layout and the version of the converter are saved in the /metadata/log_layout and /metadata/log_converter_version
+attributes of the output.
+"""
 import argparse
+import logging
+import multiprocessing
+import os
 import pathlib
+import shutil
+import tempfile
 
 import h5py
+import numpy as np
 from tqdm import tqdm
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="VR state saving and replay demo")
-    parser.add_argument("--input", required=True, type=str, help="Input file to convert to time ordered hdf5")
-    parser.add_argument("--output", required=True, type=str, help="Output file to write converted data")
-    args = parser.parse_args()
+log = logging.getLogger(__name__)
+
+LOG_CONVERTER_VERSION = 1
+LAYOUTS = ["columnar", "time_ordered"]
+
+# Number of frames read and written at once
+CHUNK_FRAMES = 4096
+# Maximum size of the HDF5 chunks of the columnar layout, which must fit in the 1 MiB chunk cache of h5py
+MAX_CHUNK_BYTES = 1 << 20
+
+
+def get_log_datasets(hf):
+    """
+    :param hf: HDF5 log file
+    :return: paths of all the datasets of the log
+    """
+    dataset_names = []
+
+    def add_dataset(name, item):
+        if isinstance(item, h5py.Dataset):
+            dataset_names.append(name)
+
+    hf.visititems(add_dataset)
+    return dataset_names
+
+
+def get_chunk_shape(dset, chunk_frames):
+    """
+    Get the shape of the HDF5 chunks of a dataset of the columnar layout
+
+    :param dset: source dataset
+    :param chunk_frames: number of frames read and written at once
+    :return: chunk shape, True to let h5py choose it, or None for a contiguous dataset
+    """
+    if len(dset.shape) == 0:
+        return None
+    if 0 in dset.shape[1:]:
+        return True
+    row_bytes = dset.dtype.itemsize * int(np.prod(dset.shape[1:]))
+    rows = min(chunk_frames, max(MAX_CHUNK_BYTES // row_bytes, 1), max(dset.shape[0], 1))
+    return (rows,) + dset.shape[1:]
+
+
+def copy_dataset_columnar(in_dset, out_group, name, chunk_frames=CHUNK_FRAMES, compression=None, progress_bar=None):
+    """
+    Copy a dataset to a preallocated dataset with the same shape, dtype and maximum shape, in blocks of frames
+
+    :param in_dset: source dataset
+    :param out_group: group (or file) to create the dataset in
+    :param name: path of the dataset in out_group
+    :param chunk_frames: number of frames read and written at once
+    :param compression: HDF5 compression filter of the dataset, such as gzip or lzf, or None
+    :param progress_bar: optional tqdm progress bar, updated with the number of frames copied
+    """
+    chunks = get_chunk_shape(in_dset, chunk_frames)
+    out_dset = out_group.create_dataset(
+        name,
+        shape=in_dset.shape,
+        dtype=in_dset.dtype,
+        maxshape=in_dset.maxshape,
+        chunks=chunks,
+        compression=compression if chunks is not None else None,
+    )
+    if len(in_dset.shape) == 0:
+        out_dset[()] = in_dset[()]
+        return
+    num_frames = in_dset.shape[0]
+    for start in range(0, num_frames, chunk_frames):
+        end = min(start + chunk_frames, num_frames)
+        out_dset[start:end] = in_dset[start:end]
+        if progress_bar is not None:
+            progress_bar.update(end - start)
 
-    assert h5py.is_hdf5(args.input), "Error, input is not an HDF5 file"
-    in_hf5 = h5py.File(args.input, "r")
 
-    assert pathlib.Path(args.output).parent.exists(), "Error, output directory does not exist"
-    out_hf5 = h5py.File(args.output, "w")
+def _convert_datasets_columnar(args):
+    """
+    Convert some datasets of a log to a temporary file, in a worker process
 
-    keys_to_write = list()
+    :param args: (input file, temporary output file, dataset names, chunk_frames, compression)
+    :return: temporary output file
+    """
+    input_path, tmp_path, dataset_names, chunk_frames, compression = args
+    with h5py.File(input_path, "r") as in_hf5, h5py.File(tmp_path, "w") as tmp_hf5:
+        for name in dataset_names:
+            copy_dataset_columnar(in_hf5[name], tmp_hf5, name, chunk_frames=chunk_frames, compression=compression)
+    return tmp_path
 
-    def map_to_time_ordered(name, item):
-        if type(item) == h5py.Dataset:
-            keys_to_write.append(name)
 
-    in_hf5.visititems(map_to_time_ordered)
+def convert_columnar(in_hf5, out_hf5, chunk_frames=CHUNK_FRAMES, compression=None, num_workers=1, show_progress=False):
+    """
+    Convert a log to the columnar layout
 
+    :param in_hf5: input HDF5 file
+    :param out_hf5: output HDF5 file
+    :param chunk_frames: number of frames read and written at once
+    :param compression: HDF5 compression filter of the datasets, such as gzip or lzf, or None
+    :param num_workers: number of worker processes converting the datasets
+    :param show_progress: whether to show a progress bar
+    """
+    dataset_names = get_log_datasets(in_hf5)
+    if num_workers <= 1 or len(dataset_names) <= 1:
+        total = sum(in_hf5[name].shape[0] if len(in_hf5[name].shape) > 0 else 0 for name in dataset_names)
+        progress_bar = tqdm(total=total) if show_progress else None
+        for name in dataset_names:
+            copy_dataset_columnar(
+                in_hf5[name],
+                out_hf5,
+                name,
+                chunk_frames=chunk_frames,
+                compression=compression,
+                progress_bar=progress_bar,
+            )
+        if progress_bar is not None:
+            progress_bar.close()
+        return
+
+    # Balance the datasets between the workers by size, largest first
+    num_workers = min(num_workers, len(dataset_names))
+    names_by_worker = [[] for _ in range(num_workers)]
+    bytes_by_worker = np.zeros(num_workers)
+    for name in sorted(dataset_names, key=lambda name: -in_hf5[name].size * in_hf5[name].dtype.itemsize):
+        worker_idx = int(np.argmin(bytes_by_worker))
+        names_by_worker[worker_idx].append(name)
+        bytes_by_worker[worker_idx] += in_hf5[name].size * in_hf5[name].dtype.itemsize
+
+    tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(out_hf5.filename)))
+    try:
+        jobs = [
+            (in_hf5.filename, os.path.join(tmp_dir, "{}.hdf5".format(i)), names, chunk_frames, compression)
+            for i, names in enumerate(names_by_worker)
+        ]
+        with multiprocessing.Pool(num_workers) as pool:
+            tmp_paths = pool.map(_convert_datasets_columnar, jobs)
+        for tmp_path, names in zip(tmp_paths, names_by_worker):
+            with h5py.File(tmp_path, "r") as tmp_hf5:
+                for name in names:
+                    # The chunks are copied as they are, without decompressing and compressing them again
+                    group_name, dset_name = os.path.split(name)
+                    group = out_hf5.require_group(group_name) if group_name else out_hf5
+                    tmp_hf5.copy(tmp_hf5[name], group, name=dset_name)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def convert_time_ordered(in_hf5, out_hf5, chunk_frames=CHUNK_FRAMES, show_progress=False):
+    """
+    Convert a log to the time ordered layout, <frame>/<dataset path>. The datasets are read in blocks of frames, but
+    every row is still a dataset of its own.
+
+    :param in_hf5: input HDF5 file
+    :param out_hf5: output HDF5 file
+    :param chunk_frames: number of frames read at once
+    :param show_progress: whether to show a progress bar
+    """
+    dataset_names = get_log_datasets(in_hf5)
     frame_count = in_hf5["frame_data"].shape[0]
+    progress_bar = tqdm(total=frame_count) if show_progress else None
+    for start in range(0, frame_count, chunk_frames):
+        end = min(start + chunk_frames, frame_count)
+        blocks = [in_hf5[name][start:end] for name in dataset_names]
+        for frame in range(start, end):
+            frame_group = out_hf5.create_group(str(frame))
+            for name, block in zip(dataset_names, blocks):
+                frame_group[name] = block[frame - start]
+        if progress_bar is not None:
+            progress_bar.update(end - start)
+    if progress_bar is not None:
+        progress_bar.close()
+
+
+def convert_log(
+    input_path,
+    output_path,
+    layout="columnar",
+    chunk_frames=CHUNK_FRAMES,
+    compression=None,
+    num_workers=1,
+    show_progress=False,
+):
+    """
+    Convert a log written by IGLogWriter, copying its metadata attributes
+
+    :param input_path: input HDF5 log
+    :param output_path: output HDF5 file, overwritten if it exists
+    :param layout: columnar or time_ordered
+    :param chunk_frames: number of frames read and written at once
+    :param compression: HDF5 compression filter of the datasets of the columnar layout, such as gzip or lzf, or None
+    :param num_workers: number of worker processes converting the datasets of the columnar layout
+    :param show_progress: whether to show a progress bar
+    """
+    assert layout in LAYOUTS, "Error, unknown layout {}".format(layout)
+    assert h5py.is_hdf5(input_path), "Error, input is not an HDF5 file"
+    assert pathlib.Path(output_path).parent.exists(), "Error, output directory does not exist"
+    if layout == "time_ordered" and (compression is not None or num_workers > 1):
+        raise ValueError("Compression and worker processes are only supported by the columnar layout")
+
+    with h5py.File(input_path, "r") as in_hf5, h5py.File(output_path, "w") as out_hf5:
+        for attr_name, value in in_hf5.attrs.items():
+            out_hf5.attrs[attr_name] = value
+        out_hf5.attrs["/metadata/log_layout"] = layout
+        out_hf5.attrs["/metadata/log_converter_version"] = LOG_CONVERTER_VERSION
 
-    progress_bar = tqdm(total=int(len(keys_to_write) * frame_count))
-    for frame in range(frame_count):
-        for key in keys_to_write:
-            out_hf5[str(frame) + "/" + key] = in_hf5[key][frame]
-            progress_bar.update()
+        if layout == "columnar":
+            convert_columnar(
+                in_hf5,
+                out_hf5,
+                chunk_frames=chunk_frames,
+                compression=compression,
+                num_workers=num_workers,
+                show_progress=show_progress,
+            )
+        else:
+            convert_time_ordered(in_hf5, out_hf5, chunk_frames=chunk_frames, show_progress=show_progress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert an HDF5 log written by IGLogWriter")
+    parser.add_argument("--input", required=True, type=str, help="Input file to convert")
+    parser.add_argument("--output", required=True, type=str, help="Output file to write converted data")
+    parser.add_argument(
+        "--layout",
+        default="time_ordered",
+        choices=LAYOUTS,
+        help="time_ordered: one group per frame, columnar: chunked datasets readable by IGLogReader",
+    )
+    parser.add_argument("--chunk_frames", type=int, default=CHUNK_FRAMES, help="Number of frames copied at once")
+    parser.add_argument(
+        "--compression", default=None, choices=["gzip", "lzf"], help="Compression of the columnar datasets"
+    )
+    parser.add_argument("--num_workers", type=int, default=1, help="Worker processes converting the columnar datasets")
+    args = parser.parse_args()
+
+    convert_log(
+        args.input,
+        args.output,
+        layout=args.layout,
+        chunk_frames=args.chunk_frames,
+        compression=args.compression,
+        num_workers=args.num_workers,
+        show_progress=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
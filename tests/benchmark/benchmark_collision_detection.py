@@ -0,0 +1,113 @@
+"""
+Benchmark of the collision test of the candidate robot poses of StarterSemanticActionPrimitives, headless and without
+any dataset. The scene has as many bodies as an interactive iGibson scene such as Rs_int, and the robot is made of
+three bodies (body and two hands) as the BehaviorRobot. Each candidate pose runs the collision test of the three parts,
+with one narrow-phase query per body of the world (before) or with the broad phase (after).
+"""
+import argparse
+import time
+
+import numpy as np
+import pybullet as p
+
+from igibson.utils.collision_utils import detect_collisions
+
+
+def create_scene(rng, num_bodies, num_links):
+    """
+    Create fixed and dynamic boxes, some of them articulated, in a 10m x 10m room with walls and a floor
+
+    :param rng: random generator
+    :param num_bodies: number of bodies
+    :param num_links: number of links of the articulated bodies
+    """
+    floor = p.createCollisionShape(p.GEOM_BOX, halfExtents=[5, 5, 0.05])
+    p.createMultiBody(0, floor, basePosition=[0, 0, -0.05])
+    wall = p.createCollisionShape(p.GEOM_BOX, halfExtents=[5, 0.05, 1.5])
+    for x, y, yaw in [(0, -5, 0), (0, 5, 0), (-5, 0, np.pi / 2), (5, 0, np.pi / 2)]:
+        p.createMultiBody(0, wall, basePosition=[x, y, 1.5], baseOrientation=p.getQuaternionFromEuler([0, 0, yaw]))
+    for i in range(num_bodies):
+        half_extents = rng.uniform(0.05, 0.15, size=3)
+        shape = p.createCollisionShape(p.GEOM_BOX, halfExtents=half_extents)
+        position = [rng.uniform(-4.5, 4.5), rng.uniform(-4.5, 4.5), half_extents[2]]
+        if i % 10 == 0:
+            link_shape = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.02, 0.2, 0.2])
+            p.createMultiBody(
+                0,
+                shape,
+                basePosition=position,
+                linkMasses=[1] * num_links,
+                linkCollisionShapeIndices=[link_shape] * num_links,
+                linkVisualShapeIndices=[-1] * num_links,
+                linkPositions=[[half_extents[0], 0, 0]] * num_links,
+                linkOrientations=[[0, 0, 0, 1]] * num_links,
+                linkInertialFramePositions=[[0, 0, 0]] * num_links,
+                linkInertialFrameOrientations=[[0, 0, 0, 1]] * num_links,
+                linkParentIndices=[0] * num_links,
+                linkJointTypes=[p.JOINT_REVOLUTE] * num_links,
+                linkJointAxis=[[0, 0, 1]] * num_links,
+            )
+        else:
+            p.createMultiBody(0 if i % 2 else 1, shape, basePosition=position)
+
+
+def detect_collision_before(body, distance=0.01):
+    """
+    Previous StarterSemanticActionPrimitives._detect_collision
+    """
+    collision = []
+    for body_id in range(p.getNumBodies()):
+        if body_id == body:
+            continue
+        if len(p.getClosestPoints(body, body_id, distance=distance)) > 0:
+            collision.append(body_id)
+            break
+    return collision
+
+
+def detect_collision_after(body, distance=0.01):
+    return [body_id for _, body_id in detect_collisions(body, distance=distance)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the collision test of candidate robot poses")
+    parser.add_argument("--bodies", type=int, default=300, help="number of bodies in the scene")
+    parser.add_argument("--links", type=int, default=4, help="number of links of the articulated bodies")
+    parser.add_argument("--poses", type=int, default=500, help="number of candidate robot poses")
+    args = parser.parse_args()
+
+    p.connect(p.DIRECT)
+    rng = np.random.RandomState(0)
+    create_scene(rng, args.bodies, args.links)
+    robot_body = p.createMultiBody(1, p.createCollisionShape(p.GEOM_CAPSULE, radius=0.2, height=0.8))
+    hand_shape = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.08, 0.04, 0.1])
+    hands = [p.createMultiBody(1, hand_shape) for _ in range(2)]
+    poses = [(rng.uniform(-4.5, 4.5), rng.uniform(-4.5, 4.5), rng.uniform(-np.pi, np.pi)) for _ in range(args.poses)]
+    print("{} bodies, {} candidate poses".format(p.getNumBodies(), len(poses)))
+
+    results = {}
+    for name, detect_collision in [("Before", detect_collision_before), ("After", detect_collision_after)]:
+        verdicts = []
+        start = time.time()
+        for x, y, yaw in poses:
+            p.resetBasePositionAndOrientation(robot_body, [x, y, 0.7], p.getQuaternionFromEuler([0, 0, yaw]))
+            for hand, side in zip(hands, [-1, 1]):
+                hand_pos = [
+                    x + 0.4 * np.cos(yaw) - side * 0.2 * np.sin(yaw),
+                    y + 0.4 * np.sin(yaw) + side * 0.2 * np.cos(yaw),
+                    1.0,
+                ]
+                p.resetBasePositionAndOrientation(hand, hand_pos, p.getQuaternionFromEuler([0, 0, yaw]))
+            verdicts.append(bool(detect_collision(robot_body) or any(detect_collision(hand) for hand in hands)))
+        elapsed = time.time() - start
+        results[name] = verdicts
+        print(
+            "{}: {:.3f}s ({:.3f}ms per pose, {} poses in collision)".format(
+                name, elapsed, 1000.0 * elapsed / len(poses), sum(verdicts)
+            )
+        )
+    assert results["Before"] == results["After"]
+
+
+if __name__ == "__main__":
+    main()
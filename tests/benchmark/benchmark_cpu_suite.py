@@ -0,0 +1,492 @@
+"""
+Headless CPU benchmark suite of the simulation: scene loading, simulation steps with and without object states, resets
+of a point-nav environment, BDDL goal checking, traversability graph building, shortest path queries and IGLogWriter
+frames. The Simulators, including the ones created by the environments, render with a NullRenderer, which keeps the
+instance groups of the objects so that the renderer sync still runs, but loads and draws nothing, so that the suite runs
+on machines without a GPU.
+
+The scene is a synthetic scene generated with igibson.utils.synthetic_dataset in a temporary folder by default, so that
+the suite runs without the iGibson dataset. --dataset and --scene run it on a scene of an actual dataset instead. The
+point-nav reset case needs the robot models of the iGibson assets, and is skipped if they are missing.
+
+Every case is timed over several rounds after warmup rounds, as with pytest-benchmark's pedantic mode, and the results
+are saved to a JSON file in the format of pytest-benchmark, with the machine and the commit they ran on. Two result files
+are compared with compare_benchmarks.py.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pybullet as p
+
+import igibson
+from igibson.envs.igibson_env import iGibsonEnv
+from igibson.render.mesh_renderer.instances import InstanceGroup
+from igibson.render.mesh_renderer.mesh_renderer_settings import MeshRendererSettings
+from igibson.scenes.igibson_indoor_scene import InteractiveIndoorScene
+from igibson.simulator import Simulator
+from igibson.tasks.bddl_backend import IGibsonBDDLBackend
+from igibson.utils.ig_logging import IGLogWriter
+from igibson.utils.synthetic_dataset import generate_synthetic_dataset, set_ig_dataset_path
+from igibson.utils.utils import parse_config
+
+try:
+    from igibson.utils.git_utils import git_info
+except ImportError:
+    git_info = None
+
+from bddl.activity import Conditions, evaluate_goal_conditions, get_goal_conditions
+
+SYNTHETIC_SCENE_ID = "Synthetic_int"
+# Synset of the categories of the synthetic scene, for the BDDL goal
+CATEGORY_SYNSETS = {
+    "apple": "apple.n.01",
+    "bowl": "bowl.n.01",
+    "breakfast_table": "breakfast_table.n.01",
+    "bottom_cabinet": "cabinet.n.01",
+}
+
+
+class NullVisualObject(object):
+    """
+    Visual object of a NullRenderer, which only keeps its mesh filename
+    """
+
+    def __init__(self, renderer, filename):
+        self.renderer = renderer
+        self.filename = filename
+
+
+class NullRenderer(object):
+    """
+    Renderer that keeps the instance groups of the objects, so that Simulator.sync updates their poses, but loads and
+    renders nothing
+    """
+
+    def __init__(self, rendering_settings=None):
+        self.rendering_settings = rendering_settings if rendering_settings is not None else MeshRendererSettings()
+        self.optimized = False
+        self.visual_objects = []
+        self.instances = []
+
+    def load_object(self, obj_path, **kwargs):
+        self.visual_objects.append(NullVisualObject(self, obj_path))
+
+    def load_randomized_material(self, material, texture_scale=1.0):
+        pass
+
+    def load_procedural_material(self, material, texture_scale=1.0):
+        # No texture is loaded, but the state changes still switch between texture ids
+        material.texture_ids = {state: None for state in material.states}
+
+    def add_instance_group(
+        self,
+        object_ids,
+        link_ids=[-1],
+        poses_trans=[np.eye(4)],
+        poses_rot=[np.eye(4)],
+        pybullet_uuid=None,
+        ig_object=None,
+        class_id=0,
+        dynamic=False,
+        softbody=False,
+        use_pbr=True,
+        use_pbr_mapping=True,
+        shadow_caster=True,
+        parent_body_name=None,
+    ):
+        self.instances.append(
+            InstanceGroup(
+                [self.visual_objects[object_id] for object_id in object_ids],
+                id=len(self.instances),
+                link_ids=link_ids,
+                pybullet_uuid=pybullet_uuid,
+                ig_object=ig_object,
+                class_id=class_id,
+                poses_trans=poses_trans,
+                poses_rot=poses_rot,
+                dynamic=dynamic,
+                softbody=softbody,
+                use_pbr=use_pbr,
+                use_pbr_mapping=use_pbr_mapping,
+                shadow_caster=shadow_caster,
+                parent_body_name=parent_body_name,
+            )
+        )
+
+    def get_instances(self):
+        return self.instances
+
+    def update_hidden_highlight_state(self, instances):
+        pass
+
+    def release(self):
+        self.visual_objects = []
+        self.instances = []
+
+
+def initialize_null_renderer(simulator):
+    """
+    Simulator.initialize_renderer creating a NullRenderer
+    """
+    simulator.visual_object_cache = {}
+    simulator.renderer = NullRenderer(simulator.rendering_settings)
+
+
+class BenchmarkSession(object):
+    """
+    Times the benchmark cases and collects their stats
+    """
+
+    def __init__(self, round_scale=1.0):
+        """
+        :param round_scale: factor applied to the number of rounds of every case
+        """
+        self.round_scale = round_scale
+        self.benchmarks = []
+
+    def pedantic(
+        self, name, target, setup=None, teardown=None, rounds=10, warmup_rounds=1, group=None, extra_info=None
+    ):
+        """
+        Time a target over rounds, after warmup rounds whose durations are discarded
+
+        :param name: name of the case
+        :param target: function timed, taking the return value of setup if setup is given
+        :param setup: function called before every round, not timed
+        :param teardown: function called after every round with the return value of setup, not timed
+        :param rounds: number of rounds timed
+        :param warmup_rounds: number of rounds run before the timed rounds
+        :param group: group of the case
+        :param extra_info: dict of extra information saved with the stats
+        :return: stats of the case
+        """
+        rounds = max(1, int(round(rounds * self.round_scale)))
+        durations = []
+        for i in range(warmup_rounds + rounds):
+            args = () if setup is None else (setup(),)
+            start = time.perf_counter()
+            target(*args)
+            duration = time.perf_counter() - start
+            if teardown is not None:
+                teardown(*args)
+            if i >= warmup_rounds:
+                durations.append(duration)
+
+        durations = np.array(durations)
+        q1, median, q3 = np.percentile(durations, [25, 50, 75])
+        stats = {
+            "min": float(durations.min()),
+            "max": float(durations.max()),
+            "mean": float(durations.mean()),
+            "stddev": float(durations.std(ddof=1)) if len(durations) > 1 else 0.0,
+            "median": float(median),
+            "q1": float(q1),
+            "q3": float(q3),
+            "iqr": float(q3 - q1),
+            "rounds": len(durations),
+            "total": float(durations.sum()),
+            "ops": float(1.0 / durations.mean()) if durations.mean() > 0 else float("inf"),
+        }
+        self.benchmarks.append(
+            {"name": name, "group": group, "stats": stats, "extra_info": extra_info if extra_info is not None else {}}
+        )
+        print(
+            "{:<40} median {:>10.3f}ms  mean {:>10.3f}ms  stddev {:>9.3f}ms  rounds {}".format(
+                name, 1000 * stats["median"], 1000 * stats["mean"], 1000 * stats["stddev"], stats["rounds"]
+            )
+        )
+        return stats
+
+
+def get_machine_info():
+    """
+    :return: dict describing the machine and the versions of the main dependencies
+    """
+    try:
+        from importlib.metadata import version
+
+        pybullet_version = version("pybullet")
+    except Exception:
+        pybullet_version = None
+    return {
+        "node": platform.node(),
+        "processor": platform.processor(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "release": platform.release(),
+        "cpu_count": os.cpu_count(),
+        "python_implementation": platform.python_implementation(),
+        "python_version": platform.python_version(),
+        "numpy": np.__version__,
+        "pybullet": pybullet_version,
+        "igibson": igibson.__version__,
+    }
+
+
+def get_commit_info():
+    """
+    :return: dict with the commit, the branch and whether the iGibson working tree is dirty, empty if unknown
+    """
+    if git_info is None:
+        return {}
+    try:
+        info = git_info(os.path.dirname(igibson.root_path))
+    except Exception:
+        return {}
+    return {
+        "id": info["commit_hash"],
+        "branch": info["branch_name"],
+        "dirty": bool(info["code_diff"] or info["code_diff_staged"]),
+    }
+
+
+def create_simulator():
+    return Simulator(mode="headless", image_width=128, image_height=128)
+
+
+def bench_scene_load(session, args):
+    def setup():
+        return create_simulator()
+
+    def target(s):
+        s.import_scene(InteractiveIndoorScene(args.scene, **args.scene_kwargs))
+
+    def teardown(s):
+        s.disconnect()
+
+    session.pedantic("scene_load", target, setup=setup, teardown=teardown, rounds=5, group="load")
+
+
+def bench_simulator_step(session, args, s):
+    num_objects = len(s.scene.get_objects())
+    session.pedantic(
+        "simulator_step[object_states]",
+        s.step,
+        rounds=args.steps,
+        warmup_rounds=10,
+        group="step",
+        extra_info={"objects": num_objects},
+    )
+
+    # Without object states: no particle system nor object state update, only the physics and the renderer sync
+    object_state_types, particle_systems = s.object_state_types, s.particle_systems
+    s.object_state_types, s.particle_systems = [], []
+    try:
+        session.pedantic(
+            "simulator_step[no_object_states]",
+            s.step,
+            rounds=args.steps,
+            warmup_rounds=10,
+            group="step",
+            extra_info={"objects": num_objects},
+        )
+    finally:
+        s.object_state_types, s.particle_systems = object_state_types, particle_systems
+
+
+def get_goal_conditions_for_scene(scene):
+    """
+    Compile a BDDL goal over the objects of the scene: every apple and bowl on a table, no apple cooked and no cabinet
+    open
+
+    :param scene: scene
+    :return: compiled goal conditions
+    """
+    objects = {}
+    object_scope = {}
+    for category, synset in CATEGORY_SYNSETS.items():
+        objects[synset] = []
+        for i, obj in enumerate(scene.objects_by_category.get(category, [])):
+            object_name = "{}_{}".format(synset, i + 1)
+            objects[synset].append(object_name)
+            object_scope[object_name] = obj
+    objects = {synset: names for synset, names in objects.items() if names}
+    assert "breakfast_table.n.01" in objects, "The BDDL goal needs tables in the scene"
+
+    goals = []
+    for synset in ["apple.n.01", "bowl.n.01"]:
+        if synset in objects:
+            goals.append(
+                "(forall (?{0} - {0}) (exists (?breakfast_table.n.01 - breakfast_table.n.01) "
+                "(ontop ?{0} ?breakfast_table.n.01)))".format(synset)
+            )
+    if "apple.n.01" in objects:
+        goals.append("(forall (?apple.n.01 - apple.n.01) (not (cooked ?apple.n.01)))")
+    if "cabinet.n.01" in objects:
+        goals.append("(forall (?cabinet.n.01 - cabinet.n.01) (not (open ?cabinet.n.01)))")
+    problem = "(define (problem benchmark_0) (:domain igibson) (:objects {}) (:init) (:goal (and {})))".format(
+        " ".join("{} - {}".format(" ".join(names), synset) for synset, names in objects.items()),
+        " ".join(goals),
+    )
+    conds = Conditions("benchmark", 0, "igibson", predefined_problem=problem)
+    return get_goal_conditions(conds, IGibsonBDDLBackend(), object_scope)
+
+
+def bench_check_success(session, args, s):
+    goal_conditions = get_goal_conditions_for_scene(s.scene)
+    session.pedantic(
+        "bddl_check_success",
+        lambda _: evaluate_goal_conditions(goal_conditions),
+        # The object states cache their values until the next step
+        setup=s.step,
+        rounds=args.steps,
+        warmup_rounds=2,
+        group="task",
+        extra_info={"goal_conditions": len(goal_conditions)},
+    )
+
+
+def bench_trav_graph(session, args, s):
+    scene = s.scene
+    maps_path = os.path.join(scene.scene_dir, "layout")
+    session.pedantic("trav_graph_build", lambda: scene.load_trav_map(maps_path), rounds=5, group="navigation")
+
+    rng = np.random.RandomState(0)
+    traversable_cells = scene.floor_trav_cells[0]
+
+    def setup():
+        source, target = traversable_cells[rng.randint(len(traversable_cells), size=2)]
+        return scene.map_to_world(source), scene.map_to_world(target)
+
+    session.pedantic(
+        "shortest_path",
+        lambda points: scene.get_shortest_path(0, points[0], points[1], entire_path=True),
+        setup=setup,
+        rounds=args.queries,
+        warmup_rounds=5,
+        group="navigation",
+        extra_info={"nodes": scene.floor_graph[0].number_of_nodes()},
+    )
+
+
+def bench_log_writer(session, args, s, output_dir):
+    log_writer = IGLogWriter(
+        s,
+        log_filepath=os.path.join(output_dir, "benchmark_log.hdf5"),
+        frames_before_write=200,
+        filter_objects=False,
+        log_status=False,
+    )
+    log_writer.set_up_data_storage()
+    try:
+        # Rounds span several writes to the HDF5 file, amortized over the frames
+        session.pedantic(
+            "iglogwriter_frame",
+            lambda _: log_writer.process_frame(),
+            setup=s.step,
+            rounds=max(args.steps, 2 * log_writer.frames_before_write),
+            warmup_rounds=0,
+            group="logging",
+            extra_info={"bodies": len(log_writer.tracked_objects)},
+        )
+    finally:
+        log_writer.end_log_session()
+
+
+def bench_env_reset(session, args):
+    robot_dir = os.path.join(igibson.assets_path, "models", "turtlebot")
+    if not os.path.isdir(robot_dir):
+        print("Skipping env_reset: the robot models of the iGibson assets are missing from {}".format(robot_dir))
+        return
+    config = parse_config(os.path.join(igibson.configs_path, "turtlebot_nav.yaml"))
+    config.update(
+        {
+            "scene": "igibson",
+            "scene_id": args.scene,
+            "task": "point_nav_random",
+            "output": ["task_obs"],
+            "load_texture": False,
+            "trav_map_type": "no_obj",
+        }
+    )
+    env = iGibsonEnv(config_file=config, mode="headless")
+    try:
+        session.pedantic("env_reset[point_nav_random]", env.reset, rounds=20, warmup_rounds=2, group="env")
+    finally:
+        env.close()
+
+
+CASES = ["scene_load", "simulator_step", "check_success", "trav_graph", "log_writer", "env_reset"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless CPU benchmark suite of the simulation")
+    parser.add_argument("--output", default="benchmark_cpu_suite.json", help="JSON file the results are saved to")
+    parser.add_argument("--dataset", default=None, help="iGibson dataset, a synthetic dataset is generated by default")
+    parser.add_argument("--scene", default=None, help="scene id, the synthetic scene by default")
+    parser.add_argument("--rooms", type=int, default=3, help="number of rooms along x and y of the synthetic scene")
+    parser.add_argument("--objects-per-room", type=int, default=4, help="small objects per room of the synthetic scene")
+    parser.add_argument("--steps", type=int, default=200, help="number of simulation steps timed")
+    parser.add_argument("--queries", type=int, default=200, help="number of shortest path queries timed")
+    parser.add_argument("--round-scale", type=float, default=1.0, help="factor applied to the number of rounds")
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES, help="cases to run")
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp(prefix="ig_benchmark_")
+    try:
+        if args.dataset is None:
+            args.dataset = generate_synthetic_dataset(
+                os.path.join(output_dir, "ig_dataset"),
+                scene_id=SYNTHETIC_SCENE_ID,
+                grid_size=(args.rooms, args.rooms),
+                objects_per_room=args.objects_per_room,
+            )
+            args.scene = SYNTHETIC_SCENE_ID
+        elif args.scene is None:
+            parser.error("--scene is required with --dataset")
+        set_ig_dataset_path(args.dataset)
+        args.scene_kwargs = {"texture_randomization": False, "object_randomization": False}
+        Simulator.initialize_renderer = initialize_null_renderer
+
+        session = BenchmarkSession(round_scale=args.round_scale)
+        if "scene_load" in args.cases:
+            bench_scene_load(session, args)
+
+        if any(case in args.cases for case in ["simulator_step", "check_success", "trav_graph", "log_writer"]):
+            s = create_simulator()
+            try:
+                s.import_scene(InteractiveIndoorScene(args.scene, **args.scene_kwargs))
+                if "simulator_step" in args.cases:
+                    bench_simulator_step(session, args, s)
+                if "check_success" in args.cases:
+                    bench_check_success(session, args, s)
+                if "trav_graph" in args.cases:
+                    bench_trav_graph(session, args, s)
+                if "log_writer" in args.cases:
+                    bench_log_writer(session, args, s, output_dir)
+            finally:
+                s.disconnect()
+
+        if "env_reset" in args.cases:
+            bench_env_reset(session, args)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    results = {
+        "machine_info": get_machine_info(),
+        "commit_info": get_commit_info(),
+        "datetime": datetime.datetime.utcnow().isoformat(),
+        "version": igibson.__version__,
+        "options": {
+            "dataset": "synthetic" if args.scene == SYNTHETIC_SCENE_ID else args.dataset,
+            "scene": args.scene,
+            "rooms": args.rooms,
+            "objects_per_room": args.objects_per_room,
+            "pybullet_api_version": p.getAPIVersion(),
+        },
+        "benchmarks": session.benchmarks,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print("Results saved to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
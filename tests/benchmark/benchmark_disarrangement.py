@@ -0,0 +1,328 @@
+"""
+Benchmark of the disarrangement metrics on a synthetic scene of 300 objects by default, built directly in pybullet with
+the kinematic object states of iGibson: tables on the floor of a grid of rooms, with items on them, under them and on
+the floor.
+
+The per step overhead of KinematicDisarrangement is compared with the previous implementation, which built and diffed
+dicts of poses object by object, while a fraction of the items move. The logical state cache is compared with the
+previous one, which evaluated every kinematic state against every object and every room floor: both caches are built
+from the same scene, with the memoized states cleared, and must hold the same values.
+"""
+import argparse
+import copy
+import time
+
+import numpy as np
+import pybullet as p
+
+from igibson.metrics.disarrangement import LOGICAL_STATE_SLOTS, KinematicDisarrangement, LogicalDisarrangement
+from igibson.object_states import (
+    AABB,
+    ContactBodies,
+    HorizontalAdjacency,
+    Inside,
+    NextTo,
+    OnFloor,
+    OnTop,
+    Pose,
+    Touching,
+    Under,
+    VerticalAdjacency,
+)
+from igibson.object_states.memoization import MemoizedObjectStateMixin
+from igibson.object_states.object_state_base import AbsoluteObjectState, BooleanState, CachingEnabledObjectState
+
+STATE_CLASSES = [
+    Pose,
+    AABB,
+    ContactBodies,
+    VerticalAdjacency,
+    HorizontalAdjacency,
+    Touching,
+    OnTop,
+    Inside,
+    Under,
+    NextTo,
+    OnFloor,
+]
+
+
+class BenchmarkObject(object):
+    """
+    Object made of a single pybullet box, with the kinematic object states
+    """
+
+    def __init__(self, name, category, body_id, scene):
+        self.name = name
+        self.category = category
+        self.body_id = body_id
+        self.scene = scene
+        self.room_floor = None
+        self.states = {}
+        for state_class in STATE_CLASSES:
+            self.states[state_class] = state_class(self)
+            self.states[state_class]._initialized = True
+
+    def get_body_ids(self):
+        return [self.body_id]
+
+    def get_position(self):
+        return np.array(p.getBasePositionAndOrientation(self.body_id)[0])
+
+    def get_orientation(self):
+        return np.array(p.getBasePositionAndOrientation(self.body_id)[1])
+
+    def set_room_floor(self, room_floor):
+        self.room_floor = room_floor
+
+    def force_wakeup(self):
+        p.changeDynamics(self.body_id, -1, activationState=p.ACTIVATION_STATE_WAKE_UP)
+
+
+class BenchmarkScene(object):
+    """
+    Scene with a grid of square rooms
+    """
+
+    def __init__(self, num_rooms, room_size):
+        self.num_rooms = num_rooms
+        self.room_size = room_size
+        self.room_ins_name_to_ins_id = {"room_{}".format(i): i + 1 for i in range(num_rooms * num_rooms)}
+        self.objects_by_name = {}
+        self.objects_by_category = {}
+
+    def add_object(self, obj):
+        self.objects_by_name[obj.name] = obj
+        self.objects_by_category.setdefault(obj.category, []).append(obj)
+
+    def get_room_instance_by_point(self, xy):
+        x, y = np.floor(np.asarray(xy) / self.room_size).astype(int)
+        if x < 0 or x >= self.num_rooms or y < 0 or y >= self.num_rooms:
+            return None
+        return "room_{}".format(x * self.num_rooms + y)
+
+
+class BenchmarkEnv(object):
+    def __init__(self, scene):
+        self.scene = scene
+        self.task = self
+
+
+def add_box(half_extents, position, mass):
+    shape = p.createCollisionShape(p.GEOM_BOX, halfExtents=half_extents)
+    return p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=shape, basePosition=position)
+
+
+def make_scene(num_objects, seed=0):
+    """
+    Build a scene of num_objects objects: a floor, tables, and items on the tables, under them and on the floor
+
+    :param num_objects: number of objects, including the floor
+    :param seed: random seed
+    :return: BenchmarkEnv
+    """
+    rng = np.random.RandomState(seed)
+    num_tables = max((num_objects - 1) // 5, 1)
+    num_rooms = int(np.ceil(np.sqrt(num_tables / 4.0)))
+    room_size = 4.0
+    scene = BenchmarkScene(num_rooms, room_size)
+    size = num_rooms * room_size
+    floor_id = add_box([size / 2, size / 2, 0.05], [size / 2, size / 2, -0.05], 0)
+    scene.add_object(BenchmarkObject("floors", "floors", floor_id, scene))
+
+    # Four tables per room, with items on them, under them and on the floor around them
+    tables = []
+    for i in range(num_tables):
+        room, slot = divmod(i, 4)
+        x = (room // num_rooms + 0.25 + 0.5 * (slot // 2)) * room_size
+        y = (room % num_rooms + 0.25 + 0.5 * (slot % 2)) * room_size
+        # Static table tops, so that items can lie under them
+        table_id = add_box([0.4, 0.4, 0.03], [x, y, 0.7], 0)
+        scene.add_object(BenchmarkObject("table_{}".format(i), "table", table_id, scene))
+        tables.append((x, y))
+    for i in range(num_objects - 1 - num_tables):
+        x, y = tables[i % num_tables]
+        half = rng.uniform(0.03, 0.08)
+        placement = rng.randint(3)
+        if placement == 0:
+            position = [x + rng.uniform(-0.3, 0.3), y + rng.uniform(-0.3, 0.3), 0.73 + half + 0.001]
+        elif placement == 1:
+            position = [x + rng.uniform(-0.3, 0.3), y + rng.uniform(-0.3, 0.3), half + 0.001]
+        else:
+            position = [x + rng.uniform(-0.2, 0.2) + 0.6, y + rng.uniform(-0.2, 0.2) + 0.6, half + 0.001]
+        item_id = add_box([half, half, half], position, 0.2)
+        scene.add_object(BenchmarkObject("item_{}".format(i), "item", item_id, scene))
+    for _ in range(60):
+        p.stepSimulation()
+    return BenchmarkEnv(scene)
+
+
+def clear_states(env, clear_memos=False):
+    """
+    Clear the cached states of all objects, as a simulator step does, and optionally the memoized states
+    """
+    for obj in env.scene.objects_by_name.values():
+        for state in obj.states.values():
+            if isinstance(state, CachingEnabledObjectState):
+                state.clear_cached_value()
+            if clear_memos and isinstance(state, MemoizedObjectStateMixin):
+                state._memo = {}
+                state._validation_caches = {}
+
+
+def move_items(env, rng, fraction):
+    """
+    Push a fraction of the items and step the simulation
+    """
+    for obj in env.scene.objects_by_category["item"]:
+        if rng.rand() < fraction:
+            p.resetBaseVelocity(obj.body_id, linearVelocity=list(rng.uniform(-0.5, 0.5, size=2)) + [0.5])
+    p.stepSimulation()
+    clear_states(env)
+
+
+class KinematicDisarrangementBefore(object):
+    """
+    Previous KinematicDisarrangement, for objects that are not multiplexed
+    """
+
+    def __init__(self):
+        self.initialized = False
+        self.integrated_disarrangement = 0
+        self.delta_disarrangement = []
+
+    def update_state_cache(self, env):
+        return {
+            obj_id: {"pose": {"base": obj.states[Pose].get_value()}, "active": 0}
+            for obj_id, obj in env.scene.objects_by_name.items()
+        }
+
+    def step_callback(self, env, _):
+        total_disarrangement = 0
+        self.cur_state_cache = self.update_state_cache(env)
+        if not self.initialized:
+            self.prev_state_cache = copy.deepcopy(self.cur_state_cache)
+            self.delta_obj_disp_dict = {obj: {"base": [], "children": []} for obj in self.cur_state_cache}
+            self.initialized = True
+        for obj in self.prev_state_cache:
+            base = np.linalg.norm(
+                self.cur_state_cache[obj]["pose"]["base"][0] - self.prev_state_cache[obj]["pose"]["base"][0]
+            )
+            total_disarrangement += base
+            total_disarrangement += np.sum([0, 0])
+            self.delta_obj_disp_dict[obj]["base"].append(base)
+            self.delta_obj_disp_dict[obj]["children"].append([0, 0])
+        self.prev_state_cache = copy.deepcopy(self.cur_state_cache)
+        self.integrated_disarrangement += total_disarrangement
+        self.delta_disarrangement.append(total_disarrangement)
+        return total_disarrangement
+
+
+def cache_single_object_before(obj_id, obj, room_floors, env):
+    """
+    Previous LogicalDisarrangement.cache_single_object
+    """
+    obj_cache = {}
+    for state_class, state in obj.states.items():
+        if not isinstance(state, BooleanState):
+            continue
+        if isinstance(state, AbsoluteObjectState):
+            obj_cache[state_class] = state.get_value()
+        elif isinstance(state, OnFloor):
+            obj_cache[state_class] = {floor_id: state.get_value(floor) for floor_id, floor in room_floors.items()}
+        else:
+            obj_cache[state_class] = {
+                target_obj_id: state.get_value(target_obj)
+                for target_obj_id, target_obj in env.scene.objects_by_name.items()
+                if target_obj_id != obj_id
+            }
+    return obj_cache
+
+
+def create_logical_state_cache_before(env):
+    room_floors = LogicalDisarrangement.get_room_floors(env)
+    return {
+        obj_id: {"base_states": cache_single_object_before(obj_id, obj, room_floors, env), "type": "standard"}
+        for obj_id, obj in env.scene.objects_by_name.items()
+    }
+
+
+def compare_logical_state_caches(cache_before, state_cache):
+    """
+    :return: number of values of the previous cache that differ in the new cache
+    """
+    object_ids = state_cache["object_ids"]
+    differences = 0
+    for idx, obj_id in enumerate(object_ids):
+        for state_class, value in cache_before[obj_id]["base_states"].items():
+            values = state_cache["states"][LOGICAL_STATE_SLOTS[0]][state_class]["values"][idx]
+            columns = state_cache["floor_ids"] if state_class == OnFloor else object_ids
+            for column, target_id in enumerate(columns):
+                if target_id in value:
+                    differences += int(bool(value[target_id]) != bool(values[column]))
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the disarrangement metrics")
+    parser.add_argument("--objects", type=int, default=300, help="number of objects of the scene")
+    parser.add_argument("--steps", type=int, default=300, help="number of steps of the kinematic metric")
+    parser.add_argument("--moving_fraction", type=float, default=0.05, help="fraction of the items pushed every step")
+    args = parser.parse_args()
+
+    p.connect(p.DIRECT)
+    p.setGravity(0, 0, -9.8)
+    env = make_scene(args.objects)
+    rng = np.random.RandomState(1)
+    print("{} objects".format(len(env.scene.objects_by_name)))
+
+    # Kinematic disarrangement, timing only the metrics
+    timings = {"before": 0.0, "after": 0.0}
+    metrics = {"before": KinematicDisarrangementBefore(), "after": KinematicDisarrangement()}
+    state_id = p.saveState()
+    for _ in range(args.steps):
+        for name, metric in metrics.items():
+            # Both metrics read the poses, which are cached until the next step
+            clear_states(env)
+            start = time.time()
+            metric.step_callback(env, None)
+            timings[name] += time.time() - start
+        move_items(env, rng, args.moving_fraction)
+    for name, elapsed in timings.items():
+        print(
+            "kinematic, {:<7} {:>8.3f} ms/step {:>6.1f}x".format(
+                name, elapsed / args.steps * 1e3, timings["before"] / elapsed
+            )
+        )
+    assert metrics["after"].delta_disarrangement == metrics["before"].delta_disarrangement
+    assert metrics["after"].integrated_disarrangement == metrics["before"].integrated_disarrangement
+
+    # Logical state caches before and after moving items, built from the same scene with the memos cleared
+    p.restoreState(state_id)
+    logical = LogicalDisarrangement()
+    caches = {"before": [], "after": []}
+    timings = {"before": 0.0, "after": 0.0}
+    for snapshot in range(2):
+        clear_states(env)
+        for name, create_cache in [
+            ("before", create_logical_state_cache_before),
+            ("after", logical.create_object_logical_state_cache),
+        ]:
+            clear_states(env, clear_memos=True)
+            start = time.time()
+            caches[name].append(create_cache(env))
+            timings[name] += time.time() - start
+        differences = compare_logical_state_caches(caches["before"][-1], caches["after"][-1])
+        print("logical state cache {}: {} differences".format(snapshot, differences))
+        assert differences == 0
+        for _ in range(30):
+            move_items(env, rng, 0.3)
+    for name, elapsed in timings.items():
+        print("logical, {:<7} {:>8.3f} s/cache {:>6.1f}x".format(name, elapsed / 2, timings["before"] / elapsed))
+    result = logical.compute_logical_disarrangement(*caches["after"])
+    print("logical disarrangement: {}".format(result))
+    p.disconnect()
+
+
+if __name__ == "__main__":
+    main()
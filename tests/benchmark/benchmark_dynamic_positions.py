@@ -0,0 +1,160 @@
+"""
+Benchmark of the Python-side per-frame cost of MeshRenderer.update_dynamic_positions for the optimized renderer,
+without any GPU context, on a scene of 500 instances of which a fraction moves every frame.
+The previous implementation, which rebuilt float64 per-draw arrays from the poses of every instance and let the
+bindings convert them to float32 for each of the two passes of a frame, is timed against the double buffered pose
+arrays gathered from the poses the instances write in place.
+"""
+import argparse
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from igibson.render.mesh_renderer.instances import InstanceGroup
+from igibson.render.mesh_renderer.optimized_packing import VERTEX_SIZE, DoubleBufferedPoses, OptimizedRendererPacking
+from igibson.utils.mesh_util import quat2rotmat, xyz2mat
+
+
+def make_scene(num_instances, links_per_instance, shapes_per_link):
+    """
+    Pack a scene of random instances
+
+    :param num_instances: number of instances
+    :param links_per_instance: number of visual objects of every instance
+    :param shapes_per_link: number of shapes of every visual object
+    :return: OptimizedRendererPacking and instances
+    """
+    num_shapes = shapes_per_link * 10
+    vertex_data = [np.zeros((3, VERTEX_SIZE), dtype=np.float32) for _ in range(num_shapes)]
+    faces = [np.array([[0, 1, 2]]) for _ in range(num_shapes)]
+    material = SimpleNamespace(
+        texture_id=-1,
+        roughness_texture_id=-1,
+        metallic_texture_id=-1,
+        normal_texture_id=-1,
+        kd=[0.5, 0.5, 0.5],
+        transform_param=[1.0, 1.0, 0.0],
+    )
+    instances = []
+    for i in range(num_instances):
+        objects = [
+            SimpleNamespace(
+                VAO_ids=list(range(j % 10 * shapes_per_link, (j % 10 + 1) * shapes_per_link)), renderer=None
+            )
+            for j in range(links_per_instance)
+        ]
+        instances.append(
+            InstanceGroup(
+                objects,
+                id=i,
+                link_ids=list(range(links_per_instance)),
+                pybullet_uuid=i,
+                ig_object=None,
+                class_id=1,
+                poses_trans=[np.eye(4)] * links_per_instance,
+                poses_rot=[np.eye(4)] * links_per_instance,
+                dynamic=True,
+                softbody=False,
+            )
+        )
+    packing = OptimizedRendererPacking(vertex_data, faces, lambda vao_id: material, {})
+    packing.repack(instances)
+    return packing, instances
+
+
+def move_instances(instances, rng, fraction):
+    """
+    Move a fraction of the instances, as Simulator.sync does for the awake bodies
+
+    :param instances: instances
+    :param rng: random generator
+    :param fraction: fraction of the instances moved
+    """
+    for instance in instances[: int(len(instances) * fraction)]:
+        for j in range(len(instance.objects)):
+            pos = rng.rand(3)
+            orn = rng.rand(4)
+            instance.set_position_for_part(xyz2mat(pos), j)
+            instance.set_rotation_for_part(quat2rotmat(orn / np.linalg.norm(orn)), j)
+
+
+class LegacyDynamicPositions(object):
+    """
+    Previous implementation of update_dynamic_positions
+    """
+
+    def __init__(self, num_slots):
+        self.trans_data = np.zeros((num_slots, 4, 4))
+        self.rot_data = np.zeros((num_slots, 4, 4))
+        self.pose_trans_array = None
+        self.pose_rot_array = None
+
+    def update(self, instances, need_flow_info):
+        for instance in instances:
+            buf_idxs = instance.or_buffer_indices
+            if not buf_idxs:
+                continue
+            # The poses of a visual object are repeated for each of its shapes
+            self.trans_data[buf_idxs] = np.repeat(
+                np.array(instance.poses_trans, dtype=np.float64), len(instance.objects[0].VAO_ids), axis=0
+            )
+            self.rot_data[buf_idxs] = np.repeat(
+                np.array(instance.poses_rot, dtype=np.float64), len(instance.objects[0].VAO_ids), axis=0
+            )
+        if need_flow_info and self.pose_trans_array is not None:
+            last_trans_array = np.copy(self.pose_trans_array)
+            last_rot_array = np.copy(self.pose_rot_array)
+        else:
+            last_trans_array = self.pose_trans_array
+            last_rot_array = self.pose_rot_array
+        self.pose_trans_array = np.ascontiguousarray(self.trans_data)
+        self.pose_rot_array = np.ascontiguousarray(self.rot_data)
+        if last_trans_array is None:
+            last_trans_array, last_rot_array = self.pose_trans_array, self.pose_rot_array
+        # Conversions done by the bindings for the shadow and main passes
+        for _ in range(2):
+            for array in [self.pose_trans_array, self.pose_rot_array, last_trans_array, last_rot_array]:
+                array.astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-frame update of the optimized renderer poses")
+    parser.add_argument("--instances", type=int, default=500, help="number of instances")
+    parser.add_argument("--links", type=int, default=1, help="number of visual objects of every instance")
+    parser.add_argument("--shapes", type=int, default=2, help="number of shapes of every visual object")
+    parser.add_argument("--moving", type=float, default=0.1, help="fraction of the instances moving every frame")
+    parser.add_argument("--frames", type=int, default=500, help="number of frames")
+    parser.add_argument("--flow", action="store_true", help="request the flow every frame")
+    args = parser.parse_args()
+
+    packing, instances = make_scene(args.instances, args.links, args.shapes)
+    print("{} instances, {} draws".format(len(instances), packing.num_slots))
+    rng = np.random.RandomState(0)
+
+    legacy = LegacyDynamicPositions(packing.num_slots)
+    pose_buffers = DoubleBufferedPoses(packing.num_slots)
+    legacy_time = 0.0
+    new_time = 0.0
+    uploaded = 0
+    for _ in range(args.frames):
+        move_instances(instances, rng, args.moving)
+        start = time.time()
+        legacy.update(instances, args.flow)
+        legacy_time += time.time() - start
+        start = time.time()
+        trans_data, rot_data, _, _ = pose_buffers.update(packing, need_flow_info=args.flow)
+        new_time += time.time() - start
+        uploaded += pose_buffers.dirty_range[1] - pose_buffers.dirty_range[0]
+        assert np.allclose(trans_data, legacy.pose_trans_array) and np.allclose(rot_data, legacy.pose_rot_array)
+
+    print("Legacy: {:.3f}ms per frame".format(1000.0 * legacy_time / args.frames))
+    print(
+        "Double buffered: {:.3f}ms per frame, {:.1f} of {} draws uploaded per frame".format(
+            1000.0 * new_time / args.frames, float(uploaded) / args.frames, packing.num_slots
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
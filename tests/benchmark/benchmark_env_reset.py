@@ -0,0 +1,44 @@
+import os
+import time
+
+import numpy as np
+
+import igibson
+from igibson.envs.igibson_env import iGibsonEnv
+
+
+def benchmark_reset(config_filename, physics_free_placement, n_reset=50):
+    config_file = os.path.join(igibson.configs_path, config_filename)
+    env = iGibsonEnv(config_file=config_file, mode="headless")
+    env.physics_free_placement = physics_free_placement
+
+    reset_times = []
+    for _ in range(n_reset):
+        start = time.time()
+        env.reset()
+        reset_times.append(time.time() - start)
+        for _ in range(10):
+            env.step(env.action_space.sample())
+
+    env.close()
+
+    print(
+        "{}, physics-free placement {}: episode reset {:.4f} s (mean over {}), {:.4f} s (max)".format(
+            config_filename, physics_free_placement, np.mean(reset_times), n_reset, np.max(reset_times)
+        )
+    )
+    return reset_times
+
+
+def main():
+    for config_filename in [
+        "turtlebot_static_nav.yaml",
+        "turtlebot_interactive_nav.yaml",
+        "turtlebot_dynamic_nav.yaml",
+    ]:
+        benchmark_reset(config_filename, physics_free_placement=False)
+        benchmark_reset(config_filename, physics_free_placement=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark of the CPU-side work of MeshRenderer.load_object with the mesh cache: obj parsing and vertex buffer
+construction for every visual mesh of a scene, without any GPU context.
+Three runs are timed: without any cache, with the disk cache of a previous process (a new in-process cache), and
+with the in-process cache, as when the same scene is loaded again or has many instances of the same model.
+"""
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+import igibson
+from igibson.render.mesh_renderer.mesh_cache import MeshCache, get_shape_vertex_data, parse_obj_file
+
+
+def get_scene_obj_files(scene_name):
+    """
+    Get the visual meshes of an iGibson scene, followed by the visual meshes of the objects of the dataset
+
+    :param scene_name: scene name
+    :return: list of obj file paths
+    """
+    scene_dir = os.path.join(igibson.ig_dataset_path, "scenes", scene_name)
+    obj_files = sorted(glob.glob(os.path.join(scene_dir, "shape", "visual", "*.obj")))
+    obj_files += sorted(
+        glob.glob(os.path.join(igibson.ig_dataset_path, "objects", "*", "*", "shape", "visual", "*.obj"))
+    )
+    return obj_files
+
+
+def load_without_cache(obj_files, scales):
+    num_vertices = 0
+    for obj_file, scale in zip(obj_files, scales):
+        parsed_mesh = parse_obj_file(obj_file)
+        for shape in parsed_mesh.shapes:
+            vertex_data, _ = get_shape_vertex_data(parsed_mesh, shape, scale=scale)
+            num_vertices += len(vertex_data)
+    return num_vertices
+
+
+def load_with_cache(mesh_cache, obj_files, scales):
+    num_vertices = 0
+    for obj_file, scale in zip(obj_files, scales):
+        _, vertex_data, _ = mesh_cache.get_mesh_data(obj_file, scale=scale)
+        num_vertices += sum(len(item) for item in vertex_data)
+    return num_vertices
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the mesh cache of the renderer")
+    parser.add_argument("--scene", default="Rs_int", help="scene whose visual meshes are loaded")
+    parser.add_argument("--max_files", type=int, default=500, help="maximum number of obj files to load")
+    parser.add_argument("--instances", type=int, default=3, help="number of instances of every obj file")
+    args = parser.parse_args()
+
+    obj_files = [item for item in get_scene_obj_files(args.scene) if not item.endswith("encrypted.obj")]
+    obj_files = obj_files[: args.max_files]
+    if len(obj_files) == 0:
+        print("No unencrypted obj file found for scene {}".format(args.scene))
+        return
+    # Instances of a model share their scale, as the objects of a category in a scene often do
+    scales = [np.array([1.0, 1.0, 1.0])] * len(obj_files)
+    obj_files = obj_files * args.instances
+    scales = scales * args.instances
+    print("Loading {} obj files, {} instances each".format(len(obj_files) // args.instances, args.instances))
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        start = time.time()
+        num_vertices = load_without_cache(obj_files, scales)
+        print("No cache: {:.3f}s ({} vertices)".format(time.time() - start, num_vertices))
+
+        # First process, fills the disk cache
+        start = time.time()
+        load_with_cache(MeshCache(cache_dir=cache_dir), obj_files, scales)
+        print("Cold cache: {:.3f}s".format(time.time() - start))
+
+        # Later process, reads the disk cache
+        mesh_cache = MeshCache(cache_dir=cache_dir)
+        start = time.time()
+        assert load_with_cache(mesh_cache, obj_files, scales) == num_vertices
+        print("Disk cache: {:.3f}s, {}".format(time.time() - start, mesh_cache.stats))
+
+        # Same process, loads the scene again
+        start = time.time()
+        assert load_with_cache(mesh_cache, obj_files, scales) == num_vertices
+        print("In-process cache: {:.3f}s, {}".format(time.time() - start, mesh_cache.stats))
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark of the frame data the multi-user VR server sends to its client every frame, without any renderer or network.
+The previous frame data, a dictionary of the pose matrices of every instance converted to lists, pickled as a proxy of
+its serialization by PodSixNet, is compared with the frames of muvr_frame_codec as sent through the channel (base64
+text of the binary frames), in float32 and quantized, for scenes of 100, 1000 and 5000 instances of which a fraction moves every frame. Bytes per frame, and encode and decode
+times are printed.
+"""
+import argparse
+import pickle
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from igibson.utils.muvr_frame_codec import (
+    FrameDecoder,
+    FrameEncoder,
+    frame_to_text,
+    get_instance_poses,
+    set_instance_poses,
+    text_to_frame,
+)
+from igibson.utils.transform_utils import quat2mat
+
+
+def make_instances(rng, num_instances, parts_per_instance):
+    """
+    Create instances with random poses, with the pose arrays of the renderer instances
+
+    :param rng: random generator
+    :param num_instances: number of instances
+    :param parts_per_instance: number of visual objects of every instance
+    :return: list of instances
+    """
+    instances = []
+    for i in range(num_instances):
+        trans = np.tile(np.eye(4, dtype=np.float32), (parts_per_instance, 1, 1))
+        rots = np.tile(np.eye(4, dtype=np.float32), (parts_per_instance, 1, 1))
+        instances.append(SimpleNamespace(pybullet_uuid=i, poses_trans=trans, poses_rot=rots))
+    move_instances(rng, instances, 1.0)
+    return instances
+
+
+def move_instances(rng, instances, fraction):
+    """
+    Move a random fraction of the instances
+
+    :param rng: random generator
+    :param instances: list of instances
+    :param fraction: fraction of the instances moved
+    """
+    for i in np.flatnonzero(rng.rand(len(instances)) < fraction):
+        instance = instances[i]
+        for j in range(len(instance.poses_trans)):
+            quat = rng.normal(size=4)
+            instance.poses_trans[j, 3, :3] = rng.uniform(-10, 10, size=3)
+            instance.poses_rot[j, :3, :3] = quat2mat(quat / np.linalg.norm(quat))
+
+
+def gen_frame_data_before(instances):
+    """
+    Previous IGVRServer.gen_frame_data
+    """
+    frame_data = {}
+    for instance in instances:
+        poses = []
+        rots = []
+        for pose in instance.poses_trans:
+            poses.append(pose.tolist())
+        for rot in instance.poses_rot:
+            rots.append(rot.tolist())
+        frame_data[instance.pybullet_uuid] = [poses, rots]
+    return pickle.dumps({"action": "frame_data", "frame_data": frame_data})
+
+
+def ingest_frame_data_before(instances, data):
+    """
+    Previous IGVRClient.ingest_frame_data
+    """
+    frame_data = pickle.loads(data)["frame_data"]
+    for instance in instances:
+        data = frame_data[instance.pybullet_uuid]
+        instance.poses_trans = [np.ascontiguousarray(np.array(trans)) for trans in data[0]]
+        instance.poses_rot = [np.ascontiguousarray(np.array(rot)) for rot in data[1]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the frame data of the multi-user VR server")
+    parser.add_argument("--parts", type=int, default=2, help="number of visual objects of every instance")
+    parser.add_argument("--moving", type=float, default=0.05, help="fraction of the instances moving every frame")
+    parser.add_argument("--frames", type=int, default=60, help="number of frames")
+    args = parser.parse_args()
+
+    for num_instances in [100, 1000, 5000]:
+        print("{} instances of {} visual objects".format(num_instances, args.parts))
+        for name in ["Before", "Float32", "Quantized"]:
+            rng = np.random.RandomState(0)
+            instances = make_instances(rng, num_instances, args.parts)
+            client_instances = make_instances(rng, num_instances, args.parts)
+            encoder = FrameEncoder(quantize=name == "Quantized")
+            decoder = FrameDecoder()
+            num_bytes = 0
+            encode_time = 0.0
+            decode_time = 0.0
+            for _ in range(args.frames):
+                move_instances(rng, instances, args.moving)
+                start = time.time()
+                if name == "Before":
+                    data = gen_frame_data_before(instances)
+                else:
+                    positions, orientations, _ = get_instance_poses(instances)
+                    data = frame_to_text(encoder.encode(positions, orientations, len(instances)))
+                encode_time += time.time() - start
+                num_bytes += len(data)
+                start = time.time()
+                if name == "Before":
+                    ingest_frame_data_before(client_instances, data)
+                else:
+                    frame_id, positions, orientations, _ = decoder.decode(text_to_frame(data))
+                    set_instance_poses(client_instances, positions, orientations)
+                    encoder.ack(frame_id)
+                decode_time += time.time() - start
+            print(
+                "  {}: {:.0f} bytes per frame, encode {:.2f}ms, decode {:.2f}ms".format(
+                    name,
+                    float(num_bytes) / args.frames,
+                    1000.0 * encode_time / args.frames,
+                    1000.0 * decode_time / args.frames,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark of the CPU-side work of adding and removing objects after the optimized renderer buffers are set up, without
+any GPU context. Objects are added and removed one at a time, either by packing all the buffers again and building the
+full merged buffers to upload (what a rebuild of the optimized renderer costs), or incrementally, by building only the
+data of the new shapes and the per-draw arrays.
+"""
+import argparse
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from igibson.render.mesh_renderer.instances import InstanceGroup
+from igibson.render.mesh_renderer.optimized_packing import VERTEX_SIZE, OptimizedRendererPacking
+
+
+def make_scene(num_shapes, num_instances, vertices_per_shape, shapes_per_instance):
+    """
+    Build random shapes, materials and instances
+
+    :param num_shapes: number of distinct shapes
+    :param num_instances: number of instances
+    :param vertices_per_shape: number of vertices of every shape
+    :param shapes_per_instance: number of shapes of every instance
+    :return: vertex data, faces, materials and instances
+    """
+    rng = np.random.RandomState(0)
+    vertex_data = [rng.rand(vertices_per_shape, VERTEX_SIZE).astype(np.float32) for _ in range(num_shapes)]
+    faces = [rng.randint(0, vertices_per_shape, size=(vertices_per_shape * 2, 3)) for _ in range(num_shapes)]
+    materials = [
+        SimpleNamespace(
+            texture_id=-1,
+            roughness_texture_id=-1,
+            metallic_texture_id=-1,
+            normal_texture_id=-1,
+            kd=[0.5, 0.5, 0.5],
+            transform_param=[1.0, 1.0, 0.0],
+        )
+        for _ in range(num_shapes)
+    ]
+    instances = [
+        InstanceGroup(
+            [SimpleNamespace(VAO_ids=list(rng.choice(num_shapes, shapes_per_instance, replace=False)), renderer=None)],
+            id=i,
+            link_ids=[-1],
+            pybullet_uuid=i,
+            ig_object=None,
+            class_id=1,
+            poses_trans=[np.eye(4)],
+            poses_rot=[np.eye(4)],
+            dynamic=True,
+            softbody=False,
+            use_pbr=False,
+        )
+        for i in range(num_instances)
+    ]
+    return vertex_data, faces, materials, instances
+
+
+def run_rebuild(packing, instances, changes):
+    current = list(instances)
+    for instance, add in changes:
+        if add:
+            current.append(instance)
+        else:
+            current.remove(instance)
+        packing.repack(current)
+        packing.get_merged_buffers()
+        packing.get_draw_arrays()
+        packing.get_merged_slot_data()
+        packing.clear_pending()
+
+
+def run_incremental(packing, instances, changes):
+    packing.repack(instances)
+    packing.clear_pending()
+    for instance, add in changes:
+        if add:
+            packing.add_instance(instance)
+        else:
+            packing.remove_instance(instance)
+        if packing.get_fragmentation() > 0.5:
+            packing.repack()
+        if packing.needs_full_upload:
+            packing.get_merged_buffers()
+        else:
+            packing.get_pending_uploads()
+        packing.get_draw_arrays()
+        packing.get_merged_slot_data()
+        packing.clear_pending()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the incremental packing of the optimized renderer")
+    parser.add_argument("--shapes", type=int, default=300, help="number of distinct shapes")
+    parser.add_argument("--instances", type=int, default=200, help="number of instances already in the scene")
+    parser.add_argument("--vertices", type=int, default=2000, help="number of vertices of every shape")
+    parser.add_argument("--shapes_per_instance", type=int, default=3, help="number of shapes of every instance")
+    parser.add_argument("--changes", type=int, default=50, help="number of objects added, then removed")
+    args = parser.parse_args()
+
+    vertex_data, faces, materials, instances = make_scene(
+        args.shapes, args.instances + args.changes, args.vertices, args.shapes_per_instance
+    )
+    initial, added = instances[: args.instances], instances[args.instances :]
+    changes = [(instance, True) for instance in added] + [(instance, False) for instance in added]
+
+    def get_shape_material(vao_id):
+        return materials[vao_id]
+
+    for name, run in [("Full rebuild", run_rebuild), ("Incremental", run_incremental)]:
+        packing = OptimizedRendererPacking(vertex_data, faces, get_shape_material, {})
+        start = time.time()
+        run(packing, initial, changes)
+        elapsed = time.time() - start
+        print(
+            "{}: {:.3f}s for {} changes ({:.2f}ms per change)".format(
+                name, elapsed, len(changes), 1000.0 * elapsed / len(changes)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
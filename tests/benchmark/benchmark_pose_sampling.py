@@ -0,0 +1,100 @@
+"""
+Benchmark of the sampling of robot poses near objects by StarterSemanticActionPrimitives, as done before navigating
+to grasp or place an object, in a headless Rs_int scene. The sampling of one candidate at a time, each tested in the
+physics simulation, is timed against the staged sampling, and the counters of each stage are printed.
+"""
+import argparse
+import time
+
+import numpy as np
+
+import igibson
+from igibson.action_primitives.action_primitive_set_base import ActionPrimitiveError
+from igibson.action_primitives.starter_semantic_action_primitives import (
+    MAX_ATTEMPTS_FOR_SAMPLING_POSE_NEAR_OBJECT,
+    StarterSemanticActionPrimitives,
+)
+from igibson.robots.behavior_robot import BehaviorRobot
+from igibson.scenes.igibson_indoor_scene import InteractiveIndoorScene
+from igibson.simulator import Simulator
+from igibson.utils.utils import parse_config
+
+OBJECT_CATEGORIES = ["bottom_cabinet", "sink", "coffee_table", "fridge"]
+
+
+def sample_pose_near_object_before(controller, obj):
+    """
+    Previous StarterSemanticActionPrimitives._sample_pose_near_object
+    """
+    pos_on_obj = np.array(controller._sample_position_on_aabb_face(obj))
+    obj_rooms = obj.in_rooms if obj.in_rooms else [controller.scene.get_room_instance_by_point(pos_on_obj[:2])]
+    for _ in range(MAX_ATTEMPTS_FOR_SAMPLING_POSE_NEAR_OBJECT):
+        distance = np.random.uniform(0.2, 1.0)
+        yaw = np.random.uniform(-np.pi, np.pi)
+        pose_2d = np.array(
+            [pos_on_obj[0] + distance * np.cos(yaw), pos_on_obj[1] + distance * np.sin(yaw), yaw + np.pi]
+        )
+        if controller.scene.get_room_instance_by_point(pose_2d[:2]) not in obj_rooms:
+            continue
+        if not controller._test_pose(pose_2d, pos_on_obj=pos_on_obj):
+            continue
+        return pose_2d
+    raise ActionPrimitiveError(ActionPrimitiveError.Reason.SAMPLING_ERROR, "Could not find valid position near object.")
+
+
+def run(controller, objects, sample_fn, num_samples):
+    latencies = []
+    failures = 0
+    for obj in objects:
+        for _ in range(num_samples):
+            start = time.time()
+            try:
+                sample_fn(obj)
+            except ActionPrimitiveError:
+                failures += 1
+            latencies.append(time.time() - start)
+    return np.mean(latencies), failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sampling of robot poses near objects")
+    parser.add_argument("--scene", default="Rs_int", help="scene name")
+    parser.add_argument("--samples", type=int, default=20, help="number of poses sampled near every object")
+    args = parser.parse_args()
+
+    s = Simulator(mode="headless", image_width=128, image_height=128)
+    scene = InteractiveIndoorScene(args.scene, load_object_categories=["walls", "floors"] + OBJECT_CATEGORIES)
+    s.import_scene(scene)
+    config = parse_config(igibson.configs_path + "/behavior_robot_mp_behavior_task.yaml")
+    robot = BehaviorRobot(**config["robot"])
+    s.import_robot(robot)
+    robot.set_position_orientation([0, 0, 1], [0, 0, 0, 1])
+    robot.apply_action(np.zeros(robot.action_dim))
+    for _ in range(100):
+        s.step()
+
+    controller = StarterSemanticActionPrimitives(None, scene, robot)
+    objects = [obj for category in OBJECT_CATEGORIES for obj in scene.objects_by_category.get(category, [])]
+    print("Sampling {} poses near each of {} objects".format(args.samples, len(objects)))
+    try:
+        np.random.seed(0)
+        mean_before, failures_before = run(
+            controller, objects, lambda obj: sample_pose_near_object_before(controller, obj), args.samples
+        )
+        print("Before: {:.2f}ms per pose, {} failures".format(1000.0 * mean_before, failures_before))
+
+        np.random.seed(0)
+        controller.reset_pose_sampling_stats()
+        mean_after, failures_after = run(controller, objects, controller._sample_pose_near_object, args.samples)
+        print("After: {:.2f}ms per pose, {} failures".format(1000.0 * mean_after, failures_after))
+        stats = controller.get_pose_sampling_stats()
+        for stage, counters in stats["stages"].items():
+            print(
+                "  {}: {} candidates, {:.1%} accepted".format(stage, counters["attempts"], counters["acceptance_rate"])
+            )
+    finally:
+        s.disconnect()
+
+
+if __name__ == "__main__":
+    main()
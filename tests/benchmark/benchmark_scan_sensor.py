@@ -0,0 +1,216 @@
+"""
+Per-step benchmark of ScanSensor (1D LiDAR scan and local occupancy grid) against the previous implementation,
+and of the multi-beam 3D LiDAR outputs.
+Runs in a synthetic pybullet scene of random boxes, so neither the dataset nor a GPU is needed. The outputs of both
+implementations are compared for equality at every step.
+"""
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pybullet as p
+from transforms3d.quaternions import quat2mat
+
+from igibson.sensors.scan_sensor import ScanSensor
+from igibson.utils.constants import OccupancyGridState
+
+
+class FixedLink(object):
+    def __init__(self, pos, orn):
+        self.pos = pos
+        self.orn = orn
+
+    def get_position_orientation(self):
+        return self.pos, self.orn
+
+
+def legacy_get_scan(sensor, laser_position, laser_orientation):
+    laser_angular_half_range = sensor.laser_angular_range / 2.0
+    angle = np.arange(
+        -laser_angular_half_range / 180 * np.pi,
+        laser_angular_half_range / 180 * np.pi,
+        sensor.laser_angular_range / 180.0 * np.pi / sensor.n_horizontal_rays,
+    )
+    unit_vector_local = np.array([[np.cos(ang), np.sin(ang), 0.0] for ang in angle])
+    transform_matrix = quat2mat(
+        [laser_orientation[3], laser_orientation[0], laser_orientation[1], laser_orientation[2]]
+    )
+    unit_vector_world = transform_matrix.dot(unit_vector_local.T).T
+
+    start_pose = np.tile(laser_position, (sensor.n_horizontal_rays, 1))
+    start_pose += unit_vector_world * sensor.min_laser_dist
+    end_pose = laser_position + unit_vector_world * sensor.laser_linear_range
+    results = p.rayTestBatch(start_pose, end_pose, numThreads=6)
+    hit_fraction = np.array([item[2] for item in results])
+    return np.expand_dims(hit_fraction, 1)
+
+
+def legacy_get_local_occupancy_grid(sensor, scan):
+    laser_linear_range = sensor.laser_linear_range
+    laser_angular_range = sensor.laser_angular_range
+    min_laser_dist = sensor.min_laser_dist
+    laser_angular_half_range = laser_angular_range / 2.0
+    angle = np.arange(
+        -np.radians(laser_angular_half_range),
+        np.radians(laser_angular_half_range),
+        np.radians(laser_angular_range) / sensor.n_horizontal_rays,
+    )
+    unit_vector_laser = np.array([[np.cos(ang), np.sin(ang), 0.0] for ang in angle])
+    scan_laser = unit_vector_laser * (scan * (laser_linear_range - min_laser_dist) + min_laser_dist)
+    laser_rotation = quat2mat(
+        [
+            sensor.laser_orientation[3],
+            sensor.laser_orientation[0],
+            sensor.laser_orientation[1],
+            sensor.laser_orientation[2],
+        ]
+    )
+    scan_world = laser_rotation.dot(scan_laser.T).T + sensor.laser_position
+    base_rotation = quat2mat(
+        [sensor.base_orientation[3], sensor.base_orientation[0], sensor.base_orientation[1], sensor.base_orientation[2]]
+    )
+    scan_local = base_rotation.T.dot((scan_world - sensor.base_position).T).T
+    scan_local = scan_local[:, :2]
+    scan_local = np.concatenate([np.array([[0, 0]]), scan_local, np.array([[0, 0]])], axis=0)
+    scan_local[:, 1] *= -1
+
+    occupancy_grid = np.zeros((sensor.grid_resolution, sensor.grid_resolution)).astype(np.uint8)
+    occupancy_grid.fill(int(OccupancyGridState.UNKNOWN * 2.0))
+    scan_local_in_map = scan_local / sensor.occupancy_range * sensor.grid_resolution + (sensor.grid_resolution / 2)
+    scan_local_in_map = scan_local_in_map.reshape((1, -1, 1, 2)).astype(np.int32)
+    for i in range(scan_local_in_map.shape[1]):
+        cv2.circle(
+            img=occupancy_grid,
+            center=(scan_local_in_map[0, i, 0, 0], scan_local_in_map[0, i, 0, 1]),
+            radius=2,
+            color=int(OccupancyGridState.OBSTACLES * 2.0),
+            thickness=-1,
+        )
+    cv2.fillPoly(img=occupancy_grid, pts=scan_local_in_map, color=int(OccupancyGridState.FREESPACE * 2.0), lineType=1)
+    cv2.circle(
+        img=occupancy_grid,
+        center=(sensor.grid_resolution // 2, sensor.grid_resolution // 2),
+        radius=int(sensor.robot_footprint_radius_in_map),
+        color=int(OccupancyGridState.FREESPACE * 2.0),
+        thickness=-1,
+    )
+    return occupancy_grid[:, :, None].astype(np.float32) / 2.0
+
+
+def build_synthetic_scene(n_boxes=60, seed=0):
+    rng = np.random.RandomState(seed)
+    p.createMultiBody(0, p.createCollisionShape(p.GEOM_PLANE))
+    for _ in range(n_boxes):
+        half_extents = rng.uniform(0.05, 0.5, size=3)
+        position = [rng.uniform(-6, 6), rng.uniform(-6, 6), half_extents[2]]
+        orientation = p.getQuaternionFromEuler([0, 0, rng.uniform(-np.pi, np.pi)])
+        shape = p.createCollisionShape(p.GEOM_BOX, halfExtents=half_extents)
+        p.createMultiBody(0, shape, basePosition=position, baseOrientation=orientation)
+
+
+def benchmark(n_horizontal_rays=228, grid_resolution=128, n_steps=500, seed=0):
+    config = {
+        "n_horizontal_rays": n_horizontal_rays,
+        "laser_linear_range": 5.6,
+        "laser_angular_range": 240.0,
+        "min_laser_dist": 0.05,
+        "grid_resolution": grid_resolution,
+        "occupancy_range": 5.0,
+        "scan_num_threads": 6,
+    }
+    laser_link = FixedLink([0.0, 0.0, 0.3], [0.0, 0.0, 0.0, 1.0])
+    base_link = FixedLink([0.0, 0.0, 0.05], [0.0, 0.0, 0.0, 1.0])
+    robot = SimpleNamespace(links={"scan_link": laser_link}, base_link=base_link)
+    env = SimpleNamespace(config=config, robots=[robot])
+    sensor = ScanSensor(env, ["scan", "occupancy_grid"])
+
+    rng = np.random.RandomState(seed)
+    poses = []
+    for _ in range(n_steps):
+        yaw = rng.uniform(-np.pi, np.pi)
+        poses.append(([rng.uniform(-5, 5), rng.uniform(-5, 5), 0.3], p.getQuaternionFromEuler([0, 0, yaw])))
+
+    legacy_time = 0.0
+    new_time = 0.0
+    n_mismatch = 0
+    for pos, orn in poses:
+        laser_link.pos, laser_link.orn = pos, orn
+
+        start = time.time()
+        legacy_scan = legacy_get_scan(sensor, pos, orn)
+        legacy_grid = legacy_get_local_occupancy_grid(sensor, legacy_scan)
+        legacy_time += time.time() - start
+
+        start = time.time()
+        state = sensor.get_obs(env)
+        new_time += time.time() - start
+
+        if not (
+            np.array_equal(legacy_scan.astype(np.float32), state["scan"])
+            and np.array_equal(legacy_grid, state["occupancy_grid"])
+        ):
+            n_mismatch += 1
+
+    print(
+        "ScanSensor, {} rays, {}x{} grid: legacy {:.3f} ms/step, new {:.3f} ms/step, {}/{} steps differ".format(
+            n_horizontal_rays,
+            grid_resolution,
+            grid_resolution,
+            legacy_time / n_steps * 1000,
+            new_time / n_steps * 1000,
+            n_mismatch,
+            n_steps,
+        )
+    )
+    return n_mismatch
+
+
+def benchmark_multi_beam(n_horizontal_rays=1024, n_vertical_beams=16, n_steps=100, seed=0):
+    config = {
+        "n_horizontal_rays": n_horizontal_rays,
+        "n_vertical_beams": n_vertical_beams,
+        "laser_vertical_angular_range": 30.0,
+        "laser_linear_range": 20.0,
+        "laser_angular_range": 360.0,
+        "grid_resolution": 128,
+        "occupancy_range": 5.0,
+        "scan_num_threads": 0,
+    }
+    laser_link = FixedLink([0.0, 0.0, 0.3], [0.0, 0.0, 0.0, 1.0])
+    base_link = FixedLink([0.0, 0.0, 0.05], [0.0, 0.0, 0.0, 1.0])
+    robot = SimpleNamespace(links={"scan_link": laser_link}, base_link=base_link)
+    env = SimpleNamespace(config=config, robots=[robot])
+    sensor = ScanSensor(env, ["scan", "occupancy_grid", "scan_pc", "scan_pc_voxel", "scan_intensity"])
+
+    rng = np.random.RandomState(seed)
+    total_time = 0.0
+    n_points = 0
+    for _ in range(n_steps):
+        yaw = rng.uniform(-np.pi, np.pi)
+        laser_link.pos = [rng.uniform(-5, 5), rng.uniform(-5, 5), 0.3]
+        laser_link.orn = p.getQuaternionFromEuler([0, 0, yaw])
+        start = time.time()
+        state = sensor.get_obs(env)
+        total_time += time.time() - start
+        n_points += np.count_nonzero(np.any(state["scan_pc_voxel"] != 0, axis=1))
+
+    print(
+        "ScanSensor, {} beams x {} rays: {:.3f} ms/step, {:.0f} points/step after voxel downsampling".format(
+            n_vertical_beams, n_horizontal_rays, total_time / n_steps * 1000, n_points / n_steps
+        )
+    )
+
+
+def main():
+    p.connect(p.DIRECT)
+    build_synthetic_scene()
+    for n_horizontal_rays in [128, 228, 640]:
+        benchmark(n_horizontal_rays=n_horizontal_rays)
+    for n_vertical_beams in [16, 32]:
+        benchmark_multi_beam(n_vertical_beams=n_vertical_beams)
+    p.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import time
+
+import numpy as np
+
+from igibson.render.mesh_renderer.mesh_renderer_settings import MeshRendererSettings
+from igibson.robots.turtlebot import Turtlebot
+from igibson.scenes.igibson_indoor_scene import InteractiveIndoorScene
+from igibson.simulator import Simulator
+
+
+def benchmark_reset(scene_name, use_reset_snapshot, should_open_all_doors=True, n_reset=100):
+    scene = InteractiveIndoorScene(
+        scene_name,
+        texture_randomization=False,
+        object_randomization=False,
+        should_open_all_doors=should_open_all_doors,
+        use_reset_snapshot=use_reset_snapshot,
+    )
+    settings = MeshRendererSettings(msaa=False, enable_shadow=False)
+    s = Simulator(mode="headless", image_width=128, image_height=128, rendering_settings=settings)
+    s.import_scene(scene)
+    turtlebot = Turtlebot()
+    s.import_object(turtlebot)
+
+    reset_times = []
+    for i in range(n_reset):
+        # Perturb the scene between resets, as an episode would
+        for _ in range(10):
+            turtlebot.apply_action(turtlebot.action_space.sample())
+            s.step()
+
+        start = time.time()
+        scene.reset_scene_objects()
+        reset_times.append(time.time() - start)
+
+    s.disconnect()
+
+    print(
+        "Scene {}, open doors {}, reset snapshot {}: first reset {:.4f} s, later resets {:.4f} s (mean over {})".format(
+            scene_name,
+            should_open_all_doors,
+            use_reset_snapshot,
+            reset_times[0],
+            np.mean(reset_times[1:]),
+            n_reset - 1,
+        )
+    )
+    return reset_times
+
+
+def main():
+    for should_open_all_doors in [False, True]:
+        benchmark_reset("Rs_int", use_reset_snapshot=False, should_open_all_doors=should_open_all_doors)
+        benchmark_reset("Rs_int", use_reset_snapshot=True, should_open_all_doors=should_open_all_doors)
+
+
+if __name__ == "__main__":
+    main()
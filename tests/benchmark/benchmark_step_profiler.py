@@ -0,0 +1,61 @@
+"""
+Benchmark of the overhead of the scopes of the step profiler, without any simulator. A step of the shape of
+Simulator.step with 30 object state types is run without any scope, with the profiler disabled and enabled.
+"""
+import argparse
+import time
+
+from igibson.render.profiler import StepProfiler
+
+STATE_TYPES = ["State{}".format(i) for i in range(30)]
+
+
+def step_without_scopes():
+    for _ in range(1):
+        pass
+    for _ in STATE_TYPES:
+        pass
+
+
+def step_with_scopes(profiler):
+    with profiler.scope("simulator_step"):
+        with profiler.scope("physics"):
+            for _ in range(1):
+                pass
+        with profiler.scope("non_physics_step"):
+            with profiler.scope("object_states"):
+                for state_type in STATE_TYPES:
+                    with profiler.scope(state_type):
+                        pass
+        with profiler.scope("sync"):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the overhead of the step profiler")
+    parser.add_argument("--steps", type=int, default=10000, help="number of steps")
+    args = parser.parse_args()
+
+    profiler = StepProfiler()
+    num_scopes = 5 + len(STATE_TYPES)
+    for name, step in [
+        ("No scopes", step_without_scopes),
+        ("Disabled", lambda: step_with_scopes(profiler)),
+        ("Enabled", lambda: step_with_scopes(profiler)),
+    ]:
+        if name == "Enabled":
+            profiler.enable()
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            step()
+        duration = time.perf_counter() - start
+        print(
+            "{}: {:.2f}us per step, {:.3f}us per scope".format(
+                name, 1e6 * duration / args.steps, 1e6 * duration / args.steps / num_scopes
+            )
+        )
+    print(profiler.summary())
+
+
+if __name__ == "__main__":
+    main()
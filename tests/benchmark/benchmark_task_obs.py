@@ -0,0 +1,131 @@
+"""
+Benchmark of BehaviorTask.get_task_obs on synthetic activities with 10 to 50 task relevant objects, made of pybullet
+boxes, and a robot with two arms and the assisted grasping logic of ManipulationRobot, grasping an object or nothing.
+The previous get_task_obs, which built a dict of formatted field names and flattened it every step, is compared with
+the compiled layout filled in place.
+"""
+import argparse
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pybullet as p
+
+from igibson.objects.articulated_object import URDFObject
+from igibson.robots.manipulation_robot import ManipulationRobot
+from igibson.tasks.behavior_task import BehaviorTask
+from igibson.utils.constants import AGENT_POSE_DIM, MAX_TASK_RELEVANT_OBJS, TASK_RELEVANT_OBJS_OBS_DIM
+
+
+class BenchmarkRobot(object):
+    is_grasping = ManipulationRobot.is_grasping
+    is_grasping_all_arms = ManipulationRobot.is_grasping_all_arms
+
+    def __init__(self, body_id):
+        self.body_id = body_id
+        self.arm_names = ["left_hand", "right_hand"]
+        self.default_arm = "left_hand"
+        self.grasping_mode = "assisted"
+        self._ag_obj_in_hand = {arm: None for arm in self.arm_names}
+        self._ag_release_counter = {arm: None for arm in self.arm_names}
+
+    def get_position(self):
+        return np.array(p.getBasePositionAndOrientation(self.body_id)[0])
+
+    def get_rpy(self):
+        return np.array(p.getEulerFromQuaternion(p.getBasePositionAndOrientation(self.body_id)[1]))
+
+
+def get_task_obs_before(task, env):
+    """
+    Previous BehaviorTask.get_task_obs
+    """
+    state = {}
+    task_obs = np.zeros((task.task_obs_dim))
+    state["robot_pos"] = np.array(env.robots[0].get_position())
+    state["robot_orn"] = np.array(env.robots[0].get_rpy())
+    i = 0
+    for _, v in task.object_scope.items():
+        if isinstance(v, URDFObject):
+            state["obj_{}_valid".format(i)] = 1.0
+            state["obj_{}_pos".format(i)] = np.array(v.get_position())
+            state["obj_{}_orn".format(i)] = np.array(p.getEulerFromQuaternion(v.get_orientation()))
+            grasping_objects = env.robots[0].is_grasping_all_arms(candidate_obj=v.get_body_ids())
+            for grasp_idx, grasping in enumerate(grasping_objects):
+                state["obj_{}_pos_in_gripper_{}".format(i, grasp_idx)] = float(grasping)
+            i += 1
+    state_list = []
+    for k, v in state.items():
+        if isinstance(v, list):
+            state_list.extend(v)
+        elif isinstance(v, tuple):
+            state_list.extend(list(v))
+        elif isinstance(v, np.ndarray):
+            state_list.extend(list(v))
+        elif isinstance(v, (float, int)):
+            state_list.append(v)
+        else:
+            raise ValueError("cannot serialize task obs")
+    assert len(state_list) <= len(task_obs)
+    task_obs[: len(state_list)] = state_list
+    return task_obs
+
+
+def make_task(num_objects, seed=0):
+    """
+    :param num_objects: number of task relevant objects
+    :param seed: random seed
+    :return: BehaviorTask with the object scope of the activity, and an environment with the robot
+    """
+    rng = np.random.RandomState(seed)
+    shape = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.05, 0.05, 0.05])
+    robot = BenchmarkRobot(p.createMultiBody(baseMass=1, baseCollisionShapeIndex=shape))
+    object_scope = {"agent.n.01_1": robot}
+    for i in range(num_objects):
+        body_id = p.createMultiBody(baseMass=1, baseCollisionShapeIndex=shape, basePosition=rng.uniform(-5, 5, 3))
+        obj = URDFObject.__new__(URDFObject)
+        obj._body_ids = [body_id]
+        obj.main_body = 0
+        object_scope["object.n.01_{}".format(i)] = obj
+
+    task = BehaviorTask.__new__(BehaviorTask)
+    task.object_scope = object_scope
+    task.task_obs_dim = MAX_TASK_RELEVANT_OBJS * TASK_RELEVANT_OBJS_OBS_DIM + AGENT_POSE_DIM
+    task.task_obs_layout = None
+    return task, SimpleNamespace(robots=[robot])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of BehaviorTask.get_task_obs")
+    parser.add_argument("--steps", type=int, default=2000, help="number of observations per case")
+    args = parser.parse_args()
+
+    p.connect(p.DIRECT)
+    for num_objects in [10, 20, 30, 50]:
+        for grasping in [False, True]:
+            task, env = make_task(num_objects)
+            robot = env.robots[0]
+            if grasping:
+                robot._ag_obj_in_hand["right_hand"] = task.object_scope["object.n.01_0"].get_body_ids()
+            task.compile_task_obs_layout(env)
+            timings = {}
+            for name, get_task_obs in [("before", get_task_obs_before), ("after", BehaviorTask.get_task_obs)]:
+                start = time.time()
+                for _ in range(args.steps):
+                    task_obs = get_task_obs(task, env)
+                timings[name] = (time.time() - start) / args.steps
+                assert np.array_equal(task_obs, get_task_obs_before(task, env))
+            print(
+                "{:>3} objects, {:<12} before {:>7.1f} us after {:>7.1f} us {:>5.1f}x".format(
+                    num_objects,
+                    "grasping" if grasping else "not grasping",
+                    timings["before"] * 1e6,
+                    timings["after"] * 1e6,
+                    timings["before"] / timings["after"],
+                )
+            )
+    p.disconnect()
+
+
+if __name__ == "__main__":
+    main()
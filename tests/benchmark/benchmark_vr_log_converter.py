@@ -0,0 +1,166 @@
+"""
+Benchmark of vr_log_converter on a synthetic log with the datasets IGLogWriter writes for a VR session: frame data, VR
+camera, device, button and event data, the actions of the robot and the physics data of the tracked objects, 100k
+frames by default. The previous converter, which copied one row of one dataset at a time to the time ordered layout, is
+timed on the first frames only and extrapolated, and compared with the block conversion to the time ordered layout and
+to the columnar layout, uncompressed, compressed and with worker processes.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+from igibson.utils.vr_log_converter import convert_log, get_log_datasets
+
+# Row shapes of the datasets IGLogWriter writes for a VR session, besides the physics data
+VR_LOG_DATASETS = {
+    "frame_data": (4,),
+    "vr/vr_camera/right_eye_view": (4, 4),
+    "vr/vr_camera/right_eye_proj": (4, 4),
+    "vr/vr_camera/right_camera_pos": (3,),
+    "vr/vr_device_data/hmd": (17,),
+    "vr/vr_device_data/left_controller": (27,),
+    "vr/vr_device_data/right_controller": (27,),
+    "vr/vr_device_data/torso_tracker": (8,),
+    "vr/vr_device_data/vr_position_data": (12,),
+    "vr/vr_button_data/left_controller": (3,),
+    "vr/vr_button_data/right_controller": (3,),
+    "vr/vr_eye_tracking_data": (9,),
+    "vr/vr_event_data/left_controller": (32,),
+    "vr/vr_event_data/right_controller": (32,),
+    "vr/vr_event_data/reset_actions": (2,),
+    "agent_actions/vr_robot": (28,),
+}
+
+
+def make_synthetic_log(filename, num_frames, num_objects, frames_before_write=1000, moving_fraction=0.2, seed=0):
+    """
+    Write a synthetic log as IGLogWriter does, appending blocks of frames to resizable datasets. The VR data and a
+    fraction of the objects follow random walks, the other objects stay still.
+
+    :param filename: output HDF5 file
+    :param num_frames: number of frames
+    :param num_objects: number of objects with physics data
+    :param frames_before_write: number of frames appended at once
+    :param moving_fraction: fraction of the objects that move
+    :param seed: random seed
+    """
+    rng = np.random.RandomState(seed)
+    shapes = dict(VR_LOG_DATASETS)
+    moving = set(VR_LOG_DATASETS)
+    for i in range(num_objects):
+        names = ["physics_data/{}/{}".format(i + 3, field) for field in ["position", "orientation", "joint_state"]]
+        shapes.update(zip(names, [(3,), (4,), (rng.randint(0, 3),)]))
+        if rng.rand() < moving_fraction:
+            moving.update(names)
+
+    with h5py.File(filename, "w") as hf:
+        hf.attrs["/metadata/start_time"] = "2021-01-01 00:00:00"
+        hf.attrs["/metadata/physics_timestep"] = 1 / 120.0
+        hf.attrs["/metadata/render_timestep"] = 1 / 30.0
+        hf.attrs["/metadata/filter_objects"] = True
+        last_rows = {}
+        for name, shape in shapes.items():
+            hf.create_dataset(name, (0,) + shape, maxshape=(None,) + shape, dtype=np.float64)
+            last_rows[name] = rng.uniform(-1, 1, size=shape)
+        for start in range(0, num_frames, frames_before_write):
+            frames_to_write = min(frames_before_write, num_frames - start)
+            for name, shape in shapes.items():
+                if name in moving:
+                    steps = rng.normal(scale=1e-3, size=(frames_to_write,) + shape)
+                    data = last_rows[name] + np.cumsum(steps, axis=0)
+                else:
+                    data = np.repeat(last_rows[name][None], frames_to_write, axis=0)
+                last_rows[name] = data[-1]
+                dset = hf[name]
+                dset.resize(dset.shape[0] + frames_to_write, axis=0)
+                dset[-frames_to_write:, ...] = data
+
+
+def convert_log_before(input_path, output_path, num_frames):
+    """
+    Previous vr_log_converter, limited to the first num_frames frames
+    """
+    in_hf5 = h5py.File(input_path, "r")
+    out_hf5 = h5py.File(output_path, "w")
+    keys_to_write = get_log_datasets(in_hf5)
+    for frame in range(num_frames):
+        for key in keys_to_write:
+            out_hf5[str(frame) + "/" + key] = in_hf5[key][frame]
+    out_hf5.close()
+    in_hf5.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of vr_log_converter")
+    parser.add_argument("--frames", type=int, default=100000, help="number of frames of the synthetic log")
+    parser.add_argument("--objects", type=int, default=30, help="number of objects with physics data")
+    parser.add_argument(
+        "--time_ordered_frames", type=int, default=1000, help="number of frames converted to the time ordered layout"
+    )
+    parser.add_argument("--num_workers", type=int, default=4, help="worker processes of the parallel conversion")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        input_path = os.path.join(tmp_dir, "log.hdf5")
+        make_synthetic_log(input_path, args.frames, args.objects)
+        with h5py.File(input_path, "r") as hf:
+            num_datasets = len(get_log_datasets(hf))
+        print("{} frames, {} datasets, {:.1f} MB".format(args.frames, num_datasets, os.path.getsize(input_path) / 1e6))
+
+        # The time ordered layout creates a dataset per frame and dataset, so it is timed on the first frames
+        short_path = os.path.join(tmp_dir, "short.hdf5")
+        make_synthetic_log(short_path, args.time_ordered_frames, args.objects)
+        output_path = os.path.join(tmp_dir, "out.hdf5")
+        cases = [
+            (
+                "row by row, time ordered (before)",
+                lambda: convert_log_before(short_path, output_path, args.time_ordered_frames),
+                args.time_ordered_frames,
+            ),
+            (
+                "blocks, time ordered",
+                lambda: convert_log(short_path, output_path, layout="time_ordered"),
+                args.time_ordered_frames,
+            ),
+            ("blocks, columnar", lambda: convert_log(input_path, output_path), args.frames),
+            ("blocks, columnar, lzf", lambda: convert_log(input_path, output_path, compression="lzf"), args.frames),
+            ("blocks, columnar, gzip", lambda: convert_log(input_path, output_path, compression="gzip"), args.frames),
+            (
+                "blocks, columnar, gzip, {} workers".format(args.num_workers),
+                lambda: convert_log(input_path, output_path, compression="gzip", num_workers=args.num_workers),
+                args.frames,
+            ),
+        ]
+        baseline = None
+        for name, convert, num_frames in cases:
+            start = time.time()
+            convert()
+            elapsed = time.time() - start
+            per_frame = elapsed / num_frames
+            if baseline is None:
+                baseline = per_frame
+            print(
+                "{:<40} {:>9.2f} s for {:>6} frames {:>9.1f} us/frame {:>8.1f}x {:>8.1f} MB".format(
+                    name,
+                    elapsed,
+                    num_frames,
+                    per_frame * 1e6,
+                    baseline / per_frame,
+                    os.path.getsize(output_path) / 1e6,
+                )
+            )
+        print(
+            "Row by row conversion of the {} frames, extrapolated: {:.0f} s".format(args.frames, baseline * args.frames)
+        )
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Load test of the frame streaming of the web UI, without any simulator or web server. Stub environments render
+synthetic frames, and fake clients read the encoded frames of their session at their own rate, some of them slower than
+the environments render. The encode latency of the previous path (PIL JPEG and base64 round trip) is compared with
+the encoders of the streaming module, then the frames achieved per second by every client and the ratio of frames
+dropped because of slow clients are printed, for two rounds of sessions that reuse the pooled environments.
+"""
+import argparse
+import base64
+import binascii
+import threading
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from igibson.examples.web_ui.streaming import EnvPool, ImageEncoder, StreamingSession
+
+
+class StubEnv(object):
+    """
+    Environment rendering synthetic frames, with the float RGBA frames of the renderer
+    """
+
+    def __init__(self, size=400, render_time=0.005):
+        """
+        :param size: width and height of the frames
+        :param render_time: time in seconds spent rendering every frame
+        """
+        self.render_time = render_time
+        x, y = np.meshgrid(np.linspace(0, 1, size), np.linspace(0, 1, size))
+        self.background = np.stack([x, y, 0.5 * (x + y), np.ones_like(x)], axis=2).astype(np.float32)
+        self.noise = np.random.RandomState(0).uniform(0, 0.1, size=self.background.shape).astype(np.float32)
+        self.frame_id = 0
+        self.num_resets = 0
+
+    def step(self, action):
+        time.sleep(self.render_time)
+        self.frame_id += 1
+        return np.clip(np.roll(self.background, self.frame_id, axis=1) + self.noise, 0, 1)
+
+    def reset(self):
+        self.frame_id = 0
+        self.num_resets += 1
+
+    def close(self):
+        pass
+
+
+def encode_before(frame):
+    """
+    Previous encoding of the frames of web_ui.gen
+    """
+    frame = (frame[:, :, :3] * 255).astype(np.uint8)
+    buf = BytesIO()
+    Image.fromarray(frame).save(buf, format="JPEG")
+    return binascii.a2b_base64(base64.b64encode(buf.getvalue()))
+
+
+def run_client(session, read_fps, results, i):
+    frames = 0
+    start = time.time()
+    for _ in session.frames():
+        frames += 1
+        time.sleep(1.0 / read_fps)
+    results[i] = frames / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the frame streaming of the web UI")
+    parser.add_argument("--clients", type=int, default=8, help="number of clients")
+    parser.add_argument("--duration", type=float, default=3.0, help="duration of every session in seconds")
+    parser.add_argument("--encoder", choices=["pil", "opencv"], default="opencv", help="image encoder")
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality")
+    parser.add_argument("--fps", type=float, default=30.0, help="frames per second rendered by every environment")
+    args = parser.parse_args()
+
+    env = StubEnv()
+    frames = [env.step(None) for _ in range(50)]
+    for name, encode in [
+        ("Before", encode_before),
+        ("PIL", ImageEncoder("pil", quality=args.quality).encode),
+        ("OpenCV", ImageEncoder("opencv", quality=args.quality).encode),
+    ]:
+        start = time.time()
+        sizes = [len(encode(frame)) for frame in frames]
+        print(
+            "{} encode latency: {:.2f}ms, {:.0f} bytes per frame".format(
+                name, 1000.0 * (time.time() - start) / len(frames), np.mean(sizes)
+            )
+        )
+
+    created = []
+
+    def worker_factory(key):
+        worker = StubEnv()
+        created.append(worker)
+        return worker
+
+    pool = EnvPool(worker_factory, max_workers=args.clients)
+    encoder = ImageEncoder(args.encoder, quality=args.quality)
+    for round_id in range(2):
+        sessions = []
+        for i in range(args.clients):
+            worker = pool.acquire(("turtlebot", "Rs_int"))
+            sessions.append(StreamingSession(worker, encoder, lambda: [0, 0], timeout=args.duration, max_fps=args.fps))
+        # Half of the clients read slower than the environments render
+        read_fps = [args.fps * 2 if i % 2 == 0 else args.fps / 3 for i in range(args.clients)]
+        results = [0.0] * args.clients
+        threads = [
+            threading.Thread(target=run_client, args=(session, read_fps[i], results, i))
+            for i, session in enumerate(sessions)
+        ]
+        for session, thread in zip(sessions, threads):
+            session.start()
+            thread.start()
+        for session, thread in zip(sessions, threads):
+            thread.join()
+            session.stop()
+            pool.release(("turtlebot", "Rs_int"), session.worker)
+
+        print("Round {}: {} environments created, {} reused".format(round_id, len(created), round_id * args.clients))
+        encode_times = np.concatenate([session.encode_times for session in sessions])
+        print(
+            "  encode latency: mean {:.2f}ms, p95 {:.2f}ms".format(
+                1000.0 * np.mean(encode_times), 1000.0 * np.percentile(encode_times, 95)
+            )
+        )
+        for i, session in enumerate(sessions):
+            stats = session.stats()
+            print(
+                "  client {} reading at {:.0f} fps: {:.1f} fps achieved, {:.1%} frames dropped".format(
+                    i, read_fps[i], results[i], float(stats["dropped"]) / max(stats["frames"], 1)
+                )
+            )
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
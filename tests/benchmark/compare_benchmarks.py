@@ -0,0 +1,100 @@
+"""
+Compare two result files of benchmark_cpu_suite.py, or of pytest-benchmark, and flag the cases that regressed by more
+than a threshold. The exit code is 1 if any case regressed, so that the comparison can gate a CI job.
+
+    python tests/benchmark/compare_benchmarks.py baseline.json contender.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+
+
+def load_results(filename):
+    """
+    :param filename: JSON result file
+    :return: (dict of the results, dict mapping the name of every case to its stats)
+    """
+    with open(filename) as f:
+        results = json.load(f)
+    return results, {benchmark["name"]: benchmark["stats"] for benchmark in results["benchmarks"]}
+
+
+def compare_stats(baseline, contender, threshold=0.1, stat="median"):
+    """
+    Compare the stats of the cases of two result files
+
+    :param baseline: dict mapping the name of every case to its stats, from load_results
+    :param contender: dict mapping the name of every case to its stats, from load_results
+    :param threshold: relative increase of the stat above which a case is flagged as a regression
+    :param stat: stat compared, such as min, median or mean
+    :return: list of (name, baseline value, contender value, relative change, status) sorted by name, status being
+        regression, improvement, ok, new or missing
+    """
+    rows = []
+    for name in sorted(set(baseline) | set(contender)):
+        if name not in baseline:
+            rows.append((name, None, contender[name][stat], None, "new"))
+            continue
+        if name not in contender:
+            rows.append((name, baseline[name][stat], None, None, "missing"))
+            continue
+        before, after = baseline[name][stat], contender[name][stat]
+        change = (after - before) / before if before > 0 else 0.0
+        if change > threshold:
+            status = "regression"
+        elif change < -threshold:
+            status = "improvement"
+        else:
+            status = "ok"
+        rows.append((name, before, after, change, status))
+    return rows
+
+
+def _format_ms(value):
+    return "{:.3f}".format(1000 * value) if value is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline", help="result file of the baseline")
+    parser.add_argument("contender", help="result file compared to the baseline")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown flagged as a regression")
+    parser.add_argument("--stat", default="median", choices=["min", "median", "mean"], help="stat compared")
+    args = parser.parse_args()
+
+    baseline_results, baseline = load_results(args.baseline)
+    contender_results, contender = load_results(args.contender)
+    for key in ["machine", "processor", "cpu_count", "python_version"]:
+        baseline_value = baseline_results.get("machine_info", {}).get(key)
+        contender_value = contender_results.get("machine_info", {}).get(key)
+        if baseline_value != contender_value:
+            print("Warning: {} differs: {} vs {}".format(key, baseline_value, contender_value))
+    for results, filename in [(baseline_results, args.baseline), (contender_results, args.contender)]:
+        commit_info = results.get("commit_info", {})
+        print("{}: commit {}{}".format(filename, commit_info.get("id"), " (dirty)" if commit_info.get("dirty") else ""))
+
+    rows = compare_stats(baseline, contender, threshold=args.threshold, stat=args.stat)
+    print(
+        "{:<40} {:>14} {:>14} {:>9}  {}".format(
+            "case", "baseline ms", "contender ms", "change", "status ({} {:+.0%})".format(args.stat, args.threshold)
+        )
+    )
+    for name, before, after, change, status in rows:
+        print(
+            "{:<40} {:>14} {:>14} {:>9}  {}".format(
+                name,
+                _format_ms(before),
+                _format_ms(after),
+                "{:+.1%}".format(change) if change is not None else "-",
+                status.upper() if status == "regression" else status,
+            )
+        )
+
+    regressions = [row[0] for row in rows if row[4] == "regression"]
+    if regressions:
+        print("{} regression(s): {}".format(len(regressions), ", ".join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import json
+import os
+
+import igibson
+from igibson.utils import assets_utils
+from igibson.utils.assets_utils import AssetMetadataRegistry
+
+
+def make_dataset(dataset_path, avg_specs):
+    os.makedirs(os.path.join(dataset_path, "metadata"))
+    with open(os.path.join(dataset_path, "metadata", "avg_category_specs.json"), "w") as f:
+        json.dump(avg_specs, f)
+    with open(os.path.join(dataset_path, "metadata", "categories.txt"), "w") as f:
+        f.write("apple\nbowl\n")
+    for category, model, has_parts in [("apple", "00_0", True), ("apple", "00_1", False), ("bowl", "b_0", None)]:
+        os.makedirs(os.path.join(dataset_path, "objects", category, model, "misc"))
+        if has_parts is not None:
+            metadata = {"object_parts": []} if has_parts else {}
+            with open(os.path.join(dataset_path, "objects", category, model, "misc", "metadata.json"), "w") as f:
+                json.dump(metadata, f)
+
+
+def test_asset_registry_cache(tmp_path):
+    dataset_path = str(tmp_path / "dataset")
+    cache_path = str(tmp_path / "cache")
+    make_dataset(dataset_path, {"apple": {"size": [0.1, 0.1, 0.1], "density": 500.0}})
+
+    registry = AssetMetadataRegistry(dataset_path=dataset_path, cache_path=cache_path)
+    registry.assets_hash = "abc"
+    assert registry.get_category_ids() == {"apple": 0, "bowl": 1}
+    avg_specs = registry.get_avg_category_specs()
+    assert avg_specs["apple"]["density"] == 500.0
+
+    # Memoized: changes on disk are not seen by the same registry
+    with open(os.path.join(dataset_path, "metadata", "avg_category_specs.json"), "w") as f:
+        json.dump({}, f)
+    assert registry.get_avg_category_specs() is avg_specs
+
+    object_index = registry.get_object_index()
+    assert object_index["categories"]["apple"]["models"] == {"00_0": True, "00_1": False}
+    assert object_index["categories"]["bowl"]["models"] == {"b_0": None}
+    assert os.path.isfile(registry.get_object_index_file())
+
+    # A new registry of the same dataset version reads the persisted index instead of walking the tree
+    registry = AssetMetadataRegistry(dataset_path=dataset_path, cache_path=cache_path)
+    registry.assets_hash = "abc"
+    registry.build_object_index = None
+    assert registry.get_object_index() == object_index
+    del registry.build_object_index
+
+    # Models added to the dataset after the index was built are found by rebuilding the index once
+    os.makedirs(os.path.join(dataset_path, "objects", "bowl", "b_1"))
+    assert registry.has_model("bowl", "b_1")
+    assert not registry.has_model("bowl", "b_2")
+
+    # Another dataset version does not use the persisted index
+    registry = AssetMetadataRegistry(dataset_path=dataset_path, cache_path=cache_path)
+    registry.assets_hash = "def"
+    assert not os.path.isfile(registry.get_object_index_file())
+
+
+def test_asset_registry_invalidation(tmp_path, monkeypatch):
+    dataset_paths = [str(tmp_path / "dataset_0"), str(tmp_path / "dataset_1")]
+    make_dataset(dataset_paths[0], {"apple": {"size": [0.1, 0.1, 0.1], "density": 500.0}})
+    make_dataset(dataset_paths[1], {"apple": {"size": [0.2, 0.2, 0.2], "density": 800.0}})
+    monkeypatch.setattr(assets_utils, "_asset_metadata_registry", None)
+
+    monkeypatch.setattr(igibson, "ig_dataset_path", dataset_paths[0])
+    registry = assets_utils.get_asset_metadata_registry()
+    assert assets_utils.get_asset_metadata_registry() is registry
+    avg_specs = assets_utils.get_ig_avg_category_specs()
+    assert avg_specs["apple"]["density"] == 500.0
+
+    # Modifying the returned specs does not leak into later callers
+    avg_specs["apple"]["density"] = 0.0
+    del avg_specs["apple"]["size"]
+    assert assets_utils.get_ig_avg_category_specs() == {"apple": {"size": [0.1, 0.1, 0.1], "density": 500.0}}
+
+    # Changing the dataset path invalidates the registry
+    monkeypatch.setattr(igibson, "ig_dataset_path", dataset_paths[1])
+    assert assets_utils.get_asset_metadata_registry() is not registry
+    assert assets_utils.get_ig_avg_category_specs()["apple"]["density"] == 800.0
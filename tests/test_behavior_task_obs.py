@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pybullet as p
+
+from igibson.objects.articulated_object import URDFObject
+from igibson.robots.manipulation_robot import ManipulationRobot
+from igibson.tasks.behavior_task import BehaviorTask
+
+
+class FakeRobot(object):
+    """
+    Robot with the assisted grasping logic of ManipulationRobot
+    """
+
+    is_grasping = ManipulationRobot.is_grasping
+    is_grasping_all_arms = ManipulationRobot.is_grasping_all_arms
+
+    def __init__(self, body_id):
+        self.body_id = body_id
+        self.arm_names = ["left_hand", "right_hand"]
+        self.default_arm = "left_hand"
+        self.grasping_mode = "assisted"
+        self._ag_obj_in_hand = {arm: None for arm in self.arm_names}
+        self._ag_release_counter = {arm: None for arm in self.arm_names}
+
+    def get_position(self):
+        return np.array(p.getBasePositionAndOrientation(self.body_id)[0])
+
+    def get_rpy(self):
+        return np.array(p.getEulerFromQuaternion(p.getBasePositionAndOrientation(self.body_id)[1]))
+
+
+def make_urdf_object(body_ids, main_body):
+    obj = URDFObject.__new__(URDFObject)
+    obj._body_ids = body_ids
+    obj.main_body = main_body
+    return obj
+
+
+def get_task_obs_before(task, env):
+    # Previous BehaviorTask.get_task_obs
+    state = {}
+    task_obs = np.zeros((task.task_obs_dim))
+    state["robot_pos"] = np.array(env.robots[0].get_position())
+    state["robot_orn"] = np.array(env.robots[0].get_rpy())
+    i = 0
+    for _, v in task.object_scope.items():
+        if isinstance(v, URDFObject):
+            state["obj_{}_valid".format(i)] = 1.0
+            state["obj_{}_pos".format(i)] = np.array(v.get_position())
+            state["obj_{}_orn".format(i)] = np.array(p.getEulerFromQuaternion(v.get_orientation()))
+            grasping_objects = env.robots[0].is_grasping_all_arms(candidate_obj=v.get_body_ids())
+            for grasp_idx, grasping in enumerate(grasping_objects):
+                state["obj_{}_pos_in_gripper_{}".format(i, grasp_idx)] = float(grasping)
+            i += 1
+    state_list = []
+    for v in state.values():
+        state_list.extend(list(v) if isinstance(v, np.ndarray) else [v])
+    task_obs[: len(state_list)] = state_list
+    return task_obs, list(state)
+
+
+def test_behavior_task_obs():
+    p.connect(p.DIRECT)
+    try:
+        rng = np.random.RandomState(0)
+        shape = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.1, 0.1, 0.1])
+        body_ids = [p.createMultiBody(baseMass=1, baseCollisionShapeIndex=shape) for _ in range(30)]
+        robot = FakeRobot(body_ids[0])
+        object_scope = {"agent.n.01_1": robot, "floor.n.01_1": None}
+        for i in range(12):
+            # Objects of two bodies, whose pose is the pose of their main body
+            object_scope["obj.n.01_{}".format(i)] = make_urdf_object(body_ids[1 + 2 * i : 3 + 2 * i], i % 2)
+
+        task = BehaviorTask.__new__(BehaviorTask)
+        task.object_scope = object_scope
+        task.task_obs_dim = 20 * 9 + 6
+        task.task_obs_layout = None
+        env = SimpleNamespace(robots=[robot])
+
+        for step in range(20):
+            for body_id in body_ids:
+                quat = rng.normal(size=4)
+                p.resetBasePositionAndOrientation(body_id, rng.uniform(-5, 5, size=3), quat / np.linalg.norm(quat))
+            # Grasping nothing, a body id (which never matches the list of body ids of a candidate), the body ids of
+            # an object, or being released
+            robot._ag_obj_in_hand["right_hand"] = [None, body_ids[3], object_scope["obj.n.01_1"].get_body_ids()][
+                step % 3
+            ]
+            robot._ag_release_counter["right_hand"] = [None, None, None, 5][step % 4]
+
+            task_obs_before, fields_before = get_task_obs_before(task, env)
+            task_obs = task.get_task_obs(env)
+            assert task_obs.shape == task_obs_before.shape
+            assert np.array_equal(task_obs, task_obs_before)
+            task_obs[:] = np.nan
+
+        assert list(task.task_obs_layout.index) == fields_before
+        assert task.task_obs_layout.size == 12 * 9 + 6
+        obj_3_pos = task.get_task_obs(env)[task.task_obs_layout.index["obj_3_pos"]]
+        assert np.array_equal(obj_3_pos, p.getBasePositionAndOrientation(body_ids[8])[0])
+    finally:
+        p.disconnect()
@@ -0,0 +1,70 @@
+import numpy as np
+import pybullet as p
+
+from igibson.utils.collision_utils import detect_collisions
+
+
+def create_scene(rng, num_bodies):
+    box = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.2, 0.2, 0.2])
+    sphere = p.createCollisionShape(p.GEOM_SPHERE, radius=0.15)
+    door = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.05, 0.3, 0.3], collisionFramePosition=[0, 0.3, 0])
+    body_ids = []
+    for i in range(num_bodies):
+        position = rng.uniform([-5, -5, 0], [5, 5, 1])
+        if i % 3 == 2:
+            # Fixed cabinet with a door
+            body_id = p.createMultiBody(
+                0,
+                box,
+                basePosition=position,
+                linkMasses=[1],
+                linkCollisionShapeIndices=[door],
+                linkVisualShapeIndices=[-1],
+                linkPositions=[[0.25, -0.2, 0]],
+                linkOrientations=[[0, 0, 0, 1]],
+                linkInertialFramePositions=[[0, 0, 0]],
+                linkInertialFrameOrientations=[[0, 0, 0, 1]],
+                linkParentIndices=[0],
+                linkJointTypes=[p.JOINT_REVOLUTE],
+                linkJointAxis=[[0, 0, 1]],
+            )
+            p.resetJointState(body_id, 0, rng.uniform(0, np.pi / 2))
+        else:
+            body_id = p.createMultiBody(1 if i % 3 else 0, sphere if i % 2 else box, basePosition=position)
+        body_ids.append(body_id)
+    return body_ids
+
+
+def detect_collisions_brute_force(body_id, distance, exclude_body_ids, find_all):
+    collisions = []
+    for other_id in range(p.getNumBodies()):
+        if other_id == body_id or other_id in exclude_body_ids:
+            continue
+        if len(p.getClosestPoints(body_id, other_id, distance=distance)) > 0:
+            collisions.append((body_id, other_id))
+            if not find_all:
+                break
+    return collisions
+
+
+def test_detect_collisions():
+    client = p.connect(p.DIRECT)
+    try:
+        rng = np.random.RandomState(0)
+        body_ids = create_scene(rng, 150)
+        robot = p.createMultiBody(1, p.createCollisionShape(p.GEOM_CAPSULE, radius=0.25, height=0.8))
+        held = body_ids[0]
+        num_collisions = 0
+        for _ in range(200):
+            position = rng.uniform([-5, -5, 0], [5, 5, 1])
+            p.resetBasePositionAndOrientation(robot, position, p.getQuaternionFromEuler([0, 0, rng.uniform(-3, 3)]))
+            # Move the doors without stepping, as _test_pose does
+            p.resetJointState(body_ids[2], 0, rng.uniform(0, np.pi / 2))
+            for find_all in [False, True]:
+                expected = detect_collisions_brute_force(robot, 0.01, [held], find_all)
+                assert detect_collisions(robot, 0.01, exclude_body_ids=[held], find_all=find_all) == expected
+            num_collisions += len(expected) > 0
+        # Both verdicts are covered
+        assert 0 < num_collisions < 200
+    finally:
+        p.disconnect(client)
@@ -0,0 +1,184 @@
+import json
+import os
+import signal
+import threading
+import time
+
+import h5py
+
+from igibson.utils.demo_replay_farm import DemoReplayFarm, get_replay_jobs
+
+
+class FakeEnv(object):
+    def __init__(self, demo_file):
+        self.demo_file = demo_file
+
+    def close(self):
+        pass
+
+
+def fake_create_env(in_demo_file, **kwargs):
+    return FakeEnv(in_demo_file)
+
+
+def fake_replay(in_demo_file, env=None, **kwargs):
+    """
+    Fake replay function that records its calls and fails, crashes or hangs once for the demos marked so
+    """
+    demo_dir = os.path.dirname(in_demo_file)
+    with open(os.path.join(demo_dir, "calls.txt"), "a") as f:
+        f.write("{} {}\n".format(os.path.basename(in_demo_file), os.path.basename(env.demo_file)))
+    marker_file = in_demo_file + ".once"
+    if os.path.isfile(marker_file):
+        with open(marker_file) as f:
+            behavior = f.read()
+        os.remove(marker_file)
+        if behavior == "error":
+            raise ValueError("Replay failed")
+        elif behavior == "crash":
+            os._exit(1)
+        elif behavior == "hang":
+            # The attempt is killed for its timeout, but still reports a success while exiting
+            def finish_on_terminate(signum, frame):
+                threading.Timer(2.0, os._exit, [0]).start()
+                raise InterruptedError()
+
+            signal.signal(signal.SIGTERM, finish_on_terminate)
+            try:
+                time.sleep(60)
+            except InterruptedError:
+                pass
+    return {"total_frame_num": 10}
+
+
+def fake_callbacks(demo_name, out_dir):
+    def save_features():
+        with open(os.path.join(out_dir, demo_name + "_features.txt"), "w") as f:
+            f.write(demo_name)
+        return {"features": demo_name + "_features.txt"}
+
+    return [], [], [], [save_features]
+
+
+def read_calls(demo_dir):
+    with open(os.path.join(demo_dir, "calls.txt")) as f:
+        return [line.split() for line in f.read().splitlines()]
+
+
+def write_demos(demo_dir, scenes, behaviors):
+    """
+    Write demo files with the metadata of the given scenes, and mark the demos that fail, crash or hang once
+    """
+    os.makedirs(demo_dir)
+    for demo, scene in scenes.items():
+        with h5py.File(os.path.join(demo_dir, demo + ".hdf5"), "w") as f:
+            f.attrs["/metadata/scene_id"] = scene
+            f.attrs["/metadata/atus_activity"] = "cleaning_out_drawers"
+            f.attrs["/metadata/activity_definition"] = 0
+    for demo, behavior in behaviors.items():
+        with open(os.path.join(demo_dir, demo + ".hdf5.once"), "w") as f:
+            f.write(behavior)
+    return get_replay_jobs(demo_dir, [demo + ".hdf5" for demo in scenes])
+
+
+def test_demo_replay_farm(tmp_path):
+    demo_dir = str(tmp_path / "demos")
+    out_dir = str(tmp_path / "out")
+    scenes = {"a": "Rs_int", "b": "Beechwood_0_int", "c": "Rs_int", "d": "Beechwood_0_int", "e": "Wainscott_0_int"}
+    jobs = write_demos(demo_dir, scenes, {"b": "error", "d": "crash", "e": "hang"})
+    assert jobs[0]["env_key"] == jobs[2]["env_key"] != jobs[1]["env_key"]
+
+    # A single worker process, so that the retried attempts run on the restarted worker of the failed attempts
+    def run_farm():
+        farm = DemoReplayFarm(
+            out_dir,
+            get_callbacks_callback=fake_callbacks,
+            num_workers=1,
+            timeout=10.0,
+            max_trials=2,
+            replay_function=fake_replay,
+            create_env_function=fake_create_env,
+            use_processes=True,
+        )
+        return farm.run(jobs)
+
+    report = run_farm()
+
+    # Demos of the same scene are replayed in a row in the same environment, and failed demos are retried right away
+    calls = read_calls(demo_dir)
+    assert [call[0] for call in calls] == [
+        "a.hdf5",
+        "c.hdf5",
+        "b.hdf5",
+        "b.hdf5",
+        "d.hdf5",
+        "d.hdf5",
+        "e.hdf5",
+        "e.hdf5",
+    ]
+    assert calls[1][1] == "a.hdf5"
+    assert calls[3][1] == "b.hdf5"
+    assert list(report["demos"]) == ["a.hdf5", "b.hdf5", "c.hdf5", "d.hdf5", "e.hdf5"]
+    assert [record["attempts"] for record in report["demos"].values()] == [1, 2, 1, 2, 2]
+    assert report["summary"]["status"] == {"success": 5}
+    assert report["summary"]["failed"] == []
+
+    with open(os.path.join(out_dir, "replay_manifest.json")) as f:
+        manifest = json.load(f)
+    assert sorted(manifest["c.hdf5"]["outputs"]) == ["c_features.txt", "c_replay_log.json"]
+    # The late success of the killed attempt is not taken as the result of the retried attempt
+    assert manifest["e.hdf5"]["times"][0] > 10.0
+    assert manifest["e.hdf5"]["times"][1] < 10.0
+    with open(os.path.join(out_dir, "c_replay_log.json")) as f:
+        assert json.load(f)["features"] == "c_features.txt"
+
+    # Resuming replays nothing, unless the outputs of a demo were modified
+    report = run_farm()
+    assert len(read_calls(demo_dir)) == 8
+    assert report["summary"]["status"] == {"success": 5}
+    with open(os.path.join(out_dir, "c_features.txt"), "w") as f:
+        f.write("modified")
+    run_farm()
+    calls = read_calls(demo_dir)
+    assert [call[0] for call in calls[8:]] == ["c.hdf5"]
+
+
+def test_demo_replay_farm_in_process(tmp_path):
+    demo_dir = str(tmp_path / "demos")
+    out_dir = str(tmp_path / "out")
+    scenes = {"a": "Rs_int", "b": "Rs_int", "c": "Rs_int", "d": "Rs_int"}
+    jobs = write_demos(demo_dir, scenes, {"b": "error"})
+    # Replay logs of a previous run without manifest
+    os.makedirs(out_dir)
+    with open(os.path.join(out_dir, "c_replay_log.json"), "w") as f:
+        json.dump({"demo_id": "c.hdf5", "failed": True, "failure_reason": "Replay failed"}, f)
+    with open(os.path.join(out_dir, "d_replay_log.json"), "w") as f:
+        json.dump({"filename": "d.hdf5", "failed": False}, f)
+
+    # With a single worker, the callbacks are called in this process, so closures work
+    replayed = []
+
+    def run_farm(retry_failed=False):
+        farm = DemoReplayFarm(
+            out_dir,
+            get_callbacks_callback=lambda demo_name, out_dir: ([], [], [], [lambda: replayed.append(demo_name) or {}]),
+            max_trials=2,
+            retry_failed=retry_failed,
+            replay_function=fake_replay,
+            create_env_function=fake_create_env,
+        )
+        return farm.run(jobs)
+
+    report = run_farm()
+    assert replayed == ["a", "b"]
+    assert [call[0] for call in read_calls(demo_dir)] == ["a.hdf5", "b.hdf5", "b.hdf5"]
+    assert [record["status"] for record in report["demos"].values()] == ["success", "success", "error", "success"]
+    assert [record["attempts"] for record in report["demos"].values()] == [1, 2, 2, 0]
+    assert report["demos"]["c.hdf5"]["error"] == "Replay failed"
+
+    # The demos that failed in the previous run are only replayed when asked for
+    run_farm()
+    assert replayed == ["a", "b"]
+    report = run_farm(retry_failed=True)
+    assert replayed == ["a", "b", "c"]
+    assert report["summary"]["status"] == {"success": 4}
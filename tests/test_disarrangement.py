@@ -0,0 +1,382 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pybullet as p
+
+from igibson.metrics.disarrangement import (
+    LOGICAL_STATE_SLOTS,
+    KinematicDisarrangement,
+    LogicalDisarrangement,
+    LogicalStateTargets,
+)
+from igibson.object_states import (
+    AABB,
+    ContactBodies,
+    Cooked,
+    HorizontalAdjacency,
+    Inside,
+    NextTo,
+    OnFloor,
+    OnTop,
+    Open,
+    Pose,
+    Touching,
+    Under,
+    VerticalAdjacency,
+)
+from igibson.object_states.memoization import MemoizedObjectStateMixin
+from igibson.object_states.object_state_base import CachingEnabledObjectState
+
+RELATIVE_STATES = [Touching, OnTop, Inside, Under, NextTo]
+
+
+def calculate_object_disarrangement_before(obj, prev_state_cache, cur_state_cache):
+    # Previous KinematicDisarrangement.calculate_object_disarrangement
+    prev, cur = prev_state_cache[obj], cur_state_cache[obj]
+    obj_disarrangement = {"base": 0, "children": [0, 0]}
+    if prev["active"] == 0 and cur["active"] == 0:
+        obj_disarrangement["base"] = np.linalg.norm(cur["pose"]["base"][0] - prev["pose"]["base"][0])
+    elif prev["active"] == 0 and cur["active"] == 1:
+        for i in range(2):
+            obj_disarrangement["children"][i] = np.linalg.norm(cur["pose"]["children"][i][0] - prev["pose"]["base"][0])
+    elif prev["active"] == 1 and cur["active"] == 0:
+        for i in range(2):
+            obj_disarrangement["children"][i] = np.linalg.norm(cur["pose"]["base"][0] - prev["pose"]["children"][i][0])
+    else:
+        for i in range(2):
+            obj_disarrangement["children"][i] = np.linalg.norm(
+                cur["pose"]["children"][i][0] - prev["pose"]["children"][i][0]
+            )
+    return obj_disarrangement
+
+
+def kinematic_results_before(state_caches):
+    # Previous KinematicDisarrangement.step_callback and gather_results, on recorded state caches
+    delta_disarrangement = []
+    integrated_disarrangement = 0
+    prev_state_cache = state_caches[0]
+    for cur_state_cache in state_caches:
+        total_disarrangement = 0
+        for obj in prev_state_cache:
+            obj_disarrangement = calculate_object_disarrangement_before(obj, prev_state_cache, cur_state_cache)
+            total_disarrangement += obj_disarrangement["base"]
+            total_disarrangement += np.sum(obj_disarrangement["children"])
+        prev_state_cache = cur_state_cache
+        integrated_disarrangement += total_disarrangement
+        delta_disarrangement.append(total_disarrangement)
+    relative_disarrangement = 0
+    for obj in state_caches[0]:
+        disarrangement = calculate_object_disarrangement_before(obj, state_caches[0], state_caches[-1])
+        relative_disarrangement += disarrangement["base"]
+        relative_disarrangement += np.sum(disarrangement["children"])
+    return {
+        "kinematic_disarrangement": {
+            "relative": relative_disarrangement,
+            "timestep": delta_disarrangement,
+            "integrated": integrated_disarrangement,
+        }
+    }
+
+
+def make_kinematic_state_caches(num_objects, num_steps, rng):
+    multiplexed = rng.rand(num_objects) < 0.3
+    poses = rng.uniform(-2, 2, size=(num_objects, 3, 7))
+    active = np.zeros(num_objects, dtype=int)
+    state_caches = []
+    for _ in range(num_steps):
+        poses[:, :, :3] += rng.normal(scale=0.01, size=(num_objects, 3, 3)) * (rng.rand(num_objects, 1, 1) < 0.5)
+        poses[:, :, 3:] = rng.normal(size=(num_objects, 3, 4))
+        poses[:, :, 3:] /= np.linalg.norm(poses[:, :, 3:], axis=2, keepdims=True)
+        active = np.where(multiplexed & (rng.rand(num_objects) < 0.2), 1 - active, active)
+        state_cache = {}
+        for i in range(num_objects):
+            pose = {"base": (poses[i, 0, :3].copy(), poses[i, 0, 3:].copy())}
+            if multiplexed[i]:
+                pose["children"] = [(poses[i, j, :3].copy(), poses[i, j, 3:].copy()) for j in [1, 2]]
+            state_cache["obj_{}".format(i)] = {"pose": pose, "active": active[i]}
+        state_caches.append(state_cache)
+    return multiplexed, state_caches
+
+
+def test_kinematic_disarrangement():
+    rng = np.random.RandomState(0)
+    multiplexed, state_caches = make_kinematic_state_caches(50, 40, rng)
+    metric = KinematicDisarrangement()
+    metric.initialize_layout(list(state_caches[0]), multiplexed)
+    for step, state_cache in enumerate(state_caches):
+        for idx, obj in enumerate(metric.object_ids):
+            pose = state_cache[obj]["pose"]
+            rows = metric.pose_rows[idx]
+            for row, (pos, orn) in zip(rows, [pose["base"]] + pose.get("children", [])):
+                metric.cur_poses[row] = np.concatenate([pos, orn])
+            metric.cur_active[idx] = state_cache[obj]["active"]
+        if step == 0:
+            metric.initial_poses[:] = metric.prev_poses[:] = metric.cur_poses
+            metric.initial_active[:] = metric.prev_active[:] = metric.cur_active
+        metric.update_disarrangement()
+
+    # Bit for bit identical results
+    assert metric.gather_results() == kinematic_results_before(state_caches)
+    assert len(metric.delta_rotation) == len(state_caches)
+    assert metric.integrated_rotation > 0
+    int_obj_disp = metric.int_obj_disp_dict
+    assert int_obj_disp["obj_0"]["base"] == sum(metric.delta_obj_disp_dict["obj_0"]["base"])
+
+
+def diff_object_states_before(obj_1_states, obj_2_states):
+    # Previous LogicalDisarrangement.diff_object_states
+    total_states = 0
+    non_kinematic_edits = 0
+    kinematic_edits = 0
+    for state in obj_1_states:
+        total_states += 1
+        if obj_1_states[state] != obj_2_states[state]:
+            if state in [Inside, Under, OnTop, Touching, OnFloor]:
+                kinematic_edits = 1
+            elif state in [NextTo]:
+                pass
+            else:
+                non_kinematic_edits += 1
+    return total_states, kinematic_edits, non_kinematic_edits
+
+
+def logical_disarrangement_before(cache_1, cache_2):
+    # Previous LogicalDisarrangement.compute_logical_disarrangement, including the split multiplexers diffed against
+    # the parts of the first cache
+    total_edit_distance = 0
+    total_states = 0
+    for obj_id in cache_1:
+        pairs = [(cache_1[obj_id]["base_states"], cache_2[obj_id]["base_states"])]
+        if cache_1[obj_id]["type"] == "multiplexer":
+            active = (cache_1[obj_id]["active"], cache_2[obj_id]["active"])
+            if active == (0, 1):
+                pairs = [(cache_1[obj_id]["base_states"], part) for part in cache_2[obj_id]["part_states"]]
+            elif active == (1, 0):
+                pairs = [(part, cache_2[obj_id]["base_states"]) for part in cache_1[obj_id]["part_states"]]
+            elif active == (1, 1):
+                pairs = [(part, part) for part in cache_1[obj_id]["part_states"]]
+        for obj_1_states, obj_2_states in pairs:
+            obj_total_states, obj_kinematic_edits, obj_non_kinematic_edits = diff_object_states_before(
+                obj_1_states, obj_2_states
+            )
+            total_states += obj_total_states
+            total_edit_distance += obj_kinematic_edits + obj_non_kinematic_edits
+    return {"total_objects": len(cache_1), "total_edit_distance": total_edit_distance, "total_states": total_states}
+
+
+def make_logical_state_caches(num_objects, num_floors, rng):
+    """
+    Make two recorded logical state caches, in the previous per object format and as boolean arrays
+    """
+    object_ids = ["obj_{}".format(i) for i in range(num_objects)]
+    floor_ids = ["room_floor_{}".format(i) for i in range(num_floors)]
+    multiplexer = rng.rand(num_objects) < 0.3
+    state_classes = {}
+    for idx in range(num_objects):
+        state_classes[idx] = [Touching, OnTop, Inside, Under, NextTo, OnFloor] + [
+            state_class for state_class in [Cooked, Open] if rng.rand() < 0.5
+        ]
+
+    caches_before = []
+    caches = []
+    for _ in range(2):
+        cache_before = {}
+        cache = {
+            "object_ids": object_ids,
+            "floor_ids": floor_ids,
+            "multiplexer": multiplexer,
+            "active": np.where(multiplexer, rng.randint(2, size=num_objects), 0),
+            "states": {slot: {} for slot in LOGICAL_STATE_SLOTS},
+        }
+        for idx, obj_id in enumerate(object_ids):
+            slots = ["base"] if cache["active"][idx] == 0 else LOGICAL_STATE_SLOTS[1:]
+            slot_caches = {}
+            for slot in slots:
+                obj_cache = {}
+                for state_class in state_classes[idx]:
+                    columns = floor_ids if state_class == OnFloor else object_ids
+                    if state_class in [Cooked, Open]:
+                        values = rng.rand() < 0.2
+                        obj_cache[state_class] = values
+                        shape = (num_objects,)
+                    else:
+                        values = rng.rand(len(columns)) < 0.02
+                        if state_class != OnFloor:
+                            values[idx] = False
+                        obj_cache[state_class] = {
+                            column: values[i] for i, column in enumerate(columns) if column != obj_id
+                        }
+                        shape = (num_objects, len(columns))
+                    slot_states = cache["states"][slot].setdefault(
+                        state_class, {"mask": np.zeros(num_objects, dtype=bool), "values": np.zeros(shape, dtype=bool)}
+                    )
+                    slot_states["mask"][idx] = True
+                    slot_states["values"][idx] = values
+                slot_caches[slot] = obj_cache
+            if multiplexer[idx]:
+                cache_before[obj_id] = {
+                    "base_states": slot_caches.get("base"),
+                    "part_states": [slot_caches.get("part_0"), slot_caches.get("part_1")],
+                    "active": cache["active"][idx],
+                    "type": "multiplexer",
+                }
+            else:
+                cache_before[obj_id] = {"base_states": slot_caches["base"], "type": "standard"}
+        caches_before.append(cache_before)
+        caches.append(cache)
+    return caches_before, caches
+
+
+def test_logical_disarrangement():
+    rng = np.random.RandomState(0)
+    for _ in range(5):
+        caches_before, caches = make_logical_state_caches(40, 4, rng)
+        metric = LogicalDisarrangement()
+        metric.relative_logical_disarrangement = metric.compute_logical_disarrangement(*caches)
+        result = logical_disarrangement_before(*caches_before)
+        assert metric.gather_results() == {
+            "logical_disarrangement": {
+                "relative": result["total_edit_distance"],
+                "total_objects": result["total_objects"],
+                "total_states": result["total_states"],
+            }
+        }
+        assert metric.compute_logical_disarrangement(caches[0], caches[0])["total_edit_distance"] == 0
+
+
+class PybulletObject(object):
+    """
+    Object made of a single pybullet body, with the kinematic object states
+    """
+
+    def __init__(self, name, category, body_id, scene):
+        self.name = name
+        self.category = category
+        self.body_id = body_id
+        self.scene = scene
+        self.room_floor = None
+        self.states = {}
+        for state_class in [
+            Pose,
+            AABB,
+            ContactBodies,
+            VerticalAdjacency,
+            HorizontalAdjacency,
+            OnFloor,
+        ] + RELATIVE_STATES:
+            self.states[state_class] = state_class(self)
+            self.states[state_class]._initialized = True
+
+    def get_body_ids(self):
+        return [self.body_id]
+
+    def get_position(self):
+        return np.array(p.getBasePositionAndOrientation(self.body_id)[0])
+
+    def get_orientation(self):
+        return np.array(p.getBasePositionAndOrientation(self.body_id)[1])
+
+    def set_room_floor(self, room_floor):
+        self.room_floor = room_floor
+
+
+def make_pybullet_env():
+    """
+    Environment of two rooms with a table, an open box on the table, and items on the table, in a corner of the box,
+    under the table, on the floor, stacked and next to each other just below the distance of NextTo
+    """
+    scene = SimpleNamespace(
+        room_ins_name_to_ins_id={"room_0": 1, "room_1": 2},
+        objects_by_name={},
+        objects_by_category={},
+        get_room_instance_by_point=lambda xy: "room_{}".format(int(xy[0] > 2.0)),
+    )
+
+    def add_object(name, category, half_extents, position, mass):
+        if isinstance(half_extents[0], list):
+            # Compound body of several boxes given by their half extents and positions
+            shape = p.createCollisionShapeArray(
+                [p.GEOM_BOX] * len(half_extents), halfExtents=half_extents, collisionFramePositions=position[1]
+            )
+            position = position[0]
+        else:
+            shape = p.createCollisionShape(p.GEOM_BOX, halfExtents=half_extents)
+        body_id = p.createMultiBody(baseMass=mass, baseCollisionShapeIndex=shape, basePosition=position)
+        obj = PybulletObject(name, category, body_id, scene)
+        scene.objects_by_name[name] = obj
+        scene.objects_by_category.setdefault(category, []).append(obj)
+
+    add_object("floors", "floors", [2.0, 1.0, 0.05], [2.0, 0.0, -0.05], 0)
+    add_object("table", "table", [0.4, 0.4, 0.03], [1.0, 0.0, 0.7], 0)
+    box_walls = [[0.15, 0.15, 0.01], [0.01, 0.15, 0.1], [0.01, 0.15, 0.1], [0.15, 0.01, 0.1], [0.15, 0.01, 0.1]]
+    box_frames = [[0, 0, 0], [-0.14, 0, 0.1], [0.14, 0, 0.1], [0, -0.14, 0.1], [0, 0.14, 0.1]]
+    add_object("box", "box", box_walls, ([1.2, 0.15, 0.745], box_frames), 0)
+    for i, (half, position) in enumerate(
+        [
+            (0.05, [0.8, -0.2, 0.785]),
+            (0.04, [1.11, 0.07, 0.8]),
+            (0.05, [1.0, 0.1, 0.051]),
+            (0.05, [1.5, 0.0, 0.051]),
+            (0.06, [3.0, 0.5, 0.061]),
+            (0.04, [3.0, 0.5, 0.162]),
+            (0.05, [1.63, 0.0, 0.051]),
+        ]
+    ):
+        add_object("item_{}".format(i), "item", [half, half, half], position, 0.2)
+    for _ in range(30):
+        p.stepSimulation()
+    return SimpleNamespace(scene=scene)
+
+
+def test_logical_state_cache_candidates(monkeypatch):
+    p.connect(p.DIRECT)
+    try:
+        p.setGravity(0, 0, -9.8)
+        env = make_pybullet_env()
+        metric = LogicalDisarrangement()
+        num_evaluations = []
+        for exhaustive in [False, True]:
+            if exhaustive:
+                # Evaluate the relative states against every target
+                monkeypatch.setattr(
+                    LogicalStateTargets,
+                    "get_candidates",
+                    lambda self, state_class, obj: np.ones(len(self.objects), bool),
+                )
+            # Count the evaluations of the relative states, with their memos cleared
+            evaluations = [0]
+            for obj in env.scene.objects_by_name.values():
+                for state in obj.states.values():
+                    if isinstance(state, CachingEnabledObjectState):
+                        state.clear_cached_value()
+                    if isinstance(state, MemoizedObjectStateMixin):
+                        state._memo = {}
+                        state._validation_caches = {}
+            for state_class in RELATIVE_STATES:
+                get_value = state_class.get_value
+
+                def count_get_value(self, *args, _get_value=get_value, **kwargs):
+                    evaluations[0] += 1
+                    return _get_value(self, *args, **kwargs)
+
+                monkeypatch.setattr(state_class, "get_value", count_get_value)
+            if exhaustive:
+                expected_cache = metric.create_object_logical_state_cache(env)
+            else:
+                state_cache = metric.create_object_logical_state_cache(env)
+            monkeypatch.undo()
+            num_evaluations.append(evaluations[0])
+
+        # The relative states skipped by the prefilter are false, and every relative state is true for some objects
+        assert state_cache["object_ids"] == expected_cache["object_ids"]
+        states = state_cache["states"]["base"]
+        expected_states = expected_cache["states"]["base"]
+        assert states.keys() == expected_states.keys()
+        for state_class in expected_states:
+            assert np.array_equal(states[state_class]["mask"], expected_states[state_class]["mask"])
+            assert np.array_equal(states[state_class]["values"], expected_states[state_class]["values"])
+        for state_class in RELATIVE_STATES:
+            assert np.any(expected_states[state_class]["values"])
+        assert num_evaluations[0] < num_evaluations[1] / 2
+    finally:
+        p.disconnect()
@@ -0,0 +1,149 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+import trimesh
+from PIL import Image
+from scipy.spatial import ConvexHull
+
+from igibson.utils import generate_trav_map
+from igibson.utils.map_utils import Plane, compute_triangle_plane_intersections, gen_trav_map, point_to_plane_dist
+
+
+def get_xy_floors_reference(vertices, faces, dist_threshold=-0.98):
+    """
+    Face by face floor selection of the original generator
+    """
+    z_faces = []
+    faces_selected = []
+    for face in faces:
+        normal = np.cross(vertices[face[2]] - vertices[face[1]], vertices[face[1]] - vertices[face[0]])
+        dist = np.dot(normal, np.array([0, 0, 1])) / np.linalg.norm(normal)
+        if dist_threshold is None or dist < dist_threshold:
+            z_faces.append(vertices[face[0]][2])
+            faces_selected.append(face)
+    return np.array(z_faces), np.array(faces_selected)
+
+
+def gen_trav_map_reference(vertices, faces, add_clutter):
+    """
+    Original single floor generator, which intersects and draws one triangle at a time
+
+    :return: obstacle map and traversability map of the floor at z=0
+    """
+    xmin, ymin, _ = vertices.min(axis=0)
+    xmax, ymax, _ = vertices.max(axis=0)
+    max_length = np.ceil(np.max([np.abs(xmin), np.abs(ymin), np.abs(xmax), np.abs(ymax)])).astype(int)
+
+    plane = Plane(np.array([0, 0, 0.5]), np.array([0, 0, 1]))
+    dists = [point_to_plane_dist(v, plane) for v in vertices]
+    wall_map = np.ones((2 * max_length * 100, 2 * max_length * 100))
+    for i in range(len(faces)):
+        res = compute_triangle_plane_intersections(vertices, faces, i, plane, dists)
+        if len(res) == 2:
+            x1, x2 = (res[0][1][0] + max_length) * 100, (res[1][1][0] + max_length) * 100
+            y1, y2 = (res[0][1][1] + max_length) * 100, (res[1][1][1] + max_length) * 100
+            cv2.line(wall_map, (int(x1), int(y1)), (int(x2), int(y2)), color=(0, 0, 0), thickness=2)
+
+    wall_convex_hull = ConvexHull(np.array(np.where(wall_map == 0)).T)
+    wall_map_hull = np.zeros(wall_map.shape).astype(np.uint8)
+    cv2.fillPoly(
+        wall_map_hull,
+        [wall_convex_hull.points[wall_convex_hull.vertices][:, ::-1].reshape((-1, 1, 2)).astype(np.int32)],
+        255,
+    )
+
+    z_faces, faces_selected = get_xy_floors_reference(vertices, faces)
+    floor_map = np.zeros((2 * max_length * 100, 2 * max_length * 100))
+    cv2.fillPoly(
+        floor_map, ((vertices[faces_selected[np.abs(z_faces) < 0.2]][:, :, :2] + max_length) * 100).astype(np.int32), 1
+    )
+    if add_clutter:
+        z_faces_all, faces_selected_all = get_xy_floors_reference(vertices, faces, dist_threshold=None)
+        mask = (z_faces_all < 2.0) * (z_faces_all > 0.05)
+        clutter_map = np.zeros((2 * max_length * 100, 2 * max_length * 100))
+        cv2.fillPoly(
+            clutter_map, ((vertices[faces_selected_all[mask]][:, :, :2] + max_length) * 100).astype(np.int32), 1
+        )
+        floor_map = np.float32((clutter_map == 0) * (floor_map == 1))
+
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (10, 10))
+    erosion = cv2.dilate(floor_map, kernel, iterations=2)
+    erosion = cv2.erode(erosion, kernel, iterations=2)
+    erosion[cv2.erode(wall_map, kernel, iterations=1) == 0] = 0
+    erosion[wall_map_hull == 0] = 0
+    return (wall_map * 255).astype(np.uint8), (erosion * 255).astype(np.uint8)
+
+
+def make_story(wall_half_extent, height):
+    """
+    Mesh of a story: a 6m x 6m floor slab, four walls and a table
+
+    :param wall_half_extent: half extent of the square enclosed by the walls, the slab extends beyond them
+    :param height: height of the floor
+    """
+    boxes = [trimesh.creation.box([6.0, 6.0, 0.2], trimesh.transformations.translation_matrix([0, 0, -0.1]))]
+    for x, y, size_x, size_y in [
+        (wall_half_extent, 0, 0.2, 2 * wall_half_extent),
+        (-wall_half_extent, 0, 0.2, 2 * wall_half_extent),
+        (0, wall_half_extent, 2 * wall_half_extent, 0.2),
+        (0, -wall_half_extent, 2 * wall_half_extent, 0.2),
+    ]:
+        boxes.append(
+            trimesh.creation.box([size_x, size_y, 2.5], trimesh.transformations.translation_matrix([x, y, 1.25]))
+        )
+    boxes.append(trimesh.creation.box([0.8, 0.6, 0.75], trimesh.transformations.translation_matrix([0.5, 0.3, 0.375])))
+    mesh = trimesh.util.concatenate(boxes)
+    mesh.apply_translation([0, 0, height])
+    return np.array(mesh.vertices), np.array(mesh.faces)
+
+
+def read_map(filename):
+    return np.array(Image.open(filename))
+
+
+def test_gen_trav_map(tmp_path):
+    vertices, faces = make_story(2.5, 0.0)
+    for add_clutter in [False, True]:
+        output_folder = str(tmp_path / str(add_clutter))
+        os.makedirs(output_folder)
+        gen_trav_map(vertices, faces, output_folder, add_clutter=add_clutter)
+        obstacle_map, trav_map = gen_trav_map_reference(vertices, faces, add_clutter)
+        assert np.array_equal(read_map(os.path.join(output_folder, "floor_0.png")), obstacle_map)
+        assert np.array_equal(read_map(os.path.join(output_folder, "floor_trav_0.png")), trav_map)
+        assert np.any(trav_map == 255)
+
+
+def test_gen_trav_map_multiple_floors(tmp_path):
+    # The upper story has a smaller footprint, so its slab sticks out beyond its walls more than the lower one's
+    stories = [make_story(2.5, 0.0), make_story(1.5, 3.0)]
+    vertices = np.concatenate([vertices for vertices, _ in stories])
+    faces = np.concatenate([stories[0][1], stories[1][1] + len(stories[0][0])])
+    gen_trav_map(vertices, faces, str(tmp_path), add_clutter=True, floors=[0.0, 3.0])
+
+    # Each floor matches the map of its story alone
+    for i_floor, (story_vertices, story_faces) in enumerate(stories):
+        story_vertices = story_vertices - [0, 0, 3.0 * i_floor]
+        obstacle_map, trav_map = gen_trav_map_reference(story_vertices, story_faces, True)
+        assert np.array_equal(read_map(os.path.join(str(tmp_path), "floor_{}.png".format(i_floor))), obstacle_map)
+        assert np.array_equal(read_map(os.path.join(str(tmp_path), "floor_trav_{}.png".format(i_floor))), trav_map)
+
+
+def test_generate_trav_map_main(monkeypatch, capsys):
+    def fake_generate_trav_map(scene_name, scene_source, floors, force):
+        if scene_name == "Broken_int":
+            raise IOError("missing urdf")
+        return {"no_obj": False, "full": True}
+
+    monkeypatch.setattr(generate_trav_map, "generate_trav_map", fake_generate_trav_map)
+    monkeypatch.setattr(sys, "argv", ["generate_trav_map", "Rs_int", "Broken_int", "Ihlen_0_int", "Rs_int"])
+    with pytest.raises(SystemExit):
+        generate_trav_map.main()
+    # Results are reported once per scene, in the order of the arguments, whether the scene failed or not
+    assert capsys.readouterr().out.splitlines() == [
+        "Rs_int: no_obj up to date, full generated",
+        "Broken_int: failed (OSError('missing urdf'))",
+        "Ihlen_0_int: no_obj up to date, full generated",
+    ]
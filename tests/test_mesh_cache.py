@@ -0,0 +1,258 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from igibson.render.mesh_renderer import mesh_cache as mesh_cache_module
+from igibson.render.mesh_renderer.mesh_cache import MeshCache, parse_obj_file, resize_texture
+from igibson.render.mesh_renderer.mesh_renderer_cpu import MeshRenderer
+from igibson.render.mesh_renderer.mesh_renderer_settings import MeshRendererSettings
+
+OBJ_CONTENT = """mtllib model.mtl
+v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+v 0 0 1
+vt 0 0
+vt 1 0
+vt 1 1
+vt 0 1
+vn 0 0 1
+vn 0 1 0
+o textured
+usemtl wood
+f 1/1/1 2/2/1 3/3/1
+f 1/1/1 3/3/1 4/4/1
+o plain
+usemtl paint
+f 1/1/2 2/2/2 5/3/2
+o no_material
+usemtl missing
+f 2/2/1 3/3/1 5/4/1
+"""
+
+MTL_CONTENT = """newmtl wood
+Kd 0.8 0.6 0.4
+map_Kd wood.png
+newmtl paint
+Kd 0.1 0.2 0.3
+"""
+
+TEXTURE_PIXELS = (np.arange(12 * 16 * 3).reshape((12, 16, 3)) * 37 % 256).astype(np.uint8)
+# TEXTURE_PIXELS downscaled by 0.25 by stbir_resize_uint8 of stb_image_resize 0.96, flipped vertically before and after
+# resizing as stb_image flips the images on load
+DOWNSCALED_TEXTURE_PIXELS = [
+    [[131, 119, 107], [126, 125, 130], [128, 136, 122], [111, 122, 146]],
+    [[142, 131, 140], [132, 125, 118], [125, 127, 129], [114, 123, 124]],
+    [[129, 134, 128], [126, 123, 131], [130, 139, 121], [127, 117, 124]],
+]
+
+
+class FakeRendererContext(object):
+    """
+    Renderer context that records the vertex buffers and textures it is given instead of uploading them
+    """
+
+    def __init__(self):
+        self.vertex_buffers = []
+        self.textures = []
+
+    def load_object_meshrenderer(self, shader_program, vertex_data):
+        self.vertex_buffers.append(np.array(vertex_data))
+        return [len(self.vertex_buffers), len(self.vertex_buffers)]
+
+    def loadTexture(self, filename, texture_scale, key_path):
+        self.textures.append((filename, texture_scale))
+        return len(self.textures)
+
+
+def make_renderer(mesh_cache, texture_cache=False):
+    """
+    Create a MeshRenderer without any GL context
+    """
+    renderer = MeshRenderer.__new__(MeshRenderer)
+    renderer.rendering_settings = MeshRendererSettings(
+        texture_scale=0.5, mesh_cache=mesh_cache is not None, texture_cache=texture_cache
+    )
+    renderer.r = FakeRendererContext()
+    renderer.mesh_cache = mesh_cache
+    renderer.optimized = False
+    renderer.shaderProgram = None
+    renderer.texture_files = {}
+    renderer.textures = []
+    renderer.material_idx_to_material_instance_mapping = {}
+    renderer.shape_material_idx = []
+    renderer.VAOs = []
+    renderer.VBOs = []
+    renderer.faces = []
+    renderer.objects = []
+    renderer.vertex_data = []
+    renderer.shapes = []
+    renderer.visual_objects = []
+    return renderer
+
+
+def write_model(folder):
+    os.makedirs(folder)
+    with open(os.path.join(folder, "model.obj"), "w") as f:
+        f.write(OBJ_CONTENT)
+    with open(os.path.join(folder, "model.mtl"), "w") as f:
+        f.write(MTL_CONTENT)
+    Image.fromarray(np.arange(48, dtype=np.uint8).reshape((4, 4, 3))).save(os.path.join(folder, "wood.png"))
+    return os.path.join(folder, "model.obj")
+
+
+def load_objects(renderer, obj_path):
+    for scale, transform_orn, transform_pos in [
+        (np.array([1, 1, 1]), None, None),
+        (np.array([2.0, -1.0, 0.5]), None, None),
+        (np.array([1, 1, 1]), [0, 0, np.sin(0.3), np.cos(0.3)], [1.0, -2.0, 0.5]),
+        (np.array([1, 1, 1]), None, None),
+    ]:
+        renderer.load_object(
+            obj_path, scale=scale, transform_orn=transform_orn, transform_pos=transform_pos, texture_scale=0.5
+        )
+
+
+def get_buffers(renderer):
+    materials = [
+        (material.material_type, material.texture_id, list(material.kd))
+        for _, material in sorted(renderer.material_idx_to_material_instance_mapping.items())
+    ]
+    return {
+        "vertex_buffers": renderer.r.vertex_buffers,
+        "vertex_data": renderer.vertex_data,
+        "faces": renderer.faces,
+        "shape_indices": [shape.indices for shape in renderer.shapes],
+        "shape_material_idx": renderer.shape_material_idx,
+        "textures": renderer.r.textures,
+        "materials": materials,
+    }
+
+
+def assert_buffers_equal(buffers, expected_buffers):
+    assert buffers.keys() == expected_buffers.keys()
+    for key in expected_buffers:
+        assert len(buffers[key]) == len(expected_buffers[key])
+        for value, expected_value in zip(buffers[key], expected_buffers[key]):
+            if isinstance(expected_value, np.ndarray):
+                assert value.dtype == expected_value.dtype
+                assert np.array_equal(value, expected_value)
+            else:
+                assert value == expected_value
+
+
+def test_mesh_cache_buffers(tmp_path, monkeypatch):
+    obj_path = write_model(str(tmp_path / "model"))
+    cache_dir = str(tmp_path / "cache")
+
+    renderer = make_renderer(None)
+    load_objects(renderer, obj_path)
+    expected_buffers = get_buffers(renderer)
+    assert len(expected_buffers["vertex_buffers"]) == 12
+    # Textures are loaded from the original files and downscaled by the renderer context
+    assert expected_buffers["textures"] == [(os.path.join(str(tmp_path / "model"), "wood.png"), 0.25)]
+
+    def load_with_cache(mesh_cache):
+        renderer = make_renderer(mesh_cache)
+        load_objects(renderer, obj_path)
+        assert_buffers_equal(get_buffers(renderer), expected_buffers)
+
+    # Cold cache, then disk cache of a previous process, then in-process cache
+    load_with_cache(MeshCache(cache_dir=cache_dir))
+    mesh_cache = MeshCache(cache_dir=cache_dir)
+    load_with_cache(mesh_cache)
+    assert mesh_cache.stats == {"memory_hits": 1, "disk_hits": 1, "parsed": 0, "textures_cached": 0}
+    # Cache hits do not access the file system
+    monkeypatch.setattr(mesh_cache_module.os, "listdir", None)
+    load_with_cache(mesh_cache)
+    monkeypatch.undo()
+    assert mesh_cache.stats == {"memory_hits": 5, "disk_hits": 1, "parsed": 0, "textures_cached": 0}
+
+    # The disk cache is keyed by the content of the obj and mtl files, which is hashed again once the cache is cleared
+    with open(os.path.join(str(tmp_path / "model"), "model.mtl"), "a") as f:
+        f.write("# Edited\n")
+    mesh_cache.clear()
+    load_with_cache(mesh_cache)
+    assert mesh_cache.stats == {"memory_hits": 6, "disk_hits": 1, "parsed": 1, "textures_cached": 0}
+
+
+def test_resize_texture():
+    # Checker of 2x1 pixel cells downscaled and upscaled by stbir_resize_uint8 of stb_image_resize 0.96
+    y, x = np.mgrid[:5, :7]
+    pixels = np.repeat((((x // 2 + y) % 2) * 255).astype(np.uint8)[:, :, None], 3, axis=2)
+    for width, height, expected in [
+        (4, 3, [[97, 148, 114, 131], [128, 127, 128, 127], [97, 148, 114, 131]]),
+        (
+            9,
+            6,
+            [
+                [0, 0, 109, 255, 255, 39, 0, 72, 255],
+                [221, 235, 140, 18, 34, 189, 244, 166, 26],
+                [96, 91, 123, 165, 159, 107, 88, 115, 162],
+                [96, 91, 123, 165, 159, 107, 88, 115, 162],
+                [221, 235, 140, 18, 34, 189, 244, 166, 26],
+                [0, 0, 109, 255, 255, 39, 0, 72, 255],
+            ],
+        ),
+    ]:
+        resized = resize_texture(pixels, width, height)
+        assert resized.dtype == np.uint8
+        assert np.array_equal(resized, np.repeat(np.array(expected)[:, :, None], 3, axis=2))
+    assert np.array_equal(resize_texture(TEXTURE_PIXELS[::-1], 4, 3)[::-1], DOWNSCALED_TEXTURE_PIXELS)
+
+
+def test_texture_cache(tmp_path):
+    obj_path = write_model(str(tmp_path / "model"))
+    tex_path = os.path.join(str(tmp_path / "model"), "wood.png")
+    Image.fromarray(TEXTURE_PIXELS).save(tex_path)
+    cache_dir = str(tmp_path / "cache")
+
+    def load_with_cache(mesh_cache):
+        renderer = make_renderer(mesh_cache, texture_cache=True)
+        load_objects(renderer, obj_path)
+        return renderer.r.textures
+
+    # The texture is downscaled once by the total texture scale and loaded without downscaling it again
+    mesh_cache = MeshCache(cache_dir=cache_dir)
+    textures = load_with_cache(mesh_cache)
+    assert len(textures) == 1
+    cache_file, texture_scale = textures[0]
+    assert os.path.dirname(cache_file) == os.path.join(cache_dir, "textures") and texture_scale == 1.0
+    assert np.array_equal(np.asarray(Image.open(cache_file)), DOWNSCALED_TEXTURE_PIXELS)
+    assert mesh_cache.stats["textures_cached"] == 1
+    assert load_with_cache(mesh_cache) == textures
+    mesh_cache = MeshCache(cache_dir=cache_dir)
+    assert load_with_cache(mesh_cache) == textures
+    assert mesh_cache.stats["textures_cached"] == 0
+
+    # A modified texture file is downscaled again
+    mtime = os.stat(tex_path).st_mtime_ns + 10**9
+    os.utime(tex_path, ns=(mtime, mtime))
+    new_textures = load_with_cache(mesh_cache)
+    assert new_textures != textures and new_textures[0][1] == 1.0
+    assert mesh_cache.stats["textures_cached"] == 1
+
+    # The pixels are resized upside down, as loadTexture resizes them once stb_image flipped them
+    pixels = np.random.RandomState(5).randint(0, 256, (17, 30, 3)).astype(np.uint8)
+    Image.fromarray(pixels).save(tex_path)
+    cache_file, texture_scale = mesh_cache.get_texture_file(tex_path, 0.7)
+    expected_pixels = resize_texture(pixels[::-1], 21, 11)[::-1]
+    assert not np.array_equal(expected_pixels, resize_texture(pixels, 21, 11))
+    assert np.array_equal(np.asarray(Image.open(cache_file)), expected_pixels) and texture_scale == 1.0
+
+    # Textures that stb_image may decode differently are loaded from the original file
+    Image.fromarray(np.dstack([TEXTURE_PIXELS, TEXTURE_PIXELS[:, :, 0]])).save(tex_path)
+    assert load_with_cache(MeshCache(cache_dir=cache_dir)) == [(tex_path, 0.25)]
+    Image.fromarray(TEXTURE_PIXELS).save(tex_path, transparency=(0, 0, 0))
+    assert load_with_cache(MeshCache(cache_dir=cache_dir)) == [(tex_path, 0.25)]
+    # So are all textures without disk cache
+    Image.fromarray(TEXTURE_PIXELS).save(tex_path)
+    assert load_with_cache(MeshCache(cache_dir=False)) == [(tex_path, 0.25)]
+
+
+def test_parse_obj_file_error(tmp_path):
+    with pytest.raises(IOError):
+        parse_obj_file(str(tmp_path / "missing.obj"))
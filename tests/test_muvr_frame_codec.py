@@ -0,0 +1,179 @@
+import socket
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from igibson.utils.muvr_frame_codec import (
+    HEADER_DTYPE,
+    FrameDecoder,
+    FrameEncoder,
+    get_instance_poses,
+    pack_quaternions,
+    rotation_matrices_to_quaternions,
+    set_instance_poses,
+    text_to_frame,
+    unpack_quaternions,
+)
+from igibson.utils.transform_utils import mat2quat, quat2mat
+
+
+def random_quaternions(rng, n):
+    quats = rng.normal(size=(n, 4))
+    return quats / np.linalg.norm(quats, axis=1, keepdims=True)
+
+
+def rotation_error(quats, expected_quats):
+    return 1.0 - np.abs(np.sum(quats * expected_quats, axis=1))
+
+
+def test_quaternion_conversions():
+    rng = np.random.RandomState(0)
+    # Random rotations, identity and half turns around each axis
+    quats = np.concatenate([random_quaternions(rng, 100), np.eye(4)])
+    rmats = np.array([quat2mat(quat) for quat in quats])
+    expected = np.array([mat2quat(rmat) for rmat in rmats])
+    assert np.max(rotation_error(rotation_matrices_to_quaternions(rmats), expected)) < 1e-6
+
+    unpacked = unpack_quaternions(pack_quaternions(quats))
+    # Smallest-three with 10 bits per component: error below 0.2 degrees
+    assert np.max(np.arccos(np.clip(1.0 - rotation_error(unpacked, quats), -1, 1)) * 2) < np.radians(0.2)
+
+
+def test_instance_poses():
+    rng = np.random.RandomState(0)
+    instances = []
+    for num_parts in [1, 3, 0, 2]:
+        quats = random_quaternions(rng, num_parts)
+        trans = np.tile(np.eye(4), (num_parts, 1, 1))
+        trans[:, 3, :3] = rng.uniform(-5, 5, size=(num_parts, 3))
+        rots = np.tile(np.eye(4), (num_parts, 1, 1))
+        rots[:, :3, :3] = np.reshape([quat2mat(quat) for quat in quats], (-1, 3, 3))
+        instances.append(SimpleNamespace(poses_trans=trans, poses_rot=rots))
+    positions, quats, num_parts = get_instance_poses(instances)
+    assert positions.shape == (6, 3) and list(num_parts) == [1, 3, 0, 2]
+
+    copies = [
+        SimpleNamespace(poses_trans=np.zeros_like(i.poses_trans), poses_rot=np.zeros_like(i.poses_rot))
+        for i in instances
+    ]
+    set_instance_poses(copies, positions, quats)
+    for instance, copy in zip(instances, copies):
+        assert np.allclose(instance.poses_trans, copy.poses_trans)
+        assert np.allclose(instance.poses_rot, copy.poses_rot, atol=1e-6)
+
+
+def test_round_trip():
+    rng = np.random.RandomState(0)
+    num_records = 500
+    positions = rng.uniform(-10, 10, size=(num_records, 3))
+    quats = random_quaternions(rng, num_records)
+    for quantize in [False, True]:
+        encoder = FrameEncoder(quantize=quantize, keyframe_interval=20)
+        decoder = FrameDecoder()
+        sizes = []
+        for frame in range(60):
+            moving = rng.rand(num_records) < 0.05
+            positions[moving] += rng.normal(scale=0.05, size=(moving.sum(), 3))
+            quats[moving] = random_quaternions(rng, moving.sum())
+            data = encoder.encode(positions, quats, num_instances=100)
+            header = np.frombuffer(data, dtype=HEADER_DTYPE, count=1)[0]
+            sizes.append(len(data))
+            # Frames 10 to 14 are lost, and only every other frame is acknowledged
+            if 10 <= frame < 15:
+                continue
+            decoded = decoder.decode(data)
+            assert decoded is not None
+            frame_id, decoded_positions, decoded_quats, num_instances = decoded
+            assert frame_id == header["frame_id"] == frame and num_instances == 100
+            if frame % 20 == 0:
+                assert header["num_changed"] == num_records
+            elif frame > 1:
+                assert header["num_changed"] < num_records
+            if frame % 2 == 0:
+                encoder.ack(frame_id)
+            position_tolerance = 1e-4 + (1e-4 if quantize else 1e-5)
+            assert np.max(np.abs(decoded_positions - positions)) < position_tolerance
+            assert np.max(rotation_error(decoded_quats, quats)) < (1e-5 if quantize else 1e-6) + 1e-6
+        # Deltas are much smaller than keyframes
+        assert np.mean(sizes[21:40]) < sizes[20] / 5
+
+
+def test_missing_base():
+    rng = np.random.RandomState(0)
+    positions = rng.uniform(-10, 10, size=(10, 3))
+    quats = random_quaternions(rng, 10)
+    encoder = FrameEncoder(keyframe_interval=5)
+    decoder = FrameDecoder()
+    encoder.ack(int(decoder.decode(encoder.encode(positions, quats, 10))[0]))
+    # The client reconnects and lost the keyframe: deltas are dropped until the next keyframe
+    decoder = FrameDecoder()
+    decoded = [decoder.decode(encoder.encode(positions + frame, quats, 10)) for frame in range(1, 6)]
+    assert all(d is None for d in decoded[:-1])
+    assert np.allclose(decoded[-1][1], positions + 5, atol=1e-4)
+
+
+def test_frame_data_channel():
+    pytest.importorskip("PodSixNet")
+    from PodSixNet.asyncwrapper import poll
+    from PodSixNet.Channel import Channel
+    from PodSixNet.EndPoint import EndPoint
+
+    from igibson.utils.muvr_utils import IGVRChannel, IGVRClient
+
+    rng = np.random.RandomState(0)
+    instances = []
+    for _ in range(200):
+        quats = random_quaternions(rng, 2)
+        trans = np.tile(np.eye(4), (2, 1, 1))
+        trans[:, 3, :3] = rng.uniform(-5, 5, size=(2, 3))
+        rots = np.tile(np.eye(4), (2, 1, 1))
+        rots[:, :3, :3] = np.reshape([quat2mat(quat) for quat in quats], (-1, 3, 3))
+        instances.append(SimpleNamespace(poses_trans=trans, poses_rot=rots))
+    positions, quats, _ = get_instance_poses(instances)
+    frames = [FrameEncoder(quantize=quantize).encode(positions, quats, len(instances)) for quantize in [False, True]]
+    # Binary frames hold bytes that are not UTF-8 and the terminator of the channel
+    frames.append(frames[0] + b"\0---\0" + bytes(range(256)))
+
+    # Frames go from the channel of the server to the connection of the client through a socket, with the
+    # serialization and framing of PodSixNet
+    socket_map = {}
+    server_socket, client_socket = socket.socketpair()
+    channel = IGVRChannel(server_socket, map=socket_map)
+    endpoint = EndPoint(map=socket_map)
+    Channel.__init__(endpoint, client_socket, map=socket_map)
+    client = IGVRClient.__new__(IGVRClient)
+    client.frame_data = None
+    try:
+        for frame in frames:
+            channel.send_frame_data(frame)
+        channel.Pump()
+        for _ in range(100):
+            if len(endpoint.GetQueue()) >= len(frames):
+                break
+            poll(0.1, map=socket_map)
+        received = []
+        for data in endpoint.GetQueue():
+            assert data["action"] == "frame_data"
+            client.Network_frame_data(data)
+            received.append(client.frame_data)
+    finally:
+        server_socket.close()
+        client_socket.close()
+    assert [text_to_frame(text) for text in received] == frames
+
+    # The client decodes the received frame into the poses of its instances
+    copies = [
+        SimpleNamespace(poses_trans=np.zeros_like(i.poses_trans), poses_rot=np.zeros_like(i.poses_rot))
+        for i in instances
+    ]
+    sent = []
+    client.frame_decoder = FrameDecoder()
+    client.renderer = SimpleNamespace(get_instances=lambda: copies)
+    client.Send = sent.append
+    client.frame_data = received[0]
+    client.ingest_frame_data()
+    assert sent == [{"action": "frame_ack", "frame_id": 0}]
+    for instance, copy in zip(instances, copies):
+        assert np.allclose(instance.poses_trans, copy.poses_trans, atol=1e-5)
+        assert np.allclose(instance.poses_rot, copy.poses_rot, atol=1e-5)
@@ -0,0 +1,171 @@
+import json
+import os
+import sys
+
+from igibson.utils.data_utils.ext_object import object_pipeline
+from igibson.utils.data_utils.ext_object.object_pipeline import (
+    PIPELINES,
+    STATUS_DEPENDENCY_FAILED,
+    STATUS_FAILED,
+    STATUS_SKIPPED,
+    STATUS_SUCCESS,
+    ObjectPipelineRunner,
+    ObjectProcessingStep,
+    get_metadata_inputs,
+)
+
+# Fake step commands: each step appends to the runs log and writes its output file from its input files
+STEP_SCRIPT = """
+import sys
+step, export_dir, source, runs_log = sys.argv[1:]
+with open(runs_log, "a") as f:
+    f.write("{} {}\\n".format(export_dir, step))
+
+def read(name):
+    with open(export_dir + "/" + name) as f:
+        return f.read()
+
+def write(name, content, mode="w"):
+    with open(export_dir + "/" + name, mode) as f:
+        f.write(content)
+
+if step == "copy":
+    with open(source) as f:
+        write("a.txt", f.read())
+elif step == "left":
+    write("b.txt", read("a.txt").upper())
+elif step == "right":
+    if "fail" in read("a.txt"):
+        sys.exit(1)
+    write("c.txt", read("a.txt")[::-1])
+    # Modify the input of the left step in place
+    write("a.txt", "\\nchecked", mode="a")
+elif step == "final":
+    write("d.txt", read("b.txt") + read("c.txt"))
+"""
+
+
+def get_step_commands(step):
+    def get_commands(obj):
+        return [[sys.executable, "-c", STEP_SCRIPT, step, obj["export_dir"], obj["source"], obj["runs_log"]]]
+
+    return get_commands
+
+
+def get_files(*names):
+    return lambda obj: [os.path.join(obj["export_dir"], name) for name in names]
+
+
+TEST_PIPELINE = [
+    ObjectProcessingStep("copy", [], get_step_commands("copy"), lambda obj: [obj["source"]], get_files("a.txt")),
+    ObjectProcessingStep("left", ["copy"], get_step_commands("left"), get_files("a.txt"), get_files("b.txt")),
+    ObjectProcessingStep(
+        "right",
+        ["copy", "left"],
+        get_step_commands("right"),
+        get_files("a.txt"),
+        get_files("c.txt"),
+        modifies_inputs_of=["left"],
+    ),
+    ObjectProcessingStep(
+        "final", ["left", "right"], get_step_commands("final"), get_files("b.txt", "c.txt"), get_files("d.txt")
+    ),
+]
+
+
+def read_runs(runs_log):
+    if not os.path.isfile(runs_log):
+        return []
+    with open(runs_log) as f:
+        return [tuple(line.split()) for line in f.read().splitlines()]
+
+
+def test_import_pipeline_dependencies():
+    # The metadata step reads the collision meshes and modifies the visual meshes read by the collision step
+    metadata_step = object_pipeline.get_pipeline_step("import", "metadata")
+    assert set(metadata_step.dependencies) == {"visual_mesh", "collision_mesh"}
+    assert metadata_step.modifies_inputs_of == ["collision_mesh"]
+    obj = {"export_dir": "/objects/chair/0"}
+    assert os.path.join("/objects/chair/0", "shape", "collision") in get_metadata_inputs(obj)
+
+
+def test_object_pipeline_runner(tmp_path, monkeypatch):
+    monkeypatch.setitem(PIPELINES, "test", TEST_PIPELINE)
+    runs_log = str(tmp_path / "runs.txt")
+    manifest_file = str(tmp_path / "manifest.json")
+    objects = []
+    for object_id, content in [("0", "zero"), ("1", "one")]:
+        export_dir = str(tmp_path / "objects" / object_id)
+        os.makedirs(export_dir)
+        source = str(tmp_path / "{}.txt".format(object_id))
+        with open(source, "w") as f:
+            f.write(content)
+        objects.append({"key": "obj/" + object_id, "export_dir": export_dir, "source": source, "runs_log": runs_log})
+
+    def run(force=False):
+        runner = ObjectPipelineRunner("test", objects, manifest_file, num_workers=2, force=force)
+        runner.run()
+        with open(manifest_file) as f:
+            assert json.load(f) == runner.manifest
+        return runner
+
+    def get_statuses(runner):
+        return {
+            (key, step_name): record["status"]
+            for key, entry in runner.manifest["objects"].items()
+            for step_name, record in entry["steps"].items()
+        }
+
+    # The steps of each object run after their dependencies
+    runner = run()
+    runs = read_runs(runs_log)
+    for obj, expected_content in zip(objects, ["ZEROorez", "ONEeno"]):
+        assert [step for export_dir, step in runs if export_dir == obj["export_dir"]] == [
+            "copy",
+            "left",
+            "right",
+            "final",
+        ]
+        with open(os.path.join(obj["export_dir"], "d.txt")) as f:
+            assert f.read() == expected_content
+    assert set(get_statuses(runner).values()) == {STATUS_SUCCESS}
+    assert runner.get_report()["final"][STATUS_SUCCESS] == 2
+    assert os.path.isfile(runner.get_record("obj/0", "final")["log_file"])
+
+    # Nothing runs again when the inputs are unchanged, even the inputs modified in place by a later step
+    runner = run()
+    assert len(read_runs(runs_log)) == 8
+    assert set(get_statuses(runner).values()) == {STATUS_SKIPPED}
+
+    # Changed inputs and missing outputs run the steps again, and their descendants if their outputs changed
+    with open(objects[0]["source"], "w") as f:
+        f.write("zero!")
+    os.remove(os.path.join(objects[1]["export_dir"], "d.txt"))
+    runner = run()
+    assert sorted(read_runs(runs_log)[8:]) == sorted(
+        [(objects[0]["export_dir"], step) for step in ["copy", "left", "right", "final"]]
+        + [(objects[1]["export_dir"], "final")]
+    )
+    assert get_statuses(runner)[("obj/1", "copy")] == STATUS_SKIPPED
+    assert get_statuses(runner)[("obj/1", "final")] == STATUS_SUCCESS
+
+    # A failed step fails its descendants, and is run again in the next run
+    with open(objects[1]["source"], "w") as f:
+        f.write("fail")
+    runner = run()
+    statuses = get_statuses(runner)
+    assert [statuses[("obj/1", step.name)] for step in TEST_PIPELINE] == [
+        STATUS_SUCCESS,
+        STATUS_SUCCESS,
+        STATUS_FAILED,
+        STATUS_DEPENDENCY_FAILED,
+    ]
+    assert "return code 1" in runner.get_record("obj/1", "right")["error"]
+    assert {statuses[("obj/0", step.name)] for step in TEST_PIPELINE} == {STATUS_SKIPPED}
+    num_runs = len(read_runs(runs_log))
+    runner = run()
+    assert read_runs(runs_log)[num_runs:] == [(objects[1]["export_dir"], "right")]
+
+    # Forced runs ignore the manifest
+    runner = run(force=True)
+    assert get_statuses(runner)[("obj/0", "final")] == STATUS_SUCCESS
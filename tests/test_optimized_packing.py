@@ -0,0 +1,167 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from igibson.render.mesh_renderer.instances import InstanceGroup
+from igibson.render.mesh_renderer.optimized_packing import (
+    VERTEX_SIZE,
+    ArenaAllocator,
+    DoubleBufferedPoses,
+    OptimizedRendererPacking,
+)
+
+
+def make_packing(num_shapes=6):
+    rng = np.random.RandomState(0)
+    vertex_data = []
+    faces = []
+    materials = []
+    for i in range(num_shapes):
+        num_vertices = 4 + i
+        vertex_data.append(rng.rand(num_vertices, VERTEX_SIZE).astype(np.float32))
+        faces.append(rng.randint(0, num_vertices, size=(2 + i, 3)))
+        materials.append(
+            SimpleNamespace(
+                texture_id=i % 2 if i < 4 else -1,
+                roughness_texture_id=-1,
+                metallic_texture_id=-1,
+                normal_texture_id=1 if i == 2 else -1,
+                kd=[0.1 * i, 0.2, 0.3],
+                transform_param=[1.0, 1.0, 0.0],
+            )
+        )
+    tex_id_layer_mapping = {0: (0, 0), 1: (1, 3)}
+    return OptimizedRendererPacking(vertex_data, faces, lambda vao_id: materials[vao_id], tex_id_layer_mapping)
+
+
+def make_instance(instance_id, vao_ids, num_objects=1):
+    return InstanceGroup(
+        [SimpleNamespace(VAO_ids=list(vao_ids), renderer=None) for _ in range(num_objects)],
+        id=instance_id,
+        link_ids=list(range(num_objects)),
+        pybullet_uuid=instance_id,
+        ig_object=None,
+        class_id=instance_id + 10,
+        poses_trans=[np.eye(4) * (instance_id + 1) for _ in range(num_objects)],
+        poses_rot=[np.eye(4) for _ in range(num_objects)],
+        dynamic=True,
+        softbody=False,
+    )
+
+
+def check_draws(packing):
+    merged_vertex_data, indices = packing.get_merged_buffers()
+    merged_vertex_data = merged_vertex_data.reshape(-1, VERTEX_SIZE)
+    offsets, counts = packing.get_draw_arrays()
+    for slot in range(packing.num_slots):
+        vao_id = packing.slot_vao_ids[slot]
+        if vao_id == -1:
+            # Tombstones draw a hidden triangle of the index buffer
+            assert offsets[slot] == 0 and counts[slot] == 3 and packing.hidden_data[slot, 0] == 1.0
+            assert len(indices) >= 3
+            continue
+        drawn = merged_vertex_data[indices[offsets[slot] : offsets[slot] + counts[slot]]]
+        expected = packing.vertex_data[vao_id][packing.faces[vao_id].flatten()]
+        assert np.array_equal(drawn, expected)
+
+
+def test_arena_allocator():
+    arena = ArenaAllocator()
+    offsets = [arena.allocate(10) for _ in range(4)]
+    assert offsets == [0, 10, 20, 30]
+    arena.free(10, 10)
+    arena.free(20, 10)
+    # Adjacent free ranges are merged and reused first
+    assert arena.free_ranges == [(10, 20)]
+    assert arena.allocate(15) == 10
+    assert arena.free_ranges == [(25, 5)]
+    # Freeing the end of the buffer shrinks the used part
+    arena.free(30, 10)
+    assert arena.end == 25 and arena.free_ranges == []
+    assert arena.used == 25
+
+
+def test_slots_and_draws():
+    packing = make_packing()
+    instances = [make_instance(0, [0, 1]), make_instance(1, [2]), make_instance(2, [0, 1])]
+    packing.repack(instances)
+
+    assert [instance.or_buffer_indices for instance in instances] == [[0, 1], [2], [3, 4]]
+    # Instances of the same shapes share their vertices and indices
+    assert len(packing.shapes) == 3
+    assert packing.index_ptr_offsets[3] == packing.index_ptr_offsets[0]
+    assert np.allclose(packing.frag_data[2], [0, 0, 11.0 / 512, 1.0 / 1024])
+    assert np.allclose(packing.frag_normal_data[2], [1, 3, 0, 0])
+    assert np.allclose(packing.frag_data[4], [1, 3, 12.0 / 512, 2.0 / 1024])
+    assert np.allclose(packing.diffuse_color_data[2], [0.2, 0.2, 0.3, 1.0])
+    check_draws(packing)
+
+
+def test_incremental_add_remove():
+    packing = make_packing()
+    instances = [make_instance(0, [0, 1]), make_instance(1, [2]), make_instance(2, [3])]
+    packing.repack(instances)
+    packing.clear_pending()
+    vertex_capacity = packing.vertex_arena.capacity
+
+    packing.remove_instance(instances[1])
+    assert packing.slot_vao_ids[2] == -1 and packing.index_counts[2] == 3
+    assert packing.num_slots == 4
+    assert packing.get_fragmentation() > 0
+
+    # The tombstoned slot and the freed ranges are reused by the new instance
+    new_instance = make_instance(3, [1])
+    packing.add_instance(new_instance)
+    assert new_instance.or_buffer_indices == [2]
+    assert packing.pending_shapes == []
+    new_instance = make_instance(4, [4])
+    packing.add_instance(new_instance)
+    assert new_instance.or_buffer_indices == [4]
+    assert packing.pending_shapes == [4]
+    assert packing.vertex_arena.capacity == vertex_capacity
+    assert not packing.needs_full_upload
+    check_draws(packing)
+
+    # Removing the last instances drops their slots
+    packing.remove_instance(new_instance)
+    packing.remove_instance(instances[2])
+    assert packing.num_slots == 3
+    check_draws(packing)
+
+    packing.repack()
+    assert packing.get_fragmentation() == 0.0
+    assert packing.needs_full_upload
+    check_draws(packing)
+
+
+def test_pose_buffers():
+    packing = make_packing()
+    instances = [make_instance(0, [0, 1], num_objects=2), make_instance(1, [2])]
+    packing.repack(instances)
+    pose_buffers = DoubleBufferedPoses(packing.num_slots)
+
+    trans_data, _, last_trans_data, _ = pose_buffers.update(packing, need_flow_info=True)
+    assert np.array_equal(trans_data[:4], np.repeat(instances[0].poses_trans, 2, axis=0))
+    assert np.array_equal(trans_data[4:], instances[1].poses_trans)
+    assert np.array_equal(last_trans_data, trans_data)
+    assert pose_buffers.dirty_range == (0, 5)
+
+    # The poses of the instances are views into the pose arrays of the packing
+    previous_trans_data = np.copy(trans_data)
+    instances[0].set_position_for_part(np.eye(4) * 5, 1)
+    trans_data, _, last_trans_data, _ = pose_buffers.update(packing, need_flow_info=True)
+    assert np.array_equal(trans_data[2:4], [np.eye(4) * 5] * 2)
+    assert np.array_equal(last_trans_data, previous_trans_data)
+    assert pose_buffers.dirty_range == (2, 4)
+    assert pose_buffers.last_dirty_range == (0, 5)
+
+    # Adding instances grows the pose arrays and keeps the poses
+    for i in range(2, 10):
+        packing.add_instance(make_instance(i, [3]))
+    assert np.array_equal(instances[0].poses_trans[1], np.eye(4) * 5)
+    pose_buffers = DoubleBufferedPoses(packing.num_slots)
+    pose_buffers.update(packing)
+    trans_data, _, last_trans_data, _ = pose_buffers.update(packing)
+    assert np.array_equal(trans_data[-1], np.eye(4) * 10)
+    assert last_trans_data is trans_data
+    assert pose_buffers.dirty_range == (0, 0)
@@ -0,0 +1,191 @@
+import ctypes as ct
+import json
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from igibson.utils.data_utils.datasets import (
+    PackedScene,
+    PackedViewDataset,
+    default_loader,
+    get_item_fn,
+    pack_dataset,
+    prefetch,
+)
+
+NUM_VIEWS = 11
+
+
+def write_synthetic_scene(root, scene, rng):
+    """
+    Write a scene with the files of the Gibson panorama dataset: camera poses, pose files and small panoramas.
+    The last view is not registered, so it is left out of the packed scene.
+    """
+    for folder in ["points", "rgb", "mist", "normal"]:
+        os.makedirs(os.path.join(root, scene, "pano", folder))
+    lines = []
+    for view_i in range(NUM_VIEWS):
+        uuid = "{}{:03d}".format(scene, view_i)
+        xyz = rng.uniform(-5, 5, 3) if view_i < NUM_VIEWS - 1 else np.zeros(3)
+        lines.append(",".join([uuid] + ["{:.6f}".format(x) for x in xyz] + ["0", "0", "0", "1"]))
+        pose = np.eye(4)
+        pose[:3, :3] = cv2.Rodrigues(rng.uniform(-np.pi, np.pi, 3))[0]
+        pose[:3, 3] = xyz
+        with open(os.path.join(root, scene, "pano", "points", "point_" + uuid + ".json"), "w") as f:
+            json.dump([{}, {"camera_rt_matrix": pose.tolist()}], f)
+        for modality, dtype in [("rgb", np.uint8), ("mist", np.uint16), ("normal", np.uint8)]:
+            shape = (8, 16) if modality == "mist" else (8, 16, 3)
+            img = rng.randint(0, np.iinfo(dtype).max, shape).astype(dtype)
+            filename = "point_" + uuid + "_view_equirectangular_domain_" + modality + ".png"
+            cv2.imwrite(os.path.join(root, scene, "pano", modality, filename), img)
+    with open(os.path.join(root, scene, "camera_poses.csv"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def assert_arrays_equal(value, expected_value):
+    value, expected_value = np.asarray(value), np.asarray(expected_value)
+    assert value.dtype == expected_value.dtype
+    assert np.array_equal(value, expected_value)
+
+
+def assert_items_equal(item, expected_item):
+    assert len(item) == len(expected_item)
+    for values, expected_values in zip(item, expected_item):
+        if isinstance(expected_values, list):
+            assert len(values) == len(expected_values)
+            for value, expected_value in zip(values, expected_values):
+                assert_arrays_equal(value, expected_value)
+        else:
+            assert_arrays_equal(values, expected_values)
+
+
+def pil_loader(path):
+    return Image.open(path).convert("RGB")
+
+
+def pil_transform(image):
+    # Transforms are given PIL images, as with the loaders of PIL images of get_item_fn
+    assert isinstance(image, Image.Image) and image.mode == "RGB"
+    return np.asarray(image, dtype=np.float32) / 255.0
+
+
+class FakeRenderDll(object):
+    """
+    Point cloud renderer that reads its arguments with the types of the render library, and outputs images that
+    depend on all of them
+    """
+
+    def __init__(self):
+        self.poses = []
+
+    def render(self, h, w, img, depth, pose, render, target_depth):
+        h, w = h.value, w.value
+        img = np.ctypeslib.as_array(ct.cast(img, ct.POINTER(ct.c_uint8)), shape=(h, w, 3))
+        depth = np.ctypeslib.as_array(ct.cast(depth, ct.POINTER(ct.c_float)), shape=(h, w))
+        pose = np.ctypeslib.as_array(ct.cast(pose, ct.POINTER(ct.c_float)), shape=(4, 4)).copy()
+        render = np.ctypeslib.as_array(ct.cast(render, ct.POINTER(ct.c_uint8)), shape=(h, w, 3))
+        target_depth = np.ctypeslib.as_array(ct.cast(target_depth, ct.POINTER(ct.c_float)), shape=(h, w))
+        self.poses.append(pose)
+        render[:] = img[::-1] // 2
+        target_depth[:] = depth * pose[0, 0] + pose[2, 3]
+
+
+def get_expected_items(dataset, root, loader, transform, off_pc_render, dll):
+    return [
+        get_item_fn(
+            (0, index),
+            [dataset.get_select(index)],
+            root,
+            loader,
+            transform,
+            dataset.off_3d,
+            transform,
+            None,
+            off_pc_render,
+            dll,
+            dataset.train,
+            True,
+        )[1]
+        for index in range(len(dataset))
+    ]
+
+
+def test_packed_view_dataset(tmp_path):
+    rng = np.random.RandomState(0)
+    root = str(tmp_path / "gibson")
+    for scene in ["Aa", "Bb"]:
+        write_synthetic_scene(root, scene, rng)
+
+    for compress in [False, True]:
+        output_root = str(tmp_path / "packed_{}".format(compress))
+        num_views = pack_dataset(root, output_root, chunk_size=4, compress=compress)
+        assert num_views == {"Aa": NUM_VIEWS - 1, "Bb": NUM_VIEWS - 1}
+
+        dataset = PackedViewDataset(output_root, train=True, off_3d=False, seqlen=3)
+        assert dataset.scenes == ["Aa"]
+        assert len(dataset) == NUM_VIEWS - 1
+
+        # Items have the same content as the ones loaded from the panoramas, also when prefetched by several threads
+        # and after pickling
+        expected_items = get_expected_items(dataset, root, default_loader, None, True, None)
+        for index in range(len(dataset)):
+            assert dataset.get_select(index)[0][1] == "Aa{:03d}".format(index)
+            assert_items_equal(dataset[index], expected_items[index])
+        indices = list(rng.permutation(len(dataset))) * 3
+        for index, item in zip(indices, prefetch(dataset, indices, num_workers=4, max_prefetch=8)):
+            assert_items_equal(item, expected_items[index])
+        dataset = pickle.loads(pickle.dumps(dataset))
+        for index in range(len(dataset)):
+            assert_items_equal(dataset[index], expected_items[index])
+
+        # Packing again is skipped when the parameters did not change
+        index_file = os.path.join(output_root, "Aa", "index.json")
+        mtime = os.path.getmtime(index_file)
+        pack_dataset(root, output_root, chunk_size=4, compress=compress)
+        assert os.path.getmtime(index_file) == mtime
+
+
+def test_packed_scene_threads(tmp_path):
+    root = str(tmp_path / "gibson")
+    write_synthetic_scene(root, "Aa", np.random.RandomState(0))
+    pack_dataset(root, str(tmp_path / "packed"), chunk_size=4, compress=True)
+    packed_scene = PackedScene(str(tmp_path / "packed" / "Aa"))
+
+    # Each thread keeps the last compressed chunk it read, whatever the other threads read in between
+    with ThreadPoolExecutor(max_workers=1) as executor_a, ThreadPoolExecutor(max_workers=1) as executor_b:
+        chunk = executor_a.submit(packed_scene.get_chunk, "rgb", 0).result()
+        executor_b.submit(packed_scene.get_chunk, "rgb", 1).result()
+        assert executor_a.submit(packed_scene.get_chunk, "rgb", 0).result() is chunk
+        assert executor_b.submit(packed_scene.get_chunk, "rgb", 0).result() is not chunk
+
+
+def test_packed_view_dataset_transforms(tmp_path):
+    root = str(tmp_path / "gibson")
+    write_synthetic_scene(root, "Aa", np.random.RandomState(0))
+    pack_dataset(root, str(tmp_path / "packed"), chunk_size=4, compress=False)
+
+    dataset = PackedViewDataset(
+        str(tmp_path / "packed"), train=True, transform=pil_transform, off_3d=False, only_load="Aa"
+    )
+    assert len(dataset) == NUM_VIEWS - 1
+    expected_items = get_expected_items(dataset, root, pil_loader, pil_transform, True, None)
+    for index in range(len(dataset)):
+        item = dataset[index]
+        assert item[-1][0].dtype == np.float32
+        assert_items_equal(item, expected_items[index])
+
+    # The point cloud renderer is given the same float32 relative pose and images as with get_item_fn
+    dataset.dll = FakeRenderDll()
+    dataset.off_pc_render = False
+    expected_dll = FakeRenderDll()
+    expected_items = get_expected_items(dataset, root, pil_loader, pil_transform, False, expected_dll)
+    for index in range(len(dataset)):
+        assert_items_equal(dataset[index], expected_items[index])
+    assert len(dataset.dll.poses) == len(expected_dll.poses) == len(dataset)
+    for pose, expected_pose in zip(dataset.dll.poses, expected_dll.poses):
+        assert_arrays_equal(pose, expected_pose)
+        assert np.allclose(pose[3], [0, 0, 0, 1])
@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pybullet as p
+
+from igibson import object_states
+from igibson.envs.igibson_env import iGibsonEnv
+from igibson.utils.placement_utils import check_bodies_collision, check_self_collision, get_bodies_aabb
+
+
+class FakeObject(object):
+    """
+    Single body object with the interface used by the placement tests of iGibsonEnv
+    """
+
+    def __init__(self, body_id):
+        self.body_id = body_id
+        self.states = {object_states.AABB: SimpleNamespace(get_value=lambda: get_bodies_aabb([body_id]))}
+
+    def get_body_ids(self):
+        return [self.body_id]
+
+    def set_position_orientation(self, pos, orn):
+        p.resetBasePositionAndOrientation(self.body_id, pos, orn)
+
+    def set_position(self, pos):
+        p.resetBasePositionAndOrientation(self.body_id, pos, p.getBasePositionAndOrientation(self.body_id)[1])
+
+
+def create_body_with_overlapping_links(self_collision):
+    """
+    Create a body whose two links overlap each other, but not the base
+    """
+    base = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.1, 0.1, 0.1])
+    link = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.1, 0.1, 0.1])
+    return p.createMultiBody(
+        1,
+        base,
+        linkMasses=[1, 1],
+        linkCollisionShapeIndices=[link, link],
+        linkVisualShapeIndices=[-1, -1],
+        linkPositions=[[0, 0.3, 0], [0, 0.35, 0]],
+        linkOrientations=[[0, 0, 0, 1]] * 2,
+        linkInertialFramePositions=[[0, 0, 0]] * 2,
+        linkInertialFrameOrientations=[[0, 0, 0, 1]] * 2,
+        linkParentIndices=[0, 0],
+        linkJointTypes=[p.JOINT_FIXED] * 2,
+        linkJointAxis=[[0, 0, 1]] * 2,
+        flags=p.URDF_USE_SELF_COLLISION if self_collision else 0,
+    )
+
+
+def test_check_self_collision():
+    p.connect(p.DIRECT)
+    try:
+        colliding_id = create_body_with_overlapping_links(self_collision=True)
+        filtered_id = create_body_with_overlapping_links(self_collision=False)
+        p.resetBasePositionAndOrientation(filtered_id, [5, 0, 0], [0, 0, 0, 1])
+
+        assert check_self_collision([colliding_id])
+        assert not check_self_collision([filtered_id])
+        assert check_bodies_collision([colliding_id])
+        # Self-collisions are only ignored when asked for
+        assert not check_bodies_collision([colliding_id], ignore_ids=[colliding_id])
+        assert not check_bodies_collision([colliding_id], check_self_collisions=False)
+        assert not check_bodies_collision([filtered_id])
+    finally:
+        p.disconnect()
+
+
+def test_valid_positions_batch():
+    p.connect(p.DIRECT)
+    try:
+        rng = np.random.RandomState(0)
+        box = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.3, 0.3, 0.3])
+        for _ in range(8):
+            p.createMultiBody(0, box, basePosition=rng.uniform([-2, -2, 0], [2, 2, 0.5]))
+        obj = FakeObject(create_body_with_overlapping_links(self_collision=True))
+
+        env = iGibsonEnv.__new__(iGibsonEnv)
+        env.physics_free_placement = True
+        env.initial_pos_z_offset = 0.1
+        positions = rng.uniform([-2, -2, 0], [2, 2, 0.5], size=(40, 3))
+        orns = [np.array([0, 0, yaw]) for yaw in rng.uniform(0, np.pi * 2, size=40)]
+
+        expected = np.array(
+            [env.test_valid_position(obj, pos, orn, ignore_self_collision=True) for pos, orn in zip(positions, orns)]
+        )
+        assert 0 < np.sum(expected) < len(expected)
+        valid = env.test_valid_positions(obj, positions, orns, ignore_self_collision=True)
+        assert np.array_equal(valid, expected)
+
+        # Only the poses up to the first valid one are tested
+        valid = env.test_valid_positions(obj, positions, orns, ignore_self_collision=True, stop_at_first_valid=True)
+        first_valid = np.argmax(expected)
+        assert np.array_equal(valid[: first_valid + 1], expected[: first_valid + 1])
+        assert not np.any(valid[first_valid + 1 :])
+
+        # The links of the object overlap, so no pose is valid unless its self-collisions are ignored
+        expected = np.array([env.test_valid_position(obj, pos, orn) for pos, orn in zip(positions, orns)])
+        assert not np.any(expected)
+        assert not np.any(env.test_valid_positions(obj, positions, orns))
+    finally:
+        p.disconnect()
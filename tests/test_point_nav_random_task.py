@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+import igibson
+from igibson.scenes.gibson_indoor_scene import StaticIndoorScene
+from igibson.tasks.point_nav_fixed_task import PointNavFixedTask
+from igibson.tasks.point_nav_random_task import PointNavRandomTask
+
+
+def make_env():
+    """
+    Environment with a single empty floor, where the initial poses are valid on one half of the floor and the target
+    positions on the other half
+    """
+    scene = StaticIndoorScene.__new__(StaticIndoorScene)
+    scene.scene_id = "Empty"
+    scene.trav_map_size = 40
+    scene.trav_map_resolution = 0.25
+    scene.floor_map = [np.full((40, 40), 255, dtype=np.uint8)]
+    scene.floor_trav_cells = {0: np.argwhere(scene.floor_map[0] == 255)}
+    scene.floor_trav_csgraph = {}
+    scene.floor_heights = [0.0]
+    scene.build_graph = True
+
+    # Count the geodesic distance fields
+    distance_fields = []
+    get_geodesic_distance_field = scene.get_geodesic_distance_field
+
+    def count_distance_fields(floor, source_world):
+        distance_fields.append(source_world)
+        return get_geodesic_distance_field(floor, source_world)
+
+    scene.get_geodesic_distance_field = count_distance_fields
+
+    tested_targets = []
+
+    def test_valid_positions(obj, positions, orns=None, ignore_self_collision=False, stop_at_first_valid=False):
+        if orns is not None:
+            return np.array([pos[0] > 0 for pos in positions])
+        tested_targets.extend(positions)
+        return np.array([pos[1] > 0 for pos in positions])
+
+    env = SimpleNamespace(
+        scene=scene, robots=[SimpleNamespace(reset=lambda: None)], test_valid_positions=test_valid_positions
+    )
+    return env, distance_fields, tested_targets
+
+
+def make_task(episode_pool_size=0):
+    task = PointNavRandomTask.__new__(PointNavRandomTask)
+    task.target_dist_min = 1.0
+    task.target_dist_max = 3.0
+    task.episode_pool_size = episode_pool_size
+    task.episode_rng = np.random.RandomState(0)
+    task.episode_pools = {}
+    task.floor_num = 0
+    return task
+
+
+def test_reset_agent(monkeypatch):
+    monkeypatch.setattr(PointNavFixedTask, "reset_agent", lambda self, env: None)
+    env, distance_fields, tested_targets = make_env()
+    task = make_task()
+
+    num_distance_fields = []
+    for _ in range(20):
+        del distance_fields[:]
+        del tested_targets[:]
+        task.reset_agent(env)
+        num_distance_fields.append(len(distance_fields))
+        assert task.initial_pos[0] > 0 and task.target_pos[1] > 0
+        assert 1.0 < np.linalg.norm(task.target_pos[:2] - task.initial_pos[:2]) < 3.0 + 1e-6
+        # The distance field is only computed for the valid initial poses whose target is tested, one per reset when
+        # the first target is valid
+        assert len(distance_fields) == len(tested_targets)
+        assert np.array_equal(distance_fields[-1], task.initial_pos[:2])
+    assert min(num_distance_fields) == 1 and np.mean(num_distance_fields) < 3
+
+
+def test_reset_agent_episode_pool(monkeypatch, tmp_path):
+    monkeypatch.setattr(PointNavFixedTask, "reset_agent", lambda self, env: None)
+    monkeypatch.setattr(igibson, "cache_path", str(tmp_path))
+    env, distance_fields, _ = make_env()
+    task = make_task(episode_pool_size=50)
+
+    task.reset_agent(env)
+    assert len(distance_fields) >= 50
+    del distance_fields[:]
+    episodes = set(
+        zip(map(tuple, task.episode_pools[0]["initial_pos"]), map(tuple, task.episode_pools[0]["target_pos"]))
+    )
+    for _ in range(20):
+        task.reset_agent(env)
+        # Initial and target positions come from the same episode of the pool
+        assert (tuple(task.initial_pos), tuple(task.target_pos)) in episodes
+        assert task.initial_pos[0] > 0 and task.target_pos[1] > 0
+    assert len(distance_fields) == 0
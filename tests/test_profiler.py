@@ -0,0 +1,49 @@
+import csv
+import json
+import os
+import time
+
+from igibson.render.profiler import Profiler, StepProfiler
+
+
+def test_step_profiler(tmp_path):
+    profiler = StepProfiler(capacity=10)
+    # Disabled: nothing is recorded
+    with profiler.scope("step"):
+        pass
+    assert profiler.stats() == {}
+
+    profiler.enable()
+    for _ in range(20):
+        with profiler.scope("step"):
+            with profiler.scope("physics"):
+                time.sleep(0.001)
+            for state in ["Temperature", "OnTop"]:
+                with profiler.scope(state):
+                    pass
+    stats = profiler.stats()
+    assert sorted(stats) == ["step", "step/OnTop", "step/Temperature", "step/physics"]
+    assert stats["step"]["count"] == 20 and stats["step/physics"]["count"] == 20
+    assert 1.0 <= stats["step/physics"]["p50_ms"] <= stats["step/physics"]["p99_ms"] <= stats["step"]["max_ms"]
+    assert stats["step"]["mean_ms"] >= stats["step/physics"]["mean_ms"]
+
+    trace_file = os.path.join(str(tmp_path), "trace.json")
+    profiler.export_chrome_trace(trace_file)
+    with open(trace_file) as f:
+        events = json.load(f)["traceEvents"]
+    assert len(events) == 80
+    step = next(event for event in events if event["name"] == "step")
+    physics = next(event for event in events if event["name"] == "physics")
+    # Nested scopes are within their parent
+    assert step["ts"] <= physics["ts"] and physics["ts"] + physics["dur"] <= step["ts"] + step["dur"]
+
+    csv_file = os.path.join(str(tmp_path), "profile.csv")
+    profiler.export_csv(csv_file)
+    with open(csv_file) as f:
+        rows = list(csv.DictReader(f))
+    assert [row["scope"] for row in rows] == sorted(stats) and rows[0]["count"] == "20"
+
+
+def test_profiler_step():
+    with Profiler("Render") as profiler:
+        assert profiler.step("first") >= 0
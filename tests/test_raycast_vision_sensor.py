@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pybullet as p
+
+from igibson.sensors.raycast_vision_sensor import RaycastVisionSensor
+from igibson.utils.constants import SemanticClass
+from igibson.utils.raycast_utils import (
+    get_body_id_segmentation_tables,
+    get_body_id_table_size,
+    get_camera_ray_directions,
+)
+from igibson.utils.semantics_utils import CLASS_NAME_TO_CLASS_ID
+
+
+def test_raycast_vision_sensor():
+    p.connect(p.DIRECT)
+    try:
+        # Camera at the origin looking along +x, in front of a wall at 2m, and inside the body of the robot
+        wall_distance = 2.0
+        wall_shape = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.05, 10, 10])
+        wall_id = p.createMultiBody(baseCollisionShapeIndex=wall_shape, basePosition=[wall_distance + 0.05, 0, 0])
+        robot_shape = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.3, 0.3, 0.3])
+        robot_id = p.createMultiBody(baseCollisionShapeIndex=robot_shape)
+
+        eyes = SimpleNamespace(get_position=lambda: [0, 0, 0], get_orientation=lambda: [0, 0, 0, 1])
+        robot = SimpleNamespace(eyes=eyes, get_body_ids=lambda: [robot_id])
+        env = SimpleNamespace(
+            config={"image_width": 16, "image_height": 12, "vertical_fov": 60, "depth_low": 0.5, "depth_high": 5.0},
+            robots=[robot],
+            simulator=SimpleNamespace(renderer=None),
+            scene=SimpleNamespace(objects_by_id={wall_id: SimpleNamespace(category="wall")}),
+        )
+        sensor = RaycastVisionSensor(env, ["depth", "pc", "seg", "ins_seg"])
+        obs = sensor.get_obs(env)
+
+        # Every pixel sees the wall at the same planar depth
+        assert obs["depth"].shape == (12, 16, 1)
+        assert np.allclose(obs["depth"], wall_distance / 5.0)
+        directions = get_camera_ray_directions(16, 12, 60)
+        assert np.allclose(obs["pc"], directions * wall_distance, atol=1e-5)
+        # Without a renderer, the class ids come from the categories and the instance ids are the body ids
+        assert np.all(obs["seg"] == CLASS_NAME_TO_CLASS_ID.get("wall", SemanticClass.SCENE_OBJS))
+        assert np.all(obs["ins_seg"] == wall_id)
+
+        # Lower the wall below the optical axis: the rays of the top half of the image miss everything
+        p.resetBasePositionAndOrientation(wall_id, [wall_distance + 0.05, 0, -10], [0, 0, 0, 1])
+        obs = sensor.get_obs(env)
+        assert np.all(obs["depth"][:6] == 0.0)
+        assert np.all(obs["ins_seg"][:6] == 0)
+        assert np.allclose(obs["depth"][6:], wall_distance / 5.0)
+        assert np.all(obs["ins_seg"][6:] == wall_id)
+    finally:
+        p.disconnect()
+
+
+def test_body_id_segmentation_tables_removed_bodies():
+    p.connect(p.DIRECT)
+    try:
+        box_shape = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.1, 0.1, 0.1])
+        body_ids = [p.createMultiBody(baseCollisionShapeIndex=box_shape, basePosition=[i, 0, 0]) for i in range(4)]
+        removed_id = body_ids.pop(1)
+        p.removeBody(removed_id)
+        # Body ids are not contiguous anymore, the tables are sized by the largest one
+        assert p.getNumBodies() == 3
+        assert get_body_id_table_size() == max(body_ids) + 2
+
+        scene = SimpleNamespace(objects_by_id={body_id: SimpleNamespace(category="wall") for body_id in body_ids})
+        class_ids, instance_ids = get_body_id_segmentation_tables(SimpleNamespace(renderer=None), scene)
+        wall_class_id = CLASS_NAME_TO_CLASS_ID.get("wall", SemanticClass.SCENE_OBJS)
+        assert np.array_equal(class_ids[np.array(body_ids) + 1], [wall_class_id] * 3)
+        assert np.array_equal(instance_ids[np.array(body_ids) + 1], body_ids)
+        assert class_ids[0] == class_ids[removed_id + 1] == instance_ids[removed_id + 1] == 0
+
+        renderer = SimpleNamespace(
+            instances=[
+                SimpleNamespace(pybullet_uuid=body_id, class_id=10 + i, id=20 + i) for i, body_id in enumerate(body_ids)
+            ]
+        )
+        class_ids, instance_ids = get_body_id_segmentation_tables(SimpleNamespace(renderer=renderer), None)
+        assert np.array_equal(class_ids[np.array(body_ids) + 1], [10, 11, 12])
+        assert np.array_equal(instance_ids[np.array(body_ids) + 1], [20, 21, 22])
+    finally:
+        p.disconnect()
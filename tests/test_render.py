@@ -3,10 +3,13 @@ import time
 
 import GPUtil
 import numpy as np
+from PIL import Image
 
 import igibson
 from igibson.render.mesh_renderer.mesh_renderer_cpu import MeshRenderer
+from igibson.render.mesh_renderer.mesh_renderer_settings import MeshRendererSettings
 from igibson.utils.assets_utils import download_assets
+from igibson.utils.mesh_util import xyz2mat
 
 
 def test_render_loading_cleaning():
@@ -112,3 +115,98 @@ def test_render_rendering_cleaning():
         GPUtil.showUtilization()
         renderer.release()
         GPUtil.showUtilization()
+
+
+def write_box(folder, name, half_extent, color):
+    """
+    Write a box mesh of a single color, given by the diffuse color of its material or by an RGB texture of that color
+    if color has four channels
+    """
+    vertices = np.array([[x, y, z] for x in [-1, 1] for y in [-1, 1] for z in [-1, 1]]) * half_extent
+    faces = [[1, 3, 4, 2], [5, 6, 8, 7], [1, 2, 6, 5], [3, 7, 8, 4], [1, 5, 7, 3], [2, 4, 8, 6]]
+    lines = ["mtllib {}.mtl".format(name), "o {}".format(name), "usemtl paint"]
+    lines += ["v {} {} {}".format(*vertex) for vertex in vertices]
+    lines += ["f {} {} {}".format(a, b, c) for a, b, c, d in faces] + [
+        "f {} {} {}".format(a, c, d) for a, b, c, d in faces
+    ]
+    material = ["newmtl paint", "Kd {} {} {}".format(*color[:3])]
+    if len(color) == 4:
+        material.append("map_Kd {}.png".format(name))
+        Image.fromarray(np.full((4, 4, 3), np.array(color[:3]) * 255, dtype=np.uint8)).save(
+            os.path.join(folder, name + ".png")
+        )
+    with open(os.path.join(folder, name + ".obj"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+    with open(os.path.join(folder, name + ".mtl"), "w") as f:
+        f.write("\n".join(material) + "\n")
+    return os.path.join(folder, name + ".obj")
+
+
+def test_render_optimized_add_remove_instance_group(tmp_path):
+    obj_paths = [
+        write_box(str(tmp_path), "box_{}".format(i), half_extent, color)
+        for i, (half_extent, color) in enumerate(
+            [(0.3, [1, 0, 0]), (0.2, [0, 1, 0]), (0.4, [0, 0, 1]), (0.3, [1, 1, 0, 1])]
+        )
+    ]
+    positions = [[-0.8, 0, 0], [0.8, 0, 0], [0, 0.5, 0.6], [0, -0.5, -0.6]]
+
+    def make_renderer(num_objects):
+        renderer = MeshRenderer(
+            width=64,
+            height=64,
+            rendering_settings=MeshRendererSettings(optimized=True, enable_pbr=False, glsl_version_override=460),
+        )
+        for obj_path in obj_paths[:num_objects]:
+            renderer.load_object(obj_path)
+        renderer.set_camera([0, -3, 0], [0, 0, 0], [0, 0, 1])
+        renderer.set_fov(90)
+        return renderer
+
+    def add_instance_group(renderer, object_id, position):
+        renderer.add_instance_group([object_id], poses_trans=[xyz2mat(position)], class_id=object_id + 1)
+        return renderer.instances[-1]
+
+    # Instance groups added to and removed from the optimized renderer after the first frame, with the instance groups
+    # of (visual object, position) that remain
+    renderer = make_renderer(3)
+    groups = [add_instance_group(renderer, 0, positions[0]), add_instance_group(renderer, 1, positions[1])]
+    frames = [renderer.render(("rgb", "seg"))]
+    instances = [[(0, positions[0]), (1, positions[1])]]
+    # Added instance groups are written in the spare capacity of the merged buffers
+    groups.append(add_instance_group(renderer, 2, positions[2]))
+    frames.append(renderer.render(("rgb", "seg")))
+    instances.append([(0, positions[0]), (1, positions[1]), (2, positions[2])])
+    # Removed instance groups are not drawn, also from the first draw, and their draws are reused
+    renderer.remove_instance_group(groups.pop(0))
+    frames.append(renderer.render(("rgb", "seg")))
+    instances.append([(1, positions[1]), (2, positions[2])])
+    groups.append(add_instance_group(renderer, 0, positions[3]))
+    frames.append(renderer.render(("rgb", "seg")))
+    instances.append([(1, positions[1]), (2, positions[2]), (0, positions[3])])
+    # Until the merged buffers are too fragmented and set up again
+    renderer.remove_instance_group(groups.pop(2))
+    renderer.remove_instance_group(groups.pop(0))
+    assert renderer.optimized_packing.get_fragmentation() > renderer.rendering_settings.optimized_repack_fragmentation
+    frames.append(renderer.render(("rgb", "seg")))
+    instances.append([(2, positions[2])])
+    # Or new textures are loaded
+    renderer.load_object(obj_paths[3])
+    groups.append(add_instance_group(renderer, 3, positions[0]))
+    frames.append(renderer.render(("rgb", "seg")))
+    instances.append([(2, positions[2]), (3, positions[0])])
+    renderer.release()
+
+    # Same frames as an optimized renderer set up with the remaining instance groups, a single context at a time
+    for frame, frame_instances in zip(frames, instances):
+        renderer = make_renderer(4)
+        for object_id, position in frame_instances:
+            add_instance_group(renderer, object_id, position)
+        expected_frame = renderer.render(("rgb", "seg"))
+        renderer.release()
+        for image, expected_image in zip(frame, expected_frame):
+            assert np.array_equal(image, expected_image)
+        # Every instance group is visible
+        assert len(np.unique(frame[1][:, :, 0])) == len(frame_instances) + 1
+    # With the color of its texture
+    assert np.allclose(frames[-1][0][32, 20, :3], [1, 1, 0], atol=0.1)
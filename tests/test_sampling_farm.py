@@ -0,0 +1,90 @@
+import os
+import signal
+import time
+
+import igibson
+from igibson.utils.data_utils.sampling_task.sampling_farm import SamplingFarm, get_job_key
+
+
+def fake_worker_main(worker_id, log_dir, max_jobs_per_env, job_queue, result_queue):
+    """
+    Fake sampling worker that records its calls, and fails, crashes or hangs depending on the task of the job
+    """
+    while True:
+        assignment = job_queue.get()
+        if assignment is None:
+            break
+        attempt_id, job = assignment
+        start = time.time()
+        with open(os.path.join(log_dir, job["task"] + ".txt"), "a") as f:
+            f.write("{}\n".format(worker_id))
+        with open(os.path.join(log_dir, job["task"] + ".txt")) as f:
+            num_calls = len(f.read().splitlines())
+
+        status = "success"
+        if job["task"] == "fail_once" and num_calls == 1:
+            status = "failed"
+        elif job["task"] == "crash_once" and num_calls == 1:
+            os._exit(1)
+        elif job["task"] == "hang":
+            if num_calls == 1:
+                # The first attempt is killed for its timeout, but still reports a success while exiting
+                def report_late_success(signum, frame):
+                    result_queue.put((worker_id, attempt_id, "success", None, time.time() - start))
+                    result_queue.close()
+                    result_queue.join_thread()
+                    os._exit(0)
+
+                signal.signal(signal.SIGTERM, report_late_success)
+                time.sleep(60)
+            status = "failed"
+        result_queue.put((worker_id, attempt_id, status, None, time.time() - start))
+
+
+def get_num_calls(log_dir, task):
+    task_file = os.path.join(log_dir, task + ".txt")
+    if not os.path.isfile(task_file):
+        return 0
+    with open(task_file) as f:
+        return len(f.read().splitlines())
+
+
+def test_sampling_farm(tmp_path, monkeypatch):
+    log_dir = str(tmp_path / "logs")
+    os.makedirs(log_dir)
+    monkeypatch.setattr(igibson, "ig_dataset_path", str(tmp_path / "dataset"))
+    tasks = ["ok", "fail_once", "crash_once", "hang"]
+    jobs = [{"task": task, "task_id": 0, "scene_id": "Rs_int", "init_id": 0} for task in tasks]
+    manifest_file = str(tmp_path / "manifest.json")
+
+    # A single worker, so that the retried attempts run on the restarted worker of the failed attempts
+    def run_farm(retry_failed=False):
+        farm = SamplingFarm(
+            log_dir,
+            manifest_file,
+            num_workers=1,
+            timeout=10.0,
+            max_trials=2,
+            retry_failed=retry_failed,
+            worker_main=fake_worker_main,
+        )
+        return farm, farm.run(jobs)
+
+    farm, report = run_farm()
+    assert [get_num_calls(log_dir, task) for task in tasks] == [1, 2, 2, 2]
+    records = [farm.manifest[get_job_key(job)] for job in jobs]
+    assert [record["attempts"] for record in records] == [1, 2, 2, 2]
+    assert [record["status"] for record in records] == ["success", "success", "success", "failed"]
+    # The late success of the killed attempt is not taken as the result of the retried attempt
+    assert records[3]["times"][0] > 10.0
+    assert report["hang"]["status"] == {"failed": 1}
+    assert report["crash_once"]["success_rate"] == 1.0
+
+    # Resuming samples nothing, unless the failed jobs are retried
+    farm, report = run_farm()
+    assert [get_num_calls(log_dir, task) for task in tasks] == [1, 2, 2, 2]
+    assert report["ok"]["status"] == {"success": 1}
+    farm, report = run_farm(retry_failed=True)
+    assert [get_num_calls(log_dir, task) for task in tasks] == [1, 2, 2, 4]
+    assert farm.manifest[get_job_key(jobs[3])]["attempts"] == 2
+    assert report["hang"]["status"] == {"failed": 1}
@@ -0,0 +1,220 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pybullet as p
+
+from igibson.utils import sampling_utils
+from igibson.utils.raycast_utils import ray_test_batch
+from igibson.utils.sampling_utils import (
+    _PARALLEL_RAY_NORMAL_ANGLE_TOLERANCE,
+    _check_cuboid_sample_attempts,
+    _get_cuboid_sample,
+    check_cuboid_empty,
+    fit_plane,
+    get_distance_to_plane,
+    get_parallel_rays,
+    sample_cuboid_on_object,
+)
+
+
+def create_table():
+    """
+    Create a table top with a bump and a tilted board on top of it, all links of the same body
+    """
+    top = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.5, 0.5, 0.05])
+    bump = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.05, 0.05, 0.03])
+    board = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.15, 0.15, 0.01])
+    return p.createMultiBody(
+        0,
+        top,
+        basePosition=[0, 0, 0.5],
+        linkMasses=[0, 0],
+        linkCollisionShapeIndices=[bump, board],
+        linkVisualShapeIndices=[-1, -1],
+        linkPositions=[[0.2, 0.2, 0.08], [-0.25, -0.25, 0.15]],
+        linkOrientations=[[0, 0, 0, 1], p.getQuaternionFromEuler([0.6, 0, 0])],
+        linkInertialFramePositions=[[0, 0, 0]] * 2,
+        linkInertialFrameOrientations=[[0, 0, 0, 1]] * 2,
+        linkParentIndices=[0, 0],
+        linkJointTypes=[p.JOINT_FIXED] * 2,
+        linkJointAxis=[[0, 0, 1]] * 2,
+    )
+
+
+def check_attempt_sequentially(sources, cast_results, body_ids, max_angle_with_z_axis, hit_to_plane_threshold):
+    """
+    Reference implementation of the checks of one attempt, one ray at a time
+
+    :return: the first failed check, or None if all the checks passed
+    """
+    hits = [ray_res[0] in body_ids for ray_res in cast_results]
+    if sum(hits) / len(hits) < 0.6:
+        return "missed_object"
+    center_idx = int(len(cast_results) / 2)
+    if not hits[center_idx]:
+        return "center_missed"
+
+    hit_positions = np.array([ray_res[3] for ray_res, hit in zip(cast_results, hits) if hit])
+    hit_normals = np.array([ray_res[4] for ray_res, hit in zip(cast_results, hits) if hit])
+    hit_normals /= np.linalg.norm(hit_normals, axis=1)[:, None]
+    center_hit_normal = hit_normals[sum(hits[:center_idx])]
+
+    if np.arccos(np.clip(center_hit_normal[2], -1.0, 1.0)) > max_angle_with_z_axis:
+        return "downward_normal"
+
+    angles = np.arccos(np.clip(np.dot(hit_normals, center_hit_normal), -1.0, 1.0))
+    if not np.all(angles < _PARALLEL_RAY_NORMAL_ANGLE_TOLERANCE):
+        return "hit_normal_similarity"
+
+    plane_centroid, plane_normal = fit_plane(hit_positions)
+    plane_normal *= np.sign(np.dot(sources[center_idx] - plane_centroid, plane_normal))
+    if (
+        not np.arccos(np.clip(np.dot(plane_normal, center_hit_normal), -1.0, 1.0))
+        < _PARALLEL_RAY_NORMAL_ANGLE_TOLERANCE
+    ):
+        return "plane_normal_similarity"
+
+    if np.any(get_distance_to_plane(hit_positions, plane_centroid, plane_normal) > hit_to_plane_threshold):
+        return "dist_to_plane"
+    return None
+
+
+def test_check_cuboid_sample_attempts():
+    p.connect(p.DIRECT)
+    try:
+        np.random.seed(0)
+        table_id = create_table()
+        obstacle = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.04, 0.04, 0.04])
+        p.createMultiBody(0, obstacle, basePosition=[0.3, -0.3, 0.59])
+        max_angle_with_z_axis = 3 * np.pi / 4
+        hit_to_plane_threshold = 0.05
+
+        # Rays along every axis direction, from random points around the table
+        attempt_sources, attempt_destinations = [], []
+        for _ in range(400):
+            source = np.random.uniform([-0.7, -0.7, 0.3], [0.7, 0.7, 0.8])
+            axis = np.random.randint(3)
+            source[axis] = np.random.choice([-1.0, 1.0]) * (0.7 if axis < 2 else 0.4) + (0.55 if axis == 2 else 0.0)
+            destination = source.copy()
+            destination[axis] = 2 * (0.55 if axis == 2 else 0.0) - source[axis]
+            sources, destinations, _ = get_parallel_rays(source, destination, np.random.uniform(0.05, 0.2))
+            attempt_sources.append(sources)
+            attempt_destinations.append(destinations)
+        # Rays whose center ray hits the obstacle instead of the table
+        for offset in [0.1, 0.15, 0.2]:
+            sources, destinations, _ = get_parallel_rays(np.array([0.3, -0.3, 1.0]), np.array([0.3, -0.3, 0.1]), offset)
+            attempt_sources.append(sources)
+            attempt_destinations.append(destinations)
+
+        expected = []
+        for sources, destinations in zip(attempt_sources, attempt_destinations):
+            cast_results = p.rayTestBatch(rayFromPositions=sources, rayToPositions=destinations)
+            expected.append(
+                check_attempt_sequentially(
+                    sources, cast_results, [table_id], max_angle_with_z_axis, hit_to_plane_threshold
+                )
+            )
+
+        # Attempts are batched by number of parallel rays
+        stages = [None] * len(expected)
+        for num_rays in set(len(sources) for sources in attempt_sources):
+            group = [k for k, sources in enumerate(attempt_sources) if len(sources) == num_rays]
+            sources = np.array([attempt_sources[k] for k in group])
+            destinations = np.array([attempt_destinations[k] for k in group])
+            cast_results = [
+                result.reshape(sources.shape[:2] + result.shape[1:])
+                for result in ray_test_batch(sources.reshape(-1, 3), destinations.reshape(-1, 3))
+            ]
+            attempts = _check_cuboid_sample_attempts(
+                sources, cast_results, [table_id], max_angle_with_z_axis, hit_to_plane_threshold, True
+            )
+            for k, attempt in zip(group, attempts):
+                assert attempt["passed"] == (attempt["failed_stage"] is None)
+                stages[k] = attempt["failed_stage"]
+
+        assert stages == expected
+        # Every check accepts and refuses some of the attempts
+        assert set(expected) == {
+            None,
+            "missed_object",
+            "center_missed",
+            "downward_normal",
+            "hit_normal_similarity",
+            "plane_normal_similarity",
+            "dist_to_plane",
+        }
+    finally:
+        p.disconnect()
+
+
+def test_sample_cuboid_on_object(monkeypatch):
+    p.connect(p.DIRECT)
+    try:
+        np.random.seed(0)
+        table_id = create_table()
+        lower, upper = np.array(p.getAABB(table_id, -1))
+        obj = SimpleNamespace(
+            get_base_aligned_bounding_box=lambda **kwargs: ((lower + upper) / 2, [0, 0, 0, 1], upper - lower, None),
+            get_body_ids=lambda: [table_id],
+        )
+
+        # Count the attempts that are cast
+        num_attempts = []
+        cast_attempts = []
+        cast_cuboid_sample_attempts = sampling_utils._cast_cuboid_sample_attempts
+
+        def count_attempts(half_extent_with_offset, to_wf_transform, attempt_cuboid_dimensions, *args):
+            num_attempts.append(len(attempt_cuboid_dimensions))
+            attempts = cast_cuboid_sample_attempts(
+                half_extent_with_offset, to_wf_transform, attempt_cuboid_dimensions, *args
+            )
+            cast_attempts.append(attempts)
+            return attempts
+
+        monkeypatch.setattr(sampling_utils, "_cast_cuboid_sample_attempts", count_attempts)
+
+        def sample(num_samples, max_sampling_attempts=10):
+            return sample_cuboid_on_object(
+                obj,
+                num_samples,
+                [0.1, 0.1, 0.2],
+                bimodal_mean_fraction=0.9,
+                bimodal_stdev_fraction=0.1,
+                axis_probabilities=[0, 0, 1.0],
+                max_sampling_attempts=max_sampling_attempts,
+                refuse_downwards=True,
+            )
+
+        # All the attempts of a single sample are cast in one batch, and the sample is the first attempt that passes
+        # all the checks, in attempt order
+        cuboid_dimensions = np.array([0.1, 0.1, 0.2])
+        for _ in range(5):
+            result = sample(1)[0]
+            cuboids = [
+                _get_cuboid_sample(attempt, cuboid_dimensions) for attempt in cast_attempts[-1] if attempt["passed"]
+            ]
+            expected = next(
+                cuboid for cuboid in cuboids if check_cuboid_empty(cuboid[1], cuboid[3], [], cuboid_dimensions)
+            )
+            assert np.allclose(result[0], expected[0])
+            assert len(cuboids) > 1
+        assert num_attempts == [10] * 5
+
+        # With many samples, samples stop at their first successful attempt
+        del num_attempts[:]
+        num_samples = 50
+        results = sample(num_samples)
+        # About 1% of the samples miss the table top in all their attempts
+        results = [result for result in results if result[0] is not None]
+        assert len(results) >= num_samples - 2
+        assert num_attempts[0] == num_samples and sum(num_attempts) < num_samples * 10 / 2
+        for cuboid_centroid, up_vector, orientation, hit_link, refusal_reasons in results:
+            # On the flat part of the table top, not on the bump or the board. The emptiness check casts rays between
+            # the corners of the cuboid, so the corner of the bump can still slightly intrude in the cuboid
+            assert hit_link == -1
+            assert np.allclose(up_vector, [0, 0, 1], atol=1e-3)
+            assert np.isclose(cuboid_centroid[2], 0.55 + 0.005 + 0.1, atol=1e-3)
+            assert not (0.15 < cuboid_centroid[0] < 0.25 and 0.15 < cuboid_centroid[1] < 0.25)
+            assert "missed_object" in refusal_reasons
+    finally:
+        p.disconnect()
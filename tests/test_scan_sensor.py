@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pybullet as p
+
+from igibson.sensors.scan_sensor import ScanSensor
+from igibson.utils.raycast_utils import voxel_downsample
+
+
+class FixedLink(object):
+    def __init__(self, pos, orn):
+        self.pos = pos
+        self.orn = orn
+
+    def get_position_orientation(self):
+        return self.pos, self.orn
+
+
+def test_voxel_downsample():
+    rng = np.random.RandomState(0)
+    points = rng.uniform(-1, 1, size=(500, 3)).astype(np.float32)
+    downsampled = voxel_downsample(points, 0.5)
+
+    # One point per occupied voxel, at the mean of the points of the voxel
+    voxels = {}
+    for point in points:
+        voxels.setdefault(tuple(np.floor(point / 0.5).astype(int)), []).append(point)
+    expected = np.array([np.mean(voxel_points, axis=0) for voxel_points in voxels.values()])
+    assert downsampled.dtype == np.float32
+    assert downsampled.shape == expected.shape
+    assert np.allclose(np.sort(downsampled, axis=0), np.sort(expected, axis=0), atol=1e-6)
+    assert voxel_downsample(np.zeros((0, 3)), 0.5).shape == (0, 3)
+
+
+def test_scan_sensor_outputs():
+    p.connect(p.DIRECT)
+    try:
+        # Wall at 2.2m in front of the laser
+        wall_distance = 2.2
+        wall_shape = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.05, 10, 10])
+        wall_id = p.createMultiBody(baseCollisionShapeIndex=wall_shape, basePosition=[wall_distance + 0.05, 0, 0])
+
+        config = {
+            "n_horizontal_rays": 32,
+            "n_vertical_beams": 3,
+            "laser_vertical_angular_range": 30.0,
+            "laser_angular_range": 90.0,
+            "laser_linear_range": 10.0,
+            "scan_voxel_size": 0.5,
+        }
+        robot = SimpleNamespace(
+            links={"scan_link": FixedLink([0.0, 0.0, 0.0], [0, 0, 0, 1])},
+            base_link=FixedLink([0.0, 0.0, 0.0], [0, 0, 0, 1]),
+        )
+        env = SimpleNamespace(
+            config=config,
+            robots=[robot],
+            simulator=SimpleNamespace(renderer=None),
+            scene=SimpleNamespace(objects_by_id={wall_id: SimpleNamespace(category="wall")}),
+        )
+        sensor = ScanSensor(env, ["scan", "scan_pc", "scan_pc_voxel", "scan_intensity", "scan_ins_seg"])
+        state = sensor.get_obs(env)
+
+        n_beams = 32 * 3
+        for modality, dim in [("scan", 1), ("scan_pc", 3), ("scan_pc_voxel", 3), ("scan_intensity", 1)]:
+            assert state[modality].shape == (n_beams, dim)
+        assert np.allclose(state["scan_pc"][:, 0], wall_distance, atol=1e-4)
+        distance = np.linalg.norm(state["scan_pc"], axis=1)
+        assert np.allclose(state["scan"][:, 0] * (10.0 - sensor.min_laser_dist) + sensor.min_laser_dist, distance)
+        # Lambertian intensity: cosine between the beam and the wall normal
+        assert np.allclose(state["scan_intensity"][:, 0], wall_distance / distance, atol=1e-4)
+        assert np.all(state["scan_ins_seg"] == wall_id)
+
+        # Downsampled points first, then zeros
+        expected_voxel = voxel_downsample(state["scan_pc"], 0.5)
+        assert np.allclose(state["scan_pc_voxel"][: len(expected_voxel)], expected_voxel)
+        assert np.all(state["scan_pc_voxel"][len(expected_voxel) :] == 0)
+    finally:
+        p.disconnect()
@@ -1,3 +1,4 @@
+import numpy as np
 import pybullet as p
 
 import igibson
@@ -6,7 +7,7 @@ from igibson.robots.turtlebot import Turtlebot
 from igibson.scenes.gibson_indoor_scene import StaticIndoorScene
 from igibson.scenes.stadium_scene import StadiumScene
 from igibson.simulator import Simulator
-from igibson.utils.assets_utils import download_assets, download_demo_data
+from igibson.utils.assets_utils import download_assets, download_demo_data, get_scene_path
 
 
 def test_import_building():
@@ -72,3 +73,24 @@ def test_import_building_viewing():
         # turtlebot3.apply_action(np.random.randint(4))
 
     s.disconnect()
+
+
+def test_geodesic_distance_field():
+    download_demo_data()
+
+    scene = StaticIndoorScene("Rs")
+    scene.load_floor_metadata()
+    scene.load_trav_map(get_scene_path("Rs"))
+    trav_cells = scene.get_traversable_cells(0)
+    cell_index = {tuple(cell): i for i, cell in enumerate(trav_cells)}
+
+    rng = np.random.RandomState(0)
+    source_world = scene.map_to_world(trav_cells[rng.randint(len(trav_cells))])
+    geodesic_distance_field = scene.get_geodesic_distance_field(0, source_world)
+    for _ in range(20):
+        target_world = scene.map_to_world(trav_cells[rng.randint(len(trav_cells))])
+        target_idx = cell_index.get(tuple(scene.world_to_map(target_world)))
+        if target_idx is None:
+            continue
+        _, geodesic_distance = scene.get_shortest_path(0, source_world, target_world)
+        assert np.isclose(geodesic_distance_field[target_idx], geodesic_distance)
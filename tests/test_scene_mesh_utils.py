@@ -0,0 +1,119 @@
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pybullet as p
+import trimesh
+from scipy.spatial.distance import cdist
+
+from igibson.objects.articulated_object import URDFObject
+from igibson.utils.scene_mesh_utils import get_urdf_mesh
+from igibson.utils.utils import get_transform_from_xyz_rpy, quatXYZWFromRotMat
+
+# Base link with a revolute and a prismatic joint, and a fixed link attached to the revolute one, with box and mesh
+# visuals that have their own origins
+URDF_CONTENT = """<robot name="cabinet">
+  <link name="base">
+    <visual><origin xyz="0.1 0 0.05" rpy="0 0 0.3"/><geometry><box size="0.4 0.2 0.1"/></geometry></visual>
+  </link>
+  <joint name="hinge" type="revolute">
+    <origin xyz="0.2 0.1 0.3" rpy="0 0 0.5"/><axis xyz="0 0 1"/>
+    <limit lower="0" upper="1.2" effort="1" velocity="1"/>
+    <parent link="base"/><child link="door"/>
+  </joint>
+  <link name="door">
+    <visual><origin xyz="0 0.15 0" rpy="0.2 0 0"/><geometry><mesh filename="shape.obj" scale="1 2 1"/></geometry></visual>
+  </link>
+  <joint name="handle_joint" type="fixed">
+    <origin xyz="0.02 0.25 0" rpy="0 0.4 0"/><parent link="door"/><child link="handle"/>
+  </joint>
+  <link name="handle">
+    <visual><geometry><box size="0.02 0.02 0.1"/></geometry></visual>
+  </link>
+  <joint name="slider" type="prismatic">
+    <origin xyz="-0.1 0 0.1" rpy="0 0 0"/><axis xyz="1 0 0"/>
+    <limit lower="0" upper="0.3" effort="1" velocity="1"/>
+    <parent link="base"/><child link="drawer"/>
+  </joint>
+  <link name="drawer">
+    <visual><origin xyz="0 0 0.02"/><geometry><box size="0.3 0.2 0.05"/></geometry></visual>
+  </link>
+</robot>
+"""
+
+
+def write_model(folder):
+    os.makedirs(folder)
+    with open(os.path.join(folder, "cabinet.urdf"), "w") as f:
+        f.write(URDF_CONTENT)
+    trimesh.Trimesh(
+        vertices=[[0, 0, 0], [0.1, 0, 0], [0, 0.1, 0], [0, 0, 0.2]], faces=[[0, 1, 2], [0, 1, 3], [0, 2, 3], [1, 2, 3]]
+    ).export(os.path.join(folder, "shape.obj"))
+    return os.path.join(folder, "cabinet.urdf")
+
+
+def write_scaled_urdf(filename, scale, scaled_filename):
+    """
+    Scale a URDF with URDFObject.scale_object, as done when the objects of a scene are imported
+    """
+    obj = URDFObject.__new__(URDFObject)
+    obj.object_tree = ET.parse(filename)
+    obj.base_link_name = "base"
+    obj.name = "base"
+    obj.scale = scale
+    obj.overwrite_inertial = False
+    obj.category = "door"
+    obj.scale_object()
+    obj.object_tree.write(scaled_filename)
+
+
+def get_pybullet_vertices(body_id, mesh_vertices):
+    """
+    Get the world vertices of the visual shapes of a pybullet body, posed by pybullet forward kinematics
+    """
+    box_vertices = trimesh.creation.box([1, 1, 1]).vertices
+    vertices = []
+    for shape in p.getVisualShapeData(body_id):
+        if shape[1] == -1:
+            link_pos, link_orn = p.getBasePositionAndOrientation(body_id)
+        else:
+            link_pos, link_orn = p.getLinkState(body_id, shape[1], computeForwardKinematics=True)[:2]
+        visual_pos, visual_orn = p.multiplyTransforms(link_pos, link_orn, shape[5], shape[6])
+        local_vertices = (box_vertices if shape[2] == p.GEOM_BOX else mesh_vertices) * np.array(shape[3])
+        rotation = np.array(p.getMatrixFromQuaternion(visual_orn)).reshape(3, 3)
+        vertices.append(local_vertices.dot(rotation.T) + visual_pos)
+    return np.concatenate(vertices)
+
+
+def test_get_urdf_mesh_matches_pybullet(tmp_path):
+    model_path = str(tmp_path / "cabinet")
+    filename = write_model(model_path)
+    scale = np.array([1.5, 0.8, 2.0])
+    base_transform = get_transform_from_xyz_rpy([1.0, 2.0, 0.5], [0.1, 0.0, 0.7])
+    scaled_filename = os.path.join(model_path, "scaled.urdf")
+    write_scaled_urdf(filename, scale, scaled_filename)
+    mesh_vertices = trimesh.load(os.path.join(model_path, "shape.obj"), force="mesh", process=False).vertices
+
+    p.connect(p.DIRECT)
+    try:
+        body_id = p.loadURDF(
+            scaled_filename,
+            basePosition=base_transform[:3, 3],
+            baseOrientation=quatXYZWFromRotMat(base_transform[:3, :3]),
+            useFixedBase=True,
+        )
+        for open_joints in [False, True]:
+            # Open joints are at the upper limit of the scaled URDF
+            for joint in range(p.getNumJoints(body_id)):
+                joint_info = p.getJointInfo(body_id, joint)
+                if joint_info[2] in [p.JOINT_REVOLUTE, p.JOINT_PRISMATIC]:
+                    p.resetJointState(body_id, joint, joint_info[9] if open_joints else 0.0)
+            expected_vertices = get_pybullet_vertices(body_id, mesh_vertices)
+
+            vertices, faces = get_urdf_mesh(filename, model_path, scale, base_transform, open_joints=open_joints)
+            assert len(vertices) == len(expected_vertices) == 3 * 8 + 4
+            assert faces.shape == (3 * 12 + 4, 3) and faces.max() == len(vertices) - 1
+            dists = cdist(vertices, expected_vertices)
+            assert np.max(np.min(dists, axis=1)) < 1e-5 and np.max(np.min(dists, axis=0)) < 1e-5
+    finally:
+        p.disconnect()
@@ -0,0 +1,54 @@
+import numpy as np
+
+from igibson.scenes.gibson_indoor_scene import StaticIndoorScene
+from igibson.scenes.igibson_indoor_scene import InteractiveIndoorScene
+
+
+def get_query_points(rng, half_extent):
+    """
+    Random points on and around a map, with points on the cell borders and on the map borders
+    """
+    points = rng.uniform(-1.5 * half_extent, 1.5 * half_extent, size=(2000, 2))
+    grid = np.linspace(-half_extent - 0.2, half_extent + 0.2, 25)
+    return np.concatenate([points, np.stack(np.meshgrid(grid, grid), axis=-1).reshape(-1, 2)])
+
+
+def test_get_room_instance_ids_by_points():
+    rng = np.random.RandomState(0)
+    scene = InteractiveIndoorScene.__new__(InteractiveIndoorScene)
+    scene.seg_map_resolution = 0.1
+    scene.seg_map_size = 50
+    # Rooms are blocks of cells, with boundary cells of id 0 in between
+    scene.room_ins_map = np.kron(rng.randint(1, 4, size=(5, 10)), np.ones((10, 5), dtype=np.int32))
+    scene.room_ins_map[rng.uniform(size=scene.room_ins_map.shape) < 0.1] = 0
+    scene.room_ins_id_to_ins_name = {1: "kitchen_0", 2: "bedroom_0", 3: "bathroom_0"}
+    scene.room_ins_name_to_ins_id = {name: ins_id for ins_id, name in scene.room_ins_id_to_ins_name.items()}
+
+    points = get_query_points(rng, 2.5)
+    expected = []
+    for point in points:
+        room = scene.get_room_instance_by_point(point)
+        expected.append(0 if room is None else scene.room_ins_name_to_ins_id[room])
+    ins_ids = scene.get_room_instance_ids_by_points(points)
+    assert np.array_equal(ins_ids, expected)
+    assert set(ins_ids) == {0, 1, 2, 3}
+
+
+def test_get_traversability_by_points():
+    rng = np.random.RandomState(0)
+    scene = StaticIndoorScene.__new__(StaticIndoorScene)
+    scene.trav_map_resolution = 0.1
+    scene.trav_map_size = 50
+    scene.floor_map = [(rng.uniform(size=(50, 50)) < p).astype(np.uint8) * 255 for p in [0.3, 0.7]]
+
+    points = get_query_points(rng, 2.5)
+    for floor in range(len(scene.floor_map)):
+        expected = []
+        for point in points:
+            x, y = scene.world_to_map(point)
+            in_map = 0 <= x < scene.trav_map_size and 0 <= y < scene.trav_map_size
+            expected.append(in_map and scene.floor_map[floor][x, y] == 255)
+        traversable = scene.get_traversability_by_points(floor, points)
+        assert traversable.dtype == bool
+        assert np.array_equal(traversable, expected)
+        assert 0 < np.sum(traversable) < len(traversable)
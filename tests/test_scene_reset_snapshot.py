@@ -0,0 +1,108 @@
+import numpy as np
+import pybullet as p
+
+from igibson.object_states.object_state_base import AbsoluteObjectState
+from igibson.scenes.igibson_indoor_scene import InteractiveIndoorScene
+
+
+class FakeTemperature(AbsoluteObjectState):
+    def _get_value(self):
+        return self.value
+
+    def _set_value(self, new_value):
+        self.value = new_value
+
+    def _dump(self):
+        return self.value
+
+    def load(self, data):
+        self.value = data
+
+
+class FakeObject(object):
+    """
+    Single body scene object with the interface used by reset_scene_objects
+    """
+
+    def __init__(self, body_id):
+        self.body_id = body_id
+        self.loaded = True
+        temperature = FakeTemperature(self)
+        temperature.initialize(None)
+        temperature.value = 20.0
+        self.states = {FakeTemperature: temperature}
+
+    def get_body_ids(self):
+        return [self.body_id]
+
+    def set_poses(self, poses):
+        p.resetBasePositionAndOrientation(self.body_id, *poses[0])
+
+    def set_velocities(self, velocities):
+        p.resetBaseVelocity(self.body_id, *velocities[0])
+
+    def set_joint_states(self, joint_states):
+        pass
+
+    def load_state(self, dump):
+        self.states[FakeTemperature].load(dump["temperature"])
+
+
+def get_base_state(body_id):
+    return sum(p.getBasePositionAndOrientation(body_id), ()) + sum(p.getBaseVelocity(body_id), ())
+
+
+def test_reset_snapshot():
+    p.connect(p.DIRECT)
+    try:
+        rng = np.random.RandomState(0)
+        shape = p.createCollisionShape(p.GEOM_BOX, halfExtents=[0.1, 0.1, 0.1])
+        body_ids = [p.createMultiBody(baseMass=1, baseCollisionShapeIndex=shape) for _ in range(5)]
+        # Leave a hole in the body ids
+        p.removeBody(body_ids.pop(1))
+        robot_id = body_ids.pop()
+
+        scene = InteractiveIndoorScene.__new__(InteractiveIndoorScene)
+        scene.objects_by_name = {}
+        scene.objects_by_id = {}
+        scene.object_states = {}
+        for i, body_id in enumerate(body_ids):
+            obj = FakeObject(body_id)
+            scene.objects_by_name["obj_{}".format(i)] = obj
+            scene.objects_by_id[body_id] = obj
+            scene.object_states["obj_{}".format(i)] = {
+                "base_poses": [(rng.uniform(-1, 1, 3), p.getQuaternionFromEuler(rng.uniform(-1, 1, 3)))],
+                "base_velocities": [(rng.uniform(-1, 1, 3), rng.uniform(-1, 1, 3))],
+                "joint_states": {},
+                "non_kinematic_states": {"temperature": 50.0 + i},
+            }
+        scene.should_open_all_doors = False
+        scene.use_reset_snapshot = True
+        scene.reset_snapshot_id = None
+
+        scene.reset_scene_objects()
+        saved_states = {body_id: get_base_state(body_id) for body_id in body_ids}
+        assert scene.reset_snapshot_id is not None
+        assert robot_id in scene.reset_snapshot_unmanaged_body_ids
+
+        for _ in range(3):
+            for body_id in body_ids + [robot_id]:
+                p.resetBasePositionAndOrientation(body_id, rng.uniform(-1, 1, 3), [0, 0, 0, 1])
+                p.resetBaseVelocity(body_id, rng.uniform(-1, 1, 3), rng.uniform(-1, 1, 3))
+            for obj in scene.objects_by_name.values():
+                obj.states[FakeTemperature].value = 0.0
+            robot_state = get_base_state(robot_id)
+
+            # Restored from the snapshot, without going through the per object restore
+            scene.restore_object_states = None
+            scene.reset_scene_objects()
+            del scene.restore_object_states
+
+            for body_id in body_ids:
+                assert np.allclose(get_base_state(body_id), saved_states[body_id])
+            # Bodies that are not scene objects keep their state
+            assert np.allclose(get_base_state(robot_id), robot_state)
+            for i, obj in enumerate(scene.objects_by_name.values()):
+                assert obj.states[FakeTemperature].value == 50.0 + i
+    finally:
+        p.disconnect()
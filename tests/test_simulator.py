@@ -21,3 +21,21 @@ def test_simulator():
     for i in range(1000):
         s.step()
     s.disconnect()
+
+
+def test_simulator_without_renderer():
+    download_assets()
+    s = Simulator(mode="headless", use_renderer=False)
+    assert s.renderer is None
+    scene = StadiumScene()
+    s.import_scene(scene)
+
+    obj = YCBObject("006_mustard_bottle")
+    s.import_object(obj)
+    obj.set_position([0, 0, 1])
+
+    for i in range(100):
+        s.step()
+    # The object is simulated even though it is not rendered
+    assert obj.get_position()[2] < 1
+    s.disconnect()
@@ -0,0 +1,33 @@
+import os
+
+import numpy as np
+
+import igibson
+from igibson.scenes.igibson_indoor_scene import InteractiveIndoorScene
+from igibson.utils.synthetic_dataset import generate_synthetic_dataset, set_ig_dataset_path
+
+
+def test_synthetic_scene(tmp_path):
+    ig_dataset_path = igibson.ig_dataset_path
+    generate_synthetic_dataset(str(tmp_path), scene_id="Synthetic_int", grid_size=(2, 2), objects_per_room=2)
+    set_ig_dataset_path(str(tmp_path))
+    try:
+        scene = InteractiveIndoorScene("Synthetic_int")
+        assert len(scene.objects_by_category["walls"]) == 1
+        assert len(scene.objects_by_category["floors"]) == 1
+        assert len(scene.objects_by_category["breakfast_table"]) == 4
+        assert len(scene.objects_by_category["bottom_cabinet"]) == 4
+        assert len(scene.objects_by_category["apple"]) + len(scene.objects_by_category["bowl"]) == 8
+        assert sorted(scene.room_ins_name_to_ins_id) == ["bathroom_0", "bedroom_0", "kitchen_0", "living_room_0"]
+        assert scene.get_room_instance_by_point(np.array([-1.0, -3.5])) == "living_room_0"
+        assert scene.get_room_instance_by_point(np.array([3.0, 1.0])) == "bathroom_0"
+
+        # The rooms are connected by their doors, so the shortest path goes through the kitchen in between
+        scene.load_trav_map(os.path.join(scene.scene_dir, "layout"))
+        path, distance = scene.get_shortest_path(0, np.array([-1.0, -3.5]), np.array([3.0, 1.0]), entire_path=True)
+        assert 6.0 < distance < 6.5
+        rooms = set(scene.get_room_instance_by_point(point) for point in path)
+        assert {"living_room_0", "kitchen_0", "bathroom_0"} <= rooms
+        assert "bedroom_0" not in rooms
+    finally:
+        set_ig_dataset_path(ig_dataset_path)
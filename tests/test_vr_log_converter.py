@@ -0,0 +1,71 @@
+import os
+
+import h5py
+import numpy as np
+
+from igibson.utils.vr_log_converter import convert_log, get_log_datasets
+
+
+def make_log(filename, num_frames):
+    rng = np.random.RandomState(0)
+    shapes = {
+        "frame_data": (4,),
+        "vr/vr_camera/right_eye_view": (4, 4),
+        "physics_data/3/position": (3,),
+        "physics_data/3/joint_state": (0,),
+        "physics_data/4/joint_state": (2,),
+    }
+    with h5py.File(filename, "w") as hf:
+        hf.attrs["/metadata/physics_timestep"] = 1 / 120.0
+        hf.attrs["/metadata/scene_id"] = "Rs_int"
+        for name, shape in shapes.items():
+            hf.create_dataset(name, (0,) + shape, maxshape=(None,) + shape, dtype=np.float64)
+        for start in range(0, num_frames, 100):
+            frames_to_write = min(100, num_frames - start)
+            for name, shape in shapes.items():
+                dset = hf[name]
+                dset.resize(dset.shape[0] + frames_to_write, axis=0)
+                dset[-frames_to_write:, ...] = rng.uniform(-1, 1, size=(frames_to_write,) + shape)
+
+
+def convert_log_row_by_row(input_path, output_path):
+    # Previous converter, copying one row of one dataset at a time
+    with h5py.File(input_path, "r") as in_hf5, h5py.File(output_path, "w") as out_hf5:
+        keys_to_write = get_log_datasets(in_hf5)
+        for frame in range(in_hf5["frame_data"].shape[0]):
+            for key in keys_to_write:
+                out_hf5[str(frame) + "/" + key] = in_hf5[key][frame]
+
+
+def test_vr_log_converter(tmp_path):
+    input_path = os.path.join(str(tmp_path), "log.hdf5")
+    make_log(input_path, 250)
+    convert_log_row_by_row(input_path, os.path.join(str(tmp_path), "before.hdf5"))
+    convert_log(input_path, os.path.join(str(tmp_path), "time_ordered.hdf5"), layout="time_ordered", chunk_frames=64)
+    convert_log(input_path, os.path.join(str(tmp_path), "columnar.hdf5"), chunk_frames=64)
+    convert_log(input_path, os.path.join(str(tmp_path), "parallel.hdf5"), compression="gzip", num_workers=2)
+
+    with h5py.File(input_path, "r") as in_hf5, h5py.File(os.path.join(str(tmp_path), "before.hdf5"), "r") as before:
+        before_datasets = get_log_datasets(before)
+        with h5py.File(os.path.join(str(tmp_path), "time_ordered.hdf5"), "r") as out_hf5:
+            assert get_log_datasets(out_hf5) == before_datasets
+            for name in before_datasets:
+                assert out_hf5[name].dtype == before[name].dtype
+                assert out_hf5[name].shape == before[name].shape
+                assert np.array_equal(out_hf5[name][()], before[name][()])
+            assert out_hf5.attrs["/metadata/log_layout"] == "time_ordered"
+
+        # The columnar layout is the layout of the input, which IGLogReader reads
+        for filename in ["columnar.hdf5", "parallel.hdf5"]:
+            with h5py.File(os.path.join(str(tmp_path), filename), "r") as out_hf5:
+                assert sorted(get_log_datasets(out_hf5)) == sorted(get_log_datasets(in_hf5))
+                for name in get_log_datasets(in_hf5):
+                    assert out_hf5[name].dtype == in_hf5[name].dtype
+                    assert out_hf5[name].maxshape == in_hf5[name].maxshape
+                    assert np.array_equal(out_hf5[name][()], in_hf5[name][()])
+                for name in before_datasets:
+                    frame, key = name.split("/", 1)
+                    assert np.array_equal(out_hf5[key][int(frame)], before[name][()])
+                assert out_hf5.attrs["/metadata/scene_id"] == "Rs_int"
+                assert out_hf5.attrs["/metadata/physics_timestep"] == 1 / 120.0
+                assert out_hf5.attrs["/metadata/log_layout"] == "columnar"
@@ -0,0 +1,61 @@
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from igibson.examples.web_ui.streaming import EnvPool, FrameQueue, ImageEncoder
+
+
+class FakeWorker(object):
+    def __init__(self, key):
+        self.key = key
+        self.num_resets = 0
+        self.closed = False
+
+    def reset(self):
+        self.num_resets += 1
+
+    def close(self):
+        self.closed = True
+
+
+def test_image_encoder():
+    frame = np.random.RandomState(0).uniform(size=(40, 60, 4)).astype(np.float32)
+    for backend in ["pil", "opencv"]:
+        for image_format in ["jpeg", "png"]:
+            encoder = ImageEncoder(backend=backend, image_format=image_format, size=(30, 20))
+            image = Image.open(BytesIO(encoder.encode(frame)))
+            assert image.format == image_format.upper() and image.size == (30, 20)
+    decoded = np.array(Image.open(BytesIO(ImageEncoder(image_format="png").encode(frame))))
+    assert np.array_equal(decoded, (frame[:, :, :3] * 255).astype(np.uint8))
+
+
+def test_frame_queue():
+    queue = FrameQueue(maxsize=2)
+    for i in range(5):
+        queue.put(i)
+    # The stale frames are dropped
+    assert queue.num_dropped == 3
+    assert queue.get() == 3 and queue.get() == 4
+    assert queue.get(timeout=0.01) is None
+    queue.put(5)
+    queue.close()
+    assert queue.get() == 5 and queue.get() is None
+
+
+def test_env_pool():
+    pool = EnvPool(FakeWorker, max_workers=2)
+    first = pool.acquire("Rs_int")
+    second = pool.acquire("Rs_int")
+    assert pool.acquire("Rs_int") is None
+    pool.release("Rs_int", first)
+    # Idle workers of the same key are reset and reused
+    assert pool.acquire("Rs_int") is first and first.num_resets == 1
+    pool.release("Rs_int", first)
+    # Idle workers of other keys are closed to make room
+    third = pool.acquire("Beechwood_0_int")
+    assert third.key == "Beechwood_0_int" and first.closed
+    pool.release("Rs_int", second)
+    pool.idle_timeout = 0
+    pool.cleanup()
+    assert second.closed and pool.num_workers == 1